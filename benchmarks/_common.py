@@ -0,0 +1,46 @@
+"""Helpers shared by the benchmark scripts."""
+import json
+import os
+import platform
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+CHILD_SCRIPT = os.path.join(BENCH_DIR, 'child.py')
+
+
+def child_command(*args):
+    """Returns a command line that runs the synthetic child with the given flags."""
+    return [sys.executable, CHILD_SCRIPT] + [str(a) for a in args]
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    """Nearest-rank percentiles of a list of numbers, plus min/max/count."""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    result = {'count': len(ordered), 'min': ordered[0], 'max': ordered[-1]}
+    for p in points:
+        index = min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered))) - 1))
+        result[f'p{p}'] = ordered[index]
+    return result
+
+
+def report(benchmark, results, json_path=None):
+    """Prints results and optionally writes them as JSON for later comparison."""
+    print(f"=== {benchmark} ===")
+    print(json.dumps(results, indent=2, sort_keys=True))
+    if json_path:
+        payload = {
+            'benchmark': benchmark,
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results,
+        }
+        with open(json_path, 'w') as f:
+            json.dump(payload, f, indent=2, sort_keys=True)
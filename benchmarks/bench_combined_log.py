@@ -0,0 +1,109 @@
+"""
+Combined log: --apps children (default 8) each write --megabytes of
+100-byte lines as fast as they can through pipe capture. Compares the
+aggregate lines/s with each app writing its own output file against
+framing every line into the combined JSON-lines log, then measures
+reading one app's last lines and all of its lines through the per-app
+index vs. scanning the whole file.
+
+Exits non-zero if the combined log keeps up with fewer than --min-rate
+lines/s (default 100,000).
+
+Usage: python benchmarks/bench_combined_log.py [--apps 8] [--megabytes 16] [--min-rate 100000] [--json out.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import child_command, report
+
+import combined_log
+from output_pipeline import OutputCapture
+
+
+def run_apps(command, apps, work_dir, combined):
+    if combined:
+        combined_log.configure_combined_log({'combined_log': 'combined.jsonl'}, work_dir)
+    started = time.perf_counter()
+    running = []
+    for number in range(apps):
+        config = {'name': f"app{number}:0", 'capture_output': True}
+        if not combined:
+            config['output'] = os.path.join(work_dir, f"app{number}.log")
+        capture = OutputCapture(config)
+        process = subprocess.Popen(command, **capture.popen_kwargs())
+        capture.attach(process)
+        running.append((capture, process))
+    for capture, process in running:
+        process.wait()
+        capture.drain(timeout=120)
+        capture.close()
+    combined_log.close_combined_log()
+    return time.perf_counter() - started
+
+
+def timed(function, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = (time.perf_counter() - started) * 1000.0
+        best = elapsed if best is None else min(best, elapsed)
+    return result, round(best, 2)
+
+
+def scan(path, app):
+    with open(path, 'rb') as f:
+        return [record for record in map(json.loads, f) if record['app'] == app]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--apps', type=int, default=8)
+    parser.add_argument('--megabytes', type=int, default=16, help="Output per app.")
+    parser.add_argument('--line-size', type=int, default=100)
+    parser.add_argument('--min-rate', type=int, default=100000, help="Lines/s the combined log must sustain.")
+    parser.add_argument('--json', type=str, help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    command = child_command('--spew', args.megabytes * 1024 * 1024, '--line-size', args.line_size)
+    work_dir = tempfile.mkdtemp(prefix="pysup-combined-")
+    try:
+        results = {'apps': args.apps}
+        for mode, combined in (('per_app_files', False), ('combined_log', True)):
+            seconds = run_apps(command, args.apps, work_dir, combined)
+            if combined:
+                path = os.path.join(work_dir, 'combined.jsonl')
+                with open(path, 'rb') as f:
+                    lines = sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b''))
+                results['combined_log_mb'] = round(os.path.getsize(path) / 1e6, 1)
+            else:
+                lines = sum(os.path.getsize(os.path.join(work_dir, name)) for name in os.listdir(work_dir)) // args.line_size
+                for name in os.listdir(work_dir):
+                    os.remove(os.path.join(work_dir, name))
+            results[mode] = {'seconds': round(seconds, 3), 'lines': lines, 'lines_per_second': round(lines / seconds)}
+
+        app = f"app{args.apps // 2}:0"
+        tail, results['tail_100_indexed_ms'] = timed(lambda: combined_log.read_records(path, [app], limit=100))
+        indexed, results['one_app_indexed_ms'] = timed(lambda: combined_log.read_records(path, [app]), repeat=1)
+        scanned, results['one_app_scan_ms'] = timed(lambda: scan(path, app), repeat=1)
+        results['one_app_records'] = len(indexed)
+        if indexed != scanned or tail != scanned[-100:]:
+            print("FAIL: the index returned different records than a full scan.", file=sys.stderr)
+            return 1
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    report('combined_log', results, args.json)
+    if results['combined_log']['lines_per_second'] < args.min_rate:
+        print(f"FAIL: {results['combined_log']['lines_per_second']} lines/s is below {args.min_rate}.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
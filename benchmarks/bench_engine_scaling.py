@@ -0,0 +1,145 @@
+"""
+Scaling test for the supervision backends: supervises N idle children with
+the asyncio SupervisorEngine and with one ProcessSupervisor thread per app,
+for N from 10 up to 5,000, and records start time, stop time, supervisor
+threads, RSS and idle CPU.
+
+Usage: python benchmarks/bench_engine_scaling.py [--counts 10,100,1000,5000] [--json out.json]
+"""
+import argparse
+import resource
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from _common import child_command, report
+from supervisor_core import ProcessSupervisor
+
+from supervisor_engine import SupervisorEngine
+
+
+def _idle_command():
+    sleep = shutil.which('sleep')
+    return [sleep, '3600'] if sleep else child_command('--sleep', 3600)
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class _Tracker:
+    def __init__(self):
+        self.running = set()
+        self.finished = set()
+        self.lock = threading.Lock()
+
+    def on_status(self, name, status):
+        with self.lock:
+            if status.startswith("RUNNING"):
+                self.running.add(name)
+            elif status == "STOPPED":
+                self.finished.add(name)
+
+    def wait_for(self, attr, count, timeout):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self.lock:
+                if len(getattr(self, attr)) >= count:
+                    return True
+            time.sleep(0.01)
+        return False
+
+
+def run_engine(configs, idle_seconds):
+    tracker = _Tracker()
+    engine = SupervisorEngine(on_log=lambda message: None, on_status=tracker.on_status)
+    engine.start()
+    threads_before = threading.active_count()
+
+    started = time.time()
+    for config in configs:
+        engine.start_app(config)
+    tracker.wait_for('running', len(configs), 300)
+    start_seconds = time.time() - started
+
+    sample = _sample(idle_seconds)
+    sample['supervisor_threads'] = threading.active_count() - threads_before + 1
+
+    stopping = time.time()
+    engine.shutdown()
+    tracker.wait_for('finished', len(configs), 60)
+    sample.update(start_seconds=start_seconds, stop_seconds=time.time() - stopping)
+    return sample
+
+
+def run_threads(configs, idle_seconds):
+    tracker = _Tracker()
+    threads_before = threading.active_count()
+    workers, threads = [], []
+
+    started = time.time()
+    for config in configs:
+        worker = ProcessSupervisor(config, on_log=lambda message: None, on_status=tracker.on_status)
+        thread = threading.Thread(target=worker.run, daemon=True)
+        thread.start()
+        workers.append(worker)
+        threads.append(thread)
+    tracker.wait_for('running', len(configs), 300)
+    start_seconds = time.time() - started
+
+    sample = _sample(idle_seconds)
+    sample['supervisor_threads'] = threading.active_count() - threads_before
+
+    stopping = time.time()
+    with ThreadPoolExecutor(max_workers=64) as pool:
+        list(pool.map(lambda w: w.stop(), workers))
+    for thread in threads:
+        thread.join(10)
+    sample.update(start_seconds=start_seconds, stop_seconds=time.time() - stopping)
+    return sample
+
+
+def _sample(idle_seconds):
+    time.sleep(0.5)
+    cpu_before, wall_before = time.process_time(), time.time()
+    time.sleep(idle_seconds)
+    cpu = time.process_time() - cpu_before
+    return {
+        'rss_mb': _rss_mb(),
+        'idle_cpu_percent': 100.0 * cpu / (time.time() - wall_before),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--counts', type=str, default='10,100,1000,5000')
+    parser.add_argument('--modes', type=str, default='asyncio,threads')
+    parser.add_argument('--idle-seconds', type=float, default=3.0)
+    parser.add_argument('--json', type=str, help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    # Every child costs a few descriptors in the supervisor.
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    runners = {'asyncio': run_engine, 'threads': run_threads}
+    results = {}
+    for count in [int(c) for c in args.counts.split(',')]:
+        configs = [{'name': f'idle-{i}', 'command': _idle_command()} for i in range(count)]
+        for mode in args.modes.split(','):
+            results[f'{mode}/{count}'] = runners[mode](configs, args.idle_seconds)
+            print(f"{mode:>8} N={count:<5} {results[f'{mode}/{count}']}")
+    report('engine_scaling', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Event journal write throughput and history query latency. Records --events
+synthetic start/exit events (default 2,000,000) for 200 apps, spread over
+30 days, through EventJournal.record_status. Then times the history
+queries the GUI and ctl.py run, taking the median of --repeat runs.
+
+Usage: python benchmarks/bench_event_journal.py [--events 2000000] [--apps 200] [--json out.json]
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from _common import report
+
+from event_journal import EventJournal
+
+
+def timed(query, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = query()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return {'median_ms': statistics.median(samples), 'max_ms': max(samples), 'rows': len(result)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=2000000)
+    parser.add_argument('--apps', type=int, default=200)
+    parser.add_argument('--days', type=float, default=30.0)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', type=str, help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="pysup-journal-")
+    try:
+        journal = EventJournal(os.path.join(directory, "events.db"), retention_days=0)
+        rng = random.Random(1)
+        now = time.time()
+        start = now - args.days * 86400
+        step = (now - start) / args.events
+        # A few apps flap constantly; the rest restart now and then.
+        weights = [50 if i < 5 else 1 for i in range(args.apps)]
+        names = [f"app-{i}" for i in range(args.apps)]
+
+        started = time.perf_counter()
+        for n in range(0, args.events, 2):
+            app = rng.choices(names, weights)[0]
+            ts = start + n * step
+            journal.record_status(app, app, f"RUNNING (PID: {1000 + n})", ts)
+            journal.record_status(app, app, f"STOPPED (Code: {rng.choice((0, 1, 1, 2, 137))})", ts + step)
+        queued = time.perf_counter() - started
+        journal.flush(timeout=3600)
+        written = time.perf_counter() - started
+
+        app = names[0]
+        day, week = now - 86400, now - 7 * 86400
+        results = {
+            'events': args.events,
+            'apps': args.apps,
+            'record_per_second': args.events / queued,
+            'commit_per_second': args.events / written,
+            'database_mb': sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) / 1e6,
+            'queries': {
+                'exit_codes_app_24h': timed(lambda: journal.exit_codes(app, day), args.repeat),
+                'top_flapping_7d': timed(lambda: journal.top_flapping(week), args.repeat),
+                'summary_30d': timed(lambda: journal.summary(start), args.repeat),
+                'events_app_24h_limit_2000': timed(lambda: journal.events(app, since=day, limit=2000), args.repeat),
+                'events_all_limit_2000': timed(lambda: journal.events(limit=2000), args.repeat),
+                'failures_app_7d_limit_2000': timed(
+                    lambda: journal.events(app, since=week, kinds=['exit', 'limit', 'unhealthy', 'error'], limit=2000),
+                    args.repeat),
+            },
+        }
+        journal.close()
+        report('event_journal', results, args.json)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Measures how quickly the supervision loop notices a crashed child and restarts
+it, and how much CPU the supervisor burns while its children sit idle,
+once with the kernel exit-notification backend and once with polling.
+
+Usage: python benchmarks/bench_exit_detection.py [--workers 20] [--json out.json]
+"""
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+from _common import child_command, percentiles, report
+
+import exit_watcher
+from supervisor_core import ProcessSupervisor
+
+PID_RE = re.compile(r"RUNNING \(PID: (\d+)\)")
+
+
+def _start_workers(configs):
+    workers, threads = [], []
+    for config in configs:
+        worker = ProcessSupervisor(config, on_log=lambda message: None)
+        thread = threading.Thread(target=worker.run, daemon=True)
+        workers.append(worker)
+        threads.append(thread)
+    return workers, threads
+
+
+def _stop_workers(workers, threads):
+    stoppers = [threading.Thread(target=w.stop) for w in workers]
+    for t in stoppers: t.start()
+    for t in stoppers: t.join()
+    for t in threads: t.join(10)
+
+
+def measure_restart_latency(backend, workers, cycles, lifetime):
+    """Crash-to-restart latency: child's exit timestamp -> next RUNNING status."""
+    exit_watcher.DEFAULT_BACKEND = backend
+    stamp_dir = tempfile.mkdtemp(prefix="pysup-bench-")
+    starts = {}  # worker index -> [(timestamp, pid), ...]
+    lock = threading.Lock()
+    try:
+        configs = [{
+            'name': f'crash-{i}',
+            'command': child_command('--sleep', lifetime + (i % 10) * 0.01, '--exit-code', 1, '--stamp-dir', stamp_dir),
+            'restart': True,
+        } for i in range(workers)]
+        worker_list, threads = _start_workers(configs)
+        for i, worker in enumerate(worker_list):
+            def on_status(name, status, i=i):
+                match = PID_RE.match(status)
+                if match:
+                    with lock: starts.setdefault(i, []).append((time.time(), int(match.group(1))))
+            worker.on_status = on_status
+        for t in threads: t.start()
+
+        deadline = time.time() + (lifetime + 2) * (cycles + 1)
+        while time.time() < deadline:
+            with lock:
+                if all(len(starts.get(i, [])) > cycles for i in range(workers)): break
+            time.sleep(0.1)
+        _stop_workers(worker_list, threads)
+
+        latencies = []
+        for events in starts.values():
+            for (_, pid), (restarted_at, _) in zip(events, events[1:]):
+                stamp = os.path.join(stamp_dir, str(pid))
+                if os.path.exists(stamp):
+                    with open(stamp) as f: latencies.append((restarted_at - float(f.read())) * 1000.0)
+        return percentiles(latencies)
+    finally:
+        shutil.rmtree(stamp_dir, ignore_errors=True)
+
+
+def measure_idle_cpu(backend, workers, seconds):
+    """CPU seconds used by the supervisor per wall second while children idle."""
+    exit_watcher.DEFAULT_BACKEND = backend
+    configs = [{'name': f'idle-{i}', 'command': child_command('--sleep', 3600)} for i in range(workers)]
+    worker_list, threads = _start_workers(configs)
+    for t in threads: t.start()
+    time.sleep(1.0)  # let every child spawn before measuring
+    cpu_before, wall_before = time.process_time(), time.time()
+    time.sleep(seconds)
+    cpu_used = time.process_time() - cpu_before
+    wall = time.time() - wall_before
+    _stop_workers(worker_list, threads)
+    return {'workers': workers, 'cpu_seconds': cpu_used, 'cpu_percent': 100.0 * cpu_used / wall}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=20)
+    parser.add_argument('--cycles', type=int, default=2, help="Restarts to observe per worker.")
+    parser.add_argument('--lifetime', type=float, default=5.2, help="Child lifetime; >5s avoids the fast-fail backoff.")
+    parser.add_argument('--idle-workers', type=int, default=200)
+    parser.add_argument('--idle-seconds', type=float, default=5.0)
+    parser.add_argument('--json', type=str, help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    backends = [exit_watcher.detect_backend()]
+    if backends[0] != 'poll':
+        backends.append('poll')
+
+    results = {}
+    for backend in backends:
+        results[backend] = {
+            'restart_latency_ms': measure_restart_latency(backend, args.workers, args.cycles, args.lifetime),
+            'idle': measure_idle_cpu(backend, args.idle_workers, args.idle_seconds),
+        }
+    report('exit_detection', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+GUI signal throughput: worker threads send the main window the same queued
+status_update and log_message signals a supervisor sends, at each of
+--rates status signals per second (0 = as fast as they can), and the real
+MainWindow slots handle them. Records signals
+emitted and delivered per second, how long the GUI takes to drain the
+backlog, queueing latency (from probe signals sent in the same stream) and
+event loop stalls.
+
+Runs headless with QT_QPA_PLATFORM=offscreen, against a throwaway config
+with --apps apps.
+Usage: python benchmarks/bench_gui_signals.py [--apps 500] [--threads 8] [--rates 1000,10000,0] [--seconds 3] [--json out.json]
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+_home = tempfile.mkdtemp(prefix="pysup-bench-home-")
+os.environ['HOME'] = os.environ['APPDATA'] = _home  # MainWindow reads its config from here
+
+from _common import percentiles, report
+
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QObject, QTimer, QEventLoop, Signal, Slot
+
+from paths import get_user_data_dir
+
+
+class _Emitter(QObject):
+    """Carries the supervisor's signals from a plain thread to the GUI thread."""
+    log_message = Signal(str)
+    status_update = Signal(str, str)
+    probe = Signal(float)
+
+
+class _Receiver(QObject):
+    def __init__(self):
+        super().__init__()
+        self.delivered = 0
+        self.latencies = []
+
+    @Slot(str, str)
+    def count(self, name, status):
+        self.delivered += 1
+
+    @Slot(float)
+    def on_probe(self, sent_at):
+        self.latencies.append((time.perf_counter() - sent_at) * 1000.0)
+
+
+def flood(window, apps, threads, seconds, rate):
+    receiver = _Receiver()
+    emitter = _Emitter()
+    emitter.log_message.connect(window.append_log_message)
+    emitter.status_update.connect(window.update_process_status)
+    emitter.status_update.connect(receiver.count)
+    emitter.probe.connect(receiver.on_probe)
+
+    emitted = [0] * threads
+    stop = threading.Event()
+
+    def emit(index):
+        n = 0
+        while not stop.is_set():
+            if rate and n >= (time.perf_counter() - started) * rate / threads:
+                time.sleep(0.001)
+                continue
+            name = f"app-{(n * threads + index) % apps}"
+            emitter.log_message.emit(f"[{name}] Process exited with code 1.")
+            emitter.status_update.emit(name, "STOPPED (Code: 1)" if n % 2 else "RUNNING (PID: 1)")
+            n += 1
+            if n % 100 == 0:
+                emitter.probe.emit(time.perf_counter())
+                time.sleep(0) # Let the other emitters and the GUI thread have the GIL
+        emitted[index] = n
+
+    gaps, last_beat = [], [time.perf_counter()]
+    def heartbeat():
+        now = time.perf_counter()
+        gaps.append((now - last_beat[0]) * 1000.0)
+        last_beat[0] = now
+    beat = QTimer()
+    beat.timeout.connect(heartbeat)
+    beat.start(5)
+
+    workers = [threading.Thread(target=emit, args=(i,), daemon=True) for i in range(threads)]
+    started = time.perf_counter()
+    for worker in workers: worker.start()
+    loop = QEventLoop()
+    QTimer.singleShot(int(seconds * 1000), loop.quit)
+    loop.exec()
+    stop.set()
+    for worker in workers: worker.join()
+    flooded = time.perf_counter() - started
+
+    total = sum(emitted)
+    app = QApplication.instance()
+    while receiver.delivered < total:
+        app.processEvents()
+    drained = time.perf_counter() - started
+    beat.stop()
+    return {
+        'target_rate': rate,
+        'status_signals': total,
+        'emitted_per_second': total / flooded,
+        'delivered_per_second': total / drained,
+        'drain_seconds': drained - flooded,
+        'queue_latency_ms': percentiles(receiver.latencies),
+        'loop_gap_ms': percentiles(gaps),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--apps', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--rates', type=str, default='1000,10000,0')
+    parser.add_argument('--json', type=str, help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    config = {'metrics_interval': 0, 'apps': [{'name': f'app-{i}', 'command': ['true']} for i in range(args.apps)]}
+    with open(get_user_data_dir() / "config.json", 'w') as f:
+        json.dump(config, f)
+
+    app = QApplication.instance() or QApplication([])
+    from supervisor_app import MainWindow
+    window = MainWindow()
+    window.show()
+    results = {}
+    for rate in (int(r) for r in args.rates.split(',')):
+        results[f"rate_{rate or 'max'}"] = flood(window, args.apps, args.threads, args.seconds, rate)
+    results['setup'] = {'apps': args.apps, 'threads': args.threads}
+    window.tray_icon.hide()
+    report('gui_signals', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Runs thousands of health checks against local stub servers (a TCP
+listener and an HTTP server whose /health can be switched to 500).
+Compares the shared HealthScheduler (one heap thread plus a bounded pool)
+with a thread per check, reporting checks per second, interval jitter
+and thread count, and measures how long the scheduler takes to declare
+a failing HTTP endpoint unhealthy.
+
+Usage: python benchmarks/bench_health_checks.py [--checks 2000] [--interval 0.5] [--seconds 5] [--json out.json]
+"""
+import argparse
+import socket
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from _common import percentiles, report
+
+from health_checks import HealthCheckSpec, HealthScheduler, run_check
+
+
+class StubTCPServer:
+    """Accepts and immediately closes connections on an ephemeral port."""
+    def __init__(self):
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(4096)
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            conn.close()
+
+    def close(self):
+        self.sock.close()
+
+
+class StubHTTPHandler(BaseHTTPRequestHandler):
+    healthy = True
+
+    def do_GET(self):
+        self.send_response(200 if StubHTTPHandler.healthy else 500)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def collect(results_by_check, name):
+    def on_result(healthy, detail):
+        results_by_check[name].append(time.monotonic())
+    return on_result
+
+
+def jitter(results_by_check, interval):
+    gaps = []
+    for stamps in results_by_check.values():
+        gaps.extend(b - a - interval for a, b in zip(stamps, stamps[1:]))
+    return percentiles(gaps)
+
+
+def run_scheduler(spec, checks, seconds):
+    scheduler = HealthScheduler()
+    results = defaultdict(list)
+    before = threading.active_count()
+    for i in range(checks):
+        scheduler.add(f'app-{i}', spec, lambda detail: None, collect(results, f'app-{i}'))
+    time.sleep(seconds)
+    threads = threading.active_count() - before
+    scheduler.stop()
+    total = sum(len(stamps) for stamps in results.values())
+    return {'checks_per_second': total / seconds, 'threads': threads, 'interval_jitter_seconds': jitter(results, spec.interval)}
+
+
+def run_thread_per_check(spec, checks, seconds):
+    stop = threading.Event()
+    results = defaultdict(list)
+
+    def loop(name):
+        on_result = collect(results, name)
+        while not stop.is_set():
+            on_result(*run_check(spec))
+            stop.wait(spec.interval)
+
+    before = threading.active_count()
+    threads = [threading.Thread(target=loop, args=(f'app-{i}',), daemon=True) for i in range(checks)]
+    for thread in threads: thread.start()
+    time.sleep(seconds)
+    count = threading.active_count() - before
+    stop.set()
+    for thread in threads: thread.join()
+    total = sum(len(stamps) for stamps in results.values())
+    return {'checks_per_second': total / seconds, 'threads': count, 'interval_jitter_seconds': jitter(results, spec.interval)}
+
+
+def detection_latency(http_port, interval, failures, trials=5):
+    spec = HealthCheckSpec('http', interval=interval, timeout=1, failures=failures, port=http_port, path='/health')
+    scheduler = HealthScheduler()
+    latencies = []
+    for trial in range(trials):
+        StubHTTPHandler.healthy = True
+        declared = threading.Event()
+        scheduler.add('web', spec, lambda detail: declared.set())
+        time.sleep(interval * 3)
+        flipped = time.monotonic()
+        StubHTTPHandler.healthy = False
+        declared.wait(10)
+        latencies.append(time.monotonic() - flipped)
+    scheduler.stop()
+    StubHTTPHandler.healthy = True
+    return percentiles(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checks', type=int, default=2000)
+    parser.add_argument('--interval', type=float, default=0.5)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--json', type=str, help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    tcp = StubTCPServer()
+    http = ThreadingHTTPServer(('127.0.0.1', 0), StubHTTPHandler)
+    http.daemon_threads = True
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+
+    results = {'checks': args.checks, 'interval': args.interval}
+    tcp_spec = HealthCheckSpec('tcp', interval=args.interval, timeout=1, port=tcp.port)
+    results['tcp_scheduler'] = run_scheduler(tcp_spec, args.checks, args.seconds)
+    results['tcp_thread_per_check'] = run_thread_per_check(tcp_spec, args.checks, args.seconds)
+    http_spec = HealthCheckSpec('http', interval=args.interval, timeout=1, port=http.server_address[1], path='/health')
+    results['http_scheduler'] = run_scheduler(http_spec, max(1, args.checks // 4), args.seconds)
+    results['http_unhealthy_detection_seconds'] = detection_latency(http.server_address[1], 0.1, 3)
+
+    http.shutdown()
+    tcp.close()
+    report('health_checks', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
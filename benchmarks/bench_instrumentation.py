@@ -0,0 +1,98 @@
+"""
+Instrumentation: what the supervisor's own latency histograms and counters
+cost, and what they report.
+
+ * per call: ns for the disabled guard (`if stats.enabled: ...`), an
+   enabled counter update and an enabled histogram record.
+ * restart loop: one app restarted --cycles times back to back, with
+   instrumentation off and on; wall time and supervisor CPU per cycle,
+   plus the latency percentiles recorded by the instrumented run.
+
+Usage: python benchmarks/bench_instrumentation.py [--calls 1000000] [--cycles 300] [--json out.json]
+"""
+import argparse
+import threading
+import time
+
+from _common import child_command, report
+
+from instrumentation import stats, format_report, SPAWN
+from supervisor_core import ProcessSupervisor
+
+
+def per_call_ns(function, calls):
+    started = time.perf_counter()
+    function(calls)
+    return round((time.perf_counter() - started) / calls * 1e9, 1)
+
+
+def guarded_count(calls):
+    for _ in range(calls):
+        if stats.enabled:
+            stats.count('bench')
+
+
+def guarded_record(calls):
+    for _ in range(calls):
+        if stats.enabled:
+            stats.record(SPAWN, 0.001)
+
+
+def empty_loop(calls):
+    for _ in range(calls):
+        pass
+
+
+def restart_loop(cycles):
+    """Wall and CPU seconds for `cycles` immediate restarts of a child that exits at once."""
+    runs, done = [0], threading.Event()
+
+    def on_status(name, status):
+        if status.startswith("RUNNING"):
+            runs[0] += 1
+            if runs[0] > cycles:
+                done.set()
+
+    proc_config = {'name': 'flapping', 'command': child_command(), 'restart': True,
+                   'restart_delay': 0, 'fast_fail_seconds': 0}
+    supervisor = ProcessSupervisor(proc_config, on_log=lambda message: None, on_status=on_status)
+    thread = threading.Thread(target=supervisor.run, name="Supervisor-flapping")
+    wall, cpu = time.perf_counter(), time.process_time()
+    thread.start()
+    done.wait(cycles * 2.0)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    supervisor.stop()
+    thread.join()
+    return wall, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=1000000)
+    parser.add_argument('--cycles', type=int, default=300)
+    parser.add_argument('--json', type=str)
+    args = parser.parse_args()
+
+    loop = per_call_ns(empty_loop, args.calls)
+    results = {'per_call_ns': {}, 'restart_loop': {}}
+    stats.enable(False)
+    results['per_call_ns']['disabled_guard'] = round(per_call_ns(guarded_count, args.calls) - loop, 1)
+    stats.enable()
+    results['per_call_ns']['enabled_count'] = round(per_call_ns(guarded_count, args.calls) - loop, 1)
+    results['per_call_ns']['enabled_record'] = round(per_call_ns(guarded_record, args.calls) - loop, 1)
+    stats.reset()
+
+    for mode, enabled in (('off', False), ('on', True)):
+        stats.enable(enabled)
+        wall, cpu = restart_loop(args.cycles)
+        results['restart_loop'][mode] = {'ms_per_cycle': round(wall / args.cycles * 1000.0, 3),
+                                         'cpu_ms_per_cycle': round(cpu / args.cycles * 1000.0, 3)}
+    snapshot = stats.snapshot()
+    results['recorded_ms'] = {name: {key: round(value * 1000.0, 3) for key, value in h.items() if key != 'count'}
+                              for name, h in snapshot['histograms'].items()}
+    print(format_report(snapshot))
+    report('instrumentation', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
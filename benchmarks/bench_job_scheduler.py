@@ -0,0 +1,117 @@
+"""
+Job scheduler: what scheduling costs, at rest and when many jobs fire at once.
+
+ * next_fire_us: microseconds to compute the next fire time of a few
+   cron expressions and an interval (done once per run, not per tick).
+ * idle: --idle-jobs jobs scheduled hours out; supervisor CPU over
+   --idle-seconds, which stays near zero because one thread sleeps until
+   the earliest is due whatever the number of jobs.
+ * pile_up: --jobs "once" jobs all due at the same instant, each a real
+   ProcessSupervisor run of a child that lives --run-seconds, with
+   max_concurrent_jobs --cap; peak concurrent runs (never above the cap),
+   fire-to-start latency percentiles and the time to drain them all.
+
+Usage: python benchmarks/bench_job_scheduler.py [--jobs 100] [--cap 8] [--run-seconds 0.05]
+       [--idle-jobs 10000] [--idle-seconds 5] [--json out.json]
+"""
+import argparse
+import threading
+import time
+from datetime import datetime
+
+from _common import child_command, percentiles, report
+
+from job_scheduler import JobScheduler, CronSchedule, IntervalSchedule, COMPLETED
+from supervisor_core import ProcessSupervisor
+
+EXPRESSIONS = ('*/5 * * * *', '0 3 * * 1-5', '30 2 29 2 *', '0 0 13 * 5')
+
+
+def next_fire_us(calls):
+    now = datetime(2026, 1, 1).timestamp()
+    results = {}
+    schedules = [(expression, CronSchedule(expression)) for expression in EXPRESSIONS]
+    schedules.append(('every 90s', IntervalSchedule(90)))
+    for label, schedule in schedules:
+        started = time.perf_counter()
+        for i in range(calls):
+            schedule.next_after(now + i * 61)
+        results[label] = round((time.perf_counter() - started) / calls * 1e6, 2)
+    return results
+
+
+def idle(jobs, seconds):
+    scheduler = JobScheduler(lambda name: None, lambda name: None)
+    for i in range(jobs):
+        scheduler.schedule({'name': f'job-{i}', 'command': ['true'], 'schedule': f'{i % 60} {i % 24} * * *'})
+    time.sleep(0.5) # Let scheduling settle before measuring
+    cpu = time.process_time()
+    time.sleep(seconds)
+    cpu = time.process_time() - cpu
+    scheduler.stop()
+    return {'jobs': jobs, 'cpu_ms_per_second': round(cpu / seconds * 1000.0, 3)}
+
+
+def pile_up(jobs, cap, run_seconds):
+    lock = threading.Lock()
+    fired, latencies, threads = {}, [], []
+    state = {'running': 0, 'peak': 0}
+    completed = threading.Event()
+    done = [0]
+
+    def on_status(name, status):
+        with lock:
+            if status.startswith("RUNNING"):
+                latencies.append(time.perf_counter() - fired[name])
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+            elif status.startswith("STOPPED (Code"):
+                state['running'] -= 1
+            elif status.startswith(COMPLETED):
+                done[0] += 1
+                if done[0] == jobs:
+                    completed.set()
+        scheduler.notify_status(name, status)
+
+    def start_run(name):
+        supervisor = ProcessSupervisor({'name': name, 'command': child_command('--sleep', run_seconds), 'restart': False},
+                                       on_log=lambda message: None, on_status=on_status)
+        thread = threading.Thread(target=supervisor.run, name=f"Supervisor-{name}")
+        threads.append(thread)
+        thread.start()
+
+    scheduler = JobScheduler(start_run, lambda name: None, on_status=on_status, max_concurrent=cap)
+    started = time.perf_counter()
+    for i in range(jobs):
+        fired[f'job-{i}'] = started
+        scheduler.schedule({'name': f'job-{i}', 'command': [], 'schedule': 'once'})
+    completed.wait(jobs * (run_seconds + 2.0))
+    drain = time.perf_counter() - started
+    scheduler.stop()
+    for thread in threads:
+        thread.join()
+    return {'jobs': jobs, 'cap': cap, 'completed': done[0], 'peak_running': state['peak'],
+            'drain_seconds': round(drain, 3),
+            'fire_to_start_ms': {key: round(value * 1000.0, 1) if key != 'count' else value
+                                 for key, value in percentiles(latencies).items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=100)
+    parser.add_argument('--cap', type=int, default=8)
+    parser.add_argument('--run-seconds', type=float, default=0.05)
+    parser.add_argument('--idle-jobs', type=int, default=10000)
+    parser.add_argument('--idle-seconds', type=float, default=5.0)
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--json', type=str)
+    args = parser.parse_args()
+
+    results = {'next_fire_us': next_fire_us(args.calls),
+               'idle': idle(args.idle_jobs, args.idle_seconds),
+               'pile_up': pile_up(args.jobs, args.cap, args.run_seconds)}
+    report('job_scheduler', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
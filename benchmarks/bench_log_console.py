@@ -0,0 +1,90 @@
+"""
+Feeds log messages into the main window's log view at a fixed rate
+(default 10,000/s from 200 apps) and measures how responsive the GUI event
+loop stays, comparing the old per-message QTextEdit.append with LogConsole.
+
+Runs headless with QT_QPA_PLATFORM=offscreen.
+Usage: python benchmarks/bench_log_console.py [--rate 10000] [--seconds 3] [--json out.json]
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from _common import percentiles, report
+
+from PySide6.QtWidgets import QApplication, QTextEdit
+from PySide6.QtCore import QTimer, QEventLoop
+
+from log_console import LogConsole
+
+
+def drive(app, append, rate, seconds, apps=200):
+    """Appends `rate` messages per second for `seconds`; returns loop stalls and achieved rate."""
+    tick_ms = 10
+    sent = [0]
+    gaps = []
+    last_beat = [time.perf_counter()]
+
+    def feed():
+        # Catch up to the target rate even if a tick fired late.
+        due = int((time.perf_counter() - started) * rate)
+        for _ in range(due - sent[0]):
+            n = sent[0]
+            append(f"[app-{n % apps}] Process exited with code 1. message #{n}")
+            sent[0] += 1
+
+    def heartbeat():
+        now = time.perf_counter()
+        gaps.append((now - last_beat[0]) * 1000.0)
+        last_beat[0] = now
+
+    started = time.perf_counter()
+    feeder, beat = QTimer(), QTimer()
+    feeder.timeout.connect(feed)
+    beat.timeout.connect(heartbeat)
+    feeder.start(tick_ms)
+    beat.start(5)
+
+    loop = QEventLoop()
+    QTimer.singleShot(int(seconds * 1000), loop.quit)
+    loop.exec()
+    feeder.stop()
+    beat.stop()
+    elapsed = time.perf_counter() - started
+    return {
+        'messages': sent[0],
+        'achieved_rate': sent[0] / elapsed,
+        'loop_gap_ms': percentiles(gaps),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=int, default=10000)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--json', type=str, help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication([])
+    results = {}
+
+    legacy = QTextEdit()
+    legacy.setReadOnly(True)
+    legacy.show()
+    results['qtextedit_append'] = drive(app, legacy.append, args.rate, args.seconds)
+    results['qtextedit_append']['document_lines'] = legacy.document().blockCount()
+    legacy.close()
+
+    console = LogConsole()
+    console.show()
+    results['log_console'] = drive(app, console.append_message, args.rate, args.seconds)
+    results['log_console']['document_lines'] = console.view.document().blockCount()
+    console.close()
+
+    report('log_console', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
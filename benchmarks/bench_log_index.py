@@ -0,0 +1,97 @@
+"""
+Log index: writes a large output file (default 2 GB of 100-byte lines) and
+measures what the output viewer does with it through LogIndex: indexing
+throughput and the memory it takes, random jump-to-line latency, how
+quickly appended lines are picked up (tail -f) and regex search throughput.
+The peak RSS shows the file is never loaded as a whole.
+
+Usage: python benchmarks/bench_log_index.py [--megabytes 2048] [--jumps 2000] [--json out.json]
+"""
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+
+from _common import percentiles, report
+from log_index import LogIndex
+
+LINE = b"2026-01-01 12:00:00 INFO worker=%06d request handled path=/api/v1/items status=200 ms=12\n"
+
+
+def write_file(path, megabytes):
+    block = b''.join(LINE % i for i in range(10000))
+    needle_at = megabytes * 1024 * 1024 // len(block) // 2
+    with open(path, 'wb') as f:
+        for i in range(megabytes * 1024 * 1024 // len(block)):
+            f.write(block)
+            if i == needle_at:
+                f.write(b"2026-01-01 12:00:00 FATAL worker=000000 lost its database connection\n")
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Log index benchmark.")
+    parser.add_argument('--megabytes', type=int, default=2048)
+    parser.add_argument('--jumps', type=int, default=2000)
+    parser.add_argument('--json', type=str)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(prefix="pysup-log-", suffix=".log")
+    os.close(fd)
+    try:
+        write_file(path, args.megabytes)
+        size_mb = os.path.getsize(path) / 1e6
+        rss_before = rss_mb()
+
+        index = LogIndex(path)
+        started = time.perf_counter()
+        while index.refresh():
+            pass
+        index_seconds = time.perf_counter() - started
+
+        jumps = []
+        for _ in range(args.jumps):
+            line = random.randrange(index.line_count)
+            started = time.perf_counter()
+            index.lines(line, 50) # One screenful
+            jumps.append((time.perf_counter() - started) * 1000.0)
+
+        tails = []
+        with open(path, 'ab') as f:
+            for i in range(50):
+                f.write(LINE % i)
+                f.flush()
+                started = time.perf_counter()
+                index.refresh()
+                tails.append((time.perf_counter() - started) * 1000.0)
+
+        started = time.perf_counter()
+        matches = [line for line, _ in index.search(r"FATAL .*database") if line is not None]
+        search_seconds = time.perf_counter() - started
+        index.close()
+
+        results = {
+            'file_mb': round(size_mb, 1),
+            'lines': index.line_count,
+            'index_seconds': round(index_seconds, 3),
+            'index_mb_per_second': round(size_mb / index_seconds, 1),
+            'index_entries': len(index.offsets),
+            'jump_ms': percentiles(jumps),
+            'tail_refresh_ms': percentiles(tails),
+            'search_seconds': round(search_seconds, 3),
+            'search_mb_per_second': round(size_mb / search_seconds, 1),
+            'search_matches': len(matches),
+            'peak_rss_growth_mb': round(rss_mb() - rss_before, 1),
+        }
+    finally:
+        os.unlink(path)
+    report('log_index', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
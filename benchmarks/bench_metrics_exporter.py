@@ -0,0 +1,147 @@
+"""
+Scrapes the metrics exporter like Prometheus would, with --apps apps
+configured (default 1000) while a churn thread keeps recording status
+changes, log lines and resource samples. Checks every scrape is valid
+exposition text and counters never go backwards, and records scrape
+latency percentiles and the cost of an update on the supervision side.
+Exits non-zero if a scrape is invalid or p99 latency exceeds --budget-ms.
+
+With --live N, N real `sleep` children are supervised by the asyncio engine
+and feed the exporter as well.
+
+Usage: python benchmarks/bench_metrics_exporter.py [--apps 1000] [--scrapes 300] [--budget-ms 50] [--live 0] [--json out.json]
+"""
+import argparse
+import re
+import shutil
+import sys
+import threading
+import time
+import urllib.request
+
+from _common import child_command, percentiles, report
+
+from metrics_exporter import MetricsExporter
+from supervisor_engine import SupervisorEngine
+
+SAMPLE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_]+="(?:[^"\\]|\\.)*",?)*\})? (-?[0-9.e+]+|NaN)$')
+
+
+def validate(text, apps, previous):
+    """Returns a list of problems with one scrape; updates previous {sample: value} for counters."""
+    problems, typed, ups = [], set(), 0
+    lines = text.split('\n')
+    if lines[-2:] != ['# EOF', '']:
+        problems.append("missing # EOF terminator")
+    for line in lines[:-2]:
+        if line.startswith('# TYPE '):
+            typed.add(line.split()[2])
+            continue
+        if line.startswith('#'):
+            continue
+        match = SAMPLE_RE.match(line)
+        if not match:
+            problems.append(f"malformed line: {line!r}")
+            continue
+        name = match.group(1)
+        if name not in typed and name.removesuffix('_total') not in typed:
+            problems.append(f"sample before its # TYPE: {name}")
+        if name == 'pysupervisor_app_up':
+            ups += 1
+        if name.endswith('_total'):
+            key, value = name + (match.group(2) or ''), float(match.group(3))
+            if value < previous.get(key, 0):
+                problems.append(f"counter went backwards: {key}")
+            previous[key] = value
+    if ups != apps:
+        problems.append(f"{ups} up samples for {apps} instances")
+    return problems
+
+
+def churn(exporter, names, stop, costs):
+    """Plays a supervisor: restarts, backoff messages and resource samples, timing each update."""
+    n = 0
+    while not stop.is_set():
+        name = names[n % len(names)]
+        started = time.perf_counter()
+        if n % 3 == 0:
+            exporter.record_status(name, name, "STOPPED (Code: 1)")
+            exporter.record_log(f"[{name}] Process failed quickly. Waiting 2s.")
+        else:
+            exporter.record_status(name, name, f"RUNNING (PID: {10000 + n % 50000})")
+        costs.append((time.perf_counter() - started) * 1e6)
+        if n % 500 == 0:
+            exporter.update_resources({name: {'cpu': 1.5, 'rss': 1e7, 'fds': 12, 'threads': 3} for name in names})
+        n += 1
+        if n % 50 == 0:
+            time.sleep(0.001)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--apps', type=int, default=1000)
+    parser.add_argument('--scrapes', type=int, default=300)
+    parser.add_argument('--budget-ms', type=float, default=50.0, help="Fail if p99 scrape latency exceeds this.")
+    parser.add_argument('--live', type=int, default=0, help="Also supervise this many real children.")
+    parser.add_argument('--json', type=str, help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    exporter = MetricsExporter('127.0.0.1:0', sample=bool(args.live))
+    names = [f"app-{i}" for i in range(args.apps)]
+    live = [f"live-{i}" for i in range(args.live)]
+    exporter.set_instances({name: name for name in names + live})
+    exporter.start()
+
+    engine = None
+    if args.live:
+        engine = SupervisorEngine(on_log=exporter.record_log,
+                                  on_status=lambda name, status: exporter.record_status(name, name, status))
+        sleep = shutil.which('sleep')
+        for name in live:
+            engine.start_app({'name': name, 'command': [sleep, '3600'] if sleep else child_command('--sleep', 3600)})
+
+    stop, costs = threading.Event(), []
+    churner = threading.Thread(target=churn, args=(exporter, names, stop, costs), daemon=True)
+    churner.start()
+
+    latencies, sizes, problems, previous = [], [], [], {}
+    request = urllib.request.Request(exporter.url, headers={'Accept': 'application/openmetrics-text; version=1.0.0'})
+    for _ in range(args.scrapes):
+        started = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=10) as response:
+            body = response.read()
+            content_type = response.headers['Content-Type']
+        latencies.append((time.perf_counter() - started) * 1000.0)
+        sizes.append(len(body))
+        problems.extend(validate(body.decode(), args.apps + args.live, previous))
+        if not content_type.startswith('application/openmetrics-text'):
+            problems.append(f"unexpected content type {content_type}")
+        time.sleep(0.01)
+
+    stop.set()
+    churner.join()
+    if engine:
+        engine.shutdown()
+    exporter.stop()
+
+    latency = percentiles(latencies)
+    results = {
+        'apps': args.apps,
+        'live_apps': args.live,
+        'scrape_latency_ms': latency,
+        'scrape_bytes': max(sizes),
+        'update_cost_us': percentiles(costs),
+        'updates': len(costs),
+        'invalid': len(problems),
+        'budget_ms': args.budget_ms,
+    }
+    report('metrics_exporter', results, args.json)
+    for problem in sorted(set(problems))[:20]:
+        print(f"INVALID: {problem}", file=sys.stderr)
+    if latency['p99'] > args.budget_ms:
+        print(f"REGRESSION: p99 scrape latency {latency['p99']:.1f} ms exceeds {args.budget_ms:.0f} ms", file=sys.stderr)
+    return 1 if problems or latency['p99'] > args.budget_ms else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
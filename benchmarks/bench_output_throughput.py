@@ -0,0 +1,73 @@
+"""
+Output throughput in MB/s for a child that writes as fast as it can, with
+the original direct-to-file mode and with pipe capture through
+OutputCapture (plain, rotating, and rotating with compression).
+
+Usage: python benchmarks/bench_output_throughput.py [--megabytes 256] [--json out.json]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from _common import child_command, report
+
+from output_pipeline import OutputCapture
+
+
+def run_direct(command, path):
+    with open(path, 'ab', buffering=0) as handle:
+        process = subprocess.Popen(command, stdout=handle, stderr=subprocess.STDOUT)
+        process.wait()
+
+
+def run_captured(command, path, **options):
+    capture = OutputCapture(dict(options, output=path, capture_output=True))
+    process = subprocess.Popen(command, **capture.popen_kwargs())
+    capture.attach(process)
+    process.wait()
+    capture.drain(timeout=60)
+    capture.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--megabytes', type=int, default=256)
+    parser.add_argument('--line-size', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', type=str, help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    total = args.megabytes * 1024 * 1024
+    command = child_command('--spew', total, '--line-size', args.line_size)
+    modes = {
+        'direct_file': lambda path: run_direct(command, path),
+        'pipe': lambda path: run_captured(command, path),
+        'pipe_rotate': lambda path: run_captured(command, path, output_max_bytes=64 * 1024 * 1024, output_backups=3),
+        'pipe_rotate_gzip': lambda path: run_captured(command, path, output_max_bytes=64 * 1024 * 1024,
+                                                      output_backups=3, output_compress=True),
+    }
+
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="pysup-output-")
+    try:
+        for mode, run in modes.items():
+            best = None
+            for attempt in range(args.repeat):
+                path = os.path.join(work_dir, f"{mode}-{attempt}.log")
+                started = time.perf_counter()
+                run(path)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+                for name in os.listdir(work_dir):
+                    os.remove(os.path.join(work_dir, name))
+            results[mode] = {'seconds': best, 'mb_per_second': args.megabytes / best}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    report('output_throughput', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Loads and updates a process table of 10,000 apps, comparing the previous
+QTableWidget approach (a button widget per row, a row scan and a new item
+per status update) with ProcessTableModel + ActionsDelegate.
+
+Runs headless with QT_QPA_PLATFORM=offscreen.
+Usage: python benchmarks/bench_process_table.py [--rows 10000] [--updates 10000] [--json out.json]
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from _common import report
+
+from PySide6.QtWidgets import (
+    QApplication, QTableWidget, QTableWidgetItem, QTableView, QWidget, QHBoxLayout, QPushButton
+)
+
+from process_table import ProcessTableModel, ActionsDelegate, ACTIONS_COLUMN
+
+
+def legacy_load(table, apps):
+    table.setRowCount(0)
+    for i, app in enumerate(apps):
+        table.insertRow(i)
+        table.setItem(i, 0, QTableWidgetItem(app['name']))
+        table.setItem(i, 1, QTableWidgetItem("STOPPED"))
+        table.setItem(i, 2, QTableWidgetItem(' '.join(app['command'])))
+        widget = QWidget()
+        layout = QHBoxLayout(widget)
+        layout.setContentsMargins(5, 0, 5, 0)
+        layout.addWidget(QPushButton("Start"))
+        layout.addWidget(QPushButton("Stop"))
+        table.setCellWidget(i, 3, widget)
+
+
+def legacy_update(table, name, status):
+    for row in range(table.rowCount()):
+        if table.item(row, 0).text() == name:
+            table.setItem(row, 1, QTableWidgetItem(status))
+            break
+
+
+def timed(app, action):
+    started = time.perf_counter()
+    action()
+    app.processEvents()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--updates', type=int, default=10000)
+    parser.add_argument('--legacy-updates', type=int, default=1000,
+                        help="The legacy scan is O(rows) per update, so fewer are timed and scaled up.")
+    parser.add_argument('--json', type=str, help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication([])
+    apps = [{'name': f'app-{i}', 'command': ['python', 'worker.py', str(i)]} for i in range(args.rows)]
+    # Spread updates across the table, as a restart storm would.
+    targets = [f'app-{(i * 7919) % args.rows}' for i in range(args.updates)]
+    results = {}
+
+    table = QTableWidget()
+    table.setColumnCount(4)
+    table.show()
+    load = timed(app, lambda: legacy_load(table, apps))
+    legacy_targets = targets[:args.legacy_updates]
+    update = timed(app, lambda: [legacy_update(table, name, f"RUNNING (PID: {i})") for i, name in enumerate(legacy_targets)])
+    results['qtablewidget'] = {
+        'load_seconds': load,
+        'update_seconds_per_10k': update * 10000.0 / max(1, len(legacy_targets)),
+    }
+    table.close()
+
+    model = ProcessTableModel()
+    view = QTableView()
+    delegate = ActionsDelegate(view)
+    view.setModel(model)
+    view.setItemDelegateForColumn(ACTIONS_COLUMN, delegate)
+    view.show()
+    load = timed(app, lambda: model.set_apps(apps))
+
+    def model_updates():
+        for i, name in enumerate(targets):
+            model.update_status(name, f"RUNNING (PID: {i})")
+        model.flush()
+    update = timed(app, model_updates)
+    results['model_view'] = {
+        'load_seconds': load,
+        'update_seconds_per_10k': update * 10000.0 / max(1, len(targets)),
+    }
+    view.close()
+
+    report('process_table', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Process-tree cleanup: a supervised app (benchmarks/child.py --leak) forks
+--leak grandchildren that outlive it, like a shell wrapper's background jobs,
+and is then stopped, or exits by itself, --runs times. Compares stopping only
+the direct child (the old behaviour: terminate() the Popen) with
+ProcessSupervisor, which stops the app's whole process tree and, with the
+orphan reaper running, also finds grandchildren that called setsid().
+
+Reports the grandchildren still alive afterwards and stop times for every
+scenario. Exits non-zero if any grandchild survives ProcessSupervisor.
+
+Usage: python benchmarks/bench_process_tree.py [--runs 5] [--leak 3] [--json out.json]
+"""
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from _common import child_command, percentiles, report
+
+from process_tree import reaper
+from supervisor_core import ProcessSupervisor
+
+SCENARIOS = {
+    'grouped_stop': ([], True),
+    'detached_stop': (['--leak-detached'], True),
+    'grouped_exit': ([], False),
+    'detached_exit': (['--leak-detached'], False),
+}
+
+
+def leaked(stamp_dir):
+    """PIDs of grandchildren (leak-<pid> stamps) that are still alive; zombies count as gone."""
+    alive = []
+    for entry in os.listdir(stamp_dir):
+        if not entry.startswith('leak-'):
+            continue
+        pid = int(entry[len('leak-'):])
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                state = f.read().rpartition(')')[2].split()[0]
+        except OSError:
+            continue
+        if state != 'Z':
+            alive.append(pid)
+    return alive
+
+
+def wait_for_stamps(stamp_dir, count, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if sum(entry.startswith('leak-') for entry in os.listdir(stamp_dir)) >= count:
+            return
+        time.sleep(0.01)
+
+
+def cleanup(pids):
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+def run_legacy(command, stop, leak, stamp_dir):
+    """Popen + terminate(): only the direct child is signalled."""
+    process = subprocess.Popen(command)
+    wait_for_stamps(stamp_dir, leak)
+    started = time.perf_counter()
+    if stop:
+        process.terminate()
+    process.wait()
+    return time.perf_counter() - started
+
+
+def run_supervised(command, stop, leak, stamp_dir):
+    running = threading.Event()
+    def on_status(name, status):
+        if status.startswith("RUNNING"):
+            running.set()
+    supervisor = ProcessSupervisor({'name': 'leaky', 'command': command}, on_log=lambda message: None,
+                                   on_status=on_status)
+    thread = threading.Thread(target=supervisor.run, daemon=True)
+    thread.start()
+    running.wait(10)
+    wait_for_stamps(stamp_dir, leak)
+    started = time.perf_counter()
+    if stop:
+        supervisor.stop()
+    thread.join()
+    return time.perf_counter() - started
+
+
+def run_scenario(run, flags, stop, runs, leak):
+    survivors, seconds = 0, []
+    for _ in range(runs):
+        stamp_dir = tempfile.mkdtemp(prefix='pysupervisor-tree-')
+        try:
+            # Stopped apps sleep until stopped; the others exit once their grandchildren are forked.
+            command = child_command('--leak', leak, *flags, '--stamp-dir', stamp_dir, '--sleep', 60 if stop else 0.2)
+            seconds.append(run(command, stop, leak, stamp_dir) * 1000.0)
+            time.sleep(0.1) # Let the last signals land
+            alive = leaked(stamp_dir)
+            survivors += len(alive)
+            cleanup(alive)
+        finally:
+            shutil.rmtree(stamp_dir, ignore_errors=True)
+    return {'leaked': survivors, 'spawned': runs * leak, 'stop_ms': percentiles(seconds)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--leak', type=int, default=3, help="Grandchildren each run leaves behind.")
+    parser.add_argument('--json', type=str)
+    args = parser.parse_args()
+    if not sys.platform.startswith('linux'):
+        print("This benchmark needs Linux (/proc).", file=sys.stderr)
+        return 0
+
+    results = {'runs': args.runs, 'leak': args.leak}
+    # The legacy runs go first: becoming a subreaper can't be undone.
+    results['direct_child_only'] = {name: run_scenario(run_legacy, flags, stop, args.runs, args.leak)
+                                    for name, (flags, stop) in SCENARIOS.items()}
+    results['subreaper'] = reaper.start()
+    try:
+        results['process_tree'] = {name: run_scenario(run_supervised, flags, stop, args.runs, args.leak)
+                                   for name, (flags, stop) in SCENARIOS.items()}
+    finally:
+        reaper.stop()
+    report('process_tree', results, args.json)
+    if any(scenario['leaked'] for scenario in results['process_tree'].values()):
+        print("FAIL: grandchildren survived ProcessSupervisor.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Thundering herd simulation: N apps (default 500) share a dependency that
+goes down for --outage seconds, so every app crashes at once and each
+restart during the outage fails again within --fail-after seconds. Drives
+the real RestartPolicy on a simulated clock (no processes are started) and
+compares the old lockstep doubling backoff with decorrelated jitter (plus
+restart_jitter), a global restart budget and the crash-loop breaker.
+
+Reports restarts in the busiest 100 ms and 1 s, total restarts during the
+outage, and how long after the dependency returns the whole fleet is back.
+Exits non-zero unless jitter at least halves the busiest 100 ms of the
+lockstep backoff.
+
+Usage: python benchmarks/bench_restart_herd.py [--apps 500] [--outage 60] [--seed 1] [--json out.json]
+"""
+import argparse
+import heapq
+import random
+import sys
+from collections import Counter
+
+from _common import report
+from restart_policy import RestartPolicy, TokenBucket
+
+# The jitter scenarios opt in to restart_jitter, which spreads the first wave (apps that were up for an hour).
+SCENARIOS = {
+    'lockstep': {'restart_backoff': 'exponential', 'crash_loop_failures': 0},
+    'jitter': {'crash_loop_failures': 0, 'restart_jitter': 1.0},
+    'jitter_breaker': {'crash_loop_failures': 5, 'crash_loop_cooldown': 30, 'restart_jitter': 1.0},
+    'jitter_budget': {'crash_loop_failures': 0, 'restart_jitter': 1.0, 'global': (100, 10)},
+}
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def simulate(settings, apps, outage, fail_after, seed):
+    settings = dict(settings)
+    clock, rng = _Clock(), random.Random(seed)
+    limit, window = settings.pop('global', (0, 60))
+    budget = TokenBucket(limit, window, clock=clock)
+    policies = [RestartPolicy(dict(settings), budget=budget, clock=clock, rng=rng) for _ in range(apps)]
+    # (time, app, uptime): every app has been up for an hour when the dependency fails.
+    events = [(rng.uniform(0, 0.05), app, 3600.0) for app in range(apps)]
+    heapq.heapify(events)
+    starts, recovered, parked = [], {}, 0
+    while events:
+        clock.now, app, uptime = heapq.heappop(events)
+        decision = policies[app].next_restart(uptime)
+        parked += decision.parked
+        start = clock.now + decision.delay
+        starts.append(start)
+        if start < outage:
+            heapq.heappush(events, (start + fail_after, app, fail_after))
+        else:
+            recovered[app] = start
+    per_100ms = Counter(int(t * 10) for t in starts)
+    per_second = Counter(int(t) for t in starts)
+    return {
+        'restarts': len(starts),
+        'restarts_during_outage': sum(1 for t in starts if t < outage),
+        'peak_per_100ms': max(per_100ms.values()),
+        'peak_per_second': max(per_second.values()),
+        'recovery_seconds': round(max(recovered.values()) - outage, 2),
+        'parked': parked,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Restart herd simulation.")
+    parser.add_argument('--apps', type=int, default=500)
+    parser.add_argument('--outage', type=float, default=60.0, help="Seconds the shared dependency is down.")
+    parser.add_argument('--fail-after', type=float, default=0.5, help="Seconds a restart runs before failing during the outage.")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', type=str)
+    args = parser.parse_args()
+
+    results = {'apps': args.apps, 'outage': args.outage}
+    for name, settings in SCENARIOS.items():
+        results[name] = simulate(settings, args.apps, args.outage, args.fail_after, args.seed)
+        print(f"{name}: {results[name]}")
+    report('restart_herd', results, args.json)
+    if results['jitter']['peak_per_100ms'] * 2 > results['lockstep']['peak_per_100ms']:
+        print("FAIL: jitter did not spread the restarts out.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
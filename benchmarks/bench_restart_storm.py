@@ -0,0 +1,131 @@
+"""
+Restart storm: N supervised children (default 500) all crash at the same
+moment and are restarted. Records how long the whole fleet takes to be back
+up, per-app crash-to-restart latency, supervisor CPU during the storm and
+supervisor threads, for the asyncio engine and one ProcessSupervisor thread
+per app.
+
+Usage: python benchmarks/bench_restart_storm.py [--apps 500] [--modes asyncio,threads] [--json out.json]
+"""
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from _common import child_command, percentiles, report
+from supervisor_core import ProcessSupervisor
+from supervisor_engine import SupervisorEngine
+
+PID_RE = re.compile(r"RUNNING \(PID: (\d+)\)")
+
+
+class _Recorder:
+    """Collects every RUNNING transition as (time, pid) per app."""
+    def __init__(self):
+        self.starts = {}
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def on_status(self, name, status):
+        match = PID_RE.match(status)
+        with self.lock:
+            if match:
+                self.starts.setdefault(name, []).append((time.time(), int(match.group(1))))
+            elif status == "ERROR":
+                self.errors += 1
+
+    def count(self, at_least):
+        with self.lock:
+            return sum(1 for events in self.starts.values() if len(events) >= at_least)
+
+
+def _wait(condition, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline and not condition():
+        time.sleep(0.01)
+    return condition()
+
+
+def run_storm(mode, apps, lead):
+    stamp_dir = tempfile.mkdtemp(prefix="pysup-storm-")
+    recorder = _Recorder()
+    # The lead keeps every child up for more than 5 s, so no restart is delayed by the fast-fail backoff.
+    crash_at = time.time() + lead
+    configs = [{
+        'name': f'storm-{i}',
+        'command': child_command('--crash-at', crash_at, '--sleep', 3600, '--exit-code', 1, '--stamp-dir', stamp_dir),
+        'restart': True,
+    } for i in range(apps)]
+    threads_before = threading.active_count()
+    engine, workers, threads = None, [], []
+    try:
+        if mode == 'asyncio':
+            engine = SupervisorEngine(on_log=lambda message: None, on_status=recorder.on_status)
+            for config in configs:
+                engine.start_app(config)
+        else:
+            for config in configs:
+                worker = ProcessSupervisor(config, on_log=lambda message: None, on_status=recorder.on_status)
+                thread = threading.Thread(target=worker.run, daemon=True)
+                thread.start()
+                workers.append(worker)
+                threads.append(thread)
+        if not _wait(lambda: recorder.count(1) >= apps, lead - 5.5):
+            raise RuntimeError(f"Only {recorder.count(1)} of {apps} apps started before the storm; raise --lead.")
+
+        time.sleep(max(0.0, crash_at - time.time() - 0.5))
+        cpu_before = time.process_time()
+        recovered = _wait(lambda: recorder.count(2) >= apps, 120)
+        storm_cpu = time.process_time() - cpu_before
+        supervisor_threads = threading.active_count() - threads_before
+
+        latencies, restarted_at = [], []
+        for name, events in recorder.starts.items():
+            if len(events) < 2:
+                continue
+            (_, pid), (started, _) = events[0], events[1]
+            restarted_at.append(started)
+            try:
+                with open(os.path.join(stamp_dir, str(pid))) as f:
+                    latencies.append((started - float(f.read())) * 1000.0)
+            except OSError:
+                pass
+        return {
+            'apps': apps,
+            'recovered': recovered,
+            'recovery_seconds': (max(restarted_at) - crash_at) if restarted_at else None,
+            'restart_latency_ms': percentiles(latencies),
+            'storm_cpu_seconds': storm_cpu,
+            'supervisor_threads': supervisor_threads,
+            'errors': recorder.errors,
+        }
+    finally:
+        if engine:
+            engine.shutdown()
+        with ThreadPoolExecutor(max_workers=64) as pool:
+            list(pool.map(lambda w: w.stop(), workers))
+        for thread in threads:
+            thread.join(10)
+        shutil.rmtree(stamp_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--apps', type=int, default=500)
+    parser.add_argument('--modes', type=str, default='asyncio,threads')
+    parser.add_argument('--lead', type=float,
+                        help="Seconds from launch to the simultaneous crash; defaults to 8 s plus 60 ms per app.")
+    parser.add_argument('--json', type=str, help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    lead = args.lead or 8.0 + 0.06 * args.apps
+    results = {mode: run_storm(mode, args.apps, lead) for mode in args.modes.split(',')}
+    report('restart_storm', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Shutdown: N supervised children (default 100), a few of which ignore
+SIGTERM, are stopped with a stop timeout. Compares stopping them one after
+another (ProcessSupervisor.stop() per app, the old service behaviour) with
+a ShutdownCoordinator that signals all of them at once and kills only the
+stragglers at one deadline, for thread workers and the asyncio engine.
+
+Usage: python benchmarks/bench_shutdown.py [--apps 100] [--stubborn 5] [--timeout 2] [--modes serial,parallel,engine] [--json out.json]
+"""
+import argparse
+import threading
+import time
+
+from _common import child_command, report
+from shutdown import ShutdownCoordinator
+from supervisor_core import ProcessSupervisor
+from supervisor_engine import SupervisorEngine
+
+
+def _configs(apps, stubborn):
+    configs = []
+    for i in range(apps):
+        flags = ['--sleep', 3600] + (['--ignore-term'] if i < stubborn else [])
+        configs.append({'name': f'stop-{i}', 'command': child_command(*flags)})
+    return configs
+
+
+def _wait_started(targets, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if all(t.process is not None and t.process.pid for t in targets.values()):
+            # Give the interpreters time to install their SIGTERM handlers.
+            time.sleep(1.0)
+            return
+        time.sleep(0.05)
+    raise RuntimeError("Children did not start in time.")
+
+
+def run_mode(mode, apps, stubborn, timeout):
+    configs = _configs(apps, stubborn)
+    engine = None
+    if mode == 'engine':
+        engine = SupervisorEngine(on_log=lambda message: None)
+        for config in configs:
+            engine.start_app(config)
+        deadline = time.time() + 30
+        while len(engine.runners) < apps and time.time() < deadline:
+            time.sleep(0.05)
+        _wait_started(dict(engine.runners))
+        targets = engine.stop_targets()
+    else:
+        targets, threads = {}, []
+        for config in configs:
+            supervisor = ProcessSupervisor(config, on_log=lambda message: None)
+            thread = threading.Thread(target=supervisor.run, daemon=True)
+            thread.start()
+            targets[config['name']] = supervisor
+            threads.append(thread)
+        _wait_started(targets)
+
+    started = time.perf_counter()
+    killed = stubborn
+    if mode == 'serial':
+        for supervisor in targets.values():
+            supervisor.stop(timeout=timeout)
+        for thread in threads:
+            thread.join()
+    else:
+        result = ShutdownCoordinator(timeout).shutdown(targets)
+        killed = len(result['killed'])
+    seconds = time.perf_counter() - started
+    if engine:
+        engine.shutdown(timeout=10)
+    return {
+        'seconds': round(seconds, 3),
+        'killed': killed,
+        'still_running': sum(1 for t in targets.values() if not t.finished.is_set()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shutdown benchmark.")
+    parser.add_argument('--apps', type=int, default=100)
+    parser.add_argument('--stubborn', type=int, default=5, help="How many children ignore SIGTERM.")
+    parser.add_argument('--timeout', type=float, default=2.0, help="Stop timeout before SIGKILL.")
+    parser.add_argument('--modes', type=str, default='serial,parallel,engine')
+    parser.add_argument('--json', type=str)
+    args = parser.parse_args()
+
+    results = {'apps': args.apps, 'stubborn': args.stubborn, 'timeout': args.timeout}
+    for mode in args.modes.split(','):
+        results[mode] = run_mode(mode, args.apps, args.stubborn, args.timeout)
+        print(f"{mode}: {results[mode]}")
+    report('shutdown', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Startup cost of main.py: wall time and peak RSS of a fresh interpreter for
+each scenario, taking the median time over --runs runs.
+
+  headless_import   import main (what every invocation pays)
+  headless_job      python main.py -- <short job>, a complete supervised run
+  gui_import        import main plus the Qt GUI modules
+  gui_window        create the QApplication and MainWindow (offscreen)
+
+Also checks that the headless scenarios never load PySide6. With
+--budget-ms/--budget-mb the script exits non-zero when headless_job goes
+over budget, so it can guard against regressions in CI.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--budget-ms 300] [--budget-mb 40] [--json out.json]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import REPO_DIR, report
+
+QT_CHECK = "import sys; print('PYSIDE6_LOADED' if any(m.startswith('PySide6') for m in sys.modules) else '')"
+
+SCENARIOS = {
+    'headless_import': [sys.executable, '-c', f"import main; {QT_CHECK}"],
+    'headless_job': [sys.executable, 'main.py', '--', sys.executable, '-c', 'pass'],
+    'gui_import': [sys.executable, '-c', "import main; from PySide6.QtWidgets import QApplication; import supervisor_app"],
+    'gui_window': [sys.executable, '-c',
+                   "import os, main; from PySide6.QtWidgets import QApplication; import supervisor_app; "
+                   "app = QApplication([]); window = supervisor_app.MainWindow(); os._exit(0)"],
+}
+
+
+def run_once(command, env):
+    """Runs command in a fresh process; returns (seconds, peak RSS bytes or None, stdout)."""
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=REPO_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    output = process.stdout.read()
+    if hasattr(os, 'wait4'):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        peak = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    else:
+        process.wait()
+        peak = None
+    return time.perf_counter() - started, peak, output.decode(errors='replace')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--scenarios', type=str, default=','.join(SCENARIOS))
+    parser.add_argument('--budget-ms', type=float, help="Fail if headless_job's median time exceeds this.")
+    parser.add_argument('--budget-mb', type=float, help="Fail if headless_job's peak RSS exceeds this.")
+    parser.add_argument('--json', type=str, help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    home = tempfile.mkdtemp(prefix="pysup-bench-home-")
+    env = dict(os.environ, HOME=home, APPDATA=home, QT_QPA_PLATFORM='offscreen')
+    results = {}
+    for name in args.scenarios.split(','):
+        run_once(SCENARIOS[name], env) # Warm the bytecode and file caches
+        samples = [run_once(SCENARIOS[name], env) for _ in range(args.runs)]
+        peaks = [peak for _, peak, _ in samples if peak is not None]
+        results[name] = {
+            'median_ms': statistics.median(seconds for seconds, _, _ in samples) * 1000.0,
+            'min_ms': min(seconds for seconds, _, _ in samples) * 1000.0,
+            'peak_rss_mb': max(peaks) / 1024.0 / 1024.0 if peaks else None,
+        }
+        if name.startswith('headless'):
+            results[name]['pyside6_loaded'] = any('PYSIDE6_LOADED' in output for _, _, output in samples)
+    report('startup', results, args.json)
+
+    failures = []
+    job = results.get('headless_job')
+    if job and args.budget_ms and job['median_ms'] > args.budget_ms:
+        failures.append(f"headless_job took {job['median_ms']:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    if job and args.budget_mb and job['peak_rss_mb'] and job['peak_rss_mb'] > args.budget_mb:
+        failures.append(f"headless_job peaked at {job['peak_rss_mb']:.1f} MB (budget {args.budget_mb:.0f} MB)")
+    if any(r.get('pyside6_loaded') for r in results.values()):
+        failures.append("a headless scenario loaded PySide6")
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
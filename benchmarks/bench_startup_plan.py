@@ -0,0 +1,106 @@
+"""
+Cold-start time of a dependency graph: one "db" app, N "api" apps that
+depend on it and a "gateway" that depends on every api. Each app spends
+--startup-delay seconds before it listens on its port (its readiness
+probe). Compares starting one app at a time and waiting for each to be
+ready, which is what ordered startup took before depends_on, with
+StartupCoordinator, which starts each layer of the graph concurrently.
+
+Usage: python benchmarks/bench_startup_plan.py [--apis 20] [--startup-delay 0.3] [--timeout 60] [--json out.json]
+"""
+import argparse
+import socket
+import threading
+import time
+
+from _common import child_command, report
+
+from startup_planner import StartupCoordinator, plan_layers, port_open
+from supervisor_engine import SupervisorEngine
+
+
+def free_ports(count):
+    """Ports the kernel just handed out for binding to port 0, so none is in use or in the ephemeral range's way."""
+    sockets = [socket.socket() for _ in range(count)]
+    try:
+        for sock in sockets:
+            sock.bind(('127.0.0.1', 0))
+        return [sock.getsockname()[1] for sock in sockets]
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+def build_apps(apis, delay):
+    ports = iter(free_ports(apis + 2))
+    def app(name, depends_on=()):
+        port = next(ports)
+        return {'name': name, 'depends_on': list(depends_on), 'ready_port': port,
+                'command': child_command('--startup-delay', delay, '--listen', port, '--sleep', 600)}
+    apps = [app('db')]
+    apps += [app(f'api-{i}', ['db']) for i in range(apis)]
+    apps.append(app('gateway', [f'api-{i}' for i in range(apis)]))
+    return apps
+
+
+def not_ready(names, log=()):
+    """The error for a graph that timed out, with what the coordinator logged."""
+    return RuntimeError('\n'.join([f"Never became ready: {', '.join(sorted(names))}", *log]))
+
+
+def sequential(engine, apps, timeout):
+    started = time.perf_counter()
+    for layer in plan_layers(apps):
+        for app in layer:
+            config = next(a for a in apps if a['name'] == app)
+            engine.start_app(config)
+            while not port_open(config['ready_port']):
+                if time.perf_counter() - started > timeout:
+                    raise not_ready([app])
+                time.sleep(0.01)
+    return time.perf_counter() - started
+
+
+def planned(engine, apps, timeout):
+    configs = {app['name']: app for app in apps}
+    done = threading.Event()
+    log = []
+    coordinator = StartupCoordinator(apps, lambda name: engine.start_app(configs[name]), on_log=log.append, probe_interval=0.01)
+    engine.on_status = coordinator.notify_status
+
+    def watch_done():
+        while not coordinator.is_done():
+            time.sleep(0.005)
+        done.set()
+
+    started = time.perf_counter()
+    threading.Thread(target=watch_done, daemon=True).start()
+    coordinator.start()
+    if not done.wait(timeout):
+        coordinator.cancel()
+        raise not_ready(set(configs) - coordinator.ready, log)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--apis', type=int, default=20)
+    parser.add_argument('--startup-delay', type=float, default=0.3)
+    parser.add_argument('--timeout', type=float, default=60.0, help="Fail if the graph isn't ready after this many seconds.")
+    parser.add_argument('--json', type=str, help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    results = {'apps': args.apis + 2, 'layers': 3}
+    for label, run in (('sequential', sequential), ('planned', planned)):
+        apps = build_apps(args.apis, args.startup_delay)
+        engine = SupervisorEngine(on_log=lambda message: None)
+        try:
+            results[label] = {'cold_start_seconds': run(engine, apps, args.timeout)}
+        finally:
+            engine.shutdown(timeout=30)
+    results['speedup'] = results['sequential']['cold_start_seconds'] / results['planned']['cold_start_seconds']
+    report('startup_plan', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
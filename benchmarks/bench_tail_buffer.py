@@ -0,0 +1,105 @@
+"""
+Tail buffers: the cost of keeping each stream's latest output in a shared
+memory ring, and how fast its end can be read back.
+
+ * throughput: MB/s of a child writing --megabytes through OutputCapture to
+   an output file, to a file plus a tail buffer, and to a tail buffer only.
+ * read: time to get the last 20 lines from another mapping of a full ring
+   (what ctl.py live and the GUI do) vs. from the end of an output file of
+   the same output (what ctl.py tail --output does), page cache warm.
+ * crash report: a supervised child that fails must have its last line
+   quoted in the supervisor log; the benchmark exits non-zero otherwise.
+
+Usage: python benchmarks/bench_tail_buffer.py [--megabytes 64] [--size 65536] [--reads 2000] [--json out.json]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import child_command, percentiles, report
+
+from daemon import tail_lines
+from output_pipeline import OutputCapture
+from supervisor_core import ProcessSupervisor
+from tail_buffer import HEADER_SIZE, TailRing, buffers
+
+LINE_SIZE = 100
+
+
+def run_captured(command, proc_config):
+    capture = OutputCapture(proc_config)
+    process = subprocess.Popen(command, **capture.popen_kwargs())
+    capture.attach(process)
+    process.wait()
+    capture.drain(timeout=60)
+    capture.close()
+
+
+def timed_reads(read, count):
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        read()
+        samples.append((time.perf_counter() - started) * 1e6)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--megabytes', type=int, default=64)
+    parser.add_argument('--size', type=int, default=65536, help="Tail buffer bytes per stream.")
+    parser.add_argument('--reads', type=int, default=2000)
+    parser.add_argument('--json', type=str)
+    args = parser.parse_args()
+
+    total = args.megabytes * 1024 * 1024
+    command = child_command('--spew', total, '--line-size', LINE_SIZE)
+    work_dir = tempfile.mkdtemp(prefix="pysup-tail-")
+    results = {'megabytes': args.megabytes, 'tail_buffer': args.size,
+               'memory_per_app_bytes': 2 * (HEADER_SIZE + args.size)}
+    try:
+        output = os.path.join(work_dir, 'out.log')
+        modes = {
+            'file': {'output': output, 'capture_output': True},
+            'file_and_tail_buffer': {'output': output, 'capture_output': True, 'tail_buffer': args.size},
+            'tail_buffer_only': {'capture_output': True, 'tail_buffer': args.size},
+        }
+        results['throughput_mb_s'] = {}
+        for mode, options in modes.items():
+            if 'output' in options and os.path.exists(output):
+                os.remove(output)
+            started = time.perf_counter()
+            run_captured(command, dict(options, name=mode))
+            results['throughput_mb_s'][mode] = round(args.megabytes / (time.perf_counter() - started), 1)
+
+        # The file of the second mode and the ring of the third hold the same output.
+        reader = TailRing(buffers.paths()['tail_buffer_only']['stdout'])
+        assert reader.lines(1) == tail_lines(output, 1)
+        results['last_20_lines_us'] = {
+            'tail_buffer': timed_reads(lambda: reader.lines(20), args.reads),
+            'output_file': timed_reads(lambda: tail_lines(output, 20), args.reads),
+        }
+        reader.close()
+
+        messages = []
+        crashing = {'name': 'crashing', 'tail_buffer': args.size,
+                    'command': child_command('--spew', 1024 * 1024, '--line-size', LINE_SIZE, '--exit-code', 1)}
+        ProcessSupervisor(crashing, on_log=messages.append).run()
+        quoted = [m for m in messages if m.startswith("[crashing] | ")]
+        results['crash_report_lines'] = len(quoted)
+    finally:
+        buffers.close_all()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    report('tail_buffer', results, args.json)
+    if not quoted or quoted[-1] != "[crashing] | " + 'x' * (LINE_SIZE - 1):
+        print("FAIL: the crash report does not quote the failed run's last line.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
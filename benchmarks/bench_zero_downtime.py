@@ -0,0 +1,178 @@
+"""
+Zero-downtime restarts: a client sends HTTP requests back to back while a
+supervised server (benchmarks/child.py --serve, which takes --startup-delay
+seconds to start) is restarted --restarts times. Compares a server that binds
+its port itself, where every restart leaves the port closed until the new
+process listens again, with the supervisor holding the listening socket
+("listen", passed as LISTEN_FDS), where connections wait in the accept queue.
+A third run rolls a 3-instance group sharing one held socket, one instance
+at a time.
+
+Reports requests served, failed requests, the longest gap between two
+successful responses and latency percentiles. Exits non-zero if any request
+fails with a held socket.
+
+Usage: python benchmarks/bench_zero_downtime.py [--restarts 10] [--startup-delay 0.3] [--port 18181] [--json out.json]
+"""
+import argparse
+import http.client
+import sys
+import threading
+import time
+
+from _common import child_command, percentiles, report
+
+from listen_sockets import registry
+from rolling_restart import RollingRestart
+from supervisor_core import ProcessSupervisor
+
+
+class Client:
+    """Sends requests back to back on a thread, recording latencies, failures and gaps."""
+    def __init__(self, port):
+        self.port = port
+        self.latencies, self.failures = [], 0
+        self.longest_gap = 0.0
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop = True
+        self._thread.join()
+
+    def _run(self):
+        last_ok = time.perf_counter()
+        while not self._stop:
+            started = time.perf_counter()
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=10)
+                connection.request('GET', '/')
+                connection.getresponse().read()
+                connection.close()
+            except OSError:
+                self.failures += 1
+                time.sleep(0.005) # Refused connections fail instantly; don't spin
+                continue
+            now = time.perf_counter()
+            self.latencies.append((now - started) * 1000.0)
+            self.longest_gap = max(self.longest_gap, now - last_ok)
+            last_ok = now
+
+    def results(self):
+        return {
+            'requests': len(self.latencies),
+            'failed': self.failures,
+            'longest_gap_ms': round(self.longest_gap * 1000.0, 1),
+            'latency_ms': percentiles(self.latencies),
+        }
+
+
+class Instance:
+    """One ProcessSupervisor on its own thread; restart() stops it and starts a fresh one."""
+    def __init__(self, config, on_status=None):
+        self.config = config
+        self.on_status = on_status or (lambda name, status: None)
+        self.supervisor = self.thread = None
+
+    def start(self):
+        self.supervisor = ProcessSupervisor(dict(self.config), on_log=lambda message: None, on_status=self.on_status)
+        self.thread = threading.Thread(target=self.supervisor.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.supervisor.stop()
+        self.thread.join()
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+
+def wait_until_serving(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/')
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Nothing is serving on port {port}")
+
+
+def run_restarts(config, port, restarts, interval):
+    instance = Instance(config)
+    instance.start()
+    wait_until_serving(port)
+    client = Client(port)
+    client.start()
+    for _ in range(restarts):
+        time.sleep(interval)
+        instance.restart()
+    time.sleep(interval)
+    client.stop()
+    instance.stop()
+    return client.results()
+
+
+def run_rolling(config, port, rounds, instances=3):
+    group, roll, seconds = [], [None], []
+    def on_status(name, status):
+        if roll[0]:
+            roll[0].notify_status(name, status)
+    for number in range(instances):
+        group.append(Instance(dict(config, name=f"web:{number}", ready_delay=0.5), on_status))
+        group[-1].start()
+    by_name = {i.config['name']: i for i in group}
+    wait_until_serving(port)
+    client = Client(port)
+    client.start()
+    for _ in range(rounds):
+        done = threading.Event()
+        roll[0] = RollingRestart('web', [i.config for i in group], lambda c: by_name[c['name']].restart(),
+                                 on_done=lambda completed: done.set())
+        started = time.perf_counter()
+        roll[0].start({name: "RUNNING" for name in by_name})
+        done.wait(120)
+        seconds.append(time.perf_counter() - started)
+    client.stop()
+    for instance in group:
+        instance.stop()
+    results = client.results()
+    results['roll_seconds'] = round(max(seconds), 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--restarts', type=int, default=10)
+    parser.add_argument('--startup-delay', type=float, default=0.3, help="Seconds the server takes to start.")
+    parser.add_argument('--interval', type=float, default=0.5, help="Seconds between restarts.")
+    parser.add_argument('--port', type=int, default=18181)
+    parser.add_argument('--json', type=str)
+    args = parser.parse_args()
+
+    serve = ['--serve', '--startup-delay', args.startup_delay]
+    base = {'name': 'web', 'restart': True}
+    results = {'restarts': args.restarts, 'startup_delay': args.startup_delay}
+    try:
+        results['self_bound'] = run_restarts(dict(base, command=child_command(*serve, '--listen', args.port)),
+                                             args.port, args.restarts, args.interval)
+        held = dict(base, command=child_command(*serve), listen=[f"127.0.0.1:{args.port}"])
+        results['held_socket'] = run_restarts(held, args.port, args.restarts, args.interval)
+        results['rolling_3_instances'] = run_rolling(held, args.port, max(1, args.restarts // 3))
+    finally:
+        registry.close_all()
+    report('zero_downtime', results, args.json)
+    if results['held_socket']['failed'] or results['rolling_3_instances']['failed']:
+        print("FAIL: requests failed while the supervisor held the socket.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Synthetic child program used by the benchmarks. It behaves like a small
+supervised app: it can simulate startup work, listen on a port, sleep, print output, record when it exits and
+exit with a chosen code. --crash-at makes a whole fleet of children exit at the same moment;
+--ignore-term makes a child that only SIGKILL stops; --serve answers HTTP requests on the
+socket it inherited from the supervisor (LISTEN_FDS) or on --listen, finishing the request in
+progress when it is told to stop; --leak forks grandchildren that outlive it, like a shell
+wrapper's background jobs (with --leak-detached they also leave its process group).
+"""
+import argparse
+import os
+import select
+import signal
+import socket
+import sys
+import time
+
+
+def serve(server):
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    # Check for a stop between requests only, so none is cut off.
+    while not stopping:
+        if not select.select([server], [], [], 0.1)[0]:
+            continue
+        connection, _ = server.accept()
+        try:
+            connection.recv(65536)
+            connection.sendall(b"HTTP/1.0 200 OK\r\nContent-Length: 3\r\n\r\nok\n")
+        except OSError:
+            pass
+        connection.close()
+    os._exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic supervised child.")
+    parser.add_argument('--sleep', type=float, default=0.0, help="Seconds to stay alive.")
+    parser.add_argument('--exit-code', type=int, default=0, help="Exit code to return.")
+    parser.add_argument('--stamp-dir', type=str, help="Write '<pid>' containing the exit timestamp here.")
+    parser.add_argument('--spew', type=int, default=0, help="Bytes of output to write before exiting.")
+    parser.add_argument('--line-size', type=int, default=100, help="Length of each output line.")
+    parser.add_argument('--startup-delay', type=float, default=0.0, help="Seconds of simulated startup work.")
+    parser.add_argument('--listen', type=int, help="Listen on this local TCP port once started up.")
+    parser.add_argument('--crash-at', type=float,
+                        help="Exit at this time.time() instead of after --sleep; ignored once it has passed.")
+    parser.add_argument('--serve', action='store_true', help="Answer HTTP requests until stopped.")
+    parser.add_argument('--ignore-term', action='store_true', help="Ignore SIGTERM, like a child that hangs on shutdown.")
+    parser.add_argument('--leak', type=int, default=0, help="Fork this many grandchildren that sleep for an hour.")
+    parser.add_argument('--leak-detached', action='store_true', help="The grandchildren call setsid(), leaving the process group.")
+    args = parser.parse_args()
+
+    for _ in range(args.leak):
+        if os.fork() == 0:
+            if args.leak_detached:
+                os.setsid()
+            if args.stamp_dir:
+                open(os.path.join(args.stamp_dir, f"leak-{os.getpid()}"), 'w').close()
+            time.sleep(3600)
+            os._exit(0)
+
+    if args.ignore_term:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    if args.startup_delay:
+        time.sleep(args.startup_delay)
+    server = None
+    if os.environ.get('LISTEN_PID') == str(os.getpid()) and int(os.environ.get('LISTEN_FDS', 0)) >= 1:
+        server = socket.socket(fileno=3) # Held open by the supervisor across restarts
+    elif args.listen:
+        server = socket.socket()
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(('127.0.0.1', args.listen))
+        server.listen(16)
+
+    if args.serve:
+        serve(server)
+
+    if args.spew:
+        line = (b'x' * (args.line_size - 1)) + b'\n'
+        chunk = line * max(1, 65536 // len(line))
+        out = sys.stdout.buffer
+        written = 0
+        while written < args.spew:
+            out.write(chunk)
+            written += len(chunk)
+        out.flush()
+
+    if args.crash_at and args.crash_at > time.time():
+        time.sleep(args.crash_at - time.time())
+    elif args.sleep:
+        time.sleep(args.sleep)
+
+    if args.stamp_dir:
+        with open(os.path.join(args.stamp_dir, str(os.getpid())), 'w') as f:
+            f.write(repr(time.time()))
+    os._exit(args.exit_code)
+
+
+if __name__ == '__main__':
+    main()
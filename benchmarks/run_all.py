@@ -0,0 +1,140 @@
+"""
+Runs the benchmark suite and collects every script's JSON results into one
+summary file, so runs can be compared over time. Each benchmark runs in its
+own interpreter, headless (QT_QPA_PLATFORM=offscreen).
+
+  python benchmarks/run_all.py                       # full suite
+  python benchmarks/run_all.py --quick               # smaller sizes, a few minutes
+  python benchmarks/run_all.py --only restart_storm,gui_signals
+  python benchmarks/run_all.py --compare benchmarks/results/<run>/summary.json
+
+Results go to benchmarks/results/<timestamp>/ (one <name>.json per benchmark
+plus summary.json) unless --out is given. --compare prints every numeric
+metric next to the same metric from an earlier summary.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from _common import BENCH_DIR
+
+# name -> arguments for --quick; the full suite uses each script's defaults.
+SUITE = {
+    'startup': ['--runs', '2'],
+    'exit_detection': ['--workers', '5', '--cycles', '1', '--idle-workers', '50', '--idle-seconds', '2'],
+    'engine_scaling': ['--counts', '10,100', '--idle-seconds', '1'],
+    'restart_storm': ['--apps', '50'],
+    'restart_herd': ['--apps', '200'],
+    'shutdown': ['--apps', '30', '--stubborn', '3', '--timeout', '1'],
+    'zero_downtime': ['--restarts', '5'],
+    'process_tree': ['--runs', '2'],
+    'output_throughput': ['--megabytes', '32', '--repeat', '1'],
+    'combined_log': ['--apps', '4', '--megabytes', '4'],
+    'tail_buffer': ['--megabytes', '16', '--reads', '500'],
+    'instrumentation': ['--calls', '200000', '--cycles', '50'],
+    'job_scheduler': ['--jobs', '30', '--idle-jobs', '2000', '--idle-seconds', '1', '--calls', '2000'],
+    'health_checks': ['--checks', '200', '--seconds', '2'],
+    'startup_plan': ['--apis', '5'],
+    'event_journal': ['--events', '200000'],
+    'metrics_exporter': ['--scrapes', '100'],
+    'log_console': ['--seconds', '1'],
+    'log_index': ['--megabytes', '100', '--jumps', '500'],
+    'process_table': ['--rows', '2000', '--updates', '2000', '--legacy-updates', '200'],
+    'gui_signals': ['--seconds', '1', '--rates', '1000,0'],
+}
+
+
+def flatten(results, prefix=''):
+    """{'a': {'b': 1}} -> {'a.b': 1}, keeping only numbers."""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(summary, baseline):
+    print(f"=== compared with {baseline['timestamp_text']} ({baseline.get('git', '?')}) ===")
+    for name, run in summary['benchmarks'].items():
+        before = baseline['benchmarks'].get(name)
+        if not (run.get('results') and before and before.get('results')):
+            continue
+        old = flatten(before['results'])
+        for metric, value in flatten(run['results']).items():
+            if metric in old:
+                change = f"{(value - old[metric]) / old[metric] * 100.0:+.1f}%" if old[metric] else "n/a"
+                print(f"{name}.{metric}: {old[metric]:.4g} -> {value:.4g} ({change})")
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', type=str, help=f"Comma-separated subset of: {', '.join(SUITE)}.")
+    parser.add_argument('--quick', action='store_true', help="Run smaller sizes.")
+    parser.add_argument('--out', type=str, help="Results directory.")
+    parser.add_argument('--compare', type=str, help="An earlier summary.json to compare against.")
+    args = parser.parse_args()
+
+    names = args.only.split(',') if args.only else list(SUITE)
+    unknown = [name for name in names if name not in SUITE]
+    if unknown:
+        parser.error(f"Unknown benchmark(s): {', '.join(unknown)}")
+    out_dir = args.out or os.path.join(BENCH_DIR, 'results', time.strftime('%Y%m%d-%H%M%S'))
+    os.makedirs(out_dir, exist_ok=True)
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+
+    summary = {
+        'timestamp': time.time(),
+        'timestamp_text': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'git': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'quick': args.quick,
+        'benchmarks': {},
+    }
+    for name in names:
+        json_path = os.path.join(out_dir, f"{name}.json")
+        command = [sys.executable, os.path.join(BENCH_DIR, f"bench_{name}.py"), '--json', json_path]
+        if args.quick:
+            command += SUITE[name]
+        print(f"--- {name} ---", flush=True)
+        started = time.time()
+        returncode = subprocess.call(command, cwd=BENCH_DIR, env=env)
+        entry = {'returncode': returncode, 'seconds': time.time() - started, 'results': None}
+        try:
+            with open(json_path) as f:
+                entry['results'] = json.load(f)['results']
+        except (OSError, ValueError):
+            pass
+        summary['benchmarks'][name] = entry
+
+    summary_path = os.path.join(out_dir, 'summary.json')
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f, indent=2, sort_keys=True)
+    print(f"Summary written to {summary_path}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(summary, json.load(f))
+    failed = [name for name, entry in summary['benchmarks'].items() if entry['returncode'] != 0]
+    if failed:
+        print(f"Failed: {', '.join(failed)}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
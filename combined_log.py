@@ -0,0 +1,400 @@
+import json
+import os
+import shutil
+import struct
+import threading
+import time
+from json.encoder import encode_basestring_ascii
+from urllib.parse import quote
+
+INDEX_SUFFIX = '.idx'
+# One index entry per block of consecutive records from one app:
+# time of its first record, byte offset, byte length, record count.
+INDEX_ENTRY = struct.Struct('<dQII')
+MAX_PENDING = 16 * 1024 * 1024
+MAX_LINE = 1024 * 1024
+SUPERVISOR_STREAM = 'supervisor'
+
+
+class CombinedLog:
+    """
+    One JSON-lines file holding the output of every app plus the
+    supervisor's own messages, one record per line:
+
+        {"ts": 1767268800.123456, "app": "web:0", "stream": "stdout", "pid": 4242, "line": "..."}
+
+    Records are queued in memory and written in batches by a background
+    thread, which also appends each app's blocks to a per-app index
+    (`<path>.idx/<app>.idx`, see INDEX_ENTRY), so reading one app's records
+    only reads that app's byte ranges. The file and its index rotate
+    together at `max_bytes`, keeping `backups` old segments.
+
+    Output read from pipes is written with block=False: the backlog may
+    then grow past `max_pending`, and the reader is expected to stop
+    reading while full() and resume from on_space(), so a slow disk holds
+    up the apps' pipes instead of the thread reading them. message() is
+    called from the GUI thread and the engine loop, which must not wait
+    either: while the backlog is full it drops messages and counts them,
+    and records how many once there is room again.
+    """
+    def __init__(self, path, max_bytes=0, backups=5, flush_interval=0.2, max_pending=MAX_PENDING):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.backups = max(0, backups)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = []     # (app, first record time, record count, bytes)
+        self._pending_bytes = 0
+        self._cond = threading.Condition()
+        self._space = threading.Condition(self._cond)
+        self._closed = False
+        self._space_waiters = [] # Callbacks for on_space()
+        self._dropped = 0        # Supervisor messages dropped while the backlog was full
+        self._indexes = {}     # app -> open index file
+        self._open()
+        self._thread = threading.Thread(target=self._run, name="CombinedLogWriter", daemon=True)
+        self._thread.start()
+
+    def write(self, app, timestamp, count, data, block=True):
+        """Queues `count` encoded records of one app; waits if the backlog is full, unless `block` is False."""
+        with self._cond:
+            if self._pending_bytes + len(data) > self.max_pending:
+                self._cond.notify()
+                if block:
+                    self._space.wait_for(lambda: self._closed or self._pending_bytes + len(data) <= self.max_pending)
+            if self._closed:
+                return
+            self._pending.append((app, timestamp, count, data))
+            self._pending_bytes += len(data)
+
+    def full(self):
+        """True while the backlog is at `max_pending`; readers should pause until on_space()."""
+        return self._pending_bytes >= self.max_pending and not self._closed
+
+    def on_space(self, callback):
+        """Calls `callback` (on the writer thread, or now) once the backlog has room again."""
+        with self._cond:
+            if self.full():
+                self._space_waiters.append(callback)
+                self._cond.notify()
+                return
+        callback()
+
+    def message(self, message, pid=None):
+        """Records one of the supervisor's own messages, under the app named in its "[name]" prefix."""
+        app = message[1:message.index(']')] if message.startswith('[') and ']' in message else ''
+        timestamp = time.time()
+        data = encode_records(app, SUPERVISOR_STREAM, pid or os.getpid(), timestamp, [message])
+        with self._cond:
+            if self._pending_bytes + len(data) > self.max_pending:
+                self._dropped += 1
+                self._cond.notify()
+                return
+            self._record_dropped(timestamp)
+            self.write(app, timestamp, 1, data, block=False)
+
+    def _record_dropped(self, timestamp):
+        if self._dropped:
+            notice = f"{self._dropped} supervisor message(s) dropped while the combined log was backed up."
+            self.write('', timestamp, 1, encode_records('', SUPERVISOR_STREAM, os.getpid(), timestamp, [notice]), block=False)
+            self._dropped = 0
+
+    def close(self):
+        """Writes everything still queued and stops the writer thread."""
+        with self._cond:
+            self._record_dropped(time.time())
+            self._closed = True
+            self._cond.notify()
+            self._space.notify_all()
+        self._thread.join()
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        with self._cond:
+            waiters, self._space_waiters = self._space_waiters, []
+        for callback in waiters:
+            callback()
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        os.makedirs(self.path + INDEX_SUFFIX, exist_ok=True)
+        self._file = open(self.path, 'ab')
+        self._size = self._file.tell()
+
+    def _index(self, app):
+        index = self._indexes.get(app)
+        if index is None:
+            index = self._indexes[app] = open(index_path(self.path, app), 'ab')
+        return index
+
+    def _close_files(self):
+        self._file.close()
+        for index in self._indexes.values():
+            index.close()
+        self._indexes.clear()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._pending and not self._closed:
+                    self._cond.wait(self.flush_interval)
+                batch, self._pending, self._pending_bytes = self._pending, [], 0
+                closed = self._closed
+                self._space.notify_all()
+            self._wake_waiters()
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except OSError:
+                    pass # Disk full or similar; the apps keep running
+            if closed:
+                self._close_files()
+                return
+
+    def _write_batch(self, batch):
+        # Consecutive blocks of one app become a single index entry.
+        entries, chunks, offset = [], [], self._size
+        for app, timestamp, count, data in batch:
+            if entries and entries[-1][0] == app:
+                entry = entries[-1]
+                entry[3] += len(data)
+                entry[4] += count
+            else:
+                entries.append([app, timestamp, offset, len(data), count])
+            chunks.append(data)
+            offset += len(data)
+        self._file.write(b''.join(chunks))
+        self._file.flush()
+        self._size = offset
+        for app, timestamp, start, length, count in entries:
+            self._index(app).write(INDEX_ENTRY.pack(timestamp, start, length, count))
+        for index in self._indexes.values():
+            index.flush()
+        if self.max_bytes and self._size >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._close_files()
+        if self.backups:
+            for number in range(self.backups, 0, -1):
+                for suffix in ('', INDEX_SUFFIX):
+                    source = f"{self.path}.{number}{suffix}"
+                    if not os.path.exists(source):
+                        continue
+                    if number == self.backups:
+                        _remove(source)
+                    else:
+                        os.replace(source, f"{self.path}.{number + 1}{suffix}")
+            os.replace(self.path, f"{self.path}.1")
+            os.replace(self.path + INDEX_SUFFIX, f"{self.path}.1{INDEX_SUFFIX}")
+        else:
+            _remove(self.path)
+            _remove(self.path + INDEX_SUFFIX)
+        self._open()
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        os.remove(path)
+
+
+def index_path(path, app):
+    # Instance names contain ':', which Windows doesn't allow in file names.
+    return os.path.join(path + INDEX_SUFFIX, (quote(app, safe='') or '-') + '.idx') # '-': messages of no app
+
+
+def encode_records(app, stream, pid, timestamp, lines):
+    """JSON-lines records for a list of str lines, all stamped with the same time."""
+    prefix = f'{{"ts": {timestamp:.6f}, "app": {encode_basestring_ascii(app)}, "stream": "{stream}", "pid": {pid}, "line": '
+    return (prefix + ('}\n' + prefix).join(map(encode_basestring_ascii, lines)) + '}\n').encode('ascii')
+
+
+class LineFramer:
+    """
+    Turns the raw bytes of one output stream into CombinedLog records. A
+    whole read is split into lines at once and encoded with one C call per
+    line; a trailing partial line waits for the next read (or for close()).
+    Every line of a read gets the time the read arrived.
+    """
+    def __init__(self, app, stream, pid, log=None):
+        self.log = log # None: shared_log, whichever it is at the time
+        self.app = app
+        self.stream = stream
+        self.pid = pid
+        self._partial = b''
+
+    def feed(self, data):
+        end = data.rfind(b'\n')
+        if end < 0:
+            self._partial += data
+            if len(self._partial) >= MAX_LINE:
+                self.close() # Output without newlines is still recorded, in MAX_LINE pieces
+            return
+        complete = self._partial + data[:end] if self._partial else data[:end]
+        self._partial = data[end + 1:]
+        self._emit(complete)
+
+    def close(self):
+        """Emits a last line that had no newline."""
+        if self._partial:
+            partial, self._partial = self._partial, b''
+            self._emit(partial)
+
+    def _emit(self, complete):
+        log = self.log or shared_log
+        if not log:
+            return
+        lines = complete.decode('utf-8', 'replace').replace('\r\n', '\n').split('\n')
+        timestamp = time.time()
+        # Never blocks the pipe reader; it pauses the pipe while the log is full().
+        log.write(self.app, timestamp, len(lines), encode_records(self.app, self.stream, self.pid, timestamp, lines),
+                  block=False)
+
+
+def segments(path):
+    """Existing segments of a combined log, newest first."""
+    candidates = [str(path)] + [f"{path}.{number}" for number in range(1, 1000)]
+    found = []
+    for candidate in candidates:
+        if not os.path.exists(candidate):
+            if candidate != str(path):
+                break
+            continue
+        found.append(candidate)
+    return found
+
+
+def read_entries(path, app):
+    """The index entries of one app in one segment: [(ts, offset, length, count), ...]."""
+    try:
+        with open(index_path(path, app), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return []
+    usable = len(data) - len(data) % INDEX_ENTRY.size # A partly written last entry is skipped
+    return list(INDEX_ENTRY.iter_unpack(data[:usable]))
+
+
+def read_records(path, apps=None, since=0, limit=None):
+    """
+    The last `limit` records (all if None) of a combined log newer than
+    `since`, oldest first, as dicts; only those of `apps` if given. App
+    filters read only the byte ranges listed in the apps' indexes, going
+    back through rotated segments until enough records are found.
+    """
+    found = []
+    for segment in segments(path):
+        try:
+            with open(segment, 'rb') as f:
+                if apps:
+                    entries = sorted((entry[1], entry[2], entry[3]) for app in apps
+                                     for entry in _entries_since(segment, app, since))
+                    if limit: # Only the entries holding the last `limit` records
+                        needed, first = limit - len(found), len(entries)
+                        while first and needed > 0:
+                            first -= 1
+                            needed -= entries[first][2]
+                        entries = entries[first:]
+                    records = []
+                    for offset, length, _ in entries:
+                        f.seek(offset)
+                        records.extend(_parse(f.read(length)))
+                else:
+                    records = _parse(_read_back(f, limit, since))
+        except OSError:
+            continue
+        reached = since and records and records[0]['ts'] <= since
+        if since:
+            records = [r for r in records if r['ts'] > since]
+        found[:0] = records
+        if (limit and len(found) >= limit) or reached:
+            break
+    return found[-limit:] if limit else found
+
+
+def _entries_since(segment, app, since):
+    # An entry can only hold records newer than `since` if the next one starts after it.
+    entries = read_entries(segment, app)
+    return [entry for entry, following in zip(entries, entries[1:] + [None])
+            if not since or following is None or following[0] > since]
+
+
+def _read_back(f, limit, since, block_size=1024 * 1024):
+    """The end of a segment holding at least `limit` records and reaching back to `since`, read backwards in blocks."""
+    f.seek(0, os.SEEK_END)
+    position, blocks, lines = f.tell(), [], 0
+    while position > 0:
+        step = min(block_size, position)
+        position -= step
+        f.seek(position)
+        blocks.insert(0, f.read(step))
+        lines += blocks[0].count(b'\n')
+        if position and (limit or since) and (not limit or lines > limit) \
+                and (not since or _first_time(blocks[0]) <= since):
+            break
+    data = b''.join(blocks)
+    return data[data.find(b'\n') + 1:] if position else data # Drop the partial first line
+
+
+def _first_time(data):
+    start = data.find(b'\n') + 1
+    try:
+        return json.loads(data[start:data.find(b'\n', start)])['ts']
+    except (ValueError, KeyError):
+        return float('inf')
+
+
+def _parse(data):
+    records = []
+    for line in data.splitlines():
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            pass # Torn write at the end of a segment
+    return records
+
+
+# Shared by every app supervised in this process; hosts set it from the
+# top-level "combined_log" settings with configure_combined_log().
+shared_log = None
+_settings = None
+_lock = threading.Lock()
+
+
+def configure_combined_log(config, base_dir):
+    """
+    Opens, reopens or closes the shared combined log to match a config's
+    "combined_log" (a path relative to base_dir; unset disables it),
+    "combined_log_max_bytes" and "combined_log_backups".
+    """
+    global shared_log, _settings
+    path = config.get('combined_log')
+    settings = (os.path.join(str(base_dir), path), config.get('combined_log_max_bytes', 0),
+                config.get('combined_log_backups', 5)) if path else None
+    with _lock:
+        if settings == _settings:
+            return
+        old, shared_log, _settings = shared_log, None, settings
+        if old:
+            old.close() # Before reopening, so two writers never append to one file
+        if settings:
+            shared_log = CombinedLog(settings[0], max_bytes=settings[1], backups=settings[2])
+
+
+def log_message(message):
+    """Records a supervisor message in the combined log, if there is one."""
+    log = shared_log
+    if log:
+        log.message(message)
+
+
+def close_combined_log():
+    global shared_log, _settings
+    with _lock:
+        old, shared_log, _settings = shared_log, None, None
+    if old:
+        old.close()
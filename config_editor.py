@@ -4,6 +4,7 @@ from PySide6.QtWidgets import (
     QTableWidgetItem, QHeaderView, QMessageBox
 )
 from process_dialog import ProcessDialog
+from startup_planner import plan_layers
 
 class ConfigEditor(QDialog):
     def __init__(self, parent=None, config_data=None, config_path=None):
@@ -93,6 +94,11 @@ class ConfigEditor(QDialog):
         if not self.config_path:
             QMessageBox.critical(self, "Error", "Configuration path not set. Cannot save.")
             return
+        try:
+            plan_layers(self.config_data.get('apps', []))
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid Dependencies", f"Please correct the apps' dependencies: {e}")
+            return
 
         try:
             with open(self.config_path, 'w') as f:
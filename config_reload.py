@@ -0,0 +1,188 @@
+import json
+import os
+import sys
+import threading
+import time
+
+from job_scheduler import is_job
+
+# Fields a running app picks up without being restarted: the restart policy
+# is read each time the child exits, startup ordering only matters at start,
+# instance counts are applied by scaling the group, and a job's schedule
+# takes effect from its next run.
+LIVE_FIELDS = frozenset({
+    'restart', 'restart_on_failure', 'depends_on', 'ready_delay', 'ready_port', 'instances', 'numprocs',
+    'restart_backoff', 'restart_delay', 'restart_delay_max', 'fast_fail_seconds', 'restart_limit', 'restart_window',
+    'restart_jitter', 'crash_loop_failures', 'crash_loop_cooldown', 'stop_signal', 'stop_timeout', 'ready_timeout',
+    'schedule', 'overlap',
+})
+SCALE_FIELDS = frozenset({'instances', 'numprocs'})
+
+
+class AppChange:
+    """How one app entry differs between two configs."""
+    def __init__(self, name, old, new):
+        self.name = name
+        self.old = old
+        self.new = new
+        keys = set(old) | set(new)
+        self.fields = sorted(key for key in keys if old.get(key) != new.get(key))
+
+    @property
+    def needs_restart(self):
+        # An app that becomes a job, or stops being one, is supervised differently from then on.
+        return is_job(self.old) != is_job(self.new) or any(field not in LIVE_FIELDS for field in self.fields)
+
+    @property
+    def rescaled(self):
+        return any(field in SCALE_FIELDS for field in self.fields)
+
+    def __repr__(self):
+        return f"AppChange({self.name!r}, {self.fields})"
+
+
+class ConfigDiff:
+    """
+    The difference between two configs, by app name: apps that were added
+    or removed, apps whose entries changed (each an AppChange) and the names
+    of top-level settings that changed.
+    """
+    def __init__(self, old_config, new_config):
+        old_apps = {app['name']: app for app in old_config.get('apps', [])}
+        new_apps = {app['name']: app for app in new_config.get('apps', [])}
+        self.added = [new_apps[name] for name in new_apps if name not in old_apps]
+        self.removed = [old_apps[name] for name in old_apps if name not in new_apps]
+        self.changed = [AppChange(name, old_apps[name], new_apps[name])
+                        for name in new_apps if name in old_apps and old_apps[name] != new_apps[name]]
+        self.unchanged = [name for name in new_apps if name in old_apps and old_apps[name] == new_apps[name]]
+        keys = (set(old_config) | set(new_config)) - {'apps'}
+        self.settings = sorted(key for key in keys if old_config.get(key) != new_config.get(key))
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed or self.settings)
+
+    def summary(self):
+        parts = []
+        if self.added: parts.append(f"added {', '.join(app['name'] for app in self.added)}")
+        if self.removed: parts.append(f"removed {', '.join(app['name'] for app in self.removed)}")
+        restarted = [change.name for change in self.changed if change.needs_restart]
+        updated = [change.name for change in self.changed if not change.needs_restart]
+        if restarted: parts.append(f"restarting {', '.join(restarted)}")
+        if updated: parts.append(f"updated {', '.join(updated)} in place")
+        if self.settings: parts.append(f"settings {', '.join(self.settings)}")
+        return '; '.join(parts) or "no changes"
+
+
+def read_config(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+class ConfigWatcher:
+    """
+    Calls on_change(config) whenever the config file is rewritten with valid
+    JSON. Uses inotify on Linux, directory change notifications on Windows
+    (pywin32) and a one-second mtime poll elsewhere. The directory is
+    watched rather than the file so editors that save by renaming a
+    temporary file are noticed too; bursts of events are coalesced.
+    """
+    POLL_INTERVAL = 1.0
+    SETTLE = 0.2
+
+    def __init__(self, path, on_change, on_log=None):
+        self.path = os.path.abspath(str(path))
+        self.on_change = on_change
+        self.on_log = on_log or (lambda message: None)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._last = self._signature()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ConfigWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(self.POLL_INTERVAL * 2)
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _run(self):
+        if sys.platform.startswith('linux'):
+            try:
+                return self._run_inotify()
+            except OSError as e:
+                self.on_log(f"inotify unavailable ({e}); polling {self.path} instead.")
+        elif sys.platform == "win32":
+            try:
+                return self._run_win32()
+            except ImportError:
+                pass
+        while not self._stop_event.wait(self.POLL_INTERVAL):
+            self._check()
+
+    def _run_inotify(self):
+        import ctypes
+        import select
+        import struct
+        IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE, IN_NONBLOCK, IN_CLOEXEC = 0x8, 0x80, 0x100, 0o4000, 0o2000000
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC) # Apps spawned with close_fds=False must not inherit it
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        try:
+            directory, filename = os.path.split(self.path)
+            if libc.inotify_add_watch(fd, directory.encode(), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+            target = filename.encode()
+            while not self._stop_event.is_set():
+                # Wake up periodically so stop() is honoured.
+                if not select.select([fd], [], [], self.POLL_INTERVAL)[0]:
+                    continue
+                data = os.read(fd, 65536)
+                offset, touched = 0, False
+                while offset < len(data):
+                    _, _, _, length = struct.unpack_from('iIII', data, offset)
+                    name = data[offset + 16:offset + 16 + length].rstrip(b'\0')
+                    touched = touched or name == target
+                    offset += 16 + length
+                if touched:
+                    self._check()
+        finally:
+            os.close(fd)
+
+    def _run_win32(self):
+        import win32con
+        import win32event
+        import win32file
+        handle = win32file.FindFirstChangeNotification(
+            os.path.dirname(self.path), False,
+            win32con.FILE_NOTIFY_CHANGE_LAST_WRITE | win32con.FILE_NOTIFY_CHANGE_FILE_NAME)
+        try:
+            while not self._stop_event.is_set():
+                result = win32event.WaitForSingleObject(handle, int(self.POLL_INTERVAL * 1000))
+                if result == win32event.WAIT_OBJECT_0:
+                    self._check()
+                    win32file.FindNextChangeNotification(handle)
+        finally:
+            win32file.FindCloseChangeNotification(handle)
+
+    def _check(self):
+        # Let a burst of writes settle before reading the file.
+        time.sleep(self.SETTLE)
+        signature = self._signature()
+        if signature is None or signature == self._last:
+            return
+        self._last = signature
+        try:
+            config = read_config(self.path)
+        except (OSError, ValueError) as e:
+            self.on_log(f"Ignoring unreadable config change: {e}")
+            return
+        self.on_change(config)
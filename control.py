@@ -0,0 +1,233 @@
+import json
+import os
+import socket
+import socketserver
+import threading
+
+from paths import get_user_data_dir
+
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+def default_socket_path():
+    return get_user_data_dir() / "supervisor.sock"
+
+
+class ControlError(Exception):
+    """A request the daemon rejected, or a daemon that could not be reached."""
+
+
+def _respond(handler, request):
+    try:
+        if not isinstance(request, dict) or 'cmd' not in request:
+            raise ControlError("Requests need a 'cmd'")
+        return {'ok': True, 'result': handler(request)}
+    except ControlError as e:
+        return {'ok': False, 'error': str(e)}
+    except Exception as e: # A bad request must never take the daemon down.
+        return {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+
+
+class _ControlHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline(MAX_REQUEST_BYTES + 1)
+            if not line:
+                return
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                response = {'ok': False, 'error': f"Malformed JSON: {e}"}
+            else:
+                if isinstance(request, dict) and 'batch' in request:
+                    response = {'ok': True, 'results': [_respond(self.server.dispatch, r) for r in request['batch']]}
+                else:
+                    response = _respond(self.server.dispatch, request)
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+
+
+class ControlServer:
+    """
+    Serves the daemon's control protocol on a Unix socket: one JSON object
+    per line in each direction. A request is {"cmd": ..., <params>} and is
+    answered with {"ok": true, "result": ...} or {"ok": false, "error": ...};
+    {"batch": [request, ...]} runs several requests in one round trip and
+    answers {"ok": true, "results": [response, ...]}. The socket is only
+    accessible to the user running the daemon.
+    """
+    def __init__(self, path, dispatch):
+        self.path = str(path)
+        self.dispatch = dispatch
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            if ControlClient.is_running(self.path):
+                raise ControlError(f"A daemon is already listening on {self.path}")
+            os.unlink(self.path) # Left behind by a daemon that did not exit cleanly
+        old_umask = os.umask(0o177)
+        try:
+            self._server = socketserver.ThreadingUnixStreamServer(self.path, _ControlHandler)
+        finally:
+            os.umask(old_umask)
+        self._server.daemon_threads = True
+        self._server.dispatch = self.dispatch
+        self._thread = threading.Thread(target=self._server.serve_forever, name="ControlServer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+class ControlClient:
+    """Client side of the control protocol. Keeps one connection open and reconnects if it drops."""
+    def __init__(self, path=None, timeout=10.0):
+        self.path = str(path or default_socket_path())
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_running(path=None):
+        """True if a daemon answers on the socket."""
+        client = ControlClient(path, timeout=1.0)
+        try:
+            client.call('ping')
+            return True
+        except ControlError:
+            return False
+        finally:
+            client.close()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            raise ControlError(f"Cannot reach the daemon at {self.path}: {e}")
+        self._sock, self._file = sock, sock.makefile('rb')
+
+    def _roundtrip(self, payload):
+        with self._lock:
+            for attempt in (1, 2):
+                if self._sock is None:
+                    self._connect()
+                try:
+                    self._sock.sendall(json.dumps(payload).encode() + b'\n')
+                    line = self._file.readline()
+                    if line:
+                        return json.loads(line)
+                except OSError:
+                    pass
+                self.close()
+            raise ControlError(f"The daemon at {self.path} closed the connection")
+
+    def call(self, cmd, **params):
+        """Sends one request and returns its result, raising ControlError if it failed."""
+        response = self._roundtrip(dict(params, cmd=cmd))
+        if not response.get('ok'):
+            raise ControlError(response.get('error', "Unknown error"))
+        return response['result']
+
+    def batch(self, requests):
+        """Sends several requests in one round trip; returns their responses in order."""
+        response = self._roundtrip({'batch': list(requests)})
+        if not response.get('ok'):
+            raise ControlError(response.get('error', "Unknown error"))
+        return response['results']
+
+    def close(self):
+        if self._sock:
+            try:
+                self._file.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._file = None
+
+
+class RemoteEngine:
+    """
+    Drives a running daemon through the calls the GUI makes on a
+    SupervisorEngine, so the window can attach to the daemon instead of
+    owning the processes. Requests don't wait for processes to stop, and
+    failures are reported through on_log rather than raised.
+    """
+    def __init__(self, client, on_log=print):
+        self.client = client
+        self.on_log = on_log
+        self.status = {} # instance name -> last polled status
+
+    def _call(self, cmd, **params):
+        try:
+            return self.client.call(cmd, **params)
+        except ControlError as e:
+            self.on_log(f"Daemon {cmd} failed: {e}")
+            return None
+
+    def poll(self, since):
+        """Statuses and new events in one round trip: returns (statuses, events, seq)."""
+        status, tail = self.client.batch([{'cmd': 'status'}, {'cmd': 'tail', 'since': since, 'lines': 1000}])
+        if not (status['ok'] and tail['ok']):
+            raise ControlError(status.get('error') or tail.get('error'))
+        self.status = status['result']
+        return status['result'], tail['result']['events'], tail['result']['seq']
+
+    def is_app_running(self, name):
+        return self.status.get(name, "STOPPED").startswith("RUNNING")
+
+    def start_app(self, proc_config):
+        return self._call('start', apps=[proc_config['name']])
+
+    def start_all(self):
+        """Starts every app in dependency order."""
+        return self._call('start', apps=[])
+
+    def restart_app(self, proc_config, wait=False):
+        return self._call('restart', apps=[proc_config['name']], wait=wait)
+
+    def rolling_restart(self, app_name):
+        """Has the daemon replace an app's instances one at a time."""
+        return self._call('restart', apps=[app_name], rolling=True)
+
+    def stop_app(self, name, wait=False):
+        return self._call('stop', apps=[name], wait=wait)
+
+    def stop_apps(self, names, wait=False):
+        return self._call('stop', apps=list(names), wait=wait)
+
+    def stop_all(self, wait=False):
+        return self._call('stop', apps=[], wait=wait)
+
+    def run_now(self, name):
+        """Runs a scheduled job now."""
+        return self._call('run', apps=[name])
+
+    def live(self, names):
+        """The daemon's tail buffer files for the named instances: {instance: {stream: path}}."""
+        return self._call('live', apps=list(names))
+
+    def diagnostics(self, **params):
+        """The daemon's instrumentation snapshot (see SupervisorDaemon.cmd_diagnostics); raises ControlError."""
+        return self.client.call('diagnostics', **params)
+
+    def update_app_config(self, name, values):
+        pass # The daemon applies config changes itself on reload.
+
+    def reload(self):
+        return self._call('reload')
+
+    def shutdown(self, timeout=None):
+        """Detaches; the daemon and its apps keep running."""
+        self.client.close()
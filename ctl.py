@@ -0,0 +1,174 @@
+"""
+Command-line client for the supervisor daemon.
+
+Usage:
+  python ctl.py status [APP ...]
+  python ctl.py start|stop|restart [APP ...]     (no APP means every app)
+  python ctl.py restart APP ... --rolling        (one instance at a time)
+  python ctl.py run [JOB ...]                    (scheduled jobs, now)
+  python ctl.py tail [APP ...] [-n LINES] [--output] [-f]
+  python ctl.py history [APP ...] [--hours H] [-n LINES]
+  python ctl.py logs [APP ...] [-n LINES] [-f]    (the combined log)
+  python ctl.py orphans [APP ...] [--kill]
+  python ctl.py live [APP ...] [-n LINES] [--stderr] [-f]   (the tail buffers)
+  python ctl.py diagnostics [--enable|--disable] [--reset] [--profile start|stop] [--folded FILE]
+  python ctl.py reload
+  python ctl.py shutdown
+"""
+import argparse
+import json
+import sys
+import time
+
+from control import ControlClient, ControlError
+from event_journal import describe
+from tail_buffer import RingFollower, open_rings
+from instrumentation import format_report
+
+
+def print_events(events):
+    for seq, timestamp, app, message in events:
+        print(f"{time.strftime('%H:%M:%S', time.localtime(timestamp))} {message}")
+
+
+def print_history(result):
+    print(f"{'APP':<20} {'STARTS':>7} {'RESTARTS':>9} {'EXITS':>6} {'FAILURES':>9}")
+    for app, starts, restarts, exits, failures in result['summary']:
+        print(f"{app:<20} {starts:>7} {restarts:>9} {exits:>6} {failures:>9}")
+    print()
+    for timestamp, app, instance, kind, code, pid, detail in reversed(result['events']):
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))} {instance}: {describe(kind, code, pid, detail)}")
+
+
+def print_records(records):
+    for record in records:
+        stamp = time.strftime('%H:%M:%S', time.localtime(record['ts'])) + f"{record['ts'] % 1:.3f}"[1:]
+        print(f"{stamp} {record['app'] or '-'} {record['stream']}[{record['pid']}] {record['line']}")
+
+
+def print_live(paths, lines, stream, follow):
+    """Prints the end of each instance's tail buffer, read from shared memory, then follows them like tail -f."""
+    followers = {}
+    for name, streams in sorted(paths.items()):
+        ring = open_rings(streams).get(stream)
+        if not ring:
+            continue
+        followers[name] = follower = RingFollower(ring)
+        text = follower.poll()
+        if follower.position > ring.capacity:
+            text = text[text.find('\n') + 1:] # The oldest line was cut by the ring
+        print(f"==> {name} ({stream}) <==")
+        for line in text.splitlines()[-lines:] if lines else []:
+            print(line)
+    if not followers:
+        print("no tail buffers (set \"tail_buffer\" in config.json and restart the apps)")
+    shown, partial = None, dict.fromkeys(followers, '')
+    while follow:
+        time.sleep(0.2)
+        for name, follower in followers.items():
+            *complete, partial[name] = (partial[name] + follower.poll()).split('\n')
+            if complete and shown != name and len(followers) > 1:
+                print(f"==> {name} ({stream}) <==")
+            shown = name if complete else shown
+            for line in complete:
+                print(line, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-s', '--socket', type=str, help="Daemon control socket (default: supervisor.sock in the user data directory).")
+    parser.add_argument('--json', action='store_true', help="Print raw JSON results.")
+    parser.add_argument('command', choices=['status', 'start', 'stop', 'restart', 'run', 'tail', 'logs', 'history', 'orphans', 'live', 'diagnostics', 'reload', 'shutdown'])
+    parser.add_argument('apps', nargs='*', help="App or instance names.")
+    parser.add_argument('-n', '--lines', type=int, default=50, help="tail, logs, history, live: number of lines.")
+    parser.add_argument('--hours', type=float, default=24, help="history: how far back to look.")
+    parser.add_argument('--output', action='store_true', help="tail: include the apps' output files.")
+    parser.add_argument('--rolling', action='store_true', help="restart: replace instances one at a time, each once the previous one is ready.")
+    parser.add_argument('--kill', action='store_true', help="orphans: SIGKILL the orphaned processes listed.")
+    parser.add_argument('--stderr', action='store_true', help="live: show stderr instead of stdout.")
+    recording = parser.add_mutually_exclusive_group()
+    recording.add_argument('--enable', dest='enable', action='store_const', const=True, help="diagnostics: start recording latencies and counters.")
+    recording.add_argument('--disable', dest='enable', action='store_const', const=False, help="diagnostics: stop recording.")
+    parser.add_argument('--reset', action='store_true', help="diagnostics: clear what was recorded.")
+    parser.add_argument('--profile', choices=['start', 'stop'], help="diagnostics: start or stop the sampling profiler.")
+    parser.add_argument('--folded', type=str, help="diagnostics: write the profile's collapsed stacks (flamegraph input) to FILE.")
+    parser.add_argument('-f', '--follow', action='store_true', help="tail, logs, live: keep printing new lines.")
+    args = parser.parse_intermixed_args()
+
+    client = ControlClient(args.socket)
+    try:
+        params = {'apps': args.apps} if args.command in ('status', 'start', 'stop', 'restart', 'run', 'tail', 'logs', 'history', 'orphans', 'live') else {}
+        if args.command == 'tail':
+            params.update(lines=args.lines, output=args.output)
+        elif args.command == 'logs':
+            params.update(lines=args.lines)
+        elif args.command == 'restart' and args.rolling:
+            params.update(rolling=True)
+        elif args.command == 'orphans' and args.kill:
+            params.update(kill=True)
+        elif args.command == 'history':
+            params.update(hours=args.hours, limit=args.lines)
+        elif args.command == 'diagnostics':
+            params.update(enable=args.enable, reset=args.reset, collapsed=bool(args.folded),
+                          profile={'start': True, 'stop': False}.get(args.profile))
+        result = client.call(args.command, **params)
+
+        if args.json:
+            print(json.dumps(result, indent=2))
+        elif args.command == 'status':
+            width = max((len(name) for name in result), default=0)
+            for name, status in result.items():
+                print(f"{name:<{width}}  {status}")
+        elif args.command == 'tail':
+            for name, lines in result.get('output', {}).items():
+                print(f"==> {name} <==")
+                print('\n'.join(lines))
+            print_events(result['events'])
+            seq = result['seq']
+            while args.follow:
+                time.sleep(0.5)
+                update = client.call('tail', apps=args.apps, lines=1000, since=seq)
+                print_events(update['events'])
+                seq = update['seq']
+        elif args.command == 'logs':
+            print_records(result)
+            since = result[-1]['ts'] if result else time.time()
+            while args.follow:
+                time.sleep(0.5)
+                update = client.call('logs', apps=args.apps, lines=10000, since=since)
+                print_records(update)
+                since = update[-1]['ts'] if update else since
+        elif args.command == 'history':
+            print_history(result)
+        elif args.command == 'diagnostics':
+            print(format_report(result))
+            if args.folded:
+                with open(args.folded, 'w', encoding='utf-8') as f:
+                    f.write(result.get('collapsed') or '')
+                print(f"\nCollapsed stacks written to {args.folded}")
+        elif args.command == 'live':
+            print_live(result, args.lines, 'stderr' if args.stderr else 'stdout', args.follow)
+        elif args.command == 'orphans':
+            for orphan in result:
+                print(f"{orphan['app'] or '-'}  PID {orphan['pid']}  since {time.strftime('%H:%M:%S', time.localtime(orphan['since']))}  "
+                      f"{orphan['command']}{'  (killed)' if args.kill else ''}")
+            if not result:
+                print("no orphaned processes")
+        elif args.command == 'restart' and args.rolling:
+            print(f"rolling restart started: {', '.join(result)} (follow it with: ctl.py tail {' '.join(args.apps)} -f)")
+        elif isinstance(result, list):
+            print(f"{args.command}: {', '.join(result) or 'nothing to do'}")
+        else:
+            print(result)
+    except ControlError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
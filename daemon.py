@@ -0,0 +1,516 @@
+"""
+Headless supervisor daemon: supervises every app in config.json from the
+asyncio engine, without Qt, and is controlled over a Unix socket (see
+control.py and ctl.py). SIGUSR1 prints the supervisor's own latency and
+counter report (see instrumentation.py) to stderr.
+
+Usage: python daemon.py [--config FILE] [--socket FILE] [--quiet]
+"""
+import argparse
+import collections
+import inspect
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+
+from config_reload import ConfigDiff, ConfigWatcher, LIVE_FIELDS, read_config
+from control import ControlError, ControlServer, default_socket_path
+from event_journal import EventJournal, JOURNAL_FILE, DEFAULT_RETENTION_DAYS
+from metrics_exporter import MetricsExporter
+from paths import get_user_data_dir
+from process_groups import expand_app, expand_apps, group_status
+from shutdown import ShutdownCoordinator, stop_layers, DEFAULT_TIMEOUT
+from restart_policy import configure_global_budget
+from listen_sockets import configure_listeners, registry as listen_registry
+from rolling_restart import RollingRestart
+from process_tree import reaper
+from tail_buffer import configure_tail_buffers, buffers as tail_buffers
+from instrumentation import configure_instrumentation, install_dump_signal, control as diagnostics, PROFILE_INTERVAL
+from combined_log import configure_combined_log, close_combined_log, log_message as record_combined_log, read_records
+from startup_planner import StartupCoordinator, plan_layers
+from supervisor_engine import SupervisorEngine
+from job_scheduler import JobScheduler, is_job, run_config
+
+EVENT_HISTORY = 10000
+
+
+def tail_lines(path, count, block_size=65536):
+    """Last `count` lines of a file, read backwards in blocks."""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position, data = f.tell(), b''
+            while position > 0 and data.count(b'\n') <= count:
+                step = min(block_size, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+    except OSError:
+        return []
+    return [line.decode('utf-8', 'replace') for line in data.splitlines()[-count:]] if count else []
+
+
+class SupervisorDaemon:
+    """
+    Owns the engine, the app list and the control socket. Every command
+    accepts app names, instance names ("web:0") or nothing for all apps,
+    so a command that touches many apps is still one request.
+    """
+    def __init__(self, config_path, socket_path, quiet=False):
+        self.config_path = Path(config_path)
+        self.base_dir = self.config_path.parent
+        self.quiet = quiet
+        self.config = read_config(self.config_path)
+        configure_global_budget(self.config)
+        configure_instrumentation(self.config)
+        configure_combined_log(self.config, self.base_dir)
+        configure_tail_buffers(self.config, expand_apps(self.config.get('apps', [])))
+        self.journal = EventJournal(self.base_dir / JOURNAL_FILE,
+                                    retention_days=self.config.get('journal_retention_days', DEFAULT_RETENTION_DAYS))
+        self.engine = SupervisorEngine(on_log=self.on_log, on_status=self.on_status)
+        # Apps with a "schedule" run on the engine too, when the job scheduler fires them.
+        self.jobs = JobScheduler(self.run_job, lambda name: self.engine.stop_app(name), on_log=self.on_log,
+                                 on_status=self.on_status)
+        self.jobs.configure(self.config)
+        self.server = ControlServer(socket_path, self.dispatch)
+        self.watcher = None
+        self.startup = None
+        self.exporter = MetricsExporter(self.config['metrics_listen']) if self.config.get('metrics_listen') else None
+        self.instances = {}        # app name -> [instance config, ...]
+        self.group_of = {}         # instance name -> app name
+        self.status = {}           # instance name -> last status
+        self.rolls = {}            # app name -> RollingRestart in progress
+        self.events = collections.deque(maxlen=EVENT_HISTORY) # (seq, time, app, message)
+        self.seq = 0
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        for app_config in self.config.get('apps', []):
+            self.set_instances(app_config)
+
+    # --- Engine callbacks (engine thread) ---
+
+    def on_log(self, message):
+        app = message[1:message.index(']')] if message.startswith('[') and ']' in message else None
+        with self._lock:
+            self.seq += 1
+            self.events.append((self.seq, time.time(), app, message))
+        if self.exporter:
+            self.exporter.record_log(message)
+        record_combined_log(message)
+        if not self.quiet:
+            print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {message}", flush=True)
+
+    def on_status(self, name, status):
+        with self._lock:
+            self.status[name] = status
+            app_name = self.group_of.get(name, name)
+            statuses = [self.status.get(i['name'], "STOPPED") for i in self.instances.get(app_name, [])]
+            roll = self.rolls.get(app_name)
+        if roll:
+            roll.notify_status(name, status)
+        self.journal.record_status(app_name, name, status)
+        if self.exporter:
+            self.exporter.record_status(app_name, name, status)
+        if self.startup and statuses:
+            self.startup.notify_status(app_name, group_status(statuses))
+        self.jobs.notify_status(name, status)
+
+    # --- App bookkeeping ---
+
+    def set_instances(self, app_config):
+        with self._lock:
+            for instance in self.instances.get(app_config['name'], []):
+                self.group_of.pop(instance['name'], None)
+            self.instances[app_config['name']] = expand_app(app_config)
+            for instance in self.instances[app_config['name']]:
+                self.group_of[instance['name']] = app_config['name']
+            if self.exporter:
+                self.exporter.set_instances(self.group_of)
+
+    def effective_config(self, instance):
+        instance = dict(instance)
+        if instance.get('output'):
+            instance['output'] = str(self.base_dir / instance['output'])
+        return instance
+
+    def resolve(self, names):
+        """Instance configs for a list of app and instance names; every app if the list is empty."""
+        if not names:
+            return [i for instances in self.instances.values() for i in instances]
+        resolved = []
+        for name in names:
+            if name in self.instances:
+                resolved.extend(self.instances[name])
+            elif name in self.group_of:
+                resolved.extend(i for i in self.instances[self.group_of[name]] if i['name'] == name)
+            else:
+                raise ControlError(f"Unknown app '{name}'")
+        return resolved
+
+    def start_app(self, app_name):
+        for instance in self.instances.get(app_name, []):
+            self.start_instance(instance)
+        if self.startup and any(is_job(i) for i in self.instances.get(app_name, [])):
+            self.startup.mark_ready(app_name) # A job is ready for its dependents once it is scheduled
+
+    def start_instance(self, instance):
+        """Supervises an instance, or for a job, schedules it."""
+        if is_job(instance):
+            self.jobs.schedule(instance)
+        else:
+            self.engine.start_app(self.effective_config(instance))
+
+    def run_job(self, name):
+        """Starts one run of a job (called by the job scheduler)."""
+        with self._lock:
+            instance = next((i for i in self.instances.get(self.group_of.get(name), []) if i['name'] == name), None)
+        if instance:
+            self.engine.start_app(self.effective_config(run_config(instance)))
+
+    def restart_instances(self, instances, wait=True):
+        """Restarts instances; a job runs now instead, as its overlap policy allows."""
+        futures = [self.engine.restart_app(self.effective_config(i)) for i in instances if not is_job(i)]
+        for instance in instances:
+            if is_job(instance):
+                self.jobs.run_now(instance['name'])
+        if wait:
+            for future in futures: future.result()
+
+    # --- Control commands ---
+
+    def dispatch(self, request):
+        handler = getattr(self, f"cmd_{request['cmd']}", None)
+        if handler is None:
+            raise ControlError(f"Unknown command '{request['cmd']}'")
+        params = {key: value for key, value in request.items() if key != 'cmd'}
+        # Only a mismatch with the handler's signature is the client's fault;
+        # a TypeError raised inside it is a bug and keeps its traceback.
+        try:
+            inspect.signature(handler).bind(**params)
+        except TypeError as e:
+            raise ControlError(f"Bad parameters for '{request['cmd']}': {e}")
+        try:
+            return handler(**params)
+        except ControlError:
+            raise
+        except Exception:
+            self.on_log(f"Control command '{request['cmd']}' failed:\n{traceback.format_exc().rstrip()}")
+            raise
+
+    def cmd_ping(self):
+        return {'pid': os.getpid(), 'config': str(self.config_path)}
+
+    def cmd_config(self):
+        return self.config
+
+    def cmd_status(self, apps=()):
+        with self._lock:
+            return {i['name']: self.status.get(i['name'], "STOPPED") for i in self.resolve(apps)}
+
+    def cmd_start(self, apps=()):
+        """Starts the named apps, or every app in dependency order if none are named."""
+        instances = self.resolve(apps)
+        if not apps:
+            self.start_planned()
+        else:
+            for instance in instances:
+                self.start_instance(instance)
+        return [i['name'] for i in instances]
+
+    def cmd_stop(self, apps=(), wait=True):
+        instances = self.resolve(apps)
+        if self.startup and not apps:
+            self.startup.cancel()
+        names = [i['name'] for i in instances]
+        if wait:
+            self.stop_instances(names)
+        else:
+            threading.Thread(target=self.stop_instances, args=(names,), name="Shutdown", daemon=True).start()
+        return names
+
+    def cmd_restart(self, apps=(), wait=True, rolling=False):
+        """
+        Restarts the named apps (or all). With rolling=true, each named app's
+        instances are replaced one at a time in the background, each waiting
+        for the previous one to be ready; follow progress with tail.
+        """
+        if not rolling:
+            instances = self.resolve(apps)
+            self.restart_instances(instances, wait=wait)
+            return [i['name'] for i in instances]
+        unknown = [name for name in apps if name not in self.instances]
+        if unknown or not apps:
+            raise ControlError(f"A rolling restart needs app names, not {', '.join(unknown) or 'nothing'}")
+        return [name for app in apps for name in self.rolling_restart(app)]
+
+    def rolling_restart(self, app_name):
+        """Starts a RollingRestart of an app's instances; returns their names."""
+        with self._lock:
+            if app_name in self.rolls:
+                raise ControlError(f"A rolling restart of '{app_name}' is already running")
+            instances = list(self.instances[app_name])
+            statuses = {i['name']: self.status.get(i['name'], "STOPPED") for i in instances}
+            roll = self.rolls[app_name] = RollingRestart(
+                app_name, instances, lambda instance: self.restart_instances([instance]), on_log=self.on_log,
+                on_done=lambda completed: self.rolls.pop(app_name, None))
+        roll.start(statuses)
+        return [i['name'] for i in instances]
+
+    def cmd_run(self, apps=()):
+        """Runs the named jobs (every job if none) now, outside their schedules."""
+        instances = self.resolve(apps)
+        not_jobs = [i['name'] for i in instances if not is_job(i)] if apps else []
+        if not_jobs:
+            raise ControlError(f"Not a scheduled job: {', '.join(not_jobs)}")
+        return [i['name'] for i in instances if is_job(i) and self.jobs.run_now(i['name'])]
+
+    def cmd_tail(self, apps=(), lines=50, since=0, output=False):
+        """
+        Supervisor events newer than `since` (at most `lines`, filtered to
+        `apps` if given) and, with output=true, the last `lines` lines of
+        each app's output file. Pass the returned seq back as `since` to follow.
+        """
+        names = {i['name'] for i in self.resolve(apps)} | set(apps)
+        with self._lock:
+            events = [e for e in self.events if e[0] > since and (not apps or e[2] in names)]
+            seq = self.seq
+        result = {'seq': seq, 'events': [list(e) for e in events[-lines:]]}
+        if output:
+            result['output'] = {i['name']: tail_lines(self.effective_config(i)['output'], lines)
+                                for i in self.resolve(apps) if i.get('output')}
+        return result
+
+    def cmd_logs(self, apps=(), lines=50, since=0):
+        """
+        The last `lines` records of the combined log newer than `since` (a
+        timestamp), oldest first: every app's, or only the named apps' and
+        their instances', read through the per-app index.
+        """
+        if not self.config.get('combined_log'):
+            raise ControlError("No combined log; set \"combined_log\" in config.json")
+        names = sorted({i['name'] for i in self.resolve(apps)} | set(apps)) if apps else None
+        return read_records(self.base_dir / self.config['combined_log'], names, since=since, limit=lines)
+
+    def cmd_history(self, apps=(), hours=24, kinds=(), limit=100):
+        """
+        Journal entries from the last `hours` hours, newest first, for the
+        named apps (or all), plus per-app start/restart/exit/failure counts.
+        """
+        since = time.time() - hours * 3600
+        unknown = set(apps) - set(self.instances) - set(self.journal.apps())
+        if unknown:
+            raise ControlError(f"No history for {', '.join(sorted(unknown))}")
+        events = []
+        for app in apps or [None]:
+            events.extend(self.journal.events(app, since=since, kinds=list(kinds) or None, limit=limit))
+        events.sort(key=lambda e: e[0], reverse=True)
+        summary = [row for row in self.journal.summary(since) if not apps or row[0] in apps]
+        return {'events': [list(e) for e in events[:limit]], 'summary': [list(row) for row in summary]}
+
+    def cmd_orphans(self, apps=(), kill=False):
+        """Processes the named apps (all if none) left behind; SIGKILLs them if `kill`."""
+        names = [i['name'] for i in self.resolve(apps)] if apps else None
+        orphans = reaper.orphans(names)
+        if kill:
+            reaper.kill_orphans(names)
+        return orphans
+
+    def cmd_live(self, apps=()):
+        """
+        The tail buffer files of the named apps' instances (all if none), as
+        {instance: {stream: path}}; clients map them and read the output
+        from shared memory themselves (see tail_buffer.TailRing).
+        """
+        names = {i['name'] for i in self.resolve(apps)} if apps else None
+        return tail_buffers.paths(names)
+
+    def cmd_diagnostics(self, enable=None, reset=False, profile=None, interval=PROFILE_INTERVAL, collapsed=False):
+        """
+        The daemon's own latency histograms, counters and profile (see
+        instrumentation.control); the options turn recording and the
+        sampling profiler on or off first.
+        """
+        return diagnostics(enable, reset, profile, interval, collapsed)
+
+    def cmd_reload(self):
+        try:
+            new_config = read_config(self.config_path)
+        except (OSError, ValueError) as e:
+            raise ControlError(f"Cannot read {self.config_path}: {e}")
+        return self.apply_config(new_config)
+
+    def cmd_shutdown(self):
+        self._stop_event.set()
+        return True
+
+    # --- Lifecycle ---
+
+    def apply_config(self, new_config):
+        """Applies a new config, touching only the apps whose entries changed."""
+        with self._reload_lock:
+            return self._apply_config(new_config)
+
+    def _apply_config(self, new_config):
+        diff = ConfigDiff(self.config, new_config)
+        summary = diff.summary()
+        if not diff:
+            return summary
+        self.on_log(f"Configuration reloaded: {summary}.")
+        self.config = new_config
+        configure_global_budget(new_config)
+        configure_combined_log(new_config, self.base_dir)
+        self.jobs.configure(new_config)
+        for app in diff.removed:
+            self.jobs.unschedule([i['name'] for i in self.instances.get(app['name'], [])])
+            self.engine.stop_apps([i['name'] for i in self.instances.get(app['name'], [])], wait=True)
+            with self._lock:
+                for instance in self.instances.pop(app['name'], []):
+                    self.group_of.pop(instance['name'], None)
+                    self.status.pop(instance['name'], None)
+                if self.exporter:
+                    self.exporter.set_instances(self.group_of)
+        for change in diff.changed:
+            old_names = {i['name'] for i in self.instances.get(change.name, [])}
+            running = any(self.engine.is_app_running(name) or self.jobs.is_scheduled(name) for name in old_names)
+            self.set_instances(change.new)
+            new = self.instances[change.name]
+            new_names = {i['name'] for i in new}
+            if is_job(change.old) or is_job(change.new):
+                self.replace_job(change.name, old_names, running and change.needs_restart)
+                continue
+            self.engine.stop_apps(old_names - new_names, wait=True)
+            if not running:
+                continue
+            for instance in new:
+                if instance['name'] not in old_names:
+                    self.engine.start_app(self.effective_config(instance))
+                elif not change.needs_restart:
+                    self.engine.update_app_config(instance['name'], {key: instance.get(key) for key in LIVE_FIELDS})
+            if change.needs_restart:
+                self.restart_instances([i for i in new if i['name'] in old_names])
+        for app in diff.added:
+            self.set_instances(app)
+            self.start_app(app['name'])
+        configure_listeners(expand_apps(new_config.get('apps', []))) # Sockets no app lists any more
+        configure_tail_buffers(new_config, expand_apps(new_config.get('apps', [])))
+        return summary
+
+    def replace_job(self, app_name, old_names, restart):
+        """
+        Moves an app that is or becomes a job onto its new instances: the
+        ones that went away are unscheduled and stopped, and if the app was
+        active the rest are (re)scheduled. With `restart` (it became a job,
+        or stopped being one) every old instance is stopped first.
+        """
+        new_names = {i['name'] for i in self.instances[app_name]}
+        gone = old_names if restart else old_names - new_names
+        self.jobs.unschedule(gone)
+        self.engine.stop_apps(gone, wait=True)
+        if restart or any(self.jobs.is_scheduled(name) for name in old_names):
+            self.start_app(app_name)
+
+    def start_planned(self):
+        """Starts every app, each once the apps it depends_on are ready."""
+        try:
+            startup = StartupCoordinator(self.config.get('apps', []), self.start_app, on_log=self.on_log)
+        except ValueError as e:
+            raise ControlError(f"Cannot order apps for startup: {e}")
+        if self.startup:
+            self.startup.cancel()
+        self.startup = startup
+        startup.start()
+        for app_name, instances in list(self.instances.items()):
+            with self._lock:
+                statuses = [self.status.get(i['name'], "STOPPED") for i in instances]
+            startup.notify_status(app_name, group_status(statuses))
+
+    def stop_instances(self, names=None):
+        """
+        Stops instances (all when `names` is None) together, in reverse
+        dependency order if "stop_order" is "dependencies", killing those
+        still running at the shutdown_timeout deadline.
+        """
+        self.jobs.unschedule(names)
+        targets = self.engine.stop_targets(names)
+        layers = stop_layers(self.config.get('apps', []), self.group_of, targets,
+                             ordered=self.config.get('stop_order') == 'dependencies')
+        coordinator = ShutdownCoordinator(self.config.get('shutdown_timeout', DEFAULT_TIMEOUT), on_log=self.on_log)
+        return coordinator.shutdown(targets, layers)
+
+    def run(self):
+        try:
+            plan_layers(self.config.get('apps', []))
+        except ValueError as e:
+            self.on_log(f"ERROR: Cannot order apps for startup: {e}")
+            return 1
+        self.server.start()
+        reaper.start(on_log=self.on_log)
+        self.on_log(f"Daemon started (PID {os.getpid()}); control socket {self.server.path}.")
+        if self.exporter:
+            try:
+                self.exporter.start()
+                self.on_log(f"Serving metrics at {self.exporter.url}")
+            except OSError as e:
+                self.on_log(f"ERROR: Could not serve metrics on {self.config['metrics_listen']}: {e}")
+                self.exporter = None
+        self.watcher = ConfigWatcher(self.config_path, self.apply_config, on_log=self.on_log)
+        self.watcher.start()
+        self.start_planned()
+        while not self._stop_event.wait(1.0):
+            pass
+        self.on_log("Daemon shutting down.")
+        # Jobs first, so none is started once shutdown has begun.
+        self.jobs.stop()
+        self.jobs.unschedule()
+        self.watcher.stop()
+        if self.startup:
+            self.startup.cancel()
+        self.stop_instances()
+        self.engine.shutdown(timeout=30)
+        listen_registry.close_all()
+        tail_buffers.close_all()
+        reaper.stop()
+        self.journal.close()
+        close_combined_log()
+        if self.exporter:
+            self.exporter.stop()
+        self.server.stop()
+        return 0
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-c', '--config', type=str, help="Config file (default: config.json in the user data directory).")
+    parser.add_argument('-s', '--socket', type=str, help="Control socket (default: supervisor.sock next to the config).")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Don't print supervisor events.")
+    args = parser.parse_args()
+
+    if sys.platform == "win32":
+        parser.error("The daemon needs Unix domain sockets; use service.py on Windows.")
+    config_path = Path(args.config) if args.config else get_user_data_dir() / "config.json"
+    socket_path = args.socket or (config_path.parent / "supervisor.sock" if args.config else default_socket_path())
+    try:
+        daemon = SupervisorDaemon(config_path, socket_path, quiet=args.quiet)
+    except (OSError, ValueError) as e:
+        print(f"Could not load {config_path}: {e}", file=sys.stderr)
+        return 1
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *args: daemon.stop())
+    install_dump_signal()
+    try:
+        return daemon.run()
+    except ControlError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
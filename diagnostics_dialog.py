@@ -0,0 +1,123 @@
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QCheckBox, QPushButton, QTableWidget, QTableWidgetItem,
+    QHeaderView, QAbstractItemView, QDialogButtonBox, QSplitter, QFileDialog
+)
+from PySide6.QtCore import Qt, QTimer
+
+from control import ControlError
+from instrumentation import format_ms, format_report
+
+REFRESH_MS = 1000
+LATENCY_KEYS = ('mean', 'p50', 'p90', 'p99', 'max')
+
+
+def _table(headers, stretch):
+    table = QTableWidget(0, len(headers))
+    table.setHorizontalHeaderLabels(headers)
+    table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+    table.setSelectionBehavior(QAbstractItemView.SelectRows)
+    table.verticalHeader().setVisible(False)
+    table.horizontalHeader().setSectionResizeMode(stretch, QHeaderView.Stretch)
+    return table
+
+
+def _fill(table, rows):
+    table.setRowCount(len(rows))
+    for row, values in enumerate(rows):
+        for column, value in enumerate(values):
+            item = QTableWidgetItem(str(value))
+            if not isinstance(value, str): item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            table.setItem(row, column, item)
+
+
+class DiagnosticsDialog(QDialog):
+    """
+    The supervisor's own instrumentation: latency percentiles, counters by
+    thread and the sampling profiler's hottest functions, refreshed every
+    second. `source` is instrumentation.control for this process, or the
+    attached daemon's diagnostics command; it takes the same keywords.
+    """
+    def __init__(self, source, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self.snapshot = None
+        self.setWindowTitle("Supervisor Diagnostics")
+        self.resize(800, 600)
+        layout = QVBoxLayout(self)
+
+        control_layout = QHBoxLayout()
+        self.enable_box = QCheckBox("Record latencies and counters")
+        self.reset_button = QPushButton("Reset")
+        self.profile_button = QPushButton("Start Profiler")
+        self.save_button = QPushButton("Save Report...")
+        control_layout.addWidget(self.enable_box)
+        control_layout.addStretch()
+        for button in (self.reset_button, self.profile_button, self.save_button):
+            control_layout.addWidget(button)
+        layout.addLayout(control_layout)
+
+        splitter = QSplitter(Qt.Vertical)
+        self.latency_table = _table(["Latency", "Count", "Mean (ms)", "P50 (ms)", "P90 (ms)", "P99 (ms)", "Max (ms)"], 0)
+        self.counter_table = _table(["Thread", "Counter", "Value"], 0)
+        self.profile_table = _table(["Samples", "Share", "Function"], 2)
+        for table in (self.latency_table, self.counter_table, self.profile_table):
+            splitter.addWidget(table)
+        layout.addWidget(splitter)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+        button_box = QDialogButtonBox(QDialogButtonBox.Close)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+        self.enable_box.clicked.connect(lambda checked: self.refresh(enable=checked))
+        self.reset_button.clicked.connect(lambda: self.refresh(reset=True))
+        self.profile_button.clicked.connect(self.toggle_profiler)
+        self.save_button.clicked.connect(self.save_report)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(REFRESH_MS)
+        self.refresh()
+
+    def profiling(self):
+        profile = self.snapshot and self.snapshot.get('profile')
+        return bool(profile and profile['running'])
+
+    def toggle_profiler(self):
+        self.refresh(profile=not self.profiling())
+
+    def refresh(self, **params):
+        try:
+            self.snapshot = snapshot = self.source(**params)
+        except ControlError as e:
+            self.status_label.setText(f"Diagnostics unavailable: {e}")
+            return
+        self.enable_box.setChecked(snapshot['enabled'])
+        self.profile_button.setText("Stop Profiler" if self.profiling() else "Start Profiler")
+        _fill(self.latency_table, [[name, h['count']] + [format_ms(h[key]) for key in LATENCY_KEYS]
+                                   for name, h in snapshot['histograms'].items()])
+        _fill(self.counter_table, [[thread, name, value] for thread, counters in snapshot['counters'].items()
+                                   for name, value in sorted(counters.items())])
+        profile = snapshot.get('profile')
+        busy = max(1, profile['busy_samples']) if profile else 1
+        _fill(self.profile_table, [[count, f"{count * 100.0 / busy:.1f}%", function]
+                                   for function, count in (profile['top'] if profile else [])])
+        state = "recording" if snapshot['enabled'] else "off (enable to record)"
+        profiled = f"; profiler {'running' if profile['running'] else 'stopped'}, {profile['samples']} samples" if profile else ""
+        self.status_label.setText(f"PID {snapshot['pid']}: {state}{profiled}.")
+
+    def save_report(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Diagnostics Report", "diagnostics.txt", "Text files (*.txt)")
+        if not path: return
+        try:
+            snapshot = self.source(collapsed=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(format_report(snapshot) + '\n')
+            if snapshot.get('collapsed'):
+                # Collapsed stacks next to the report, for flamegraph.pl or speedscope.
+                with open(path + '.folded', 'w', encoding='utf-8') as f:
+                    f.write(snapshot['collapsed'])
+        except (ControlError, OSError) as e:
+            self.status_label.setText(f"Could not save the report: {e}")
+            return
+        self.status_label.setText(f"Report saved to {path}.")
@@ -0,0 +1,254 @@
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+JOURNAL_FILE = "events.db"
+FLUSH_INTERVAL = 0.5
+BATCH_SIZE = 2000
+DEFAULT_RETENTION_DAYS = 90
+
+# Kinds of event, derived from the status strings the supervisors emit.
+START, RESTART, EXIT, LIMIT, UNHEALTHY, ERROR, STOPPED, PARKED = (
+    'start', 'restart', 'exit', 'limit', 'unhealthy', 'error', 'stopped', 'parked')
+KINDS = (START, RESTART, EXIT, LIMIT, UNHEALTHY, ERROR, STOPPED, PARKED)
+_ENDED = (EXIT, LIMIT, UNHEALTHY, PARKED)
+
+_RUNNING_RE = re.compile(r"^RUNNING \(PID: (\d+)\)")
+_EXIT_RE = re.compile(r"^STOPPED \(Code: (-?\d+)\)")
+_DETAIL_RE = re.compile(r"^[A-Z ]+\((.*)\)$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    app TEXT NOT NULL,
+    instance TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    code INTEGER,
+    pid INTEGER,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS events_app_ts ON events (app, ts, kind, code);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE TABLE IF NOT EXISTS app_hourly (
+    app TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    starts INTEGER NOT NULL DEFAULT 0,
+    restarts INTEGER NOT NULL DEFAULT 0,
+    exits INTEGER NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (app, hour)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS app_hourly_hour ON app_hourly (hour, app, starts, restarts, exits, failures);
+"""
+
+_ROLLUP = """
+INSERT INTO app_hourly (app, hour, starts, restarts, exits, failures) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (app, hour) DO UPDATE SET
+    starts = starts + excluded.starts, restarts = restarts + excluded.restarts,
+    exits = exits + excluded.exits, failures = failures + excluded.failures
+"""
+
+
+def classify(status):
+    """Maps a status string to (kind, code, pid, detail), or None for statuses that are not events."""
+    match = _RUNNING_RE.match(status)
+    if match:
+        return START, None, int(match.group(1)), None
+    match = _EXIT_RE.match(status)
+    if match:
+        return EXIT, int(match.group(1)), None, None
+    detail = _DETAIL_RE.match(status)
+    detail = detail.group(1) if detail else None
+    if status.startswith("LIMIT EXCEEDED"):
+        return LIMIT, None, None, detail
+    if status.startswith("UNHEALTHY"):
+        return UNHEALTHY, None, None, detail
+    if status.startswith("CRASH LOOP"):
+        return PARKED, None, None, detail
+    if status == "ERROR":
+        return ERROR, None, None, None
+    if status == "STOPPED":
+        return STOPPED, None, None, None
+    return None
+
+
+def describe(kind, code=None, pid=None, detail=None):
+    """One-line description of an event, e.g. "exit (code 1)"."""
+    if kind in (START, RESTART) and pid:
+        return f"{kind} (PID {pid})"
+    if kind == EXIT:
+        return f"exit (code {code})"
+    return f"{kind} ({detail})" if detail else kind
+
+
+def _connect(path):
+    connection = sqlite3.connect(str(path), timeout=10.0, check_same_thread=False, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class EventJournal:
+    """
+    Append-only history of every start, restart, exit and failure, kept in
+    SQLite (WAL mode) so it survives restarts of the GUI, service or daemon.
+    record_status() only queues the event; a writer thread commits queued
+    events in one transaction every FLUSH_INTERVAL seconds (or every
+    BATCH_SIZE events) and keeps hourly per-app counters up to date, so
+    history queries stay fast with millions of events.
+    """
+    def __init__(self, path, retention_days=DEFAULT_RETENTION_DAYS, read_only=False):
+        self.path = str(path)
+        self.read_only = read_only
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._last_kind = {} # instance name -> kind of its last event
+        self._closed = False
+        self._queued = 0  # events queued so far
+        self._written = 0 # events committed (or dropped) so far
+        self._flushing = False
+        self._thread = None
+        self._reader_lock = threading.Lock()
+        self._reader = _connect(self.path)
+        self._reader.executescript(_SCHEMA)
+        if not read_only:
+            if retention_days:
+                self.prune(time.time() - retention_days * 86400)
+            self._thread = threading.Thread(target=self._run, name="EventJournal", daemon=True)
+            self._thread.start()
+
+    # --- Writing ---
+
+    def record_status(self, app, instance, status, timestamp=None):
+        """Queues the event a status change represents; statuses that aren't events are ignored."""
+        event = classify(status)
+        if event is None or self.read_only:
+            return
+        kind, code, pid, detail = event
+        with self._cond:
+            if kind == START and self._last_kind.get(instance) in _ENDED:
+                kind = RESTART
+            self._last_kind[instance] = kind
+            self._queue.append((timestamp or time.time(), app, instance, kind, code, pid, detail))
+            self._queued += 1
+            if len(self._queue) >= BATCH_SIZE:
+                self._cond.notify()
+
+    def _run(self):
+        writer = _connect(self.path)
+        try:
+            while True:
+                with self._cond:
+                    if not self._closed and len(self._queue) < BATCH_SIZE and not self._flushing:
+                        self._cond.wait(FLUSH_INTERVAL)
+                    batch = [self._queue.popleft() for _ in range(min(len(self._queue), BATCH_SIZE))]
+                    closing = self._closed and not self._queue
+                if batch:
+                    self._write(writer, batch)
+                    with self._cond:
+                        self._written += len(batch)
+                        self._cond.notify_all()
+                if closing:
+                    return
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _write(connection, batch):
+        counters = {}
+        for ts, app, _, kind, code, _, _ in batch:
+            row = counters.setdefault((app, int(ts // 3600)), [0, 0, 0, 0])
+            row[0] += kind in (START, RESTART)
+            row[1] += kind == RESTART
+            row[2] += kind == EXIT
+            row[3] += (kind == EXIT and code != 0) or kind in (LIMIT, UNHEALTHY, ERROR)
+        try:
+            connection.execute("BEGIN")
+            connection.executemany(
+                "INSERT INTO events (ts, app, instance, kind, code, pid, detail) VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+            connection.executemany(_ROLLUP, [key + tuple(row) for key, row in counters.items()])
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            # A full disk or locked database must not stop supervision; the batch is dropped.
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+
+    def flush(self, timeout=5.0):
+        """Waits until every queued event has been committed."""
+        deadline = time.time() + timeout
+        with self._cond:
+            target = self._queued
+            self._flushing = True
+            self._cond.notify_all()
+            while self._written < target and self._thread and time.time() < deadline:
+                self._cond.wait(0.05)
+            self._flushing = False
+
+    def close(self):
+        """Commits what is queued, then stops the writer."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(10)
+        with self._reader_lock:
+            self._reader.close()
+
+    def prune(self, before):
+        """Deletes events and hourly counters older than the `before` timestamp."""
+        with self._reader_lock:
+            self._reader.execute("DELETE FROM events WHERE ts < ?", (before,))
+            self._reader.execute("DELETE FROM app_hourly WHERE hour < ?", (int(before // 3600),))
+
+    # --- Queries ---
+
+    def _query(self, sql, params=()):
+        with self._reader_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def apps(self):
+        """Every app name that has history."""
+        return [row[0] for row in self._query("SELECT DISTINCT app FROM app_hourly ORDER BY app")]
+
+    def events(self, app=None, since=None, until=None, kinds=None, limit=1000):
+        """
+        The newest events first, as (ts, app, instance, kind, code, pid,
+        detail) tuples, optionally limited to one app, a time range and
+        some kinds.
+        """
+        where, params = [], []
+        if app:
+            where.append("app = ?"); params.append(app)
+        if since is not None:
+            where.append("ts >= ?"); params.append(since)
+        if until is not None:
+            where.append("ts < ?"); params.append(until)
+        if kinds:
+            where.append(f"kind IN ({', '.join('?' * len(kinds))})"); params.extend(kinds)
+        sql = "SELECT ts, app, instance, kind, code, pid, detail FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return self._query(sql + " ORDER BY ts DESC LIMIT ?", params + [limit])
+
+    def exit_codes(self, app, since):
+        """{exit code: count} for one app's exits since a timestamp."""
+        rows = self._query("SELECT code, COUNT(*) FROM events WHERE app = ? AND ts >= ? AND kind = ? GROUP BY code",
+                           (app, since, EXIT))
+        return dict(rows)
+
+    def summary(self, since):
+        """
+        Per-app counts since a timestamp (to the hour): a list of
+        (app, starts, restarts, exits, failures), most restarted first.
+        The first rows are the apps that flapped the most.
+        """
+        return self._query(
+            "SELECT app, SUM(starts), SUM(restarts), SUM(exits), SUM(failures) FROM app_hourly WHERE hour >= ? "
+            "GROUP BY app ORDER BY SUM(restarts) DESC, SUM(failures) DESC, app", (int(since // 3600),))
+
+    def top_flapping(self, since, limit=10):
+        """The apps restarted most often since a timestamp, as (app, restarts) pairs."""
+        return [(row[0], row[2]) for row in self.summary(since)[:limit] if row[2]]
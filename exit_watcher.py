@@ -0,0 +1,143 @@
+import os
+import sys
+import select
+import selectors
+import threading
+import time
+
+from instrumentation import stats
+
+POLL_INTERVAL = 0.5
+
+
+def detect_backend():
+    """
+    Picks the best available way to be notified of a child's exit.
+    'pidfd' on Linux 5.3+, 'kqueue' on macOS/BSD, otherwise 'poll'.
+    """
+    if hasattr(os, 'pidfd_open'):
+        return 'pidfd'
+    if hasattr(select, 'kqueue') and hasattr(select, 'KQ_FILTER_PROC'):
+        return 'kqueue'
+    return 'poll'
+
+DEFAULT_BACKEND = detect_backend()
+
+
+class ExitWatcher:
+    """
+    Blocks until a subprocess.Popen child exits, or until wake() is called
+    from another thread. On Linux and macOS the kernel wakes us the moment
+    the child dies; elsewhere it falls back to polling every POLL_INTERVAL.
+    With instrumentation on, `exit_seen` is the perf_counter() time the
+    kernel reported the exit, or when polling, the last time the child was
+    seen alive, so the detection latency measured from it is an upper bound.
+    wake() may race with close() on the supervising thread; a lock and a
+    closed flag keep it from writing to a wake pipe that was closed (or
+    whose fd number was reused).
+    """
+    def __init__(self, process, backend=None):
+        self.process = process
+        self.backend = backend or DEFAULT_BACKEND
+        self._woken = threading.Event()
+        self._lock = threading.Lock() # Guards the wake pipe between wake() and close()
+        self._closed = False
+        self._selector = None
+        self._wake_r = self._wake_w = None
+        self._pidfd = None
+        self.exit_seen = None
+
+        if self.backend == 'poll' or sys.platform == "win32":
+            self.backend = 'poll'
+            return
+        try:
+            self._wake_r, self._wake_w = os.pipe()
+            os.set_blocking(self._wake_r, False)
+            os.set_blocking(self._wake_w, False)
+            if self.backend == 'pidfd':
+                self._pidfd = os.pidfd_open(process.pid)
+                self._selector = selectors.DefaultSelector()
+                self._selector.register(self._pidfd, selectors.EVENT_READ)
+                self._selector.register(self._wake_r, selectors.EVENT_READ)
+            else:
+                self._selector = select.kqueue()
+                self._selector.control([
+                    select.kevent(process.pid, filter=select.KQ_FILTER_PROC,
+                                  flags=select.KQ_EV_ADD | select.KQ_EV_ONESHOT, fflags=select.KQ_NOTE_EXIT),
+                    select.kevent(self._wake_r, filter=select.KQ_FILTER_READ, flags=select.KQ_EV_ADD),
+                ], 0)
+        except OSError:
+            # The child may already be gone, or the kernel may be too old.
+            self._close_fds()
+            self.backend = 'poll'
+
+    def wait(self, timeout=None):
+        """
+        Returns the child's exit code, or None if woken up (or timed out)
+        before the child exited.
+        """
+        if stats.enabled:
+            self.exit_seen = time.perf_counter()
+        return_code = self.process.poll()
+        if return_code is not None or self._woken.is_set():
+            return return_code
+
+        if self.backend == 'poll':
+            return self._wait_polling(timeout)
+
+        if self.backend == 'pidfd':
+            exited = any(key.fd == self._pidfd for key, _ in self._selector.select(timeout))
+        else:
+            exited = any(event.filter == select.KQ_FILTER_PROC for event in self._selector.control(None, 2, timeout))
+        if stats.enabled:
+            self.exit_seen = time.perf_counter()
+        if not exited or self._woken.is_set():
+            return self.process.poll() # Timed out or woken: the child may still be running
+        try:
+            return self.process.wait(timeout=1)
+        except Exception:
+            return self.process.poll()
+
+    def _wait_polling(self, timeout):
+        waited = 0.0
+        while timeout is None or waited < timeout:
+            interval = POLL_INTERVAL if timeout is None else min(POLL_INTERVAL, timeout - waited)
+            if self._woken.wait(interval):
+                return self.process.poll()
+            waited += interval
+            polled = time.perf_counter() if stats.enabled else None
+            return_code = self.process.poll()
+            if return_code is not None:
+                return return_code
+            self.exit_seen = polled
+        return None
+
+    def wake(self):
+        """Interrupts a blocked wait() from any thread."""
+        self._woken.set()
+        with self._lock:
+            if self._closed or self._wake_w is None:
+                return
+            try:
+                os.write(self._wake_w, b'\0')
+            except OSError:
+                pass
+
+    def close(self):
+        """Releases the pidfd and wake pipe; later wake() calls only set the flag."""
+        with self._lock:
+            self._closed = True
+            self._close_fds()
+
+    def _close_fds(self):
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+        for attr in ('_pidfd', '_wake_r', '_wake_w'):
+            fd = getattr(self, attr)
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+                setattr(self, attr, None)
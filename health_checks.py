@@ -0,0 +1,250 @@
+import heapq
+import http.client
+import itertools
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+MAX_WORKERS = 16
+
+
+class HealthCheckSpec:
+    """
+    One app's "health_check" settings. type is "tcp" (connect to host:port),
+    "http" (GET url, healthy on 2xx/3xx) or "exec" (run command, healthy on
+    exit code 0). After `failures` consecutive failed checks the app is
+    restarted; checks start `start_period` seconds after each spawn.
+    """
+    TYPES = ('tcp', 'http', 'exec')
+
+    def __init__(self, type, interval=10.0, timeout=2.0, failures=3, start_period=0.0,
+                 host='127.0.0.1', port=None, url=None, path='/', command=None):
+        if type not in self.TYPES:
+            raise ValueError(f"Unknown health check type {type!r}; expected one of {', '.join(self.TYPES)}")
+        self.type = type
+        self.interval = float(interval)
+        self.timeout = float(timeout)
+        self.failures = max(1, int(failures))
+        self.start_period = float(start_period)
+        self.host = host
+        self.port = int(port) if port not in (None, "") else None
+        self.url = url or (f"http://{host}:{self.port}{path}" if self.port else None)
+        if isinstance(command, str):
+            command = shlex.split(command, posix=sys.platform != "win32")
+        self.command = command
+        if type == 'tcp' and self.port is None:
+            raise ValueError("tcp health checks need a port")
+        if type == 'http' and not self.url:
+            raise ValueError("http health checks need a url or a port")
+        if type == 'exec' and not self.command:
+            raise ValueError("exec health checks need a command")
+
+    @classmethod
+    def from_config(cls, proc_config):
+        """Returns the app's health check, or None if it has none."""
+        spec = proc_config.get('health_check')
+        if not spec:
+            return None
+        return cls(**spec)
+
+
+def run_check(spec):
+    """Runs one check synchronously. Returns (healthy, detail)."""
+    try:
+        if spec.type == 'tcp':
+            with socket.create_connection((spec.host, spec.port), timeout=spec.timeout):
+                return True, "connected"
+        if spec.type == 'http':
+            url = urlsplit(spec.url)
+            connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+            connection = connection_class(url.hostname, url.port, timeout=spec.timeout)
+            try:
+                connection.request('GET', (url.path or '/') + (f"?{url.query}" if url.query else ''))
+                response = connection.getresponse()
+                response.read()
+            finally:
+                connection.close()
+            return 200 <= response.status < 400, f"HTTP {response.status}"
+        creation_flags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+        result = subprocess.run(spec.command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                timeout=spec.timeout, creationflags=creation_flags)
+        return result.returncode == 0, f"exit code {result.returncode}"
+    except subprocess.TimeoutExpired:
+        return False, f"timed out after {spec.timeout:g}s"
+    except (OSError, http.client.HTTPException) as e:
+        return False, str(e) or type(e).__name__
+
+
+class _Check:
+    def __init__(self, name, spec, on_unhealthy, on_result):
+        self.name = name
+        self.spec = spec
+        self.on_unhealthy = on_unhealthy
+        self.on_result = on_result
+        self.strikes = 0
+        self.cancelled = False
+
+
+class HealthScheduler:
+    """
+    Runs every app's health checks from one scheduler thread and a bounded
+    worker pool. Due times live in a heap; a check is only rescheduled once
+    its previous run finished, so a slow endpoint never piles up runs and
+    the pool's queue holds at most one entry per check.
+    """
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._heap = []
+        self._seq = itertools.count()
+        self._checks = {}
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="HealthCheck")
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="HealthScheduler", daemon=True)
+        self._thread.start()
+
+    def add(self, name, spec, on_unhealthy, on_result=None):
+        """
+        Starts checking `name`, replacing any previous check of that name.
+        on_unhealthy(detail) fires once the failure threshold is reached;
+        on_result(healthy, detail) fires after every check.
+        """
+        check = _Check(name, spec, on_unhealthy, on_result)
+        with self._cond:
+            previous = self._checks.get(name)
+            if previous:
+                previous.cancelled = True
+            self._checks[name] = check
+            self._schedule(check, time.monotonic() + spec.start_period)
+
+    def remove(self, name):
+        with self._cond:
+            check = self._checks.pop(name, None)
+            if check:
+                check.cancelled = True
+
+    def __len__(self):
+        return len(self._checks)
+
+    def _schedule(self, check, due):
+        heapq.heappush(self._heap, (due, next(self._seq), check))
+        if self._heap[0][2] is check:
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self._heap and self._heap[0][0] <= time.monotonic():
+                        break
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                if self._stopped:
+                    return
+                now = time.monotonic()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    check = heapq.heappop(self._heap)[2]
+                    if not check.cancelled:
+                        due.append(check)
+            for check in due:
+                self._pool.submit(self._execute, check)
+
+    def _execute(self, check):
+        healthy, detail = run_check(check.spec)
+        if check.cancelled:
+            return
+        if check.on_result:
+            check.on_result(healthy, detail)
+        check.strikes = 0 if healthy else check.strikes + 1
+        if check.strikes >= check.spec.failures:
+            check.strikes = 0
+            with self._cond:
+                if self._checks.get(check.name) is check:
+                    del self._checks[check.name]
+            check.on_unhealthy(detail)
+            return
+        with self._cond:
+            if not check.cancelled and not self._stopped:
+                self._schedule(check, time.monotonic() + check.spec.interval)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
+        self._pool.shutdown(wait=True)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """The process-wide scheduler shared by every supervised app."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = HealthScheduler()
+        return _scheduler
+
+
+class HealthMonitor:
+    """
+    Watches one app's health while it runs. attach() starts checking a new
+    child; once the failure threshold is reached its supervisor's kill
+    function takes the child's process tree down so the supervision loop
+    restarts it, and unhealthy() reports why.
+    """
+    def __init__(self, name, spec, on_log=None):
+        self.name = name
+        self.spec = spec
+        self.on_log = on_log
+        self._unhealthy = None
+        self._kill = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_app(cls, proc_config, on_log=None):
+        """Returns a monitor for the app's health_check, or None if it has none or it is invalid."""
+        name = proc_config['name']
+        try:
+            spec = HealthCheckSpec.from_config(proc_config)
+        except (TypeError, ValueError) as e:
+            if on_log:
+                on_log(f"[{name}] Invalid health_check ({e}); health checks are disabled.")
+            return None
+        return cls(name, spec, on_log) if spec else None
+
+    def attach(self, kill):
+        """Starts checking a new child; kill() is called from a check thread to end it."""
+        with self._lock:
+            self._unhealthy = None
+            self._kill = kill
+        get_scheduler().add(self.name, self.spec, self._on_unhealthy, self._on_result)
+
+    def _on_result(self, healthy, detail):
+        if not healthy and self.on_log:
+            self.on_log(f"[{self.name}] Health check failed: {detail}")
+
+    def _on_unhealthy(self, detail):
+        with self._lock:
+            kill = self._kill
+            if kill is None:
+                return # The child exited in the meantime
+            self._unhealthy = detail
+            if self.on_log:
+                self.on_log(f"[{self.name}] Unhealthy after {self.spec.failures} failed check(s); restarting.")
+            kill()
+
+    def unhealthy(self):
+        """Call once the child has exited: the failing check's detail, if that is why it was killed."""
+        return self._unhealthy
+
+    def close(self):
+        """Stops checking; called whenever the child exits."""
+        with self._lock:
+            self._kill = None
+        get_scheduler().remove(self.name)
@@ -0,0 +1,142 @@
+import time
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton, QTableView, QTableWidget,
+    QTableWidgetItem, QHeaderView, QAbstractItemView, QDialogButtonBox, QSplitter
+)
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+from event_journal import describe, RESTART, EXIT, LIMIT, UNHEALTHY, ERROR, PARKED
+
+ALL_APPS = "All apps"
+RANGES = (("Last hour", 1), ("Last 24 hours", 24), ("Last 7 days", 24 * 7), ("Last 30 days", 24 * 30))
+FILTERS = (("All events", None), ("Failures", [EXIT, LIMIT, UNHEALTHY, ERROR, PARKED]), ("Restarts", [RESTART]))
+MAX_EVENTS = 2000
+
+
+class EventModel(QAbstractTableModel):
+    """Read-only rows of (ts, app, instance, kind, code, pid, detail) journal events."""
+    HEADERS = ("Time", "Instance", "Event")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.events = []
+
+    def set_events(self, events):
+        self.beginResetModel()
+        self.events = events
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.events)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        ts, app, instance, kind, code, pid, detail = self.events[index.row()]
+        if index.column() == 0:
+            return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))
+        if index.column() == 1:
+            return instance
+        return describe(kind, code, pid, detail)
+
+
+class HistoryDialog(QDialog):
+    """
+    Start, exit and restart history from the event journal: per-app counts
+    (most restarted first), the exit codes of the selected app and its
+    newest events.
+    """
+    def __init__(self, journal, apps, app=None, parent=None):
+        super().__init__(parent)
+        self.journal = journal
+        self.setWindowTitle("Process History")
+        self.resize(800, 600)
+        layout = QVBoxLayout(self)
+
+        filter_layout = QHBoxLayout()
+        self.app_combo = QComboBox()
+        self.app_combo.addItem(ALL_APPS)
+        self.app_combo.addItems(sorted(set(apps) | set(journal.apps())))
+        self.range_combo = QComboBox()
+        self.range_combo.addItems([label for label, _ in RANGES])
+        self.range_combo.setCurrentIndex(1)
+        self.filter_combo = QComboBox()
+        self.filter_combo.addItems([label for label, _ in FILTERS])
+        refresh_button = QPushButton("Refresh")
+        for widget in (QLabel("App:"), self.app_combo, QLabel("Period:"), self.range_combo,
+                       QLabel("Show:"), self.filter_combo):
+            filter_layout.addWidget(widget)
+        filter_layout.addStretch()
+        filter_layout.addWidget(refresh_button)
+        layout.addLayout(filter_layout)
+
+        splitter = QSplitter(Qt.Vertical)
+        self.summary_table = QTableWidget(0, 5)
+        self.summary_table.setHorizontalHeaderLabels(["App", "Starts", "Restarts", "Exits", "Failures"])
+        self.summary_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.summary_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.summary_table.verticalHeader().setVisible(False)
+        self.summary_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        splitter.addWidget(self.summary_table)
+
+        self.event_model = EventModel(self)
+        self.event_table = QTableView()
+        self.event_table.setModel(self.event_model)
+        self.event_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.event_table.verticalHeader().setVisible(False)
+        self.event_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        splitter.addWidget(self.event_table)
+        layout.addWidget(splitter)
+
+        self.exit_codes_label = QLabel()
+        self.status_label = QLabel()
+        layout.addWidget(self.exit_codes_label)
+        layout.addWidget(self.status_label)
+        button_box = QDialogButtonBox(QDialogButtonBox.Close)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+        if app:
+            self.app_combo.setCurrentText(app)
+        self.app_combo.currentTextChanged.connect(self.refresh)
+        self.range_combo.currentIndexChanged.connect(self.refresh)
+        self.filter_combo.currentIndexChanged.connect(self.refresh)
+        refresh_button.clicked.connect(self.refresh)
+        self.summary_table.cellDoubleClicked.connect(
+            lambda row, column: self.app_combo.setCurrentText(self.summary_table.item(row, 0).text()))
+        self.refresh()
+
+    def refresh(self):
+        app = self.app_combo.currentText()
+        app = None if app == ALL_APPS else app
+        since = time.time() - RANGES[self.range_combo.currentIndex()][1] * 3600
+        kinds = FILTERS[self.filter_combo.currentIndex()][1]
+        started = time.perf_counter()
+
+        summary = self.journal.summary(since)
+        self.summary_table.setRowCount(len(summary))
+        for row, values in enumerate(summary):
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(str(value))
+                if column: item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.summary_table.setItem(row, column, item)
+
+        events = self.journal.events(app, since=since, kinds=kinds, limit=MAX_EVENTS)
+        self.event_model.set_events(events)
+        if app:
+            codes = self.journal.exit_codes(app, since)
+            text = ', '.join(f"{code} ×{count}" for code, count in sorted(codes.items(), key=lambda c: -c[1]))
+            self.exit_codes_label.setText(f"Exit codes for {app}: {text or 'none'}")
+        else:
+            self.exit_codes_label.setText("Select an app (or double-click a row above) to see its exit codes.")
+        elapsed = (time.perf_counter() - started) * 1000.0
+        more = f" (newest {MAX_EVENTS} shown)" if len(events) >= MAX_EVENTS else ""
+        self.status_label.setText(f"{len(events)} event(s){more}; queried in {elapsed:.0f} ms.")
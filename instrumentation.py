@@ -0,0 +1,294 @@
+import os
+import signal
+import sys
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
+
+# Latency histograms the supervisor records, in seconds.
+SPAWN = 'spawn'                     # Popen / create_subprocess_exec until it returns
+EXIT_DETECTION = 'exit_detection'   # The kernel's exit notification (or the last poll that saw the child alive) until the supervisor acts
+RESTART = 'restart'                 # Exit detected until the next run is up, leaving out the restart policy's deliberate delay
+SIGNAL_DISPATCH = 'signal_dispatch' # A status update emitted until the GUI thread handles it
+HISTOGRAMS = (SPAWN, EXIT_DETECTION, RESTART, SIGNAL_DISPATCH)
+
+SUB_BUCKETS = 8 # Per power of two: bucket bounds are about 9% apart
+BOUNDS = [2.0 ** (exponent + step / SUB_BUCKETS) for exponent in range(-20, 11) for step in range(SUB_BUCKETS)]
+PROFILE_INTERVAL = 0.005
+PROFILE_DEPTH = 64
+PROFILE_TOP = 25
+
+
+class Histogram:
+    """Counts of values in log-spaced buckets (about 1 µs to 30 min) plus their sum and maximum."""
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        self.counts[bisect_right(BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile (capped at the maximum)."""
+        if not self.count:
+            return 0.0
+        rank, seen = p / 100.0 * self.count, 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(BOUNDS[index] if index < len(BOUNDS) else self.max, self.max)
+        return self.max
+
+    def summary(self):
+        return {'count': self.count, 'mean': self.total / self.count if self.count else 0.0,
+                'p50': self.percentile(50), 'p90': self.percentile(90), 'p99': self.percentile(99), 'max': self.max}
+
+
+class _Shard:
+    """One thread's histograms and counters; only that thread writes to it, so recording takes no lock."""
+    __slots__ = ('thread', 'histograms', 'counters')
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.histograms = {}
+        self.counters = {}
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of every thread each `interval` seconds with
+    sys._current_frames() and counts where they are. Where the OS offers
+    per-thread CPU clocks (Linux, macOS), threads that used no CPU since
+    the last sample are skipped, so threads blocked in select() or wait()
+    don't drown out the ones doing work.
+    """
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.started = time.time()
+        self.stopped = None
+        self.self_counts = {}  # "function (file:line)" -> samples with it on top
+        self.stacks = {}       # "thread;outer;...;inner" -> samples
+        self._cpu = {}         # thread ident -> CPU time at the last sample
+        self._names = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.time()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if self.samples % 200 == 0: # Thread names change rarely
+                self._names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != me and self._busy(ident):
+                    self._sample(self._names.get(ident, str(ident)), frame)
+            self.samples += 1
+
+    def _busy(self, ident):
+        try:
+            cpu = time.clock_gettime(time.pthread_getcpuclockid(ident))
+        except (AttributeError, OSError):
+            return True # No per-thread clocks here: every thread counts
+        busy = cpu > self._cpu.get(ident, -1.0)
+        self._cpu[ident] = cpu
+        return busy
+
+    def _sample(self, thread_name, frame):
+        stack = []
+        while frame is not None and len(stack) < PROFILE_DEPTH:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if not stack:
+            return
+        self.self_counts[stack[0]] = self.self_counts.get(stack[0], 0) + 1
+        key = ';'.join([thread_name] + stack[::-1])
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def report(self, top=PROFILE_TOP):
+        busy = sum(self.self_counts.values())
+        ranked = sorted(self.self_counts.items(), key=lambda item: item[1], reverse=True)[:top]
+        return {'running': self.stopped is None, 'interval': self.interval, 'samples': self.samples,
+                'seconds': (self.stopped or time.time()) - self.started, 'busy_samples': busy,
+                'top': [[function, count] for function, count in ranked]}
+
+    def collapsed(self):
+        """The samples as collapsed stacks ("thread;outer;...;inner count" lines), the input of flamegraph tools."""
+        return '\n'.join(f"{stack} {count}" for stack, count in sorted(self.stacks.items())) + '\n'
+
+
+class Instrumentation:
+    """
+    The supervisor's own latency histograms and per-thread counters.
+    Callers check `enabled` before recording (`if stats.enabled: ...`), so
+    while it is off the hot paths pay one attribute lookup and take no
+    timestamps. Each thread records into a shard of its own without locks;
+    snapshot() merges the shards.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.since = time.time()
+        self.profiler = None
+        self._local = threading.local()
+        self._shards = []
+        self._marks = {} # (histogram, key) -> perf_counter() of each open span that crosses threads
+        self._lock = threading.Lock()
+
+    def enable(self, on=True):
+        if on and not self.enabled:
+            self.since = time.time()
+        elif not on:
+            self._marks.clear() # Spans opened now would never be ended
+        self.enabled = on
+
+    def reset(self):
+        with self._lock:
+            self._shards = []
+            self._marks.clear()
+            self._local = threading.local()
+            self.since = time.time()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard(threading.current_thread().name)
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def record(self, name, seconds):
+        histograms = self._shard().histograms
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram()
+        histogram.record(seconds)
+
+    def count(self, name, amount=1):
+        counters = self._shard().counters
+        counters[name] = counters.get(name, 0) + amount
+
+    def mark(self, name, key):
+        """Starts a span that another thread ends with end_mark(), e.g. a queued signal; spans of a key end in order."""
+        self._marks.setdefault((name, key), deque()).append(time.perf_counter())
+
+    def end_mark(self, name, key):
+        try:
+            started = self._marks[(name, key)].popleft()
+        except (KeyError, IndexError):
+            return
+        self.record(name, time.perf_counter() - started)
+
+    def start_profiler(self, interval=PROFILE_INTERVAL):
+        self.stop_profiler()
+        self.profiler = SamplingProfiler(interval)
+        self.profiler.start()
+
+    def stop_profiler(self):
+        if self.profiler and self.profiler.stopped is None:
+            self.profiler.stop()
+
+    def snapshot(self):
+        """Everything recorded so far, JSON-ready: histogram summaries in seconds, counters by thread name."""
+        with self._lock:
+            shards = list(self._shards)
+        histograms, counters = {}, {}
+        for shard in shards:
+            for name, histogram in list(shard.histograms.items()):
+                histograms.setdefault(name, Histogram()).merge(histogram)
+            thread = counters.setdefault(shard.thread, {})
+            for name, value in list(shard.counters.items()):
+                thread[name] = thread.get(name, 0) + value
+        return {'enabled': self.enabled, 'since': self.since, 'pid': os.getpid(),
+                'histograms': {name: histograms[name].summary() for name in sorted(histograms)},
+                'counters': {thread: counters[thread] for thread in sorted(counters) if counters[thread]},
+                'profile': self.profiler.report() if self.profiler else None}
+
+
+# Shared by everything in this process; hosts enable it from the top-level
+# "instrumentation" setting, the GUI's Diagnostics panel or ctl.py diagnostics.
+stats = Instrumentation()
+
+
+def configure_instrumentation(config):
+    """Turns recording on at startup when the config's top-level "instrumentation" is true."""
+    if config.get('instrumentation'):
+        stats.enable()
+
+
+def install_dump_signal():
+    """On Unix, SIGUSR1 prints the report to stderr, so a headless supervisor can be inspected without a client."""
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda *args: print(format_report(stats.snapshot()), file=sys.stderr, flush=True))
+
+
+def control(enable=None, reset=False, profile=None, interval=PROFILE_INTERVAL, collapsed=False):
+    """
+    Applies diagnostics requests and returns a snapshot: `enable` turns
+    recording on or off, `reset` clears it, `profile` starts (True) or
+    stops (False) the sampling profiler, and `collapsed` adds the
+    profile's collapsed stacks. The daemon's "diagnostics" command and
+    the GUI panel both go through here.
+    """
+    if enable is not None:
+        stats.enable(bool(enable))
+    if reset:
+        stats.reset()
+    if profile is True:
+        stats.start_profiler(interval)
+    elif profile is False:
+        stats.stop_profiler()
+    snapshot = stats.snapshot()
+    if collapsed:
+        snapshot['collapsed'] = stats.profiler.collapsed() if stats.profiler else ''
+    return snapshot
+
+
+def format_ms(seconds):
+    return f"{seconds * 1000.0:.3f}" if seconds < 0.01 else f"{seconds * 1000.0:.1f}"
+
+
+def format_report(snapshot):
+    """A snapshot as text, for headless dumps and ctl.py."""
+    lines = [f"Instrumentation of PID {snapshot['pid']} ({'enabled' if snapshot['enabled'] else 'disabled'}), "
+             f"since {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot['since']))}"]
+    lines.append(f"{'LATENCY (ms)':<18} {'COUNT':>8} {'MEAN':>9} {'P50':>9} {'P90':>9} {'P99':>9} {'MAX':>9}")
+    for name, h in snapshot['histograms'].items():
+        lines.append(f"{name:<18} {h['count']:>8} " + ' '.join(f"{format_ms(h[key]):>9}" for key in ('mean', 'p50', 'p90', 'p99', 'max')))
+    if not snapshot['histograms']:
+        lines.append("(nothing recorded)")
+    lines.append("")
+    lines.append(f"{'THREAD':<32} {'COUNTER':<18} {'VALUE':>12}")
+    for thread, counters in snapshot['counters'].items():
+        for name, value in sorted(counters.items()):
+            lines.append(f"{thread[:32]:<32} {name:<18} {value:>12}")
+    profile = snapshot.get('profile')
+    if profile:
+        lines.append("")
+        lines.append(f"Profile: {profile['samples']} samples every {profile['interval'] * 1000:.0f} ms over {profile['seconds']:.1f}s"
+                     f"{' (running)' if profile['running'] else ''}, {profile['busy_samples']} thread samples on CPU")
+        for function, count in profile['top']:
+            lines.append(f"{count:>8}  {count * 100.0 / max(1, profile['busy_samples']):5.1f}%  {function}")
+    return '\n'.join(lines)
@@ -0,0 +1,464 @@
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime, timedelta
+
+DEFAULT_MAX_CONCURRENT_JOBS = 8 # Top-level "max_concurrent_jobs"; 0 means no limit
+OVERLAP_POLICIES = ('skip', 'queue', 'replace')
+QUEUE_LIMIT = 10 # Runs an "overlap": "queue" job can have waiting behind the current one
+CRON_SEARCH_YEARS = 5
+
+# Statuses of jobs between runs: the process table's job status class.
+SCHEDULED, WAITING, COMPLETED = "SCHEDULED", "WAITING", "COMPLETED"
+JOB_STATUSES = (SCHEDULED, WAITING, COMPLETED)
+
+_EXIT_RE = re.compile(r"STOPPED \(Code: (-?\d+)\)")
+_INTERVAL_RE = re.compile(r"(\d+(?:\.\d+)?)\s*([smhd])", re.IGNORECASE)
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+_MACROS = {
+    '@yearly': '0 0 1 1 *', '@annually': '0 0 1 1 *', '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0', '@daily': '0 0 * * *', '@midnight': '0 0 * * *', '@hourly': '0 * * * *',
+}
+_MONTHS = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+_DAYS = ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat']
+
+
+def is_job(app_config):
+    """True for apps that run on a "schedule" instead of being kept running."""
+    return bool(app_config.get('schedule'))
+
+
+def run_config(instance):
+    """The config one run of a job is supervised with: it is never restarted once it succeeded."""
+    return dict(instance, restart=False)
+
+
+def _cron_field(text, low, high, names=()):
+    values = set()
+    for part in text.lower().split(','):
+        spec, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if spec == '*':
+            first, last = low, high
+        else:
+            first, _, last = spec.partition('-')
+            first = names.index(first) + low if first in names else int(first)
+            last = (names.index(last) + low if last in names else int(last)) if last else (high if step > 1 else first)
+        if step < 1 or not low <= first <= last <= high:
+            raise ValueError(f"'{part}' is outside {low}-{high}")
+        values.update(range(first, last + 1, step))
+    return sorted(values)
+
+
+class CronSchedule:
+    """A five-field cron expression (minute hour day-of-month month day-of-week) or @hourly and the like."""
+    def __init__(self, expression):
+        self.text = expression
+        fields = _MACROS.get(expression.strip().lower(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"'{expression}' is not a cron expression (five fields, or @hourly/@daily/...)")
+        try:
+            self.minutes = _cron_field(fields[0], 0, 59)
+            self.hours = _cron_field(fields[1], 0, 23)
+            self.days = set(_cron_field(fields[2], 1, 31))
+            self.months = set(_cron_field(fields[3], 1, 12, _MONTHS))
+            self.weekdays = {day % 7 for day in _cron_field(fields[4], 0, 7, _DAYS)} # 7 is Sunday too
+        except ValueError as e:
+            raise ValueError(f"Bad cron expression '{expression}': {e}")
+        # As in cron, when both day fields are restricted a day matching either one fires.
+        self.any_day, self.any_weekday = fields[2] == '*', fields[4] == '*'
+        if self.next_after(time.time()) is None:
+            raise ValueError(f"Cron expression '{expression}' never matches a date")
+
+    def _day_matches(self, moment):
+        day, weekday = moment.day in self.days, (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, timestamp):
+        """The first matching minute after `timestamp`, in local time, found by skipping whole fields."""
+        moment = datetime.fromtimestamp(timestamp).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment.year + CRON_SEARCH_YEARS
+        while moment.year <= limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(moment):
+                moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+            else:
+                hour = bisect_left(self.hours, moment.hour)
+                if hour == len(self.hours):
+                    moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+                elif self.hours[hour] != moment.hour:
+                    moment = moment.replace(hour=self.hours[hour], minute=0)
+                else:
+                    minute = bisect_left(self.minutes, moment.minute)
+                    if minute < len(self.minutes):
+                        return moment.replace(minute=self.minutes[minute]).timestamp()
+                    moment = (moment + timedelta(hours=1)).replace(minute=0)
+        return None
+
+    def first(self, now):
+        return self.next_after(now)
+
+    def __str__(self):
+        return f"cron '{self.text}'"
+
+
+class IntervalSchedule:
+    """Every `seconds`, the first run one interval after the job is scheduled."""
+    def __init__(self, seconds, text=None):
+        if seconds <= 0:
+            raise ValueError("A schedule interval must be positive")
+        self.seconds = float(seconds)
+        self.text = text or f"{seconds:g}s"
+
+    def next_after(self, timestamp):
+        return timestamp + self.seconds
+
+    def first(self, now):
+        return now + self.seconds
+
+    def __str__(self):
+        return f"every {self.text}"
+
+
+class OnceSchedule:
+    """A one-shot job: it runs as soon as it is scheduled, and not again."""
+    def next_after(self, timestamp):
+        return None
+
+    def first(self, now):
+        return now
+
+    def __str__(self):
+        return "once"
+
+
+def parse_schedule(value):
+    """
+    A schedule from an app's "schedule": seconds (300), an interval
+    ("90s", "5m", "1h30m", "every 2h"), "once", or a cron expression
+    ("*/15 * * * *", "@daily"). Raises ValueError for anything else.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return IntervalSchedule(value)
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"Unrecognised schedule {value!r}")
+    text = value.strip()
+    if text.lower() in ('once', '@once'):
+        return OnceSchedule()
+    interval = text[len('every'):].strip() if text.lower().startswith('every') else text
+    parts = _INTERVAL_RE.findall(interval)
+    if parts and _INTERVAL_RE.sub('', interval).strip() == '':
+        return IntervalSchedule(sum(float(number) * _UNITS[unit.lower()] for number, unit in parts), interval)
+    return CronSchedule(text)
+
+
+def format_duration(seconds):
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    if seconds < 3600:
+        return f"{int(seconds // 60)}m{int(seconds % 60):02d}s"
+    return f"{int(seconds // 3600)}h{int(seconds % 3600 // 60):02d}m"
+
+
+def format_when(timestamp, now):
+    pattern = '%H:%M:%S' if timestamp - now < 86400 else '%Y-%m-%d %H:%M'
+    return time.strftime(pattern, time.localtime(timestamp))
+
+
+class _Job:
+    __slots__ = ('name', 'config', 'schedule', 'overlap', 'due', 'generation', 'active', 'started',
+                 'queued', 'waiting', 'replacing', 'removed', 'last_code', 'last_duration')
+
+    def __init__(self, name):
+        self.name = name
+        self.due = None            # Next fire time, or None if it won't fire again
+        self.generation = 0        # Heap entries of older generations are stale
+        self.active = False        # A run was requested and hasn't reported its final STOPPED
+        self.started = None        # When the current run reported RUNNING
+        self.queued = 0            # Runs to start once the current one ends
+        self.waiting = False       # In the global queue for a free slot
+        self.replacing = False     # The current run was told to stop for a newer one
+        self.removed = False       # Unscheduled while a run was still going
+        self.last_code = None      # Exit code of the last run (None: it never got to exit)
+        self.last_duration = None
+
+
+class JobScheduler:
+    """
+    Runs the apps that have a "schedule" from one priority queue of fire
+    times: the next fire time of each job is computed once, when it is
+    scheduled or fires, and one thread sleeps until the earliest is due,
+    whatever the number of jobs. When a job fires while its previous run
+    is still going, its "overlap" policy skips the new run (the default),
+    queues it behind the current one, or stops the current one and starts
+    afresh. At most `max_concurrent` runs go at once; runs beyond that wait
+    in order for a slot, so jobs that all fire at the top of the hour are
+    spread out instead of piling up.
+
+    Runs are supervised by the host like any app: start_fn(name) begins
+    one and stop_fn(name) stops it, both called from the scheduler's
+    thread or from notify_status()'s caller, never with a lock held. Feed
+    every status of the host's apps through notify_status(); a run ends
+    with the final "STOPPED" its supervision reports. Between runs
+    on_status() reports each job as SCHEDULED, WAITING or COMPLETED,
+    with the exit code and duration of its last run.
+    """
+    def __init__(self, start_fn, stop_fn, on_log=None, on_status=None,
+                 max_concurrent=DEFAULT_MAX_CONCURRENT_JOBS, clock=time.time):
+        self.start_fn = start_fn
+        self.stop_fn = stop_fn
+        self.on_log = on_log or (lambda message: None)
+        self.on_status = on_status or (lambda name, status: None)
+        self.max_concurrent = max_concurrent
+        self.clock = clock
+        self.jobs = {}
+        self.running = 0           # Runs holding a slot
+        self.started_runs = 0
+        self.skipped_runs = 0
+        self._heap = []            # (due, sequence, name, generation)
+        self._sequence = 0
+        self._waiting = deque()    # Job names in order of their turn for a slot
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def configure(self, config):
+        """Applies the top-level "max_concurrent_jobs" and starts runs a raised limit makes room for."""
+        limit = config.get('max_concurrent_jobs')
+        with self._cond:
+            self.max_concurrent = DEFAULT_MAX_CONCURRENT_JOBS if limit is None else int(limit)
+            actions = self._fill_slots()
+        self._perform(actions)
+
+    def is_scheduled(self, name):
+        with self._cond:
+            job = self.jobs.get(name)
+            return job is not None and not job.removed
+
+    # --- Host entry points ---
+
+    def schedule(self, instance):
+        """
+        Schedules a job instance, or reschedules it with a changed config;
+        a run in progress carries on. Returns False (and reports ERROR) if
+        its schedule or overlap policy is invalid.
+        """
+        name = instance['name']
+        overlap = instance.get('overlap') or 'skip'
+        try:
+            schedule = parse_schedule(instance.get('schedule'))
+            if overlap not in OVERLAP_POLICIES:
+                raise ValueError(f"'overlap' must be one of {', '.join(OVERLAP_POLICIES)}, not {overlap!r}")
+        except ValueError as e:
+            self.on_log(f"[{name}] Cannot schedule: {e}")
+            self.on_status(name, "ERROR")
+            return False
+        now = self.clock()
+        with self._cond:
+            job = self.jobs.get(name)
+            if job is None or job.removed:
+                job = self.jobs.setdefault(name, _Job(name))
+                job.removed = False
+                self.on_log(f"[{name}] Scheduled {schedule}.")
+            job.config, job.schedule, job.overlap = instance, schedule, overlap
+            self._push(job, schedule.first(now))
+            active = job.active
+            self._ensure_thread()
+        if not active:
+            self.on_status(name, self._idle_status(job, now))
+        return True
+
+    def unschedule(self, names=None):
+        """Stops scheduling the named jobs (all when None). Runs in progress are the host's to stop."""
+        emit = []
+        with self._cond:
+            for name in list(self.jobs) if names is None else names:
+                job = self.jobs.get(name)
+                if job is None or job.removed:
+                    continue
+                job.generation += 1
+                job.queued = 0
+                if job.waiting:
+                    self._waiting.remove(name)
+                    job.waiting, job.active = False, False
+                if job.active:
+                    job.removed = True # Forgotten once its run ends
+                else:
+                    del self.jobs[name]
+                    emit.append(name)
+            self._cond.notify()
+        for name in emit:
+            self.on_status(name, "STOPPED")
+
+    def run_now(self, name):
+        """Runs a job now, outside its schedule, subject to its overlap policy and the global limit."""
+        with self._cond:
+            job = self.jobs.get(name)
+            if job is None or job.removed:
+                return False
+            actions = self._request(job, "run requested")
+        self._perform(actions)
+        return True
+
+    def notify_status(self, name, status):
+        """Tracks the runs the host supervises; statuses of other apps are ignored."""
+        with self._cond:
+            job = self.jobs.get(name)
+            if job is None or not job.active or job.waiting:
+                return
+            if status.startswith("RUNNING"):
+                if job.started is None:
+                    job.started = self.clock()
+                return
+            match = _EXIT_RE.match(status)
+            if match:
+                job.last_code = int(match.group(1))
+                return
+            if status != "STOPPED":
+                return
+            actions = self._finished(job)
+        self._perform(actions)
+
+    def start(self):
+        with self._cond:
+            self._ensure_thread()
+
+    def stop(self):
+        """Stops the scheduler thread; no run starts after this (running ones are the host's to stop)."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+
+    def info(self):
+        """{job: {'schedule', 'next', 'running', 'queued', 'last_code', 'last_duration'}} for every scheduled job."""
+        with self._cond:
+            return {name: {'schedule': str(job.schedule), 'next': job.due, 'running': job.active and not job.waiting,
+                           'queued': job.queued, 'last_code': job.last_code, 'last_duration': job.last_duration}
+                    for name, job in self.jobs.items() if not job.removed}
+
+    # --- Internals; everything below runs with the lock held, except _perform() ---
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="JobScheduler", daemon=True)
+            self._thread.start()
+
+    def _push(self, job, due):
+        job.generation += 1
+        job.due = due
+        if due is not None:
+            self._sequence += 1
+            heapq.heappush(self._heap, (due, self._sequence, job.name, job.generation))
+        self._cond.notify()
+
+    def _run(self):
+        with self._cond:
+            while not self._stopped:
+                now = self.clock()
+                actions = []
+                while self._heap and self._heap[0][0] <= now:
+                    due, _, name, generation = heapq.heappop(self._heap)
+                    job = self.jobs.get(name)
+                    if job is None or job.generation != generation or job.removed:
+                        continue # Rescheduled or unscheduled since this entry was pushed
+                    # Runs missed while the machine slept or the scheduler lagged collapse into this one.
+                    following = job.schedule.next_after(due)
+                    if following is not None and following <= now:
+                        following = job.schedule.next_after(now)
+                    self._push(job, following)
+                    actions += self._request(job, "scheduled run")
+                if actions:
+                    self._cond.release()
+                    try:
+                        self._perform(actions)
+                    finally:
+                        self._cond.acquire()
+                    continue
+                timeout = self._heap[0][0] - now if self._heap else None
+                self._cond.wait(timeout)
+
+    def _request(self, job, reason):
+        """Actions for one requested run of a job: start it, hold it for a slot, or apply its overlap policy."""
+        name = job.name
+        if self._stopped:
+            return []
+        if job.waiting:
+            self.skipped_runs += 1
+            return [('log', f"[{name}] Still waiting for a free job slot; {reason} skipped.")]
+        if job.active:
+            if job.overlap == 'queue' and job.queued < QUEUE_LIMIT:
+                job.queued += 1
+                return [('log', f"[{name}] Previous run still going; {reason} queued ({job.queued} waiting).")]
+            if job.overlap == 'replace':
+                job.queued = 1
+                if job.replacing:
+                    return []
+                job.replacing = True
+                return [('log', f"[{name}] Previous run still going; stopping it for the {reason}."), ('stop', name)]
+            self.skipped_runs += 1
+            return [('log', f"[{name}] Previous run still going; {reason} skipped.")]
+        job.active = True
+        if self.max_concurrent and self.running >= self.max_concurrent:
+            job.waiting = True
+            self._waiting.append(name)
+            return [('status', name, f"{WAITING} (job limit {self.max_concurrent} reached)")]
+        return self._launch(job)
+
+    def _launch(self, job):
+        self.running += 1
+        self.started_runs += 1
+        job.started = None
+        job.last_code = None
+        return [('start', job.name)]
+
+    def _fill_slots(self):
+        actions = []
+        while not self._stopped and self._waiting and (not self.max_concurrent or self.running < self.max_concurrent):
+            job = self.jobs[self._waiting.popleft()]
+            job.waiting = False
+            actions += self._launch(job)
+        return actions
+
+    def _finished(self, job):
+        now = self.clock()
+        self.running -= 1
+        job.active = job.replacing = False
+        job.last_duration = now - job.started if job.started is not None else None
+        actions = []
+        if job.removed:
+            del self.jobs[job.name]
+        elif job.queued:
+            job.queued -= 1
+            actions += self._request(job, "queued run")
+        actions += self._fill_slots()
+        if not job.removed and not job.active:
+            actions.append(('status', job.name, self._idle_status(job, now)))
+        return actions
+
+    def _idle_status(self, job, now):
+        last = ""
+        if job.last_duration is not None:
+            outcome = "no exit code" if job.last_code is None else f"exit {job.last_code}"
+            last = f"last: {outcome} after {format_duration(job.last_duration)}"
+        if job.due is None:
+            return f"{COMPLETED} ({last or 'no run'})"
+        return f"{SCHEDULED} (next {format_when(job.due, now)}{'; ' + last if last else ''})"
+
+    def _perform(self, actions):
+        for action in actions:
+            if action[0] == 'start':
+                self.start_fn(action[1])
+            elif action[0] == 'stop':
+                self.stop_fn(action[1])
+            elif action[0] == 'status':
+                self.on_status(action[1], action[2])
+            else:
+                self.on_log(action[1])
@@ -0,0 +1,196 @@
+import os
+import socket
+import stat
+import threading
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
+LISTEN_FDS_START = 3 # SD_LISTEN_FDS_START: the first inherited socket is fd 3
+DEFAULT_BACKLOG = 128
+# Runs the app as the shell's own PID, so LISTEN_PID names the app itself.
+SHIM = ['/bin/sh', '-c', 'export LISTEN_PID=$$; exec "$@"']
+
+
+class ListenSpec:
+    """
+    One entry of an app's "listen" list: a TCP port ("8000" or 8000, on
+    every interface), "host:port", "[::1]:port", "unix:/path", or a dict
+    {"address": ..., "name": ..., "backlog": ...}. `key` identifies the
+    socket, so instances that list the same address share one socket.
+    """
+    def __init__(self, entry, default_name):
+        if isinstance(entry, dict):
+            address, self.name, self.backlog = entry['address'], entry.get('name'), entry.get('backlog')
+        else:
+            address, self.name, self.backlog = entry, None, None
+        self.name = self.name or default_name
+        self.backlog = int(self.backlog or DEFAULT_BACKLOG)
+        address = str(address)
+        if address.startswith('unix:'):
+            self.family, self.address = 'unix', address[len('unix:'):]
+        else:
+            host, _, port = address.rpartition(':')
+            host = host.strip('[]')
+            if not port.isdigit():
+                raise ValueError(f"Bad listen address '{address}'")
+            self.family, self.address = 'tcp', (host, int(port))
+        self.key = (self.family, self.address)
+
+    def __str__(self):
+        if self.family == 'unix':
+            return f"unix:{self.address}"
+        host, port = self.address
+        return f"[{host}]:{port}" if ':' in host else f"{host or '*'}:{port}"
+
+    def bind(self):
+        """A new listening socket for this address."""
+        if self.family == 'unix':
+            try:
+                if stat.S_ISSOCK(os.stat(self.address).st_mode):
+                    os.remove(self.address) # A stale socket from an earlier run
+            except FileNotFoundError:
+                pass
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                server.bind(self.address)
+                server.listen(self.backlog)
+            except OSError:
+                server.close()
+                raise
+            return server
+        host, port = self.address
+        if not host and socket.has_dualstack_ipv6():
+            return socket.create_server(('', port), family=socket.AF_INET6, backlog=self.backlog, dualstack_ipv6=True)
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        return socket.create_server((host, port), family=family, backlog=self.backlog)
+
+
+def listen_specs(proc_config):
+    entries = proc_config.get('listen') or []
+    if not isinstance(entries, list):
+        entries = [entries]
+    default_name = proc_config.get('group', proc_config['name'])
+    return [ListenSpec(entry, default_name) for entry in entries]
+
+
+class SocketRegistry:
+    """
+    The listening sockets held by the supervisor, by address. A socket is
+    bound the first time an app that lists it starts and stays open across
+    restarts, stops and starts of that app, so connections wait in its
+    accept queue instead of being refused; it is only closed once no app
+    in the config lists it (retain()) or the supervisor exits (close_all()).
+    """
+    def __init__(self):
+        self._sockets = {} # key -> socket
+        self._lock = threading.Lock()
+
+    def sockets(self, specs):
+        """The held socket of every spec, binding those not held yet. Raises OSError if one can't be bound."""
+        with self._lock:
+            for spec in specs:
+                if spec.key not in self._sockets:
+                    try:
+                        self._sockets[spec.key] = spec.bind()
+                    except OSError as e:
+                        raise OSError(e.errno, f"Cannot listen on {spec}: {e.strerror or e}") from e
+            return [self._sockets[spec.key] for spec in specs]
+
+    def retain(self, keys):
+        """Closes every held socket whose key is not in `keys`."""
+        with self._lock:
+            for key in [key for key in self._sockets if key not in keys]:
+                self._close(key)
+
+    def close_all(self):
+        self.retain(())
+
+    def _close(self, key):
+        self._sockets.pop(key).close()
+        family, address = key
+        if family == 'unix':
+            try:
+                os.remove(address)
+            except OSError:
+                pass
+
+
+# Shared by every app supervised in this process; hosts drop the sockets
+# of apps that left the config with configure_listeners().
+registry = SocketRegistry()
+
+
+def configure_listeners(apps):
+    """Closes the held sockets that no app (instance configs, expanded) lists any more."""
+    keys = set()
+    for app in apps:
+        try:
+            keys.update(spec.key for spec in listen_specs(app))
+        except (ValueError, KeyError):
+            pass
+    registry.retain(keys)
+
+
+def _close_inherited(first):
+    """
+    In the child, before exec: closes the fds from `first` up that would
+    survive the exec. Close-on-exec fds are left for the exec to close,
+    as one of them is subprocess's pipe for reporting a failed exec.
+    """
+    for directory in ('/proc/self/fd', '/dev/fd'):
+        try:
+            candidates = [int(fd) for fd in os.listdir(directory)]
+            break
+        except OSError:
+            continue
+    else:
+        candidates = range(first, os.sysconf('SC_OPEN_MAX'))
+    for fd in candidates:
+        if fd < first:
+            continue
+        try:
+            if not fcntl.fcntl(fd, fcntl.F_GETFD) & fcntl.FD_CLOEXEC:
+                os.close(fd)
+        except OSError:
+            pass # Closed already (listdir's own fd)
+
+
+class Listeners:
+    """
+    Hands an app the supervisor's listening sockets with the systemd
+    protocol: they become fds 3, 4, ... in the child, which finds their
+    count in LISTEN_FDS, their names in LISTEN_FDNAMES and its own PID in
+    LISTEN_PID (set by a small sh shim, since the PID is only known after
+    the fork). Apps use sd_listen_fds() or socket.socket(fileno=3).
+    """
+    def __init__(self, proc_config):
+        if fcntl is None:
+            raise OSError("Listening sockets (\"listen\") are only supported on Linux and macOS")
+        self.specs = listen_specs(proc_config)
+
+    def wrap(self, command):
+        return SHIM + [command[0]] + list(command)
+
+    def popen_kwargs(self, preexec_fn=None):
+        """Popen arguments that place the sockets; chains an existing preexec_fn (e.g. joining a cgroup)."""
+        fds = [sock.fileno() for sock in registry.sockets(self.specs)]
+        env = dict(os.environ, LISTEN_FDS=str(len(fds)), LISTEN_FDNAMES=':'.join(spec.name for spec in self.specs))
+        env.pop('LISTEN_PID', None)
+
+        def place_sockets():
+            if preexec_fn:
+                preexec_fn()
+            # Move the sockets above the target range first, so placing one
+            # never overwrites another, then dup2() them onto 3, 4, ...
+            # (dup2 clears close-on-exec, so only these survive the exec).
+            high = [fcntl.fcntl(fd, fcntl.F_DUPFD, LISTEN_FDS_START + len(fds)) for fd in fds]
+            for target, fd in enumerate(high, LISTEN_FDS_START):
+                os.dup2(fd, target)
+                os.close(fd)
+            _close_inherited(LISTEN_FDS_START + len(fds))
+        # pass_fds would have to name fds 3, 4, ... before they exist, so
+        # close_fds is off and place_sockets() closes whatever else would
+        # be inherited (e.g. an fd opened through ctypes without O_CLOEXEC).
+        return {'env': env, 'preexec_fn': place_sockets, 'close_fds': False}
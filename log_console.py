@@ -0,0 +1,128 @@
+import re
+from collections import deque
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QComboBox, QLabel
+from PySide6.QtCore import QTimer, Slot
+
+ALL_PROCESSES = "All processes"
+_APP_PREFIX = re.compile(r"^\[([^\]]+)\]")
+
+
+def message_app(message):
+    """Returns the app name from a "[name] ..." log message, or None for supervisor messages."""
+    match = _APP_PREFIX.match(message)
+    return match.group(1) if match else None
+
+
+class LogBuffer:
+    """
+    Fixed-size ring buffer of (app, message) pairs. Appends are O(1) and
+    the oldest lines fall off once max_lines is reached, so memory stays
+    flat no matter how many messages arrive.
+    """
+    def __init__(self, max_lines=5000):
+        self.max_lines = max_lines
+        self.lines = deque(maxlen=max_lines)
+        self.pending = deque(maxlen=max_lines)
+        self.apps = set()
+
+    def append(self, message):
+        entry = (message_app(message), message)
+        self.lines.append(entry)
+        self.pending.append(entry)
+        if entry[0] is not None:
+            self.apps.add(entry[0])
+
+    def resize(self, max_lines):
+        self.max_lines = max_lines
+        self.lines = deque(self.lines, maxlen=max_lines)
+        self.pending = deque(self.pending, maxlen=max_lines)
+
+    def take_pending(self, app=None):
+        """Returns and clears the messages added since the last call, filtered by app."""
+        pending, self.pending = self.pending, deque(maxlen=self.max_lines)
+        return [message for name, message in pending if app is None or name == app]
+
+    def snapshot(self, app=None):
+        return [message for name, message in self.lines if app is None or name == app]
+
+
+class LogConsole(QWidget):
+    """
+    Log view for the main window. Messages are buffered and rendered in one
+    batch per flush interval instead of one document update per message,
+    the view keeps at most max_lines blocks, and a per-process filter only
+    affects which new lines get appended.
+    """
+    def __init__(self, parent=None, max_lines=5000, flush_interval_ms=100):
+        super().__init__(parent)
+        self.buffer = LogBuffer(max_lines)
+        self.filter_app = None
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        filter_layout = QHBoxLayout()
+        self.filter_combo = QComboBox()
+        self.filter_combo.addItem(ALL_PROCESSES)
+        self.filter_combo.currentTextChanged.connect(self.set_filter)
+        filter_layout.addWidget(QLabel("Show:"))
+        filter_layout.addWidget(self.filter_combo)
+        filter_layout.addStretch()
+        layout.addLayout(filter_layout)
+
+        self.view = QPlainTextEdit()
+        self.view.setReadOnly(True)
+        self.view.setUndoRedoEnabled(False)
+        self.view.setMaximumBlockCount(max_lines)
+        layout.addWidget(self.view)
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(flush_interval_ms)
+        self.flush_timer.timeout.connect(self.flush)
+        self.flush_timer.start()
+
+    @Slot(str)
+    def append_message(self, message):
+        """Queues a message; it is shown on the next flush."""
+        self.buffer.append(message)
+
+    def set_max_lines(self, max_lines):
+        self.buffer.resize(max_lines)
+        self.view.setMaximumBlockCount(max_lines)
+
+    def set_apps(self, names):
+        """Makes sure each app appears in the filter list, even before it logs anything."""
+        self.buffer.apps.update(names)
+        self._sync_filter_items()
+
+    @Slot(str)
+    def set_filter(self, app):
+        self.filter_app = None if not app or app == ALL_PROCESSES else app
+        # The ring buffer is bounded, so a rebuild costs at most max_lines.
+        self.buffer.take_pending()
+        self.view.setPlainText('\n'.join(self.buffer.snapshot(self.filter_app)))
+        self.view.moveCursor(self.view.textCursor().MoveOperation.End)
+
+    @Slot()
+    def flush(self):
+        if not self.buffer.pending:
+            return
+        lines = self.buffer.take_pending(self.filter_app)
+        self._sync_filter_items()
+        if not lines:
+            return
+        scrollbar = self.view.verticalScrollBar()
+        at_bottom = scrollbar.value() == scrollbar.maximum()
+        self.view.appendPlainText('\n'.join(lines[-self.buffer.max_lines:]))
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def _sync_filter_items(self):
+        if self.filter_combo.count() - 1 == len(self.buffer.apps):
+            return
+        known = {self.filter_combo.itemText(i) for i in range(1, self.filter_combo.count())}
+        for name in sorted(self.buffer.apps - known):
+            self.filter_combo.addItem(name)
+
+    def toPlainText(self):
+        self.flush()
+        return self.view.toPlainText()
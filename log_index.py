@@ -0,0 +1,215 @@
+import bisect
+import mmap
+import os
+import re
+import threading
+from array import array
+
+STRIDE = 1024           # Lines between index entries; jumping to a line scans at most this many
+CHUNK = 4 * 1024 * 1024 # Bytes read (or searched) per step
+MAX_MATCHES = 10000
+RELEASE_ALIGN = 2 * 1024 * 1024 # Largest page-cache folio a read can map
+
+
+def _nth_newline(data, start, n):
+    """Offset of the n-th (1-based) newline in data at or after start; data must contain that many."""
+    end, step = len(data), 65536
+    # Gallop forward to a range holding it, halve that range with count()
+    # (a C loop) until it is small, then find() the rest.
+    while True:
+        stop = min(end, start + step)
+        count = data.count(b'\n', start, stop)
+        if count >= n or stop == end:
+            break
+        n -= count
+        start, step = stop, step * 2
+    end = stop
+    while end - start > 4096:
+        mid = (start + end) // 2
+        count = data.count(b'\n', start, mid)
+        if count >= n:
+            end = mid
+        else:
+            n -= count
+            start = mid
+    position = start - 1
+    for _ in range(n):
+        position = data.find(b'\n', position + 1)
+    return position
+
+
+class LogIndex:
+    """
+    Random access to the lines of a (possibly huge, growing) log file
+    through mmap. A sparse index keeps the byte offset of every STRIDE-th
+    line, so jumping to any line reads at most STRIDE lines, and the file
+    is never read into memory as a whole: refresh() indexes only the bytes
+    appended since the last call, a chunk at a time. A file that shrinks
+    or is replaced (log rotation) is indexed again from the start.
+
+    Only complete lines are counted; a partial last line appears once its
+    newline is written. Safe to refresh from one thread while others read.
+    """
+    def __init__(self, path, stride=STRIDE):
+        self.path = str(path)
+        self.stride = stride
+        self._lock = threading.RLock()
+        self._map = None
+        self._identity = None
+        self._reset()
+
+    def _reset(self):
+        self.offsets = array('Q', [0]) # offsets[i] = start of line i * stride
+        self.line_count = 0            # complete lines indexed
+        self.indexed = 0               # bytes indexed (up to the end of the last complete line)
+        self.size = 0                  # bytes mapped
+        self.generation = getattr(self, 'generation', -1) + 1 # bumped on every reset
+
+    def _remap(self):
+        """Maps the file's current contents; returns False if it can't be opened."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        identity = (stat.st_dev, stat.st_ino)
+        if identity != self._identity or stat.st_size < self.size:
+            self._close_map()
+            self._identity = identity
+            self._reset()
+        if stat.st_size > self.size:
+            with open(self.path, 'rb') as f:
+                new_map = mmap.mmap(f.fileno(), stat.st_size, access=mmap.ACCESS_READ)
+            self._close_map()
+            self._map, self.size = new_map, stat.st_size
+        return True
+
+    def _release(self, start, end):
+        """Drops the mapped pages of a scanned range from this process (the OS may still cache them)."""
+        if hasattr(mmap, 'MADV_DONTNEED') and self._map is not None:
+            # A fault maps a whole (possibly huge) page-cache folio, not just
+            # the bytes read, so release the surrounding RELEASE_ALIGN too.
+            start -= start % RELEASE_ALIGN
+            end = min(self.size, end + (-end) % RELEASE_ALIGN)
+            if end > start:
+                self._map.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def refresh(self, budget=64 * CHUNK):
+        """
+        Maps and indexes whatever was appended since the last call, at most
+        `budget` bytes of it, so callers can report progress on big files.
+        Returns True if new lines (or a reset) were found.
+        """
+        with self._lock:
+            generation, lines = self.generation, self.line_count
+            if not self._remap():
+                return False
+            end = min(self.size, self.indexed + budget)
+            position = self.indexed
+            while position < end:
+                data = self._map[position:min(end, position + CHUNK)]
+                self._release(position, position + len(data))
+                count = data.count(b'\n')
+                if not count:
+                    if len(data) == CHUNK and position + CHUNK < end:
+                        position += CHUNK # An enormous line; keep looking for its end
+                        continue
+                    break
+                start, remaining = 0, count
+                # Record the start of every stride-th line that begins in this chunk.
+                next_entry = len(self.offsets) * self.stride
+                while self.line_count + remaining >= next_entry:
+                    newline = _nth_newline(data, start, next_entry - self.line_count)
+                    remaining -= next_entry - self.line_count
+                    self.line_count = next_entry
+                    start = newline + 1
+                    self.offsets.append(position + start)
+                    next_entry += self.stride
+                self.line_count += remaining
+                self.indexed = position + data.rfind(b'\n') + 1
+                position = self.indexed
+            return self.generation != generation or self.line_count != lines
+
+    @property
+    def complete(self):
+        """True once everything mapped has been indexed."""
+        return self.size - self.indexed < CHUNK
+
+    def line_offset(self, line):
+        """Byte offset where a line (0-based, at most line_count) starts."""
+        with self._lock:
+            entry = line // self.stride
+            offset = self.offsets[entry]
+            skip = line - entry * self.stride
+            if not skip:
+                return offset
+            # The next entry (or the end of the index) is at most one stride of lines away.
+            end = self.offsets[entry + 1] if entry + 1 < len(self.offsets) else self.indexed
+            data = self._map[offset:end]
+            self._release(offset, end)
+            return offset + _nth_newline(data, 0, skip) + 1
+
+    def lines(self, first, count):
+        """Up to `count` complete lines starting at line `first`, decoded."""
+        with self._lock:
+            first = max(0, min(first, self.line_count))
+            last = min(self.line_count, first + count)
+            if last <= first:
+                return []
+            start, end = self.line_offset(first), self.line_offset(last)
+            data = self._map[start:end]
+            self._release(start, end)
+        return [line.rstrip(b'\r').decode('utf-8', 'replace') for line in data.split(b'\n')[:-1]]
+
+    def line_at(self, offset):
+        """The number of the line containing a byte offset."""
+        with self._lock:
+            entry = bisect.bisect_right(self.offsets, offset) - 1
+            start = self.offsets[entry]
+            data = self._map[start:offset]
+            self._release(start, offset)
+            return entry * self.stride + data.count(b'\n')
+
+    def search(self, pattern, start_line=0, ignore_case=False, limit=MAX_MATCHES, cancelled=None):
+        """
+        Yields (line number, text) for lines matching a regex, from start_line
+        on, searching the mapping CHUNK bytes at a time so results stream
+        in. Yields (None, bytes searched) between chunks so callers can show
+        progress; stops early if `cancelled()` becomes true.
+        """
+        regex = re.compile(pattern.encode('utf-8'), re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+        with self._lock:
+            position, end, generation = self.line_offset(start_line), self.indexed, self.generation
+        found = 0
+        while position < end and found < limit:
+            if cancelled and cancelled():
+                return
+            matches = []
+            with self._lock:
+                if self.generation != generation:
+                    return # Rotated underneath us
+                mapping = self._map # Remapped as the file grows; same bytes up to `end`
+                chunk_end = mapping.rfind(b'\n', position, min(end, position + CHUNK)) + 1 or end
+                cursor = position
+                while cursor < chunk_end and found < limit:
+                    match = regex.search(mapping, cursor, chunk_end)
+                    if not match:
+                        break
+                    line_start = mapping.rfind(b'\n', cursor, match.start()) + 1 or cursor
+                    line_end = mapping.find(b'\n', match.start(), chunk_end)
+                    line_end = chunk_end if line_end < 0 else line_end
+                    matches.append((self.line_at(line_start), mapping[line_start:line_end].rstrip(b'\r').decode('utf-8', 'replace')))
+                    found += 1
+                    cursor = line_end + 1 # Each line is reported once
+                self._release(position, chunk_end)
+            yield from matches
+            position = chunk_end
+            yield None, position
+
+    def close(self):
+        with self._lock:
+            self._close_map()
@@ -1,14 +1,15 @@
 import sys
 import os
 import argparse
-from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import QCoreApplication, QThread, Signal, Slot
-from supervisor_app import MainWindow
-from supervisor_logic import SupervisorWorker
+import threading
 from paths import get_user_data_dir
 
+# Qt is imported only once GUI mode is chosen, so headless runs stay fast and small.
+
 def run_gui_mode():
     """Launches the full graphical user interface."""
+    from PySide6.QtWidgets import QApplication
+    from supervisor_app import MainWindow
     app = QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(False)
     window = MainWindow()
@@ -23,6 +24,20 @@ def run_standalone_mode():
     parser.add_argument('-r', '--restart', action='store_true', help="Always restart the process when it exits.")
     parser.add_argument('--restart-on-failure', action='store_true', help="Restart only if it fails (non-zero exit code).")
     parser.add_argument('-o', '--output', type=str, metavar='FILE', help="Redirect process stdout/stderr to a file.")
+    parser.add_argument('-m', '--metrics', type=float, metavar='SECONDS', help="Print CPU, memory, FD and thread usage every SECONDS.")
+    parser.add_argument('--stop-signal', type=str, metavar='SIGNAL', help="Signal to stop the process with on Ctrl+C (default: TERM).")
+    parser.add_argument('--stop-timeout', type=float, default=10.0, metavar='SECONDS', help="Kill the process if it hasn't stopped this long after its stop signal (default: 10).")
+    parser.add_argument('--listen', action='append', metavar='ADDRESS',
+                        help="Hold a listening socket (PORT, HOST:PORT or unix:PATH) and pass it to the process as fd 3, 4, ... (LISTEN_FDS). Repeatable.")
+    parser.add_argument('--tail-buffer', type=int, metavar='BYTES',
+                        help="Keep the last BYTES of stdout and stderr in shared memory and print the last lines when the process fails.")
+    parser.add_argument('--instrument', action='store_true',
+                        help="Record the supervisor's own spawn, exit detection and restart latencies; print them on SIGUSR1 and at exit.")
+    parser.add_argument('--profile', action='store_true', help="With --instrument: also run the sampling profiler and print its hottest functions.")
+    parser.add_argument('--schedule', type=str, metavar='SPEC',
+                        help="Run the command as a job: on a cron expression (\"*/5 * * * *\"), an interval (\"every 10m\") or \"once\".")
+    parser.add_argument('--overlap', choices=('skip', 'queue', 'replace'), default='skip',
+                        help="With --schedule: what a run due while the last is still going does (default: skip).")
     parser.add_argument('command', nargs=argparse.REMAINDER, help="The command and its arguments to run.")
     args = parser.parse_args()
 
@@ -34,7 +49,6 @@ def run_standalone_mode():
     if command_to_run and command_to_run[0] == '--':
         command_to_run = command_to_run[1:]
 
-    app = QCoreApplication(sys.argv)
     proc_name = args.name if args.name else os.path.basename(command_to_run[0])
     
     proc_config = {
@@ -43,6 +57,15 @@ def run_standalone_mode():
         "restart": args.restart,
         "restart_on_failure": args.restart_on_failure,
     }
+    if args.stop_signal:
+        proc_config['stop_signal'] = args.stop_signal
+    if args.listen:
+        proc_config['listen'] = args.listen
+    if args.tail_buffer:
+        proc_config['tail_buffer'] = args.tail_buffer
+    if args.schedule:
+        proc_config['schedule'] = args.schedule
+        proc_config['overlap'] = args.overlap
 
     if args.output:
         user_data_dir = get_user_data_dir()
@@ -53,35 +76,96 @@ def run_standalone_mode():
     print(f"--- Starting Standalone Supervisor for '{proc_name}' ---")
     print(f"--- Press Ctrl+C to stop. ---")
 
-    worker = SupervisorWorker(proc_config)
-    thread = QThread()
-    worker.moveToThread(thread)
+    from supervisor_core import ProcessSupervisor
+    from shutdown import ShutdownCoordinator
+    from process_tree import reaper
+    from tail_buffer import buffers as tail_buffers
+    from instrumentation import stats, install_dump_signal, format_report
+    from job_scheduler import JobScheduler, run_config, COMPLETED
 
-    worker.log_message.connect(print)
-    worker.status_update.connect(lambda name, status: print(f"STATUS UPDATE for '{name}': {status}"))
-    
-    thread.started.connect(worker.run)
-    worker.status_update.connect(lambda name, status: app.quit() if status.startswith("STOPPED") else None)
-    
-    def stop_on_interrupt(*args):
-        """A more robust shutdown handler for Ctrl+C."""
-        print("\n--- Ctrl+C detected. Shutting down... ---")
-        # Tell the worker's internal loop to stop
-        worker.stop()
-        # Tell the QThread's event loop to quit
-        thread.quit()
-        # Wait for the thread to finish all its cleanup
-        thread.wait()
-    
-    from PySide6.QtCore import QTimer
-    import signal
-    signal.signal(signal.SIGINT, stop_on_interrupt)
-    timer = QTimer()
-    timer.start(500)
-    timer.timeout.connect(lambda: None)
-
-    thread.start()
-    sys.exit(app.exec())
+    sampler = jobs = None
+    completed = threading.Event()
+    def on_status(name, status):
+        print(f"STATUS UPDATE for '{name}': {status}")
+        if sampler:
+            pid = pid_from_status(status)
+            if pid: sampler.track(name, pid)
+            else: sampler.untrack(name)
+        if jobs:
+            jobs.notify_status(name, status)
+            if status.startswith(COMPLETED): completed.set()
+
+    if args.instrument:
+        stats.enable()
+        if args.profile:
+            stats.start_profiler()
+        install_dump_signal()
+
+    if args.schedule:
+        # Each run gets its own supervisor and thread; `run` holds the latest.
+        run = {}
+        def start_run(name):
+            run['supervisor'] = ProcessSupervisor(run_config(proc_config), on_log=print, on_status=on_status)
+            run['thread'] = threading.Thread(target=run['supervisor'].run, name=f"Supervisor-{name}")
+            run['thread'].start()
+        jobs = JobScheduler(start_run, lambda name: run['supervisor'].stop(), on_log=print, on_status=on_status)
+        if not jobs.schedule(proc_config):
+            sys.exit(2)
+    else:
+        supervisor = ProcessSupervisor(proc_config, on_log=print, on_status=on_status)
+    reaper.start(on_log=print) # Reports and reaps what the process leaves behind
+
+    if args.metrics:
+        # Only --metrics needs the metrics module and psutil.
+        from metrics import MetricsSampler, format_bytes, pid_from_status
+        if not MetricsSampler.available():
+            print("--- psutil is not installed; --metrics is unavailable. ---")
+        else:
+            def print_metrics(snapshot):
+                for name, m in snapshot.items():
+                    # The recent history: average and peak CPU, peak RSS.
+                    cpu, rss = (sampler.history[name].summary(field) for field in ('cpu', 'rss'))
+                    print(f"METRICS for '{name}': CPU {m['cpu']:.1f}% (avg {cpu['avg']:.1f}%, max {cpu['max']:.1f}% "
+                          f"over {cpu['samples']} samples) | RSS {format_bytes(m['rss'])} (max {format_bytes(rss['max'])}) | "
+                          f"FDs {int(m['fds'])} | Threads {int(m['threads'])}")
+
+            sampler = MetricsSampler(args.metrics, on_sample=print_metrics)
+            sampler.start()
+
+    if jobs:
+        # Runs until Ctrl+C, or for "once", until its run has finished.
+        try:
+            while not completed.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            print("\n--- Ctrl+C detected. Shutting down... ---")
+        jobs.stop()
+        jobs.unschedule()
+        if completed.is_set():
+            run['thread'].join() # The last run reported COMPLETED on its way out
+        elif run and run['thread'].is_alive():
+            ShutdownCoordinator(args.stop_timeout, on_log=print).shutdown({proc_name: run['supervisor']})
+            run['thread'].join()
+    else:
+        # Supervise on a worker thread so Ctrl+C reaches the main thread promptly.
+        thread = threading.Thread(target=supervisor.run, name=f"Supervisor-{proc_name}")
+        thread.start()
+        try:
+            while thread.is_alive():
+                thread.join(0.5)
+        except KeyboardInterrupt:
+            print("\n--- Ctrl+C detected. Shutting down... ---")
+            # The same deadline-bounded path the service and daemon use to stop their apps.
+            ShutdownCoordinator(args.stop_timeout, on_log=print).shutdown({proc_name: supervisor})
+            thread.join()
+    if sampler:
+        sampler.stop()
+    reaper.stop()
+    tail_buffers.close_all()
+    if args.instrument:
+        stats.stop_profiler()
+        print(format_report(stats.snapshot()))
+    sys.exit(0)
 
 if __name__ == '__main__':
     get_user_data_dir()
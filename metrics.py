@@ -0,0 +1,193 @@
+import re
+import sys
+import threading
+import time
+from array import array
+
+try:
+    import psutil
+except ImportError: # Metrics are optional; supervision works without them.
+    psutil = None
+
+_PID_RE = re.compile(r"PID: (\d+)")
+FIELDS = ('cpu', 'rss', 'fds', 'threads')
+
+
+def pid_from_status(status):
+    """Extracts the PID from a "RUNNING (PID: 1234)" status string."""
+    match = _PID_RE.search(status)
+    return int(match.group(1)) if match else None
+
+
+def format_bytes(value):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024 or unit == 'GB':
+            return f"{value:.0f} {unit}" if unit == 'B' else f"{value:.1f} {unit}"
+        value /= 1024.0
+
+
+class MetricRing:
+    """Fixed-capacity ring of floats stored in a flat array (8 bytes per sample)."""
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = array('d', bytes(8 * capacity))
+        self.count = 0
+
+    def append(self, value):
+        self.data[self.count % self.capacity] = value
+        self.count += 1
+
+    def last(self):
+        return self.data[(self.count - 1) % self.capacity] if self.count else None
+
+    def values(self):
+        """All retained samples, oldest first."""
+        if self.count <= self.capacity:
+            return self.data[:self.count].tolist()
+        start = self.count % self.capacity
+        return (self.data[start:] + self.data[:start]).tolist()
+
+
+class MetricsHistory:
+    """Recent samples for one app: a timestamp ring plus one ring per metric."""
+    def __init__(self, capacity):
+        self.timestamps = MetricRing(capacity)
+        self.rings = {field: MetricRing(capacity) for field in FIELDS}
+
+    def append(self, timestamp, sample):
+        self.timestamps.append(timestamp)
+        for field in FIELDS:
+            self.rings[field].append(sample[field])
+
+    def latest(self):
+        if not self.timestamps.count:
+            return None
+        return {field: self.rings[field].last() for field in FIELDS}
+
+    def summary(self, field):
+        """{'min', 'avg', 'max', 'samples'} of one metric over the retained samples, or None."""
+        values = self.rings[field].values()
+        if not values:
+            return None
+        return {'min': min(values), 'avg': sum(values) / len(values), 'max': max(values), 'samples': len(values)}
+
+
+def _walk(children, root_pid):
+    """root_pid followed by all its descendants in `children` ({ppid: [pid, ...]})."""
+    pids, stack, visited = [root_pid], [root_pid], {root_pid}
+    while stack:
+        for pid in children.get(stack.pop(), ()):
+            if pid not in visited: # pid 0 is its own parent on some systems
+                visited.add(pid)
+                pids.append(pid)
+                stack.append(pid)
+    return pids
+
+
+class MetricsSampler:
+    """
+    Samples CPU%, RSS, open file descriptors (handles on Windows) and thread
+    count for every tracked process tree in one pass per interval, on a
+    single background thread. Each pass scans the process table once and
+    walks every tree from that parent map, whatever the number of apps.
+    psutil.Process handles are cached across passes so cpu_percent() has a
+    baseline and nothing is re-created per column. on_sample receives
+    {name: {'cpu', 'rss', 'fds', 'threads'}}; the last `history` samples of
+    each app are kept in `history` ({name: MetricsHistory}).
+    """
+    def __init__(self, interval=2.0, history=300, on_sample=None):
+        self.interval = interval
+        self.history_size = history
+        self.on_sample = on_sample
+        self.history = {}
+        self._targets = {}   # name -> root pid
+        self._handles = {}   # pid -> psutil.Process
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def available():
+        return psutil is not None
+
+    def track(self, name, pid):
+        with self._lock:
+            self._targets[name] = pid
+
+    def untrack(self, name):
+        with self._lock:
+            self._targets.pop(name, None)
+
+    def start(self):
+        if psutil is None or (self._thread and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="MetricsSampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            snapshot = self.sample_once()
+            if self.on_sample:
+                self.on_sample(snapshot)
+
+    def _handle(self, pid):
+        handle = self._handles.get(pid)
+        if handle is None:
+            handle = self._handles[pid] = psutil.Process(pid)
+        return handle
+
+    @staticmethod
+    def _children_map():
+        """{ppid: [pid, ...]} from one scan of the process table, shared by every tree in a pass."""
+        children = {}
+        for proc in psutil.process_iter(['ppid']):
+            ppid = proc.info['ppid']
+            if ppid is not None:
+                children.setdefault(ppid, []).append(proc.pid)
+        return children
+
+    def sample_once(self):
+        """Takes one sample of every tracked tree and returns the snapshot."""
+        if psutil is None:
+            return {}
+        with self._lock:
+            targets = dict(self._targets)
+        now = time.time()
+        snapshot, seen = {}, set()
+        children = self._children_map() if targets else {}
+        for name, root_pid in targets.items():
+            tree = []
+            for pid in _walk(children, root_pid):
+                try:
+                    tree.append(self._handle(pid))
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue # A short-lived descendant that is already gone; the rest of the tree still counts
+            if not tree or tree[0].pid != root_pid:
+                continue
+            totals = {'cpu': 0.0, 'rss': 0.0, 'fds': 0.0, 'threads': 0.0, 'procs': 0}
+            for proc in tree:
+                seen.add(proc.pid)
+                try:
+                    with proc.oneshot():
+                        totals['cpu'] += proc.cpu_percent(None)
+                        totals['rss'] += proc.memory_info().rss
+                        totals['fds'] += proc.num_handles() if sys.platform == "win32" else proc.num_fds()
+                        totals['threads'] += proc.num_threads()
+                    totals['procs'] += 1
+                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                    continue
+            history = self.history.get(name)
+            if history is None:
+                history = self.history[name] = MetricsHistory(self.history_size)
+            history.append(now, totals)
+            snapshot[name] = totals
+        for pid in list(self._handles):
+            if pid not in seen:
+                del self._handles[pid]
+        return snapshot
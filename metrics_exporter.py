@@ -0,0 +1,244 @@
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from event_journal import classify, START, EXIT, LIMIT, UNHEALTHY, ERROR, STOPPED, PARKED
+from metrics import MetricsSampler, FIELDS
+
+DEFAULT_HOST = '127.0.0.1'
+OPENMETRICS_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PROMETHEUS_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+_BACKOFF_RE = re.compile(r"^\[([^\]]+)\] (?:Process failed quickly\. Waiting|Restart budget exhausted\. Waiting|"
+                         r"Crash loop: .* Parking for) (\d+(?:\.\d+)?)s\.")
+_ENDED = (EXIT, LIMIT, UNHEALTHY, PARKED)
+
+# name -> (type, help); samples of a family are kept and rendered together.
+FAMILIES = {
+    'pysupervisor_app_up': ('gauge', "1 if the instance's process is running, else 0."),
+    'pysupervisor_app_starts': ('counter', "Processes started for the instance, including restarts."),
+    'pysupervisor_app_restarts': ('counter', "Restarts after an exit, limit kill or failed health check."),
+    'pysupervisor_app_failures': ('counter', "Non-zero exits, limit kills, failed health checks and errors."),
+    'pysupervisor_app_last_exit_code': ('gauge', "Exit code of the instance's last process."),
+    'pysupervisor_app_backoff_seconds': ('gauge', "Delay before the next restart of a fast-failing, rate-limited or parked instance."),
+    'pysupervisor_app_cpu_percent': ('gauge', "CPU usage of the process tree, in percent of one core."),
+    'pysupervisor_app_memory_rss_bytes': ('gauge', "Resident memory of the process tree."),
+    'pysupervisor_app_open_fds': ('gauge', "Open file descriptors (handles on Windows) of the process tree."),
+    'pysupervisor_app_threads': ('gauge', "Threads in the process tree."),
+}
+RESOURCE_FAMILIES = dict(zip(FIELDS, (
+    'pysupervisor_app_cpu_percent', 'pysupervisor_app_memory_rss_bytes',
+    'pysupervisor_app_open_fds', 'pysupervisor_app_threads')))
+UPTIME = 'pysupervisor_app_uptime_seconds'
+
+
+def parse_listen(value):
+    """"host:port", ":port" or a bare port -> (host, port)."""
+    host, _, port = str(value).rpartition(':')
+    return host.strip('[]') or DEFAULT_HOST, int(port)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Instance:
+    def __init__(self, app, name):
+        self.labels = f'{{app="{_escape(app)}",instance="{_escape(name)}"}}'
+        self.started_at = None
+        self.starts = 0
+        self.restarts = 0
+        self.failures = 0
+        self.last_kind = None
+
+
+class MetricsRegistry:
+    """
+    Per-instance supervisor metrics, kept ready to serve. Every update
+    rewrites only the changed instance's sample lines, under a lock held for
+    a few dictionary operations, so supervision callbacks never wait on a
+    scrape. A scrape copies the prepared lines and joins them; only uptime
+    is computed per scrape.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._instances = {}                             # instance name -> _Instance
+        self._lines = {family: {} for family in FAMILIES} # family -> instance name -> sample line
+
+    def _instance(self, app, name):
+        instance = self._instances.get(name)
+        if instance is None:
+            instance = self._instances[name] = _Instance(app, name)
+            self._set('pysupervisor_app_up', instance, name, 0)
+            for family in ('pysupervisor_app_starts', 'pysupervisor_app_restarts', 'pysupervisor_app_failures'):
+                self._set(family, instance, name, 0)
+        return instance
+
+    def _set(self, family, instance, name, value):
+        suffix = '_total' if FAMILIES[family][0] == 'counter' else ''
+        self._lines[family][name] = f"{family}{suffix}{instance.labels} {_number(value)}\n"
+
+    def _clear(self, family, name):
+        self._lines[family].pop(name, None)
+
+    def set_instances(self, group_of):
+        """Makes {instance name: app name} the known instances: new ones show as down, missing ones are dropped."""
+        with self._lock:
+            for name in list(self._instances):
+                if name not in group_of:
+                    del self._instances[name]
+                    for lines in self._lines.values():
+                        lines.pop(name, None)
+            for name, app in group_of.items():
+                self._instance(app, name)
+
+    def record_status(self, app, name, status):
+        event = classify(status)
+        if event is None:
+            return
+        kind, code, pid, detail = event
+        with self._lock:
+            instance = self._instance(app, name)
+            if kind == START:
+                instance.starts += 1
+                instance.started_at = time.time()
+                self._set('pysupervisor_app_starts', instance, name, instance.starts)
+                if instance.last_kind in _ENDED:
+                    instance.restarts += 1
+                    self._set('pysupervisor_app_restarts', instance, name, instance.restarts)
+                self._set('pysupervisor_app_up', instance, name, 1)
+                self._clear('pysupervisor_app_backoff_seconds', name)
+            else:
+                instance.started_at = None
+                self._set('pysupervisor_app_up', instance, name, 0)
+                if (kind == EXIT and code != 0) or kind in (LIMIT, UNHEALTHY, ERROR):
+                    instance.failures += 1
+                    self._set('pysupervisor_app_failures', instance, name, instance.failures)
+                if kind == EXIT:
+                    self._set('pysupervisor_app_last_exit_code', instance, name, code)
+                for family in RESOURCE_FAMILIES.values():
+                    self._clear(family, name)
+                if kind in (STOPPED, ERROR):
+                    self._clear('pysupervisor_app_backoff_seconds', name)
+            instance.last_kind = kind
+
+    def record_log(self, message):
+        """Picks the restart delay out of "[name] Process failed quickly. Waiting Ns." and similar messages."""
+        match = _BACKOFF_RE.match(message)
+        if not match:
+            return
+        with self._lock:
+            instance = self._instances.get(match.group(1))
+            if instance:
+                self._set('pysupervisor_app_backoff_seconds', instance, match.group(1), float(match.group(2)))
+    
+    def update_resources(self, snapshot):
+        """Takes a MetricsSampler snapshot, {instance name: {'cpu', 'rss', 'fds', 'threads'}}."""
+        with self._lock:
+            for name, sample in snapshot.items():
+                instance = self._instances.get(name)
+                if instance is None or instance.started_at is None:
+                    continue
+                for field, family in RESOURCE_FAMILIES.items():
+                    self._set(family, instance, name, sample[field])
+
+    def render(self, openmetrics=True):
+        """The exposition text for one scrape."""
+        with self._lock:
+            lines = {family: list(samples.values()) for family, samples in self._lines.items()}
+            running = [(instance.labels, instance.started_at) for instance in self._instances.values()
+                       if instance.started_at is not None]
+            total = len(self._instances)
+        now = time.time()
+        parts = [
+            "# TYPE pysupervisor_instances gauge\n# HELP pysupervisor_instances Supervised instances.\n",
+            f"pysupervisor_instances {total}\n",
+            f"# TYPE {UPTIME} gauge\n# HELP {UPTIME} Seconds since the instance's process started.\n",
+        ]
+        parts.extend(f"{UPTIME}{labels} {now - started:.3f}\n" for labels, started in running)
+        for family, (kind, help_text) in FAMILIES.items():
+            # OpenMetrics names a counter family without its _total suffix; the Prometheus text format with it.
+            name = family if openmetrics or kind != 'counter' else f"{family}_total"
+            parts.append(f"# TYPE {name} {kind}\n# HELP {name} {help_text}\n")
+            parts.extend(lines[family])
+        if openmetrics:
+            parts.append("# EOF\n")
+        return ''.join(parts).encode()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+        body = self.server.registry.render(openmetrics)
+        self.send_response(200)
+        self.send_header('Content-Type', OPENMETRICS_TYPE if openmetrics else PROMETHEUS_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Scrapes every few seconds would flood the supervisor log.
+
+
+class MetricsExporter:
+    """
+    Serves a MetricsRegistry at http://<listen>/metrics in the OpenMetrics
+    (or, for older scrapers, Prometheus text) format, from its own threads.
+    With sample=True it also runs a MetricsSampler for the instances it
+    sees start; pass sample=False when the host already samples and feeds
+    update_resources() itself.
+    """
+    def __init__(self, listen, sample=True, interval=5.0):
+        self.host, self.port = parse_listen(listen)
+        self.registry = MetricsRegistry()
+        self.sampler = MetricsSampler(interval, history=1, on_sample=self.registry.update_resources) \
+            if sample and MetricsSampler.available() else None
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        self._server.daemon_threads = True
+        self._server.registry = self.registry
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="MetricsExporter", daemon=True)
+        self._thread.start()
+        if self.sampler:
+            self.sampler.start()
+
+    def stop(self):
+        if self.sampler:
+            self.sampler.stop()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/metrics"
+
+    def set_instances(self, group_of):
+        self.registry.set_instances(group_of)
+
+    def record_status(self, app, name, status):
+        self.registry.record_status(app, name, status)
+        if self.sampler:
+            event = classify(status)
+            if event and event[0] == START:
+                self.sampler.track(name, event[2])
+            elif event:
+                self.sampler.untrack(name)
+
+    def record_log(self, message):
+        self.registry.record_log(message)
+
+    def update_resources(self, snapshot):
+        self.registry.update_resources(snapshot)
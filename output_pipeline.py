@@ -0,0 +1,434 @@
+import asyncio
+import gzip
+import os
+import selectors
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import combined_log
+from tail_buffer import buffers as tail_buffers, crash_report, CRASH_REPORT_LINES
+from instrumentation import stats
+
+READ_SIZE = 65536
+
+
+class RotatingOutputWriter:
+    """
+    Appends process output to a file from a background thread. write() only
+    queues bytes in memory, so a chatty child never waits on the disk; the
+    writer thread flushes them in batches and rotates the file by size
+    and/or age, keeping `backups` old segments (optionally gzipped).
+
+    write() never blocks. Once `max_pending` bytes pile up because the disk
+    can't keep up, full() is true and the pipe reader stops reading that
+    app's pipes until on_space(), so the child waits on its full pipe while
+    other apps carry on. With `drop_on_overflow`, data over the limit is
+    discarded instead.
+    """
+    def __init__(self, path, max_bytes=0, rotate_seconds=0, backups=5, compress=False,
+                 flush_interval=0.2, max_pending=16 * 1024 * 1024, drop_on_overflow=False):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backups = max(0, backups)
+        self.compress = compress
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.drop_on_overflow = drop_on_overflow
+
+        self._pending = []
+        self._pending_bytes = 0
+        self._dropped_bytes = 0
+        self._cond = threading.Condition()
+        self._space_waiters = [] # Callbacks for on_space()
+        self._closed = False
+
+        self._file = None
+        self._size = 0
+        self._opened_at = 0
+        self._compress_queue = []
+        self._compress_cond = threading.Condition()
+        self._compressor = None
+        self._compressor_done = False
+
+        self._open()
+        self._thread = threading.Thread(target=self._run, name=f"OutputWriter-{os.path.basename(self.path)}", daemon=True)
+        self._thread.start()
+
+    def write(self, data):
+        """Queues bytes for writing, without waiting."""
+        if not data:
+            return
+        with self._cond:
+            if self._closed:
+                return
+            if self.drop_on_overflow and self._pending_bytes + len(data) > self.max_pending:
+                self._dropped_bytes += len(data)
+                return
+            self._pending.append(data)
+            self._pending_bytes += len(data)
+            if self._pending_bytes >= READ_SIZE:
+                self._cond.notify()
+
+    def full(self):
+        """True while the backlog is at `max_pending`; readers should pause until on_space()."""
+        return self._pending_bytes >= self.max_pending and not self._closed and not self.drop_on_overflow
+
+    def on_space(self, callback):
+        """Calls `callback` (on the writer thread, or now) once the backlog has room again."""
+        with self._cond:
+            if self.full():
+                self._space_waiters.append(callback)
+                self._cond.notify()
+                return
+        callback()
+
+    def close(self):
+        """Flushes everything still queued and stops the writer threads."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self._wake_waiters()
+        if self._compressor:
+            with self._compress_cond:
+                self._compressor_done = True
+                self._compress_cond.notify_all()
+            self._compressor.join()
+
+    def _wake_waiters(self):
+        with self._cond:
+            waiters, self._space_waiters = self._space_waiters, []
+        for callback in waiters:
+            callback()
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, 'ab')
+        self._size = self._file.tell()
+        self._opened_at = time.time()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._pending and not self._closed:
+                    self._cond.wait(self.flush_interval)
+                batch, self._pending, self._pending_bytes = self._pending, [], 0
+                dropped, self._dropped_bytes = self._dropped_bytes, 0
+                closed = self._closed
+            self._wake_waiters()
+            if dropped:
+                batch.append(f"\n[PySupervisor] output dropped: {dropped} bytes (disk too slow)\n".encode())
+            if batch:
+                self._write_batch(b''.join(batch))
+            elif self.rotate_seconds and time.time() - self._opened_at >= self.rotate_seconds and self._size:
+                self._rotate()
+            if closed:
+                self._file.close()
+                return
+
+    def _write_batch(self, data):
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+        if (self.max_bytes and self._size >= self.max_bytes) or \
+                (self.rotate_seconds and time.time() - self._opened_at >= self.rotate_seconds):
+            self._rotate()
+
+    def _rotate(self):
+        self._file.close()
+        self._wait_for_compression()
+        if self.backups:
+            for index in range(self.backups, 0, -1):
+                for suffix in ('', '.gz'):
+                    source = f"{self.path}.{index}{suffix}"
+                    if not os.path.exists(source):
+                        continue
+                    if index == self.backups:
+                        os.remove(source)
+                    else:
+                        os.replace(source, f"{self.path}.{index + 1}{suffix}")
+            os.replace(self.path, f"{self.path}.1")
+            if self.compress:
+                self._queue_compression(f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def _queue_compression(self, path):
+        with self._compress_cond:
+            self._compress_queue.append(path)
+            self._compress_cond.notify()
+        if self._compressor is None:
+            self._compressor = threading.Thread(target=self._compress_loop, name="OutputCompressor", daemon=True)
+            self._compressor.start()
+
+    def _wait_for_compression(self):
+        # Segments are renamed on rotation, so let the previous one finish first.
+        with self._compress_cond:
+            while self._compress_queue:
+                self._compress_cond.wait()
+
+    def _compress_loop(self):
+        while True:
+            with self._compress_cond:
+                while not self._compress_queue and not self._compressor_done:
+                    self._compress_cond.wait()
+                if not self._compress_queue:
+                    return
+                path = self._compress_queue[0]
+            try:
+                with open(path, 'rb') as source, gzip.open(path + '.gz', 'wb') as target:
+                    shutil.copyfileobj(source, target, READ_SIZE)
+                os.remove(path)
+            except OSError:
+                pass
+            with self._compress_cond:
+                self._compress_queue.pop(0)
+                self._compress_cond.notify_all()
+
+
+def _full_writer(writers):
+    """The first of a pipe's writers whose backlog is full, if any."""
+    for writer in writers():
+        if writer is not None and writer.full():
+            return writer
+    return None
+
+
+class _PipeReactor:
+    """
+    One thread that reads every captured pipe through a selector and hands
+    the bytes to each pipe's sinks. Windows pipes can't be selected on, so
+    there each pipe gets its own reader thread instead.
+
+    The reactor thread never waits on a disk: when one of a pipe's writers
+    (from its `writers` callable) is full(), that pipe alone is taken out
+    of the selector until the writer has room again, and its child blocks
+    on the full pipe while every other app's output keeps flowing.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._selector = None
+        self._thread = None
+        self._wake_r = self._wake_w = None
+        self._paused = {} # fd -> selector data, while its writer is full
+
+    def add(self, stream, sinks, on_eof, writers=lambda: ()):
+        if sys.platform == "win32":
+            threading.Thread(target=self._read_blocking, args=(stream, sinks, on_eof, writers), daemon=True).start()
+            return
+        with self._lock:
+            if self._selector is None:
+                self._selector = selectors.DefaultSelector()
+                self._wake_r, self._wake_w = os.pipe()
+                os.set_blocking(self._wake_r, False)
+                self._selector.register(self._wake_r, selectors.EVENT_READ)
+                self._thread = threading.Thread(target=self._loop, name="OutputPipeReactor", daemon=True)
+                self._thread.start()
+            os.set_blocking(stream.fileno(), False)
+            self._selector.register(stream.fileno(), selectors.EVENT_READ, (stream, sinks, on_eof, writers))
+        os.write(self._wake_w, b'\0')
+
+    def _pause(self, fd, data, writer):
+        with self._lock:
+            self._selector.unregister(fd)
+            self._paused[fd] = data
+        writer.on_space(lambda: self._resume(fd))
+
+    def _resume(self, fd):
+        with self._lock:
+            data = self._paused.pop(fd, None)
+            if data is None:
+                return
+            self._selector.register(fd, selectors.EVENT_READ, data)
+        os.write(self._wake_w, b'\0')
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                selector = self._selector
+            for key, _ in selector.select():
+                if key.data is None:
+                    try:
+                        os.read(self._wake_r, 4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                stream, sinks, on_eof, writers = key.data
+                try:
+                    data = os.read(key.fd, READ_SIZE)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    data = b''
+                if data:
+                    _dispatch(sinks, data)
+                    writer = _full_writer(writers)
+                    if writer:
+                        self._pause(key.fd, key.data, writer)
+                else:
+                    with self._lock:
+                        selector.unregister(key.fd)
+                    stream.close()
+                    on_eof()
+
+    @staticmethod
+    def _read_blocking(stream, sinks, on_eof, writers):
+        read = getattr(stream, 'read1', stream.read)
+        while True:
+            data = read(READ_SIZE)
+            if not data:
+                break
+            _dispatch(sinks, data)
+            writer = _full_writer(writers)
+            if writer:
+                space = threading.Event()
+                writer.on_space(space.set)
+                space.wait()
+        stream.close()
+        on_eof()
+
+_reactor = _PipeReactor()
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _dispatch(sinks, data):
+    if stats.enabled:
+        stats.count('output_reads')
+        stats.count('output_bytes', len(data))
+    for sink in sinks:
+        try:
+            sink(data)
+        except Exception:
+            pass
+
+
+class OutputCapture:
+    """
+    Pipe-based output capture for one app. stdout and stderr go through
+    pipes to a shared reactor thread, then to the app's RotatingOutputWriter
+    and to any extra sinks (callables taking bytes). The writer lives for
+    the whole supervision, across restarts. While a combined log is
+    configured, each stream is also framed into lines tagged with the app,
+    stream and PID for it (see combined_log.py). With a "tail_buffer", the
+    latest bytes of each stream are also kept in shared memory rings (see
+    tail_buffer.py), which crash_report() quotes from.
+    """
+    def __init__(self, proc_config, sinks=None):
+        self.name = proc_config.get('name', '')
+        self.writer = None
+        if proc_config.get('output'):
+            self.writer = RotatingOutputWriter(
+                proc_config['output'],
+                max_bytes=proc_config.get('output_max_bytes', 0),
+                rotate_seconds=proc_config.get('output_rotate_seconds', 0),
+                backups=proc_config.get('output_backups', 5),
+                compress=proc_config.get('output_compress', False),
+                drop_on_overflow=proc_config.get('output_overflow') == 'drop',
+            )
+        self.sinks = list(sinks or [])
+        if self.writer:
+            self.sinks.insert(0, self.writer.write)
+        self.combined = proc_config.get('combined_log', True) is not False
+        size = tail_buffers.size_for(proc_config)
+        self.rings = tail_buffers.rings(self.name, size) if size > 0 else {}
+        self.report_lines = proc_config.get('crash_report_lines', CRASH_REPORT_LINES)
+        self._run_start = {} # stream -> ring position when the current run started
+        self._open_streams = [0] # Streams of the current run not at EOF yet; each run counts its own
+        self._drained = threading.Condition()
+
+    @staticmethod
+    def wanted(proc_config):
+        """True if the app asked for pipe capture, rotation or a tail buffer, or its output goes to the combined log."""
+        return bool(proc_config.get('capture_output') or proc_config.get('output_max_bytes')
+                    or proc_config.get('output_rotate_seconds') or tail_buffers.size_for(proc_config) > 0
+                    or (combined_log.shared_log and proc_config.get('combined_log', True) is not False))
+
+    def popen_kwargs(self):
+        return {'stdout': subprocess.PIPE, 'stderr': subprocess.PIPE}
+
+    def stream_sinks(self, stream_name, pid):
+        """The sinks for one stream of a freshly spawned child, and what to call at its EOF."""
+        sinks, flush = self.sinks, None
+        ring = self.rings.get(stream_name)
+        if ring:
+            self._run_start[stream_name] = ring.position
+            sinks = sinks + [lambda data: ring.write(data, pid)]
+        if self.combined and combined_log.shared_log:
+            framer = combined_log.LineFramer(self.name, stream_name, pid)
+            sinks, flush = sinks + [framer.feed], framer.close
+        return sinks, flush
+
+    def crash_report(self):
+        """Log messages quoting the last output of the run that just failed ([] without a tail buffer)."""
+        return crash_report(self.name, self.rings, self._run_start, self.report_lines)
+
+    def writers(self):
+        """The writers whose backlog pauses this app's pipes when full."""
+        if self.combined and combined_log.shared_log:
+            return (self.writer, combined_log.shared_log)
+        return (self.writer,)
+
+    def attach(self, process):
+        """Starts pumping a freshly spawned Popen's stdout and stderr."""
+        streams = [(s, n) for s, n in ((process.stdout, 'stdout'), (process.stderr, 'stderr')) if s is not None]
+        run = [len(streams)]
+        with self._drained:
+            self._open_streams = run
+        for stream, stream_name in streams:
+            sinks, flush = self.stream_sinks(stream_name, process.pid)
+            _reactor.add(stream, sinks, self._eof_handler(run, flush), self.writers)
+
+    def _eof_handler(self, run, flush):
+        def on_eof():
+            if flush:
+                flush()
+            with self._drained:
+                run[0] -= 1 # Counted against its own run, even after drain() gave up on it
+                self._drained.notify_all()
+        return on_eof
+
+    def drain(self, timeout=2.0):
+        """
+        Waits briefly for the current run's pipes to hit EOF after the child
+        exits; returns False if they are still open. A forked grandchild may
+        hold them open, so don't wait forever. Streams still open are not
+        counted against the next run.
+        """
+        with self._drained:
+            run = self._open_streams
+            return self._drained.wait_for(lambda: run[0] <= 0, timeout)
+
+    async def pump_async(self, stream, stream_name='stdout', pid=None):
+        """asyncio equivalent of attach() for one StreamReader (used by the engine)."""
+        sinks, flush = self.stream_sinks(stream_name, pid)
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                data = await stream.read(READ_SIZE)
+                if not data:
+                    return
+                _dispatch(sinks, data)
+                writer = _full_writer(self.writers)
+                if writer:
+                    # Stop reading this pipe, not the loop, until the disk catches up.
+                    space = loop.create_future()
+                    writer.on_space(lambda: loop.call_soon_threadsafe(_resolve, space))
+                    await space
+        finally:
+            if flush:
+                flush()
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
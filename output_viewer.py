@@ -0,0 +1,403 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton, QTableView, QListWidget,
+    QListWidgetItem, QLineEdit, QCheckBox, QSplitter, QAbstractItemView, QHeaderView, QPlainTextEdit
+)
+from PySide6.QtGui import QFontDatabase
+from PySide6.QtCore import Qt, QObject, QAbstractListModel, QModelIndex, QTimer, Signal, Slot
+
+from log_index import LogIndex, CHUNK
+from metrics import format_bytes
+from tail_buffer import RingFollower, open_rings
+
+BLOCK = 256          # Lines fetched (and cached) together for the view
+CACHED_BLOCKS = 64
+MAX_LINE_CHARS = 4000
+FOLLOW_INTERVAL = 0.5
+INDEX_STEP = 8 * CHUNK # Bytes indexed per refresh, so the view never waits long for the index lock
+TAIL_INTERVAL_MS = 250
+TAIL_MAX_LINES = 20000
+
+
+class LineModel(QAbstractListModel):
+    """Rows are the lines of a LogIndex, read a block at a time as the view scrolls."""
+    def __init__(self, log, parent=None):
+        super().__init__(parent)
+        self.log = log # Not "index": that would hide QAbstractItemModel.index()
+        self.rows = 0
+        self.blocks = OrderedDict() # block number -> lines
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.rows
+
+    def line(self, row):
+        block = row // BLOCK
+        lines = self.blocks.get(block)
+        if lines is None:
+            lines = self.blocks[block] = self.log.lines(block * BLOCK, BLOCK)
+            if len(self.blocks) > CACHED_BLOCKS:
+                self.blocks.popitem(last=False)
+        else:
+            self.blocks.move_to_end(block)
+        offset = row - block * BLOCK
+        return lines[offset] if offset < len(lines) else ""
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        return self.line(index.row())[:MAX_LINE_CHARS]
+
+    def grow(self, rows, reset):
+        if reset or rows < self.rows:
+            self.beginResetModel()
+            self.blocks.clear()
+            self.rows = rows
+            self.endResetModel()
+        elif rows > self.rows:
+            self.blocks.pop(self.rows // BLOCK, None) # It was read while still filling up
+            self.beginInsertRows(QModelIndex(), self.rows, rows - 1)
+            self.rows = rows
+            self.endInsertRows()
+
+
+class IndexWorker(QObject):
+    """Indexes a file on a background thread, then follows it as it grows (tail -f)."""
+    grown = Signal(int, int) # generation, line count
+
+    def __init__(self, index):
+        super().__init__()
+        self.index = index
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="OutputIndex", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            changed = self.index.refresh(INDEX_STEP)
+            if changed:
+                self.grown.emit(self.index.generation, self.index.line_count)
+            if self.index.complete:
+                self._stop.wait(FOLLOW_INTERVAL)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(5)
+
+
+class SearchWorker(QObject):
+    """Runs LogIndex.search() on a background thread, delivering matches in batches."""
+    found = Signal(object)  # [(line, text), ...]
+    progress = Signal(int)  # bytes searched
+    finished = Signal(bool) # False if cancelled
+
+    def __init__(self, index, pattern, ignore_case):
+        super().__init__()
+        self.index = index
+        self.pattern = pattern
+        self.ignore_case = ignore_case
+        self.cancelled = False
+
+    def start(self):
+        threading.Thread(target=self._run, name="OutputSearch", daemon=True).start()
+
+    def _run(self):
+        batch = []
+        for line, value in self.index.search(self.pattern, ignore_case=self.ignore_case,
+                                              cancelled=lambda: self.cancelled):
+            if line is None:
+                if batch:
+                    self.found.emit(batch)
+                    batch = []
+                self.progress.emit(value)
+            else:
+                batch.append((line, value))
+        if batch:
+            self.found.emit(batch)
+        self.finished.emit(not self.cancelled)
+
+
+class OutputViewer(QDialog):
+    """
+    Browses an app's output file, however large: the file is memory-mapped
+    and indexed in the background, the view only reads the lines on
+    screen, "Go to line" jumps straight to any line, Follow keeps the newest
+    lines in view, and searches stream their matches as they are found.
+    `paths` maps instance names to their output files.
+    """
+    def __init__(self, paths, parent=None):
+        super().__init__(parent)
+        self.paths = paths
+        self.index = self.model = self.indexer = self.search = None
+        self.setWindowTitle("Output")
+        self.resize(1000, 700)
+        layout = QVBoxLayout(self)
+
+        top_layout = QHBoxLayout()
+        self.file_combo = QComboBox()
+        self.file_combo.addItems(list(paths))
+        self.line_edit = QLineEdit()
+        self.line_edit.setPlaceholderText("line")
+        self.line_edit.setMaximumWidth(120)
+        go_button = QPushButton("Go to Line")
+        self.follow_check = QCheckBox("Follow")
+        self.follow_check.setChecked(True)
+        top_layout.addWidget(QLabel("Instance:"))
+        top_layout.addWidget(self.file_combo)
+        top_layout.addStretch()
+        for widget in (self.line_edit, go_button, self.follow_check):
+            top_layout.addWidget(widget)
+        layout.addLayout(top_layout)
+
+        search_layout = QHBoxLayout()
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Regular expression")
+        self.ignore_case_check = QCheckBox("Ignore case")
+        self.search_button = QPushButton("Search")
+        for widget in (QLabel("Search:"), self.search_edit, self.ignore_case_check, self.search_button):
+            search_layout.addWidget(widget)
+        layout.addLayout(search_layout)
+
+        font = QFontDatabase.systemFont(QFontDatabase.FixedFont)
+        splitter = QSplitter(Qt.Vertical)
+        # A table with fixed row heights never measures rows, however many
+        # millions there are; its row header shows the line numbers.
+        self.view = QTableView()
+        self.view.setFont(font)
+        self.view.setShowGrid(False)
+        self.view.setWordWrap(False)
+        self.view.horizontalHeader().hide()
+        self.view.horizontalHeader().setStretchLastSection(True)
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.view.verticalHeader().setDefaultSectionSize(self.view.fontMetrics().height() + 2)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.view.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+        self.results = QListWidget()
+        self.results.setFont(font)
+        self.results.setUniformItemSizes(True)
+        splitter.addWidget(self.view)
+        splitter.addWidget(self.results)
+        splitter.setSizes([500, 150])
+        layout.addWidget(splitter)
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        self.file_combo.currentTextChanged.connect(self.open_file)
+        go_button.clicked.connect(self.go_to_line)
+        self.line_edit.returnPressed.connect(self.go_to_line)
+        self.search_edit.returnPressed.connect(self.toggle_search)
+        self.search_button.clicked.connect(self.toggle_search)
+        self.follow_check.toggled.connect(lambda on: on and self.view.scrollToBottom())
+        self.results.itemActivated.connect(lambda item: self.scroll_to(item.data(Qt.UserRole)))
+        self.open_file(self.file_combo.currentText())
+
+    @Slot(str)
+    def open_file(self, name):
+        self.close_file()
+        if not name:
+            return
+        self.setWindowTitle(f"Output - {name}")
+        self.index = LogIndex(self.paths[name])
+        self.model = LineModel(self.index, self)
+        self.view.setModel(self.model)
+        self.indexer = IndexWorker(self.index)
+        self.indexer.grown.connect(self.on_grown)
+        self.generation = None
+        self.indexer.start()
+        self.update_status()
+
+    def close_file(self):
+        self.cancel_search()
+        if self.indexer:
+            self.indexer.stop()
+        if self.index:
+            self.index.close()
+        self.index = self.model = self.indexer = None
+
+    @Slot(int, int)
+    def on_grown(self, generation, lines):
+        if not self.model or self.sender() is not self.indexer:
+            return
+        self.model.grow(lines, reset=generation != self.generation)
+        self.generation = generation
+        if self.follow_check.isChecked():
+            self.view.scrollToBottom()
+        self.update_status()
+
+    def _on_scrolled(self, value):
+        # Scrolling up stops following; scrolling back to the end resumes it.
+        bar = self.view.verticalScrollBar()
+        if self.follow_check.isChecked() != (value == bar.maximum()):
+            self.follow_check.blockSignals(True)
+            self.follow_check.setChecked(value == bar.maximum())
+            self.follow_check.blockSignals(False)
+
+    def update_status(self):
+        if not self.index:
+            return
+        path = self.index.path
+        if not os.path.exists(path):
+            self.status_label.setText(f"{path} does not exist yet.")
+            return
+        text = f"{path}: {self.model.rows:,} lines, {format_bytes(self.index.size)}"
+        if not self.index.complete:
+            text += f" (indexing, {self.index.indexed * 100 // max(1, self.index.size)}%)"
+        self.status_label.setText(text)
+
+    def scroll_to(self, line):
+        if self.model and 0 <= line < self.model.rows:
+            self.follow_check.setChecked(False)
+            index = self.model.index(line)
+            self.view.scrollTo(index, QAbstractItemView.PositionAtCenter)
+            self.view.setCurrentIndex(index)
+
+    @Slot()
+    def go_to_line(self):
+        try:
+            self.scroll_to(int(self.line_edit.text()) - 1)
+        except ValueError:
+            pass
+
+    @Slot()
+    def toggle_search(self):
+        if self.search:
+            self.cancel_search()
+            return
+        pattern = self.search_edit.text()
+        if not pattern or not self.index:
+            return
+        try:
+            re.compile(pattern.encode('utf-8'))
+        except re.error as e:
+            self.status_label.setText(f"Invalid pattern: {e}")
+            return
+        self.results.clear()
+        self.search = SearchWorker(self.index, pattern, self.ignore_case_check.isChecked())
+        self.search.found.connect(self.on_found)
+        self.search.progress.connect(self.on_search_progress)
+        self.search.finished.connect(self.on_search_finished)
+        self.search_button.setText("Stop")
+        self.search.start()
+
+    def cancel_search(self):
+        if self.search:
+            self.search.cancelled = True
+            self.search = None
+            self.search_button.setText("Search")
+
+    @Slot(object)
+    def on_found(self, matches):
+        if self.sender() is not self.search:
+            return
+        for line, text in matches:
+            item = QListWidgetItem(f"{line + 1:>9}  {text[:MAX_LINE_CHARS]}")
+            item.setData(Qt.UserRole, line)
+            self.results.addItem(item)
+
+    @Slot(int)
+    def on_search_progress(self, searched):
+        if self.sender() is self.search and self.index:
+            percent = searched * 100 // max(1, self.index.indexed)
+            self.status_label.setText(f"Searching... {percent}%, {self.results.count():,} matching lines")
+
+    @Slot(bool)
+    def on_search_finished(self, completed):
+        if self.sender() is not self.search:
+            return
+        self.search = None
+        self.search_button.setText("Search")
+        if completed:
+            self.status_label.setText(f"{self.results.count():,} matching lines.")
+
+    def done(self, result):
+        self.close_file()
+        super().done(result)
+
+
+class TailViewer(QDialog):
+    """
+    Shows what an app's instances are printing, straight from their tail
+    buffers in shared memory, so it works for apps without an output file
+    too. It polls the chosen ring a few times a second and only copies out
+    the bytes written since the last poll. `paths` maps instance names to
+    {stream: ring file}.
+    """
+    def __init__(self, paths, parent=None):
+        super().__init__(parent)
+        self.rings = {name: open_rings(streams) for name, streams in paths.items()}
+        self.follower = None
+        self.setWindowTitle("Live Output")
+        self.resize(900, 600)
+        layout = QVBoxLayout(self)
+
+        top_layout = QHBoxLayout()
+        self.instance_combo = QComboBox()
+        self.instance_combo.addItems(list(self.rings))
+        self.stream_combo = QComboBox()
+        self.stream_combo.addItems(['stdout', 'stderr'])
+        self.follow_check = QCheckBox("Follow")
+        self.follow_check.setChecked(True)
+        for widget in (QLabel("Instance:"), self.instance_combo, QLabel("Stream:"), self.stream_combo):
+            top_layout.addWidget(widget)
+        top_layout.addStretch()
+        top_layout.addWidget(self.follow_check)
+        layout.addLayout(top_layout)
+
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.text.setMaximumBlockCount(TAIL_MAX_LINES)
+        self.text.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        layout.addWidget(self.text)
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        self.instance_combo.currentTextChanged.connect(self.select)
+        self.stream_combo.currentTextChanged.connect(self.select)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.poll)
+        self.timer.start(TAIL_INTERVAL_MS)
+        self.select()
+
+    @Slot()
+    def select(self):
+        name, stream = self.instance_combo.currentText(), self.stream_combo.currentText()
+        ring = self.rings.get(name, {}).get(stream)
+        self.setWindowTitle(f"Live Output - {name} ({stream})")
+        self.text.clear()
+        self.follower = RingFollower(ring) if ring else None
+        if not ring:
+            self.status_label.setText(f"{name} has no {stream} buffer.")
+        self.poll()
+
+    @Slot()
+    def poll(self):
+        if not self.follower:
+            return
+        text = self.follower.poll()
+        if text:
+            bar = self.text.verticalScrollBar()
+            position = bar.value()
+            cursor = self.text.textCursor()
+            cursor.movePosition(cursor.MoveOperation.End)
+            cursor.insertText(text)
+            if self.follow_check.isChecked():
+                bar.setValue(bar.maximum())
+            else:
+                bar.setValue(position)
+        ring = self.follower.ring
+        position, pid, _ = ring.info()
+        self.status_label.setText(f"Last {format_bytes(min(position, ring.capacity))} of {format_bytes(position)} written"
+                                  + (f" (PID {pid})" if pid else ""))
+
+    def done(self, result):
+        self.timer.stop()
+        for rings in self.rings.values():
+            for ring in rings.values():
+                ring.close()
+        super().done(result)
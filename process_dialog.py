@@ -1,7 +1,10 @@
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QFormLayout, QLineEdit, 
-    QCheckBox, QDialogButtonBox, QPushButton
+    QCheckBox, QDialogButtonBox, QPushButton, QMessageBox
 )
+from resource_limits import parse_size, parse_cpu
+from startup_planner import dependencies
+from shutdown import stop_signal
 
 class ProcessDialog(QDialog):
     """A dialog for adding or editing a single process configuration."""
@@ -18,12 +21,30 @@ class ProcessDialog(QDialog):
         self.output_edit = QLineEdit()
         self.restart_check = QCheckBox()
         self.restart_on_failure_check = QCheckBox()
+        self.memory_max_edit = QLineEdit()
+        self.memory_max_edit.setPlaceholderText("e.g. 512M (blank = unlimited)")
+        self.cpu_quota_edit = QLineEdit()
+        self.cpu_quota_edit.setPlaceholderText("cores, e.g. 0.5 or 50% (blank = unlimited)")
+        self.pids_max_edit = QLineEdit()
+        self.pids_max_edit.setPlaceholderText("max processes (blank = unlimited)")
+        self.depends_on_edit = QLineEdit()
+        self.depends_on_edit.setPlaceholderText("app names, comma-separated")
+        self.stop_signal_edit = QLineEdit()
+        self.stop_signal_edit.setPlaceholderText("TERM (default), INT, QUIT, HUP...")
+        self.stop_timeout_edit = QLineEdit()
+        self.stop_timeout_edit.setPlaceholderText("seconds before SIGKILL (blank = shutdown_timeout)")
 
         form_layout.addRow("Name:", self.name_edit)
         form_layout.addRow("Command:", self.command_edit)
         form_layout.addRow("Output Log:", self.output_edit)
         form_layout.addRow("Always Restart:", self.restart_check)
         form_layout.addRow("Restart on Failure:", self.restart_on_failure_check)
+        form_layout.addRow("Memory Limit:", self.memory_max_edit)
+        form_layout.addRow("CPU Quota:", self.cpu_quota_edit)
+        form_layout.addRow("Process Limit:", self.pids_max_edit)
+        form_layout.addRow("Depends On:", self.depends_on_edit)
+        form_layout.addRow("Stop Signal:", self.stop_signal_edit)
+        form_layout.addRow("Stop Timeout:", self.stop_timeout_edit)
         
         self.layout.addLayout(form_layout)
 
@@ -33,6 +54,9 @@ class ProcessDialog(QDialog):
         self.button_box.rejected.connect(self.reject)
         self.layout.addWidget(self.button_box)
 
+        # Keys the form doesn't show are carried over unchanged in get_data()
+        self.process_config = process_config or {}
+
         # Populate form if editing an existing process
         if process_config:
             self.name_edit.setText(process_config.get("name", ""))
@@ -40,13 +64,60 @@ class ProcessDialog(QDialog):
             self.output_edit.setText(process_config.get("output", ""))
             self.restart_check.setChecked(process_config.get("restart", False))
             self.restart_on_failure_check.setChecked(process_config.get("restart_on_failure", False))
+            self.memory_max_edit.setText(str(process_config.get("memory_max", "")))
+            self.cpu_quota_edit.setText(str(process_config.get("cpu_quota", "")))
+            self.pids_max_edit.setText(str(process_config.get("pids_max", "")))
+            self.depends_on_edit.setText(', '.join(dependencies(process_config)))
+            self.stop_signal_edit.setText(str(process_config.get("stop_signal", "")))
+            self.stop_timeout_edit.setText(str(process_config.get("stop_timeout", "")))
+
+    def accept(self):
+        try:
+            parse_size(self.memory_max_edit.text())
+            parse_cpu(self.cpu_quota_edit.text())
+            if self.pids_max_edit.text().strip(): int(self.pids_max_edit.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid Limit", f"Please correct the resource limits: {e}")
+            return
+        try:
+            stop_signal({"stop_signal": self.stop_signal_edit.text().strip()})
+            if self.stop_timeout_edit.text().strip(): float(self.stop_timeout_edit.text())
+        except (KeyError, ValueError) as e:
+            QMessageBox.warning(self, "Invalid Stop Setting", f"Please correct the stop signal or timeout: {e}")
+            return
+        super().accept()
 
     def get_data(self):
         """Returns the process configuration as a dictionary."""
-        return {
+        data = dict(self.process_config)
+        data.update({
             "name": self.name_edit.text(),
             "command": self.command_edit.text().split(),
             "output": self.output_edit.text(),
             "restart": self.restart_check.isChecked(),
             "restart_on_failure": self.restart_on_failure_check.isChecked()
+        })
+        limits = {
+            "memory_max": self.memory_max_edit.text().strip(),
+            "cpu_quota": self.cpu_quota_edit.text().strip(),
+            "pids_max": self.pids_max_edit.text().strip(),
+            "stop_signal": self.stop_signal_edit.text().strip(),
+            "stop_timeout": self.stop_timeout_edit.text().strip(),
         }
+        depends_on = [name.strip() for name in self.depends_on_edit.text().split(',') if name.strip()]
+        if depends_on:
+            data["depends_on"] = depends_on
+        else:
+            data.pop("depends_on", None)
+        for key, value in limits.items():
+            if not value:
+                data.pop(key, None)
+            elif key == "pids_max":
+                data[key] = int(value)
+            elif key == "stop_timeout":
+                data[key] = float(value)
+            elif key == "cpu_quota" and not value.endswith('%'):
+                data[key] = float(value)
+            else:
+                data[key] = value
+        return data
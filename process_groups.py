@@ -0,0 +1,102 @@
+import re
+
+from job_scheduler import JOB_STATUSES
+
+_TOKEN_RE = re.compile(r"\{(\w+)(?:\s*\+\s*(\w+))?\}")
+
+
+def instance_count(app_config):
+    """How many instances an app entry asks for ("instances", or supervisord-style "numprocs")."""
+    return max(1, int(app_config.get('instances', app_config.get('numprocs', 1))))
+
+
+def render(template, variables):
+    """
+    Substitutes {name} and {a+b} tokens from variables. Tokens that refer to
+    unknown names are left alone, so commands that contain braces survive.
+    """
+    def substitute(match):
+        first, second = match.group(1), match.group(2)
+        if first not in variables or (second and second not in variables):
+            return match.group(0)
+        value = variables[first] + (variables[second] if second else 0)
+        return str(value)
+    return _TOKEN_RE.sub(substitute, template)
+
+
+def instance_name(group, index):
+    return f"{group}:{index}"
+
+
+def expand_app(app_config, count=None):
+    """
+    Expands one app entry into the configs of its instances. Single-instance
+    apps are returned as-is. Instances are named "<name>:<n>" and get
+    {instance}, {port} and {port_base+instance} substituted in command,
+    output, listen, ready_port and health_check, where port = port_base + instance.
+    """
+    count = instance_count(app_config) if count is None else count
+    if count == 1 and 'instances' not in app_config and 'numprocs' not in app_config:
+        return [app_config]
+    port_base = int(app_config.get('port_base', 0))
+    instances = []
+    for index in range(count):
+        variables = {'instance': index, 'port_base': port_base, 'port': port_base + index}
+        config = dict(app_config)
+        config['name'] = instance_name(app_config['name'], index)
+        config['group'] = app_config['name']
+        config['instance'] = index
+        config['command'] = [render(arg, variables) for arg in app_config['command']]
+        if config.get('output'):
+            config['output'] = render(config['output'], variables)
+        if config.get('listen'):
+            entries = config['listen'] if isinstance(config['listen'], list) else [config['listen']]
+            config['listen'] = [dict(entry, address=render(str(entry['address']), variables)) if isinstance(entry, dict)
+                                else render(str(entry), variables) for entry in entries]
+        if isinstance(config.get('ready_port'), str):
+            config['ready_port'] = int(render(config['ready_port'], variables))
+        if config.get('health_check'):
+            config['health_check'] = {key: render(value, variables) if isinstance(value, str) else value
+                                      for key, value in config['health_check'].items()}
+        config.pop('instances', None)
+        config.pop('numprocs', None)
+        instances.append(config)
+    return instances
+
+
+def expand_apps(app_configs):
+    """Flattens a config's apps into one entry per supervised instance."""
+    return [instance for app in app_configs for instance in expand_app(app)]
+
+
+def group_status(statuses):
+    """
+    Aggregate status of a group from its instances' statuses. A lone
+    instance reports its own status unchanged.
+    """
+    if len(statuses) == 1:
+        return statuses[0]
+    running = sum(1 for status in statuses if status.startswith("RUNNING"))
+    total = len(statuses)
+    if running == total:
+        return f"RUNNING ({running}/{total})"
+    if any(status.startswith(JOB_STATUSES) for status in statuses):
+        return f"SCHEDULED ({running}/{total} running)"
+    if running:
+        return f"DEGRADED ({running}/{total})"
+    if any(status.startswith("ERROR") for status in statuses):
+        return f"ERROR (0/{total})"
+    return f"STOPPED (0/{total})"
+
+
+def aggregate_metrics(snapshot, group_of):
+    """Sums per-instance metric samples into per-group totals."""
+    totals = {}
+    for name, sample in snapshot.items():
+        group = group_of.get(name, name)
+        if group not in totals:
+            totals[group] = dict(sample)
+        else:
+            for key, value in sample.items():
+                totals[group][key] += value
+    return totals
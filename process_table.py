@@ -0,0 +1,198 @@
+from PySide6.QtWidgets import QStyledItemDelegate, QStyleOptionButton, QStyle, QApplication
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer, QRect, QSize, QEvent, Signal
+from metrics import format_bytes
+
+(NAME_COLUMN, STATUS_COLUMN, CPU_COLUMN, MEMORY_COLUMN, FDS_COLUMN, THREADS_COLUMN,
+ COMMAND_COLUMN, ACTIONS_COLUMN) = range(8)
+HEADERS = ["Name", "Status", "CPU %", "Memory", "FDs", "Threads", "Command", "Actions"]
+METRIC_COLUMNS = {CPU_COLUMN: 'cpu', MEMORY_COLUMN: 'rss', FDS_COLUMN: 'fds', THREADS_COLUMN: 'threads'}
+
+
+class ProcessTableModel(QAbstractTableModel):
+    """
+    Table model for the main window's process list. Rows are looked up by
+    name through a dict, and status updates are collected and published on
+    a short timer as a few contiguous dataChanged ranges, so a storm of
+    status signals costs one repaint rather than one per signal.
+    """
+    def __init__(self, parent=None, coalesce_ms=50):
+        super().__init__(parent)
+        self.rows = []          # [{'name', 'status', 'command', 'metrics', 'orphans'}]
+        self.row_of = {}        # name -> row index
+        self.pending = set()    # rows with unpublished changes
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(coalesce_ms)
+        self.flush_timer.timeout.connect(self.flush)
+
+    @staticmethod
+    def _new_row(app_config):
+        return {
+            'name': app_config['name'],
+            'status': "STOPPED",
+            'command': ' '.join(app_config['command']),
+            'metrics': None,
+            'orphans': [],
+        }
+
+    def set_apps(self, app_configs):
+        self.beginResetModel()
+        self.rows = [self._new_row(app) for app in app_configs]
+        self.row_of = {row['name']: i for i, row in enumerate(self.rows)}
+        self.pending.clear()
+        self.endResetModel()
+
+    def add_app(self, app_config):
+        row = len(self.rows)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.rows.append(self._new_row(app_config))
+        self.row_of[app_config['name']] = row
+        self.endInsertRows()
+
+    def remove_app(self, name):
+        row = self.row_of.pop(name, None)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.rows[row]
+        for i in range(row, len(self.rows)):
+            self.row_of[self.rows[i]['name']] = i
+        self.pending = {r - 1 if r > row else r for r in self.pending if r != row}
+        self.endRemoveRows()
+
+    def update_app(self, app_config):
+        """Refreshes the command shown for an existing row, keeping its status."""
+        row = self.row_of.get(app_config['name'])
+        if row is None:
+            return
+        self.rows[row]['command'] = ' '.join(app_config['command'])
+        self.pending.add(row)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def name_at(self, row):
+        return self.rows[row]['name']
+
+    def status_of(self, name):
+        row = self.row_of.get(name)
+        return None if row is None else self.rows[row]['status']
+
+    def update_status(self, name, status):
+        row = self.row_of.get(name)
+        if row is None or self.rows[row]['status'] == status:
+            return
+        self.rows[row]['status'] = status
+        self.pending.add(row)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def update_metrics(self, snapshot):
+        """Applies a MetricsSampler snapshot; apps missing from it show blank metrics."""
+        if not self.rows:
+            return
+        for row in self.rows:
+            row['metrics'] = snapshot.get(row['name'])
+        # One range covers every metric cell, whatever changed.
+        self.dataChanged.emit(self.index(0, CPU_COLUMN), self.index(len(self.rows) - 1, THREADS_COLUMN), [Qt.DisplayRole])
+
+    def update_orphans(self, orphans_by_name):
+        """Shows each app's orphaned processes ({name: [orphan, ...]}) next to its status."""
+        for row, entry in enumerate(self.rows):
+            orphans = orphans_by_name.get(entry['name'], [])
+            if orphans != entry['orphans']:
+                entry['orphans'] = orphans
+                self.pending.add(row)
+        if self.pending and not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        """Publishes pending changes as contiguous dataChanged ranges."""
+        if not self.pending:
+            return
+        rows = sorted(self.pending)
+        self.pending.clear()
+        first = previous = rows[0]
+        for row in rows[1:] + [None]:
+            if row is not None and row == previous + 1:
+                previous = row
+                continue
+            self.dataChanged.emit(self.index(first, 0), self.index(previous, self.columnCount() - 1), [Qt.DisplayRole])
+            if row is not None:
+                first = previous = row
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        row = self.rows[index.row()]
+        column = index.column()
+        if column == NAME_COLUMN: return row['name']
+        if column == STATUS_COLUMN:
+            orphans = row['orphans']
+            if not orphans: return row['status']
+            if role == Qt.ToolTipRole:
+                return "Orphaned processes:\n" + "\n".join(f"PID {o['pid']}: {o['command']}" for o in orphans)
+            return f"{row['status']} +{len(orphans)} orphaned"
+        if column == COMMAND_COLUMN: return row['command']
+        if column in METRIC_COLUMNS:
+            metrics = row['metrics']
+            if metrics is None: return ""
+            value = metrics[METRIC_COLUMNS[column]]
+            if column == CPU_COLUMN: return f"{value:.1f}"
+            if column == MEMORY_COLUMN: return format_bytes(value)
+            return str(int(value))
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return None
+
+
+class ActionsDelegate(QStyledItemDelegate):
+    """
+    Paints per-row action buttons instead of creating real button widgets
+    for every row, and turns clicks on them into action_requested(name, action).
+    """
+    action_requested = Signal(str, str)
+
+    def __init__(self, parent=None, actions=("Start", "Stop")):
+        super().__init__(parent)
+        self.actions = list(actions)
+        self.button_width = 56
+        self.spacing = 4
+
+    def _button_rects(self, rect):
+        height = rect.height() - 4
+        x = rect.x() + self.spacing
+        for action in self.actions:
+            yield action, QRect(x, rect.y() + 2, self.button_width, height)
+            x += self.button_width + self.spacing
+
+    def paint(self, painter, option, index):
+        style = option.widget.style() if option.widget else QApplication.style()
+        for action, rect in self._button_rects(option.rect):
+            button = QStyleOptionButton()
+            button.rect = rect
+            button.text = action
+            button.state = QStyle.State_Enabled | QStyle.State_Raised
+            style.drawControl(QStyle.CE_PushButton, button, painter)
+
+    def preferred_width(self):
+        return len(self.actions) * (self.button_width + self.spacing) + self.spacing
+
+    def sizeHint(self, option, index):
+        return QSize(self.preferred_width(), 28)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            for action, rect in self._button_rects(option.rect):
+                if rect.contains(event.position().toPoint()):
+                    self.action_requested.emit(model.name_at(index.row()), action)
+                    return True
+        return super().editorEvent(event, model, option, index)
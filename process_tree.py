@@ -0,0 +1,394 @@
+import os
+import signal
+import sys
+import threading
+import time
+
+PR_SET_CHILD_SUBREAPER = 36
+REAP_INTERVAL = 1.0   # Seconds between the reaper's looks at the supervisor's children
+LEFTOVER_GRACE = 2.0  # Seconds an exited app's leftover processes get before SIGKILL
+SNAPSHOT_MAX_AGE = 0.2
+MAX_SESSIONS = 10000
+KILL = getattr(signal, 'SIGKILL', signal.SIGTERM)
+TAG = 'PYSUPERVISOR_APP' # Set in every app's environment, and inherited by its descendants
+
+
+def become_subreaper():
+    """
+    Makes this process the reaper of its orphaned descendants (Linux
+    PR_SET_CHILD_SUBREAPER): processes whose parent exits are re-parented
+    to the supervisor instead of init. Returns False where unsupported.
+    """
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        import ctypes
+        return ctypes.CDLL(None, use_errno=True).prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+def _stat(pid):
+    """(state, ppid, pgid, sid) of a process from /proc, or None if it is gone."""
+    try:
+        with open(f"/proc/{pid}/stat", 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    fields = data[data.rindex(b')') + 2:].split(None, 4) # The command in (...) may contain spaces
+    return fields[0].decode(), int(fields[1]), int(fields[2]), int(fields[3])
+
+
+def process_command(pid):
+    """A process's command line (its name for zombies), or '' if it is gone."""
+    try:
+        with open(f"/proc/{pid}/cmdline", 'rb') as f:
+            command = f.read().replace(b'\0', b' ').decode('utf-8', 'replace').strip()
+        if not command:
+            with open(f"/proc/{pid}/comm") as f:
+                command = f"[{f.read().strip()}]"
+        return command
+    except OSError:
+        return ''
+
+
+_snapshot = (0.0, {})
+_snapshot_lock = threading.Lock()
+
+
+def _processes():
+    """
+    {pid: (state, ppid, pgid, sid)} of every process, from /proc (empty
+    elsewhere). Cached for SNAPSHOT_MAX_AGE, so stopping many apps at once
+    scans /proc once instead of once per app.
+    """
+    global _snapshot
+    with _snapshot_lock:
+        taken, table = _snapshot
+        if time.monotonic() - taken > SNAPSHOT_MAX_AGE:
+            table = {}
+            try:
+                names = os.listdir('/proc')
+            except OSError:
+                names = []
+            for name in names:
+                if name.isdigit():
+                    stat = _stat(name)
+                    if stat:
+                        table[int(name)] = stat
+            _snapshot = (time.monotonic(), table)
+        return table
+
+
+def _children():
+    """PIDs of this process's children, from /proc/self/task/*/children, or None if unavailable."""
+    pids, readable = set(), False
+    try:
+        tasks = os.listdir('/proc/self/task')
+    except OSError:
+        return None
+    for task in tasks:
+        try:
+            with open(f"/proc/self/task/{task}/children") as f:
+                pids.update(map(int, f.read().split()))
+            readable = True
+        except OSError:
+            pass # The thread exited, or the kernel lacks CONFIG_PROC_CHILDREN
+    return pids if readable else None
+
+
+def tagged_env(name, env=None):
+    """The environment to start an app with: `env` (or ours) plus its TAG."""
+    return dict(env if env is not None else os.environ, **{TAG: name})
+
+
+def _tag(pid):
+    """The app named in a process's TAG, or None."""
+    try:
+        with open(f"/proc/{pid}/environ", 'rb') as f:
+            environ = f.read()
+    except OSError:
+        return None
+    start = environ.find(b'\0' + TAG.encode() + b'=')
+    if start < 0:
+        return None
+    start += len(TAG) + 2
+    return environ[start:environ.find(b'\0', start)].decode('utf-8', 'replace')
+
+
+def _exists(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+class ProcessTree:
+    """
+    Every process of one run of an app. Apps are started with
+    start_new_session and a tagged_env(), so the child leads a session and
+    process group that everything it forks inherits. signal() and kill()
+    reach that whole group, descendants that moved to a group of their own
+    (found through /proc on Linux, by ancestry while the child lives and
+    by their TAG once it has exited), the app's cgroup if it has one and
+    the orphans the reaper attributed to the app. On Windows, where none of that exists,
+    the child's descendants are found with psutil while it is alive.
+    """
+    def __init__(self, name, pid, cgroup=None):
+        self.name = name
+        self.pid = pid
+        self.cgroup = cgroup
+        self.escaped = set() # Descendants seen outside the process group
+        reaper.track(name, pid)
+
+    def signal(self, sig):
+        """Sends `sig` to every process of the tree."""
+        if sys.platform == "win32":
+            self._signal_windows(sig)
+            return
+        # Walk the tree first: once the child dies its descendants are re-parented.
+        outside = self._outside_group()
+        try:
+            os.killpg(self.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+        for pid in outside:
+            try:
+                os.kill(pid, sig)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+    def kill(self):
+        """SIGKILLs every process of the tree; cgroup.kill takes the app's cgroup down in one go."""
+        if self.cgroup:
+            try:
+                with open(os.path.join(self.cgroup, 'cgroup.kill'), 'w') as f:
+                    f.write('1')
+            except OSError:
+                pass # Linux < 5.14; the processes are signalled one by one below
+        self.signal(KILL)
+
+    def leftovers(self):
+        """True while processes of the tree other than the (reaped) child remain."""
+        if sys.platform == "win32":
+            return any(_exists(pid) for pid in self.escaped)
+        if reaper.enabled:
+            # Descendants that left the group were re-parented to us when the child exited.
+            self.escaped.update(pid for pid in reaper.unclaimed() if _tag(pid) == self.name)
+        reaper.reap()
+        try:
+            os.killpg(self.pid, 0)
+            return True
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            return True
+        return any(_exists(pid) for pid in self.escaped | self._cgroup_pids()) or bool(reaper.orphans(self.name))
+
+    def stop_leftovers(self, sig=None, on_log=None, grace=LEFTOVER_GRACE):
+        """
+        Call once the child has exited and been reaped: sends whatever it
+        left behind `sig` (None if they were already signalled), SIGKILLs
+        what is still there after `grace` seconds and waits for it to go.
+        Blocks for up to grace + 1 seconds, and not at all if nothing is left.
+        """
+        if not self.leftovers():
+            return
+        if on_log:
+            on_log(f"[{self.name}] Stopping the processes PID {self.pid} left behind.")
+        if sig is not None:
+            self.signal(sig)
+        deadline = time.monotonic() + grace
+        while self.leftovers():
+            if time.monotonic() >= deadline + 1.0:
+                if on_log:
+                    on_log(f"[{self.name}] Some processes PID {self.pid} left behind could not be killed.")
+                return
+            if time.monotonic() >= deadline:
+                self.kill()
+            time.sleep(0.05)
+
+    def close(self):
+        """Call once the child has been reaped by its supervisor."""
+        reaper.untrack(self.pid)
+
+    def _outside_group(self):
+        """Descendants in process groups of their own, the app's cgroup members and its orphans."""
+        table = _processes()
+        children = {}
+        for pid, (_, ppid, _, _) in table.items():
+            children.setdefault(ppid, []).append(pid)
+        stack = [self.pid]
+        while stack:
+            for pid in children.get(stack.pop(), ()):
+                if table[pid][2] != self.pid:
+                    self.escaped.add(pid)
+                stack.append(pid)
+        self.escaped = {pid for pid in self.escaped if pid in table} if table else self.escaped
+        return self.escaped | self._cgroup_pids() | {orphan['pid'] for orphan in reaper.orphans(self.name)}
+
+    def _cgroup_pids(self):
+        if not self.cgroup:
+            return set()
+        try:
+            with open(os.path.join(self.cgroup, 'cgroup.procs')) as f:
+                return set(map(int, f.read().split()))
+        except OSError:
+            return set()
+
+    def _signal_windows(self, sig):
+        try:
+            from metrics import psutil
+            if psutil is not None:
+                self.escaped.update(child.pid for child in psutil.Process(self.pid).children(recursive=True))
+        except Exception:
+            pass # The child is gone; the descendants found earlier are still signalled
+        for pid in [self.pid] + list(self.escaped):
+            try:
+                os.kill(pid, sig) # TerminateProcess on Windows
+            except OSError:
+                pass
+
+
+class OrphanReaper:
+    """
+    Reports and reaps the processes apps leave behind. As a subreaper
+    (become_subreaper()) the supervisor inherits every descendant whose
+    parent exits. A background thread looks at the supervisor's children
+    every REAP_INTERVAL seconds; those that aren't an app's main process
+    are orphans, attributed to the app whose session they are in, and each
+    is reaped with waitid() once it exits. Children in the supervisor's
+    own session (health check commands) are left alone, and an
+    unattributed child must be seen twice, so a just-spawned app is never
+    mistaken for one. Linux only; elsewhere orphans go to init as before.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.on_log = lambda message: None
+        self.on_change = lambda orphans: None
+        self._managed = {}   # pid -> app: main processes, reaped by their own supervisor
+        self._sessions = {}  # session id -> app
+        self._orphans = {}   # pid -> {'pid', 'app', 'command', 'since'}
+        self._suspects = set()
+        self._lock = threading.Lock()
+        self._reap_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, on_log=None, on_change=None, interval=REAP_INTERVAL):
+        """Becomes the subreaper and starts reaping. Returns False where that isn't supported."""
+        self.on_log = on_log or self.on_log
+        self.on_change = on_change or self.on_change
+        if self._thread:
+            return True
+        self.enabled = become_subreaper()
+        if self.enabled:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval,), name="OrphanReaper", daemon=True)
+            self._thread.start()
+        return self.enabled
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def track(self, name, pid):
+        with self._lock:
+            self._managed[pid] = name
+            self._sessions.pop(pid, None)
+            self._sessions[pid] = name # The child leads a session with its own PID
+            while len(self._sessions) > MAX_SESSIONS:
+                del self._sessions[next(iter(self._sessions))]
+
+    def untrack(self, pid):
+        with self._lock:
+            self._managed.pop(pid, None) # Its session stays known, so later orphans are still attributed
+
+    def orphans(self, names=None):
+        """The orphans still running, of every app or only of `names` (a name or a list)."""
+        if isinstance(names, str):
+            names = [names]
+        with self._lock:
+            return [dict(o) for o in self._orphans.values() if names is None or o['app'] in names]
+
+    def unclaimed(self):
+        """Children that are neither an app's main process nor in the supervisor's session."""
+        children = _children()
+        if children is None:
+            children = {pid for pid, stat in _processes().items() if stat[1] == os.getpid()}
+        own_session = os.getsid(0)
+        with self._lock:
+            children -= self._managed.keys()
+        return [pid for pid in children if (_stat(pid) or (None, 0, 0, own_session))[3] != own_session]
+
+    def kill_orphans(self, names=None):
+        """SIGKILLs the orphans of `names` (all if None); returns how many were signalled."""
+        orphans = self.orphans(names)
+        for orphan in orphans:
+            try:
+                os.kill(orphan['pid'], KILL)
+            except OSError:
+                pass
+        self.reap()
+        return len(orphans)
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.reap()
+            except Exception as e:
+                self.on_log(f"Orphan reaper error: {e}")
+
+    def reap(self):
+        """Looks for new orphans and reaps the ones that exited."""
+        if not self.enabled:
+            return
+        with self._reap_lock:
+            suspects, changed = set(), False
+            for pid in self.unclaimed():
+                stat = _stat(pid)
+                if stat is None:
+                    continue
+                with self._lock:
+                    app = self._sessions.get(stat[3])
+                    known = pid in self._orphans
+                if app is None and pid not in self._suspects and not known:
+                    suspects.add(pid) # Possibly an app its supervisor hasn't tracked yet
+                    continue
+                changed |= self._check(pid, app or _tag(pid) or '')
+            self._suspects = suspects
+            if changed:
+                self.on_change(self.orphans())
+
+    def _check(self, pid, app):
+        """Records a new orphan or reaps one that exited; True if the set of orphans changed."""
+        prefix = f"[{app}] " if app else ""
+        with self._lock:
+            known = pid in self._orphans
+        command = None if known else process_command(pid)
+        try:
+            result = os.waitid(os.P_PID, pid, os.WEXITED | os.WNOHANG)
+        except ChildProcessError:
+            with self._lock:
+                return self._orphans.pop(pid, None) is not None # Reaped elsewhere; just forget it
+        if result is None:
+            if known:
+                return False
+            with self._lock:
+                self._orphans[pid] = {'pid': pid, 'app': app, 'command': command, 'since': time.time()}
+            self.on_log(f"{prefix}Orphaned process PID {pid} ({command}) is still running after its parent exited.")
+            return True
+        how = f"code {result.si_status}" if result.si_code == os.CLD_EXITED else f"signal {result.si_status}"
+        self.on_log(f"{prefix}Reaped orphaned process PID {pid}{f' ({command})' if command else ''}, {how}.")
+        with self._lock:
+            return self._orphans.pop(pid, None) is not None
+
+
+# Shared by every app supervised in this process; hosts start it with
+# reaper.start() and show what it reports.
+reaper = OrphanReaper()
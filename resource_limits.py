@@ -0,0 +1,278 @@
+import os
+import re
+import sys
+import threading
+
+from metrics import MetricsSampler
+
+CPU_PERIOD = 100000 # cpu.max period in microseconds
+_SIZE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$", re.IGNORECASE)
+_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_size(value):
+    """Turns 536870912, "512M" or "1.5G" into a byte count."""
+    if value in (None, ""):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = _SIZE_RE.match(str(value))
+    if not match:
+        raise ValueError(f"Invalid size: {value!r}")
+    return int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+
+
+def parse_cpu(value):
+    """Turns 0.5, "0.5" or "50%" into a number of cores."""
+    if value in (None, ""):
+        return None
+    text = str(value).strip()
+    if text.endswith('%'):
+        return float(text[:-1]) / 100.0
+    return float(text)
+
+
+class ResourceLimits:
+    """The memory_max / cpu_quota / pids_max settings of one app."""
+    def __init__(self, memory_max=None, cpu_quota=None, pids_max=None, grace=3):
+        self.memory_max = memory_max
+        self.cpu_quota = cpu_quota
+        self.pids_max = pids_max
+        self.grace = grace
+
+    @classmethod
+    def from_config(cls, proc_config):
+        """Returns the app's limits, or None if it has none."""
+        limits = cls(
+            memory_max=parse_size(proc_config.get('memory_max')),
+            cpu_quota=parse_cpu(proc_config.get('cpu_quota')),
+            pids_max=int(proc_config['pids_max']) if proc_config.get('pids_max') else None,
+            grace=proc_config.get('limit_grace', 3),
+        )
+        if limits.memory_max is None and limits.cpu_quota is None and limits.pids_max is None:
+            return None
+        return limits
+
+
+class _CgroupTree:
+    """
+    The supervisor's delegated cgroup v2 subtree. On first use the
+    supervisor moves itself into a "supervisor" leaf (cgroup v2 forbids
+    processes in a cgroup that hands controllers down), enables the
+    memory/cpu/pids controllers and creates "apps/<name>" per limited app.
+    """
+    CONTROLLERS = ('memory', 'cpu', 'pids')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._apps_dir = None
+        self._error = None
+
+    def _own_cgroup(self):
+        mount = None
+        with open('/proc/self/mounts') as f:
+            for line in f:
+                fields = line.split()
+                if fields[2] == 'cgroup2':
+                    mount = fields[1]
+                    break
+        if mount is None:
+            raise OSError("cgroup v2 is not mounted")
+        with open('/proc/self/cgroup') as f:
+            for line in f:
+                if line.startswith('0::'):
+                    return os.path.join(mount, line.strip()[3:].lstrip('/'))
+        raise OSError("process is not in a cgroup v2 hierarchy")
+
+    def _setup(self):
+        own = self._own_cgroup()
+        with open(os.path.join(own, 'cgroup.controllers')) as f:
+            available = f.read().split()
+        missing = [c for c in self.CONTROLLERS if c not in available]
+        if missing:
+            raise OSError(f"cgroup controllers not delegated: {', '.join(missing)}")
+        enable = ' '.join(f"+{c}" for c in self.CONTROLLERS)
+
+        leaf = os.path.join(own, 'supervisor')
+        os.makedirs(leaf, exist_ok=True)
+        with open(os.path.join(leaf, 'cgroup.procs'), 'w') as f:
+            f.write(str(os.getpid()))
+        with open(os.path.join(own, 'cgroup.subtree_control'), 'w') as f:
+            f.write(enable)
+        apps_dir = os.path.join(own, 'apps')
+        os.makedirs(apps_dir, exist_ok=True)
+        with open(os.path.join(apps_dir, 'cgroup.subtree_control'), 'w') as f:
+            f.write(enable)
+        return apps_dir
+
+    def apps_dir(self):
+        """Returns the directory for app cgroups, raising OSError if cgroups can't be used."""
+        with self._lock:
+            if self._apps_dir is None and self._error is None:
+                try:
+                    self._apps_dir = self._setup()
+                except (OSError, IndexError) as e:
+                    self._error = e
+            if self._error is not None:
+                raise OSError(str(self._error))
+            return self._apps_dir
+
+    def create(self, name, limits):
+        path = os.path.join(self.apps_dir(), re.sub(r"[^A-Za-z0-9_.-]", "_", name))
+        os.makedirs(path, exist_ok=True)
+        settings = {
+            'memory.max': limits.memory_max,
+            'cpu.max': f"{int(limits.cpu_quota * CPU_PERIOD)} {CPU_PERIOD}" if limits.cpu_quota else None,
+            'pids.max': limits.pids_max,
+        }
+        for key, value in settings.items():
+            with open(os.path.join(path, key), 'w') as f:
+                f.write('max' if value is None else str(value))
+        return path
+
+_cgroups = _CgroupTree()
+
+
+def _events(path, filename, key):
+    try:
+        with open(os.path.join(path, filename)) as f:
+            for line in f:
+                name, _, value = line.partition(' ')
+                if name == key:
+                    return int(value)
+    except OSError:
+        pass
+    return 0
+
+
+class _LimitWatchdog:
+    """
+    Fallback when cgroups are unavailable: one shared MetricsSampler checks
+    every limited process tree and reports apps that stay over a limit for
+    `grace` consecutive samples.
+    """
+    def __init__(self, interval=1.0):
+        self.sampler = MetricsSampler(interval, history=1, on_sample=self._check)
+        self._watched = {} # name -> [limits, on_exceeded, strikes]
+        self._lock = threading.Lock()
+
+    def watch(self, name, pid, limits, on_exceeded):
+        with self._lock:
+            self._watched[name] = [limits, on_exceeded, 0]
+        self.sampler.track(name, pid)
+        self.sampler.start()
+
+    def unwatch(self, name):
+        self.sampler.untrack(name)
+        with self._lock:
+            self._watched.pop(name, None)
+
+    def _check(self, snapshot):
+        for name, sample in snapshot.items():
+            with self._lock:
+                entry = self._watched.get(name)
+            if entry is None:
+                continue
+            limits, on_exceeded, strikes = entry
+            reason = None
+            if limits.memory_max is not None and sample['rss'] > limits.memory_max:
+                reason = 'memory'
+            elif limits.cpu_quota is not None and sample['cpu'] > limits.cpu_quota * 100.0:
+                reason = 'cpu'
+            elif limits.pids_max is not None and sample['procs'] > limits.pids_max:
+                reason = 'pids'
+            entry[2] = strikes + 1 if reason else 0
+            if reason and entry[2] >= limits.grace:
+                self.unwatch(name)
+                on_exceeded(reason)
+
+_watchdog = None
+_watchdog_lock = threading.Lock()
+
+
+def _get_watchdog():
+    global _watchdog
+    with _watchdog_lock:
+        if _watchdog is None:
+            _watchdog = _LimitWatchdog()
+        return _watchdog
+
+
+class LimitEnforcer:
+    """
+    Applies one app's resource limits. On Linux with a delegated cgroup v2
+    tree each child is started inside its own cgroup with memory.max,
+    cpu.max and pids.max set, and OOM kills and refused forks are read back
+    from memory.events and pids.events. Otherwise a psutil watchdog kills
+    the child's process tree once it stays over a limit. exceeded() names
+    the limit the last run hit.
+    """
+    def __init__(self, name, limits, on_log=None):
+        self.name = name
+        self.limits = limits
+        self.cgroup = None
+        self._procs_fd = None
+        self._oom_kills = 0
+        self._pids_refused = 0
+        self._exceeded = None
+        self._tree = None
+        if sys.platform.startswith('linux'):
+            try:
+                self.cgroup = _cgroups.create(name, limits)
+            except OSError as e:
+                if on_log:
+                    on_log(f"[{name}] cgroup v2 limits unavailable ({e}); using the resource watchdog.")
+        if self.cgroup is None and not MetricsSampler.available() and on_log:
+            on_log(f"[{name}] psutil is not installed; resource limits will not be enforced.")
+
+    def popen_kwargs(self):
+        """Extra Popen arguments that start the child inside the app's cgroup."""
+        if self.cgroup is None:
+            return {}
+        if self._procs_fd is not None:
+            os.close(self._procs_fd)
+        self._procs_fd = os.open(os.path.join(self.cgroup, 'cgroup.procs'), os.O_WRONLY)
+        procs_fd = self._procs_fd
+        def join_cgroup():
+            os.write(procs_fd, b"0") # "0" means the writing process: the new child
+        return {'preexec_fn': join_cgroup}
+
+    def attach(self, process, tree=None):
+        """Starts enforcement for a freshly spawned Popen-like process and its ProcessTree."""
+        self._exceeded = None
+        self._tree = tree
+        if self._procs_fd is not None:
+            os.close(self._procs_fd)
+            self._procs_fd = None
+        if self.cgroup is not None:
+            self._oom_kills = _events(self.cgroup, 'memory.events', 'oom_kill')
+            self._pids_refused = _events(self.cgroup, 'pids.events', 'max')
+        elif MetricsSampler.available():
+            _get_watchdog().watch(self.name, process.pid, self.limits, self._on_watchdog)
+
+    def _on_watchdog(self, reason):
+        self._exceeded = reason
+        if self._tree:
+            self._tree.kill() # The whole tree: descendants hold the resources too
+
+    def exceeded(self):
+        """Call once the child has exited: which limit killed it, if any."""
+        if self.cgroup is None:
+            if MetricsSampler.available():
+                _get_watchdog().unwatch(self.name)
+            return self._exceeded
+        if _events(self.cgroup, 'memory.events', 'oom_kill') > self._oom_kills:
+            return 'memory'
+        if _events(self.cgroup, 'pids.events', 'max') > self._pids_refused:
+            return 'pids' # Forks were refused at pids.max
+        return None
+
+    def close(self):
+        if self._procs_fd is not None:
+            os.close(self._procs_fd)
+            self._procs_fd = None
+        if self.cgroup is not None:
+            try:
+                os.rmdir(self.cgroup)
+            except OSError:
+                pass
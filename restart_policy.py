@@ -0,0 +1,174 @@
+import random
+import threading
+import time
+
+# Per-app keys (all optional; read each time the app exits, so they apply live).
+BACKOFF_BASE = 1.0        # "restart_delay": first delay after a fast failure
+BACKOFF_MAX = 60.0        # "restart_delay_max": longest delay
+FAST_FAIL_SECONDS = 5.0   # "fast_fail_seconds": a run shorter than this is a fast failure
+CRASH_LOOP_FAILURES = 10  # "crash_loop_failures": fast failures in a row that park the app; 0 disables
+CRASH_LOOP_COOLDOWN = 300.0 # "crash_loop_cooldown": seconds a parked app waits before one trial restart
+RESTART_WINDOW = 60.0     # "restart_window": with "restart_limit", at most that many restarts per window
+RESTART_JITTER = 0.0      # "restart_jitter": other restarts wait a random 0..this many seconds; 0 restarts at once
+
+# Reasons for a restart delay, as logged.
+JITTER, FAST_FAIL, BUDGET, CRASH_LOOP = 'jitter', 'fast-fail', 'budget', 'crash-loop'
+
+
+def decorrelated_jitter(previous, base, cap, rng=random):
+    """The next delay: random between base and three times the previous one (or base), capped."""
+    return min(cap, rng.uniform(base, max(base, previous) * 3))
+
+
+def exponential(previous, base, cap, rng=random):
+    """The next delay: double the previous one, capped. Restarts of apps that failed together stay in lockstep."""
+    return min(cap, max(base, previous * 2) if previous else base)
+
+
+BACKOFFS = {'decorrelated': decorrelated_jitter, 'exponential': exponential}
+
+
+class TokenBucket:
+    """
+    Allows `limit` events per `window` seconds with bursts of up to `limit`.
+    reserve() always takes a token, possibly one that only becomes available
+    later, and returns how long the caller has to wait for it, so callers
+    queue up in order instead of retrying.
+    """
+    def __init__(self, limit, window=RESTART_WINDOW, clock=time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.configure(limit, window)
+
+    def configure(self, limit, window=RESTART_WINDOW):
+        with self._lock:
+            self.limit = limit or 0
+            self.window = float(window or RESTART_WINDOW)
+            self.rate = self.limit / self.window
+            self._tokens = float(self.limit)
+            self._updated = self.clock()
+
+    def reserve(self, at=None):
+        """Takes a token for an event at time `at` (default now); returns the seconds to wait after `at`."""
+        if not self.limit:
+            return 0.0
+        with self._lock:
+            now = self.clock()
+            at = now if at is None else max(at, now)
+            self._tokens = min(self.limit, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            # Tokens accrued between now and `at` count towards this reservation.
+            missing = -self._tokens - (at - now) * self.rate
+            return max(0.0, missing / self.rate)
+
+
+# Shared by every app supervised in this process; hosts set it from
+# "global_restart_limit" / "global_restart_window" with configure_global_budget().
+global_budget = TokenBucket(0)
+
+
+def configure_global_budget(config):
+    """Applies a config's top-level restart budget to the shared bucket; no limit when unset."""
+    limit = config.get('global_restart_limit') or 0
+    window = float(config.get('global_restart_window') or RESTART_WINDOW)
+    if (limit, window) != (global_budget.limit, global_budget.window):
+        global_budget.configure(limit, window)
+
+
+class RestartDecision:
+    """How long to wait before restarting, and why."""
+    def __init__(self, delay, reason=None, failures=0):
+        self.delay = delay
+        self.reason = reason
+        self.failures = failures # fast failures in a row
+
+    @property
+    def parked(self):
+        return self.reason == CRASH_LOOP
+
+    def __repr__(self):
+        return f"RestartDecision({self.delay:.2f}, {self.reason!r})"
+
+
+class RestartPolicy:
+    """
+    Decides when a supervised app restarts after it exits. A fast failure
+    (a run shorter than fast_fail_seconds) is followed by a backoff delay,
+    with decorrelated jitter by default so apps that fail together drift
+    apart. Other restarts are immediate unless restart_jitter spreads them
+    over up to that many seconds. After crash_loop_failures fast failures in a row the app is
+    parked for crash_loop_cooldown seconds and then gets one trial restart;
+    a trial that fails fast parks it again, one that stays up resets it.
+    Every restart also takes a token from the app's budget (restart_limit
+    per restart_window) and from the shared global budget, waiting for one
+    if either is exhausted.
+
+    Settings are read from proc_config on every decision, so changes made
+    through update_app_config() apply to the next restart.
+    """
+    def __init__(self, proc_config, budget=None, clock=time.monotonic, rng=random):
+        self.proc_config = proc_config
+        self.global_budget = global_budget if budget is None else budget
+        self.clock = clock
+        self.rng = rng
+        self.failures = 0   # fast failures in a row
+        self.previous = 0.0 # last backoff delay
+        self._budget = TokenBucket(0, clock=clock)
+        self._budget_key = None
+
+    def _setting(self, key, default):
+        value = self.proc_config.get(key)
+        return default if value is None or value == "" else float(value)
+
+    def _app_budget(self):
+        key = (self.proc_config.get('restart_limit') or 0, self.proc_config.get('restart_window') or RESTART_WINDOW)
+        if key != self._budget_key:
+            self._budget.configure(*key)
+            self._budget_key = key
+        return self._budget
+
+    def next_restart(self, uptime):
+        """The RestartDecision for an app that exited after `uptime` seconds."""
+        base = self._setting('restart_delay', BACKOFF_BASE)
+        cap = self._setting('restart_delay_max', BACKOFF_MAX)
+        threshold = int(self._setting('crash_loop_failures', CRASH_LOOP_FAILURES))
+        jitter = self._setting('restart_jitter', RESTART_JITTER)
+        delay, reason, failures = 0.0, None, 0
+        if uptime < self._setting('fast_fail_seconds', FAST_FAIL_SECONDS):
+            self.failures += 1
+            failures = self.failures
+            backoff = BACKOFFS.get(self.proc_config.get('restart_backoff') or 'decorrelated', decorrelated_jitter)
+            self.previous = backoff(self.previous, base, cap, self.rng)
+            delay, reason = self.previous, FAST_FAIL
+            if threshold and self.failures >= threshold:
+                delay, reason = self._setting('crash_loop_cooldown', CRASH_LOOP_COOLDOWN), CRASH_LOOP
+                self.previous = 0.0 # The count stays over the threshold, so a failed trial parks it again
+        else:
+            self.failures = 0
+            self.previous = 0.0
+            if jitter > 0:
+                delay, reason = self.rng.uniform(0, jitter), JITTER
+
+        at = self.clock() + delay
+        wait = max(self._app_budget().reserve(at), self.global_budget.reserve(at))
+        if wait > 0:
+            delay, reason = delay + wait, reason or BUDGET
+        return RestartDecision(delay, reason, failures)
+
+    def message(self, name, decision):
+        """The log line announcing a delayed restart."""
+        if decision.reason == JITTER:
+            return f"[{name}] Restarting in {decision.delay:.1f}s."
+        if decision.reason == FAST_FAIL:
+            return f"[{name}] Process failed quickly. Waiting {decision.delay:.1f}s."
+        if decision.reason == BUDGET:
+            return f"[{name}] Restart budget exhausted. Waiting {decision.delay:.1f}s."
+        if decision.reason == CRASH_LOOP:
+            return (f"[{name}] Crash loop: {decision.failures} fast failures in a row. "
+                    f"Parking for {decision.delay:.0f}s.")
+        return None
+
+    @staticmethod
+    def parked_status(decision):
+        return f"CRASH LOOP (retry in {decision.delay:.0f}s)"
@@ -0,0 +1,104 @@
+import threading
+import time
+
+from startup_planner import port_open
+
+READY_TIMEOUT = 60.0 # "ready_timeout": seconds each instance gets to become ready
+
+
+class RollingRestart:
+    """
+    Restarts the instances of a group one at a time: each instance is
+    restarted, then the next one waits until it is running again (a new
+    PID), has stayed up for `ready_delay` seconds and, if `ready_port` is
+    set, accepts connections on it. If an instance isn't ready within
+    `ready_timeout` seconds the roll stops there, so a bad release takes
+    down at most one instance. Feed it status updates through
+    notify_status(); restart_fn(instance_config) is called from the roll's
+    own thread, and on_done(completed) once it ends.
+    """
+    def __init__(self, group, instances, restart_fn, on_log=None, on_done=None, probe_interval=0.1):
+        self.group = group
+        self.instances = list(instances)
+        self.restart_fn = restart_fn
+        self.on_log = on_log or (lambda message: None)
+        self.on_done = on_done or (lambda completed: None)
+        self.probe_interval = probe_interval
+        self.status = {}
+        self.cancelled = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f"RollingRestart-{group}", daemon=True)
+
+    def start(self, statuses=None):
+        """Starts rolling; `statuses` seeds the instances' current statuses."""
+        self.status.update(statuses or {})
+        self._thread.start()
+
+    def cancel(self):
+        with self._cond:
+            self.cancelled = True
+            self._cond.notify_all()
+
+    def notify_status(self, name, status):
+        with self._cond:
+            self.status[name] = status
+            self._cond.notify_all()
+
+    def _run(self):
+        completed = False
+        try:
+            completed = self._roll()
+        finally:
+            self.on_done(completed)
+
+    def _roll(self):
+        total = len(self.instances)
+        self.on_log(f"[{self.group}] Rolling restart of {total} instance(s).")
+        for number, instance in enumerate(self.instances, 1):
+            name = instance['name']
+            with self._cond:
+                if self.cancelled:
+                    self.on_log(f"[{self.group}] Rolling restart cancelled before {name}.")
+                    return False
+                before = self.status.get(name)
+            self.on_log(f"[{self.group}] Rolling restart: restarting {name} ({number}/{total}).")
+            self.restart_fn(instance)
+            problem = self._wait_ready(instance, before)
+            if problem:
+                self.on_log(f"[{self.group}] Rolling restart stopped: {name} {problem}. "
+                            f"{total - number} instance(s) were not restarted.")
+                return False
+        self.on_log(f"[{self.group}] Rolling restart finished.")
+        return True
+
+    def _wait_ready(self, instance, before):
+        """None once the restarted instance is ready, otherwise why it isn't."""
+        name = instance['name']
+        timeout = float(instance.get('ready_timeout') or READY_TIMEOUT)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            # A RUNNING status with another PID than before means the new process is up.
+            self._cond.wait_for(lambda: self.cancelled or self._running(name) and self.status.get(name) != before,
+                                timeout)
+            if self.cancelled:
+                return "was being restarted when the roll was cancelled"
+            if not self._running(name):
+                return f"did not start within {timeout:.0f}s"
+            running = self.status[name]
+        ready_at = time.monotonic() + float(instance.get('ready_delay', 0))
+        port = instance.get('ready_port')
+        while True:
+            with self._cond:
+                if self.cancelled:
+                    return "was being restarted when the roll was cancelled"
+                if self.status.get(name) != running:
+                    return f"exited while starting ({self.status.get(name)})"
+            if time.monotonic() >= ready_at and (not port or port_open(port)):
+                return None
+            if time.monotonic() >= deadline:
+                return f"was not ready within {timeout:.0f}s"
+            with self._cond:
+                self._cond.wait(self.probe_interval)
+
+    def _running(self, name):
+        return self.status.get(name, "").startswith("RUNNING")
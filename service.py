@@ -11,7 +11,20 @@ project_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(project_dir)
 python_exe = sys.executable
 
-from supervisor_logic import SupervisorWorker
+from supervisor_core import ProcessSupervisor
+from supervisor_engine import SupervisorEngine
+from process_groups import expand_app, expand_apps, group_status
+from startup_planner import StartupCoordinator
+from config_reload import ConfigDiff, ConfigWatcher, LIVE_FIELDS
+from event_journal import EventJournal, JOURNAL_FILE, DEFAULT_RETENTION_DAYS
+from metrics_exporter import MetricsExporter
+from shutdown import ShutdownCoordinator, stop_layers, DEFAULT_TIMEOUT, KILL_GRACE
+from restart_policy import configure_global_budget
+from listen_sockets import configure_listeners, registry as listen_registry
+from tail_buffer import configure_tail_buffers, buffers as tail_buffers
+from instrumentation import configure_instrumentation
+from job_scheduler import JobScheduler, is_job, run_config
+from combined_log import configure_combined_log, close_combined_log, log_message as record_combined_log
 from paths import get_system_data_dir # Use the system path for the service
 
 class SupervisorService(win32serviceutil.ServiceFramework):
@@ -25,14 +38,49 @@ class SupervisorService(win32serviceutil.ServiceFramework):
         self.hWaitStop = win32event.CreateEvent(None, 0, 0, None)
         self.threads = {}
         self.workers = {}
+        self.engine = None
+        self.startup = None
+        self.jobs = JobScheduler(self.run_job, lambda name: self.stop_run(name, wait=False),
+                                 on_log=self.on_log, on_status=self.on_status)
+        self.watcher = None
+        self.journal = None
+        self.exporter = None
+        self.config = {}
+        self.instances = {}        # app name -> [instance config, ...]
+        self.group_of = {}         # instance name -> app name
+        self.instance_status = {}  # instance name -> last status
         self.is_running = True
 
     def SvcStop(self):
-        self.ReportServiceStatus(win32service.SERVICE_STOP_PENDING)
+        timeout = self.config.get('shutdown_timeout', DEFAULT_TIMEOUT)
+        # Tell the service manager how long the parallel stop below may take.
+        self.ReportServiceStatus(win32service.SERVICE_STOP_PENDING, waitHint=int((timeout + KILL_GRACE + 5) * 1000))
         servicemanager.LogInfoMsg("PySupervisorService - Received stop signal.")
         self.is_running = False
-        for worker in self.workers.values():
-            worker.stop()
+        if self.watcher:
+            self.watcher.stop()
+        if self.startup:
+            self.startup.cancel()
+        self.jobs.stop()
+        self.jobs.unschedule()
+        # Every app gets its stop signal at once; only those still running at the deadline are killed.
+        targets = {name: worker for name, worker in self.workers.items() if self.threads[name].is_alive()}
+        if self.engine:
+            targets.update(self.engine.stop_targets())
+        layers = stop_layers(self.config.get('apps', []), self.group_of, targets,
+                             ordered=self.config.get('stop_order') == 'dependencies')
+        ShutdownCoordinator(timeout, on_log=servicemanager.LogInfoMsg).shutdown(targets, layers)
+        for thread in self.threads.values():
+            thread.join(KILL_GRACE)
+        if self.engine:
+            self.engine.shutdown(timeout=30)
+        listen_registry.close_all()
+        tail_buffers.close_all()
+        if self.journal:
+            self.journal.close()
+        close_combined_log()
+        if self.exporter:
+            self.exporter.stop()
         win32event.SetEvent(self.hWaitStop)
 
     def SvcDoRun(self):
@@ -49,24 +97,177 @@ class SupervisorService(win32serviceutil.ServiceFramework):
         except Exception as e:
             servicemanager.LogErrorMsg(f"PySupervisorService - CRITICAL: Could not load config.json from {config_path}. Error: {e}")
             return
+        self.config = config
+        configure_global_budget(config)
+        configure_instrumentation(config)
+        self.jobs.configure(config)
+        try:
+            configure_combined_log(config, system_data_dir)
+        except OSError as e:
+            servicemanager.LogErrorMsg(f"PySupervisorService - Could not open the combined log. Error: {e}")
+        configure_tail_buffers(config, expand_apps(config.get('apps', [])))
+        # Starts, exits and restarts are kept in events.db so their history outlives the service.
+        self.journal = EventJournal(system_data_dir / JOURNAL_FILE,
+                                    retention_days=config.get('journal_retention_days', DEFAULT_RETENTION_DAYS))
+
+        if config.get('engine') == 'asyncio':
+            # One event loop supervises every app instead of one thread each.
+            self.engine = SupervisorEngine(on_log=self.on_log, on_status=self.on_status)
+
+        apps = config.get('apps', [])
+        for app_config in apps:
+            self.set_instances(app_config)
+        if config.get('metrics_listen'):
+            try:
+                self.exporter = MetricsExporter(config['metrics_listen'])
+                self.exporter.set_instances(self.group_of)
+                self.exporter.start()
+                servicemanager.LogInfoMsg(f"PySupervisorService - Serving metrics at {self.exporter.url}")
+            except (OSError, ValueError) as e:
+                self.exporter = None
+                servicemanager.LogErrorMsg(f"PySupervisorService - Could not serve metrics on {config['metrics_listen']}. Error: {e}")
+        try:
+            # Each app starts once everything in its depends_on is ready.
+            self.startup = StartupCoordinator(apps, self.start_app, on_log=servicemanager.LogInfoMsg)
+        except ValueError as e:
+            servicemanager.LogErrorMsg(f"PySupervisorService - CRITICAL: Cannot order apps for startup. Error: {e}")
+            return
+        self.startup.start()
 
-        for app_config in config.get('apps', []):
-            name = app_config['name']
-            servicemanager.LogInfoMsg(f"PySupervisorService - Starting thread for '{name}'.")
-            
-            if app_config.get('output'):
-                log_path = system_data_dir / app_config['output']
-                app_config['output'] = str(log_path)
-
-            worker = SupervisorWorker(app_config)
-            thread = Thread(target=worker.run)
-            self.workers[name] = worker
-            self.threads[name] = thread
-            thread.start()
-
-        servicemanager.LogInfoMsg("PySupervisorService - All workers started.")
+        servicemanager.LogInfoMsg("PySupervisorService - Startup planned; apps start as their dependencies become ready.")
+        # Edits to config.json are applied in place, touching only the apps that changed.
+        self.watcher = ConfigWatcher(config_path, self.apply_config, on_log=servicemanager.LogInfoMsg)
+        self.watcher.start()
         win32event.WaitForSingleObject(self.hWaitStop, win32event.INFINITE)
         servicemanager.LogInfoMsg("PySupervisorService - Service has stopped.")
 
+    def start_app(self, app_name):
+        for app_config in self.instances[app_name]:
+            self.start_instance(app_config)
+        if self.startup and any(is_job(i) for i in self.instances[app_name]):
+            self.startup.mark_ready(app_name) # A job is ready for its dependents once it is scheduled
+
+    def start_instance(self, app_config):
+        if is_job(app_config):
+            self.jobs.schedule(app_config)
+        else:
+            self.launch_instance(app_config)
+
+    def run_job(self, name):
+        """Starts one run of a job (called by the job scheduler)."""
+        instance = next((i for i in self.instances.get(self.group_of.get(name), []) if i['name'] == name), None)
+        if instance:
+            self.launch_instance(run_config(instance))
+
+    def launch_instance(self, app_config):
+        name = app_config['name']
+        app_config = dict(app_config)
+        if app_config.get('output'):
+            log_path = get_system_data_dir() / app_config['output']
+            app_config['output'] = str(log_path)
+
+        if self.engine:
+            servicemanager.LogInfoMsg(f"PySupervisorService - Supervising '{name}' on the engine loop.")
+            self.engine.start_app(app_config)
+            return
+
+        servicemanager.LogInfoMsg(f"PySupervisorService - Starting thread for '{name}'.")
+        worker = ProcessSupervisor(app_config, on_log=self.on_log, on_status=self.on_status)
+        thread = Thread(target=worker.run)
+        self.workers[name] = worker
+        self.threads[name] = thread
+        thread.start()
+
+    def stop_instance(self, name):
+        self.jobs.unschedule([name])
+        self.stop_run(name)
+
+    def stop_run(self, name, wait=True):
+        """Stops an instance's supervision; a job stays scheduled."""
+        if self.engine:
+            self.engine.stop_app(name, wait=wait)
+        worker, thread = self.workers.pop(name, None), self.threads.pop(name, None)
+        if worker:
+            worker.stop()
+            if wait:
+                thread.join()
+
+    def set_instances(self, app_config):
+        self.instances[app_config['name']] = expand_app(app_config)
+        for instance in self.instances[app_config['name']]:
+            self.group_of[instance['name']] = app_config['name']
+
+    def apply_config(self, new_config):
+        """Called by the config watcher: starts, stops or restarts only the apps whose entries changed."""
+        diff = ConfigDiff(self.config, new_config)
+        if not diff:
+            return
+        servicemanager.LogInfoMsg(f"PySupervisorService - config.json changed: {diff.summary()}.")
+        self.config = new_config
+        configure_global_budget(new_config)
+        self.jobs.configure(new_config)
+        try:
+            configure_combined_log(new_config, get_system_data_dir())
+        except OSError as e:
+            servicemanager.LogErrorMsg(f"PySupervisorService - Could not open the combined log. Error: {e}")
+        for app in diff.removed:
+            for instance in self.instances.pop(app['name'], []):
+                self.stop_instance(instance['name'])
+        for change in diff.changed:
+            old_names = {i['name'] for i in self.instances.get(change.name, [])}
+            self.set_instances(change.new)
+            new_names = {i['name'] for i in self.instances[change.name]}
+            if is_job(change.old) or is_job(change.new):
+                # Unschedule and stop what went away (everything, if it became or stopped being a job)
+                # and reschedule the rest if the job was active.
+                active = any(self.jobs.is_scheduled(name) or (name in self.threads and self.threads[name].is_alive()) or
+                             (self.engine and self.engine.is_app_running(name)) for name in old_names)
+                for name in (old_names if change.needs_restart else old_names - new_names):
+                    self.stop_instance(name)
+                if active:
+                    self.start_app(change.name)
+                continue
+            for name in old_names - new_names:
+                self.stop_instance(name)
+            for instance in self.instances[change.name]:
+                if instance['name'] not in old_names:
+                    self.start_instance(instance)
+                elif change.needs_restart:
+                    self.stop_instance(instance['name'])
+                    self.start_instance(instance)
+                else:
+                    values = {key: instance.get(key) for key in LIVE_FIELDS}
+                    if self.engine:
+                        self.engine.update_app_config(instance['name'], values)
+                    if instance['name'] in self.workers:
+                        self.workers[instance['name']].proc_config.update(values)
+        for app in diff.added:
+            self.set_instances(app)
+            self.start_app(app['name'])
+        configure_listeners(expand_apps(new_config.get('apps', []))) # Sockets no app lists any more
+        configure_tail_buffers(new_config, expand_apps(new_config.get('apps', [])))
+        if self.exporter:
+            self.exporter.set_instances({i['name']: app for app, instances in self.instances.items() for i in instances})
+        if diff.settings:
+            servicemanager.LogInfoMsg(f"PySupervisorService - Restart the service to apply: {', '.join(diff.settings)}.")
+
+    def on_log(self, message):
+        servicemanager.LogInfoMsg(message)
+        if self.exporter:
+            self.exporter.record_log(message)
+        record_combined_log(message)
+
+    def on_status(self, name, status):
+        self.instance_status[name] = status
+        app_name = self.group_of.get(name, name)
+        if self.journal:
+            self.journal.record_status(app_name, name, status)
+        if self.exporter:
+            self.exporter.record_status(app_name, name, status)
+        statuses = [self.instance_status.get(i['name'], "STOPPED") for i in self.instances.get(app_name, [])]
+        if self.startup and statuses:
+            self.startup.notify_status(app_name, group_status(statuses))
+        self.jobs.notify_status(name, status)
+
 if __name__ == '__main__':
     win32serviceutil.HandleCommandLine(SupervisorService)
@@ -0,0 +1,100 @@
+import signal
+import sys
+import time
+
+from startup_planner import plan_layers
+
+DEFAULT_TIMEOUT = 10.0 # Global deadline for every app to exit after its stop signal
+KILL_GRACE = 2.0       # How long killed stragglers get to be reaped
+
+
+def stop_signal(proc_config):
+    """
+    The signal an app is asked to stop with: its "stop_signal" ("TERM",
+    "SIGINT", 15, ...), SIGTERM by default. Windows can only terminate.
+    """
+    value = proc_config.get('stop_signal')
+    if sys.platform == "win32" or value in (None, ""):
+        return signal.SIGTERM
+    if isinstance(value, int):
+        return signal.Signals(value)
+    name = str(value).upper()
+    return signal.Signals[name if name.startswith('SIG') else f"SIG{name}"]
+
+
+def stop_layers(app_configs, group_of, names, ordered=False):
+    """
+    Splits instance names into the order they should be stopped in. Unless
+    `ordered`, everything stops at once. Otherwise apps stop in reverse
+    dependency order: an app only stops once everything that depends_on it
+    has stopped. Names outside the config stop first.
+    """
+    names = list(names)
+    if not ordered:
+        return [names]
+    try:
+        layers = plan_layers(app_configs)
+    except ValueError:
+        return [names]
+    depth = {app: i for i, layer in enumerate(layers) for app in layer}
+    grouped = {}
+    for name in names:
+        grouped.setdefault(depth.get(group_of.get(name, name), len(layers)), []).append(name)
+    return [grouped[key] for key in sorted(grouped, reverse=True)]
+
+
+class ShutdownCoordinator:
+    """
+    Stops many supervised apps at once against one deadline. Every app in
+    a layer is sent its stop signal together. The coordinator then waits
+    for all of them until the deadline, or until an app's own
+    "stop_timeout" if that is shorter, and sends SIGKILL only to apps still
+    running then. Each layer starts once the previous one has stopped.
+
+    A target is anything with request_stop(), kill(), a threading.Event
+    `finished` and a `proc_config`: ProcessSupervisor, or an engine runner
+    from SupervisorEngine.stop_targets().
+    """
+    def __init__(self, timeout=DEFAULT_TIMEOUT, on_log=None):
+        self.timeout = timeout
+        self.on_log = on_log or (lambda message: None)
+
+    def shutdown(self, targets, layers=None):
+        """
+        Stops `targets` ({name: target}) layer by layer. Returns a dict
+        with the names that stopped on their stop signal, those that had
+        to be killed and the seconds it took.
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        layers = layers or [list(targets)]
+        stopped, killed = [], []
+        for layer in layers:
+            members = [(name, targets[name]) for name in layer if name in targets]
+            if not members:
+                continue
+            layer_started = time.monotonic()
+            for name, target in members:
+                target.request_stop()
+
+            def kill_at(member):
+                own = member[1].proc_config.get('stop_timeout')
+                return min(deadline, layer_started + float(own)) if own else deadline
+
+            # Waiting in kill-time order means no wait runs past a later target's kill time.
+            for name, target in sorted(members, key=kill_at):
+                if not target.finished.wait(max(0.0, kill_at((name, target)) - time.monotonic())):
+                    self.on_log(f"[{name}] Did not stop in time; killing it.")
+                    target.kill()
+                    killed.append(name)
+            grace_end = time.monotonic() + KILL_GRACE
+            layer_killed = set(killed)
+            for name, target in members:
+                # A killed target finishing now is already counted as killed.
+                if target.finished.wait(max(0.0, grace_end - time.monotonic())) and name not in layer_killed:
+                    stopped.append(name)
+        seconds = time.monotonic() - started
+        if stopped or killed:
+            self.on_log(f"Stopped {len(stopped)} app(s) in {seconds:.1f}s" +
+                        (f"; killed {len(killed)} that ignored the stop signal." if killed else "."))
+        return {'stopped': stopped, 'killed': killed, 'seconds': seconds}
@@ -0,0 +1,155 @@
+import socket
+import threading
+import time
+
+
+class CycleError(ValueError):
+    """Raised when depends_on entries form a cycle."""
+    def __init__(self, members):
+        self.members = sorted(members)
+        super().__init__(f"Dependency cycle between: {', '.join(self.members)}")
+
+
+def dependencies(app_config):
+    depends_on = app_config.get('depends_on', [])
+    return [depends_on] if isinstance(depends_on, str) else list(depends_on)
+
+
+def plan_layers(app_configs):
+    """
+    Orders apps into layers with Kahn's algorithm: every app's dependencies
+    are in earlier layers, and apps within a layer are independent of each
+    other. Raises ValueError for unknown dependencies and CycleError for cycles.
+    """
+    names = [app['name'] for app in app_configs]
+    known = set(names)
+    pending = {}
+    dependents = {name: [] for name in names}
+    for app in app_configs:
+        deps = dependencies(app)
+        for dep in deps:
+            if dep not in known:
+                raise ValueError(f"'{app['name']}' depends on unknown app '{dep}'")
+            dependents[dep].append(app['name'])
+        pending[app['name']] = len(set(deps))
+
+    layers = []
+    layer = [name for name in names if pending[name] == 0]
+    while layer:
+        layers.append(layer)
+        next_layer = []
+        for name in layer:
+            for dependent in dependents[name]:
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    next_layer.append(dependent)
+        layer = next_layer
+
+    if sum(len(l) for l in layers) != len(names):
+        raise CycleError(name for name, count in pending.items() if count > 0)
+    return layers
+
+
+def port_open(port, host='127.0.0.1', timeout=0.5):
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+class StartupCoordinator:
+    """
+    Starts apps as soon as everything they depend on is ready, so
+    independent apps start together and dependents wait only for their own
+    dependencies. Feed it status updates through notify_status(); an app
+    is ready once it is RUNNING, has stayed up for `ready_delay` seconds and,
+    if `ready_port` is set, accepts TCP connections on that local port.
+    Readiness probes run on short-lived background threads, so start_fn
+    may be called from any thread.
+    """
+    def __init__(self, app_configs, start_fn, on_log=None, probe_interval=0.1):
+        self.layers = plan_layers(app_configs)
+        self.configs = {app['name']: app for app in app_configs}
+        self.deps = {app['name']: set(dependencies(app)) for app in app_configs}
+        self.start_fn = start_fn
+        self.on_log = on_log or (lambda message: None)
+        self.probe_interval = probe_interval
+        self.started, self.ready, self.probing = set(), set(), set()
+        self.status = {}
+        self.started_at = None
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Starts every app that has no dependencies."""
+        self.started_at = time.time()
+        self._start_eligible()
+
+    def cancel(self):
+        """Stops starting apps; anything still waiting on a dependency stays stopped."""
+        with self._lock:
+            self.cancelled = True
+
+    def is_done(self):
+        return len(self.ready) == len(self.configs)
+
+    def _start_eligible(self):
+        with self._lock:
+            if self.cancelled:
+                return
+            eligible = [name for name in self.configs
+                        if name not in self.started and self.deps[name] <= self.ready]
+            self.started.update(eligible)
+        for name in eligible:
+            if self.deps[name]:
+                self.on_log(f"[{name}] Dependencies ready ({', '.join(sorted(self.deps[name]))}); starting.")
+            self.start_fn(name)
+
+    def notify_status(self, name, status):
+        with self._lock:
+            self.status[name] = status
+            if (name not in self.started or name in self.ready or name in self.probing
+                    or not status.startswith("RUNNING")):
+                return
+            self.probing.add(name)
+        threading.Thread(target=self._probe, args=(name,), daemon=True).start()
+
+    def _still_running(self, name):
+        with self._lock:
+            return self.status.get(name, "").startswith("RUNNING")
+
+    def _probe(self, name):
+        config = self.configs[name]
+        deadline = time.time() + config.get('ready_delay', 0)
+        ready = True
+        while time.time() < deadline:
+            if not self._still_running(name):
+                ready = False
+                break
+            time.sleep(min(self.probe_interval, max(0, deadline - time.time())))
+        port = config.get('ready_port')
+        while ready and port and not port_open(port):
+            if not self._still_running(name):
+                ready = False
+                break
+            time.sleep(self.probe_interval)
+        with self._lock:
+            self.probing.discard(name)
+        if ready and self._still_running(name):
+            self.mark_ready(name)
+        elif not self.cancelled:
+            # Its dependents keep waiting; say so rather than leave them hanging silently.
+            with self._lock:
+                waiting = sum(1 for other, deps in self.deps.items() if name in deps and other not in self.started)
+            self.on_log(f"[{name}] Exited before ready; {waiting} dependent(s) waiting.")
+
+    def mark_ready(self, name):
+        """Records that an app is ready and starts whatever was waiting on it."""
+        with self._lock:
+            if name in self.ready:
+                return
+            self.ready.add(name)
+        if any(name in deps for deps in self.deps.values()):
+            self.on_log(f"[{name}] Ready.")
+        self._start_eligible()
@@ -0,0 +1,173 @@
+import os
+import subprocess
+import sys
+import time
+from output_pipeline import OutputCapture
+from restart_policy import RestartPolicy
+from listen_sockets import Listeners
+from process_tree import ProcessTree, tagged_env
+from instrumentation import stats, SPAWN, RESTART
+
+LIMIT_KEYS = ('memory_max', 'cpu_quota', 'pids_max')
+
+
+class Supervision:
+    """
+    The steps of supervising one app that don't depend on how the
+    supervisor waits: building a run's spawn arguments, tracking the
+    child once it is up, classifying its exit, cleaning up after it and
+    deciding whether and when it restarts. ProcessSupervisor (a thread
+    per app) and the engine's _AppRunner (a task on one event loop) drive
+    the same steps and differ only in how they spawn, wait and sleep.
+    """
+    def __init__(self, proc_config, on_log, on_status):
+        self.proc_config = proc_config
+        self.name = proc_config['name']
+        self.on_log = on_log
+        self.on_status = on_status
+        self.policy = RestartPolicy(proc_config)
+        self.capture = OutputCapture(proc_config) if OutputCapture.wanted(proc_config) else None
+        self.return_code = None
+        self.unhealthy = None
+        self.restart_clock = None # With instrumentation on: when the last exit was detected, less the policy's delay
+        self._started_at = None
+        self._spawn_started = None
+        self._output_handle = None
+        # Limits and health checks pull in psutil, http.client and a thread
+        # pool, so their modules are only imported for apps that use them.
+        self.enforcer = self.monitor = None
+        if any(proc_config.get(key) for key in LIMIT_KEYS):
+            from resource_limits import ResourceLimits, LimitEnforcer
+            limits = ResourceLimits.from_config(proc_config)
+            self.enforcer = LimitEnforcer(self.name, limits, on_log=on_log) if limits else None
+        if proc_config.get('health_check'):
+            from health_checks import HealthMonitor
+            self.monitor = HealthMonitor.for_app(proc_config, on_log=on_log)
+
+    def spawn_args(self):
+        """Logs the start of a run and returns its (argv, Popen keyword arguments)."""
+        command = self.proc_config['command']
+        self._started_at = time.time()
+        self.return_code = self.unhealthy = None
+        self.on_log(f"[{self.name}] Starting command: {' '.join(command)}")
+        if self.capture:
+            kwargs = self.capture.popen_kwargs()
+        else:
+            self._output_handle = open(self.proc_config.get('output', os.devnull), 'ab', buffering=0)
+            kwargs = {'stdout': self._output_handle, 'stderr': subprocess.STDOUT}
+
+        if self.enforcer:
+            kwargs.update(self.enforcer.popen_kwargs())
+        argv = command
+        if self.proc_config.get('listen'):
+            # Inherit the supervisor's listening sockets, which stay open across restarts.
+            listeners = Listeners(self.proc_config)
+            kwargs.update(listeners.popen_kwargs(kwargs.get('preexec_fn')))
+            argv = listeners.wrap(command)
+        kwargs['env'] = tagged_env(self.name, kwargs.get('env'))
+        kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP if sys.platform == "win32" else 0
+        # A session of its own lets stop and kill reach everything the app forks.
+        kwargs['start_new_session'] = True
+        self._spawn_started = time.perf_counter() if stats.enabled else None
+        return argv, kwargs
+
+    def started(self, process, kill):
+        """
+        Call once the child is spawned: tracks its process tree, starts
+        limits and health checks (which end a run with `kill`, callable
+        from any thread) and reports it RUNNING. Returns the ProcessTree.
+        """
+        if self._spawn_started is not None:
+            stats.record(SPAWN, time.perf_counter() - self._spawn_started)
+            stats.count('spawns')
+        tree = ProcessTree(self.name, process.pid, self.enforcer.cgroup if self.enforcer else None)
+        if self.enforcer:
+            self.enforcer.attach(process, tree)
+        if self.monitor:
+            self.monitor.attach(kill)
+        self.on_status(self.name, f"RUNNING (PID: {process.pid})")
+        if self.restart_clock is not None and stats.enabled:
+            stats.record(RESTART, time.perf_counter() - self.restart_clock)
+        self.restart_clock = None
+        return tree
+
+    def exited(self, return_code, is_running, detected=None):
+        """
+        Call once the wait for the child is over: `return_code` is None if
+        it was cut short by a stop. Reports why the child exited while
+        supervision goes on. `detected` is when the exit was noticed
+        (perf_counter(), with instrumentation on), for the restart latency.
+        """
+        self.return_code = return_code
+        if return_code is None:
+            return
+        self.restart_clock = detected
+        exceeded = self.enforcer.exceeded() if self.enforcer else None
+        self.unhealthy = self.monitor.unhealthy() if self.monitor else None
+        if not is_running:
+            return
+        if self.unhealthy:
+            self.on_status(self.name, f"UNHEALTHY ({self.unhealthy})")
+        elif exceeded:
+            self.on_log(f"[{self.name}] Process exceeded its {exceeded} limit and was stopped (code {return_code}).")
+            self.on_status(self.name, f"LIMIT EXCEEDED ({exceeded})")
+        else:
+            self.on_log(f"[{self.name}] Process exited with code {return_code}.")
+            self.on_status(self.name, f"STOPPED (Code: {return_code})")
+
+    def failed(self, error):
+        """Call when a run fails to start or supervise; supervision ends."""
+        self.on_log(f"[{self.name}] Error: {error}")
+        self.on_status(self.name, "ERROR")
+
+    def end_run(self):
+        """First step of a run's cleanup: stops its health checks. The caller kills and reaps the child if needed."""
+        if self.monitor:
+            self.monitor.close()
+
+    def close_run(self, tree):
+        """Last step of a run's cleanup, once the child is reaped and its leftovers stopped."""
+        if tree:
+            tree.close()
+        if self._output_handle:
+            self._output_handle.close()
+            self._output_handle = None
+
+    def next_delay(self):
+        """
+        After a run that ended on its own: the seconds to wait before the
+        next one (logging why, and reporting a parked crash loop), or None
+        if the app is not restarted.
+        """
+        if self.return_code and self.capture:
+            for message in self.capture.crash_report(): # The failed run's last output
+                self.on_log(message)
+        # An app killed by its health check is always restarted.
+        if not (self.unhealthy or self.proc_config.get('restart', False) or
+                (self.proc_config.get('restart_on_failure', False) and self.return_code != 0)):
+            self.on_log(f"[{self.name}] Process finished and will not be restarted.")
+            return None
+        decision = self.policy.next_restart(time.time() - self._started_at)
+        if stats.enabled:
+            stats.count('restarts')
+        if decision.delay:
+            self.on_log(self.policy.message(self.name, decision))
+            if decision.parked:
+                self.on_status(self.name, self.policy.parked_status(decision))
+        return decision.delay
+
+    def waited(self, seconds):
+        """Leaves the policy's delay out of the measured restart latency."""
+        if self.restart_clock is not None:
+            self.restart_clock += seconds
+
+    def close(self):
+        """Releases what lives for the whole supervision; may block on flushing output."""
+        if self.capture:
+            self.capture.close()
+        if self.enforcer:
+            self.enforcer.close()
+
+    def finished(self):
+        self.on_status(self.name, "STOPPED")
+        self.on_log(f"[{self.name}] Supervision finished.")
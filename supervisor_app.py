@@ -1,3 +1,4 @@
+import copy
 import json
 import sys
 import os
@@ -5,17 +6,37 @@ import ctypes
 import subprocess
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QTableWidget, QTableWidgetItem, QPushButton, QTextEdit, QHeaderView,
-    QGroupBox, QMessageBox, QMenu
+    QTableView, QPushButton, QHeaderView, QAbstractItemView,
+    QGroupBox, QMessageBox, QMenu, QInputDialog
 )
 from PySide6.QtGui import QIcon, QAction
 from PySide6.QtWidgets import QSystemTrayIcon
 from PySide6.QtCore import QThread, Slot, Qt
 from about_dialog import AboutDialog
-from supervisor_logic import SupervisorWorker
+from history_dialog import HistoryDialog
+from diagnostics_dialog import DiagnosticsDialog
+from output_viewer import OutputViewer, TailViewer
+from supervisor_logic import (SupervisorWorker, EngineBridge, MetricsBridge, StartupBridge, DaemonBridge, ShutdownBridge,
+                              RollingRestartBridge, OrphanBridge, JobBridge)
 from config_editor import ConfigEditor
+from log_console import LogConsole
+from process_table import ProcessTableModel, ActionsDelegate, NAME_COLUMN, STATUS_COLUMN, COMMAND_COLUMN, ACTIONS_COLUMN, METRIC_COLUMNS
 from paths import get_user_data_dir
 from utils import is_admin
+from metrics import MetricsSampler, pid_from_status
+from process_groups import expand_app, expand_apps, group_status, aggregate_metrics
+from config_reload import ConfigDiff, LIVE_FIELDS, read_config
+from control import ControlError, default_socket_path
+from event_journal import EventJournal, JOURNAL_FILE, DEFAULT_RETENTION_DAYS
+from metrics_exporter import MetricsExporter
+from shutdown import stop_layers, DEFAULT_TIMEOUT
+from restart_policy import configure_global_budget
+from listen_sockets import configure_listeners, registry as listen_registry
+from tail_buffer import configure_tail_buffers, buffers as tail_buffers
+from job_scheduler import is_job, run_config
+from instrumentation import stats, configure_instrumentation, control as diagnostics, SIGNAL_DISPATCH
+from combined_log import configure_combined_log, close_combined_log, log_message as record_combined_log
+from pathlib import Path
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -27,38 +48,164 @@ class MainWindow(QMainWindow):
         self.setGeometry(100, 100, 900, 650)
         self.threads = {}
         self.workers = {}
+        self.instances = {}        # app name -> [instance config, ...]
+        self.group_of = {}         # instance name -> app name
+        self.instance_status = {}  # instance name -> last status
+        self.engine_bridge = None
+        self.metrics_bridge = None
+        self.journal = None
+        self.exporter = None
+        self.startup_bridge = None
+        self.shutdown_bridges = [] # ShutdownBridges still stopping apps
+        self.output_viewers = []   # Open OutputViewer and TailViewer dialogs
+        self.rolls = {}            # group -> RollingRestartBridge in progress
+        self.orphan_bridge = None
+        self.orphans = []          # Processes apps left behind, as reported by the reaper
+        self.pending_restarts = {} # instance name -> config to start once it has stopped
+        self.job_bridge = None     # Schedules the apps that have a "schedule" (not when attached)
+        self.attached = False      # True when a running daemon owns the processes
         
         self.init_ui()
+        self.attach_daemon()
+        if not self.attached: self.init_jobs()
         self.load_config()
+        self.init_journal()
+        if self.attached: self.engine_bridge.start()
+        self.init_metrics()
+        self.init_exporter()
+        self.init_reaper()
         self.init_tray_icon()
         
     def init_ui(self):
         central_widget = QWidget()
         main_layout = QVBoxLayout(central_widget)
         self.setCentralWidget(central_widget)
-        self.process_table = QTableWidget()
-        self.process_table.setColumnCount(4)
-        self.process_table.setHorizontalHeaderLabels(["Name", "Status", "Command", "Actions"])
-        self.process_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
-        self.process_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
-        self.process_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
-        self.process_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
+        self.process_model = ProcessTableModel(self)
+        self.actions_delegate = ActionsDelegate(self, actions=("Start", "Stop", "Logs"))
+        self.actions_delegate.action_requested.connect(self.on_row_action)
+        self.process_table = QTableView()
+        self.process_table.setModel(self.process_model)
+        self.process_table.setItemDelegateForColumn(ACTIONS_COLUMN, self.actions_delegate)
+        self.process_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.process_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.process_table.verticalHeader().setDefaultSectionSize(30)
+        # Interactive + fixed widths avoid measuring every row on each update.
+        header = self.process_table.horizontalHeader()
+        header.setSectionResizeMode(NAME_COLUMN, QHeaderView.Interactive)
+        header.setSectionResizeMode(STATUS_COLUMN, QHeaderView.Interactive)
+        header.setSectionResizeMode(COMMAND_COLUMN, QHeaderView.Stretch)
+        header.setSectionResizeMode(ACTIONS_COLUMN, QHeaderView.Fixed)
+        header.resizeSection(NAME_COLUMN, 160)
+        header.resizeSection(STATUS_COLUMN, 160)
+        header.resizeSection(ACTIONS_COLUMN, self.actions_delegate.preferred_width())
+        self.process_table.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.process_table.customContextMenuRequested.connect(self.show_process_menu)
+        for column in METRIC_COLUMNS:
+            header.setSectionResizeMode(column, QHeaderView.Interactive)
+            header.resizeSection(column, 70)
         main_layout.addWidget(self.process_table)
-        self.log_viewer = QTextEdit()
-        self.log_viewer.setReadOnly(True)
+        self.log_viewer = LogConsole()
         main_layout.addWidget(self.log_viewer)
         button_layout = QHBoxLayout()
         self.start_all_button = QPushButton("Start All")
         self.stop_all_button = QPushButton("Stop All")
         self.edit_config_button = QPushButton("Edit Configuration")
+        self.history_button = QPushButton("History")
+        self.diagnostics_button = QPushButton("Diagnostics")
         button_layout.addWidget(self.start_all_button)
         button_layout.addWidget(self.stop_all_button)
         button_layout.addStretch()
+        button_layout.addWidget(self.history_button)
+        button_layout.addWidget(self.diagnostics_button)
         button_layout.addWidget(self.edit_config_button)
         main_layout.addLayout(button_layout)
         self.start_all_button.clicked.connect(self.start_all_processes)
         self.stop_all_button.clicked.connect(self.stop_all_processes)
         self.edit_config_button.clicked.connect(self.open_config_editor)
+        self.history_button.clicked.connect(lambda: self.show_history())
+        self.diagnostics_button.clicked.connect(self.show_diagnostics)
+
+    def show_diagnostics(self):
+        """The supervisor's own latencies, counters and profile: this process's, or the attached daemon's."""
+        DiagnosticsDialog(self.engine_bridge.engine.diagnostics if self.attached else diagnostics, self).exec()
+
+    def init_jobs(self):
+        """Starts the job scheduler; its runs are supervised here like any other instance."""
+        self.job_bridge = JobBridge()
+        self.job_bridge.start_requested.connect(self.run_job)
+        self.job_bridge.stop_requested.connect(lambda name: self.stop_runs([name]))
+        self.job_bridge.log_message.connect(self.append_log_message)
+        self.job_bridge.status_update.connect(self.update_process_status)
+
+    def attach_daemon(self):
+        """If a daemon (daemon.py) is running, show and control its apps instead of owning processes."""
+        socket_path = default_socket_path()
+        if not socket_path.exists(): return
+        try:
+            bridge = DaemonBridge(socket_path)
+        except ControlError:
+            return
+        bridge.log_message.connect(self.append_log_message)
+        bridge.status_update.connect(self.update_process_status)
+        self.engine_bridge, self.attached = bridge, True
+        self.config_path = Path(bridge.info['config'])
+        self.setWindowTitle(f"PySupervisor (attached to daemon, PID {bridge.info['pid']})")
+        self.append_log_message(f"Attached to the running daemon (PID {bridge.info['pid']}, config {self.config_path}).")
+
+    def init_journal(self):
+        """
+        Opens the event journal next to the config. When attached, the daemon
+        records into the same file and the window only reads it.
+        """
+        try:
+            self.journal = EventJournal(self.config_path.parent / JOURNAL_FILE, read_only=self.attached,
+                                        retention_days=self.config.get('journal_retention_days', DEFAULT_RETENTION_DAYS))
+        except Exception as e:
+            self.append_log_message(f"ERROR: Could not open the event journal; history is unavailable. {e}")
+        self.history_button.setEnabled(self.journal is not None)
+
+    def show_history(self, app=None):
+        if self.journal:
+            HistoryDialog(self.journal, [a['name'] for a in self.config.get('apps', [])], app, self).exec()
+
+    def init_metrics(self):
+        """Starts the background resource sampler (metrics_interval seconds, 0 disables)."""
+        interval = self.config.get('metrics_interval', 2.0)
+        if not interval or not MetricsSampler.available():
+            for column in METRIC_COLUMNS: self.process_table.setColumnHidden(column, True)
+            return
+        self.metrics_bridge = MetricsBridge(interval)
+        self.metrics_bridge.sampled.connect(self.update_metrics)
+        self.metrics_bridge.sampler.start()
+
+    def init_exporter(self):
+        """Serves Prometheus/OpenMetrics metrics at metrics_listen ("host:port") if it is set."""
+        listen = self.config.get('metrics_listen')
+        if not listen or self.attached: return # An attached daemon serves its own metrics
+        try:
+            # Resource usage comes from the window's sampler when it runs.
+            self.exporter = MetricsExporter(listen, sample=self.metrics_bridge is None)
+            self.exporter.set_instances(self.group_of)
+            self.exporter.start()
+            self.append_log_message(f"Serving metrics at {self.exporter.url}")
+        except (OSError, ValueError) as e:
+            self.exporter = None
+            self.append_log_message(f"ERROR: Could not serve metrics on {listen}. {e}")
+
+    def init_reaper(self):
+        """Reaps and reports the processes apps leave behind (Linux); an attached daemon does this itself."""
+        if self.attached: return
+        self.orphan_bridge = OrphanBridge()
+        self.orphan_bridge.log_message.connect(self.append_log_message)
+        self.orphan_bridge.changed.connect(self.update_orphans)
+
+    @Slot(object)
+    def update_orphans(self, orphans):
+        self.orphans = orphans
+        by_group = {}
+        for orphan in orphans:
+            by_group.setdefault(self.group_of.get(orphan['app'], orphan['app']), []).append(orphan)
+        self.process_model.update_orphans(by_group)
 
     def init_tray_icon(self):
         self.tray_icon = QSystemTrayIcon(self)
@@ -148,37 +295,235 @@ class MainWindow(QMainWindow):
                 with open(self.config_path, 'w') as f: json.dump(default_config, f, indent=2)
                 self.config = default_config
             else:
-                with open(self.config_path, 'r') as f: self.config = json.load(f)
+                self.config = read_config(self.config_path)
         except Exception as e:
             self.append_log_message(f"ERROR: Could not load or create config file. {e}")
             self.config = {"apps": []}
-        self.process_table.setRowCount(0)
-        for i, app_config in enumerate(self.config.get('apps', [])):
-            self.process_table.insertRow(i)
-            self.process_table.setItem(i, 0, QTableWidgetItem(app_config['name']))
-            self.process_table.setItem(i, 1, QTableWidgetItem("STOPPED"))
-            self.process_table.setItem(i, 2, QTableWidgetItem(' '.join(app_config['command'])))
-            self.add_action_buttons(i, app_config['name'])
-            
-    def add_action_buttons(self, row, name):
-        widget = QWidget()
-        layout = QHBoxLayout(widget)
-        layout.setContentsMargins(5, 0, 5, 0)
-        start_button, stop_button = QPushButton("Start"), QPushButton("Stop")
-        start_button.clicked.connect(lambda: self.start_process(name))
-        stop_button.clicked.connect(lambda: self.stop_process(name))
-        layout.addWidget(start_button)
-        layout.addWidget(stop_button)
-        self.process_table.setCellWidget(row, 3, widget)
+        configure_global_budget(self.config)
+        if self.job_bridge: self.job_bridge.scheduler.configure(self.config)
+        if not self.attached: configure_instrumentation(self.config)
+        if not self.attached: self.configure_combined_log(self.config)
+        if not self.attached: configure_tail_buffers(self.config, expand_apps(self.config.get('apps', [])))
+        self.log_viewer.set_max_lines(self.config.get('log_max_lines', 5000))
+        self.log_viewer.set_apps(app['name'] for app in self.config.get('apps', []))
+        self.process_model.set_apps(self.config.get('apps', []))
+        self.instances, self.group_of = {}, {}
+        for app_config in self.config.get('apps', []):
+            self.set_instances(app_config['name'], expand_app(app_config))
 
-    def start_process(self, name):
-        if name in self.threads and self.threads[name].isRunning(): return
+    def set_instances(self, name, instances):
+        for instance in self.instances.get(name, []):
+            self.group_of.pop(instance['name'], None)
+        self.instances[name] = instances
+        for instance in instances: self.group_of[instance['name']] = name
+        if self.exporter: self.exporter.set_instances(self.group_of)
+
+    def remove_instances(self, name):
+        for instance in self.instances.pop(name, []):
+            self.group_of.pop(instance['name'], None)
+            self.instance_status.pop(instance['name'], None)
+        if self.exporter: self.exporter.set_instances(self.group_of)
+
+    def show_process_menu(self, pos):
+        index = self.process_table.indexAt(pos)
+        if not index.isValid(): return
+        name = self.process_model.name_at(index.row())
+        menu = QMenu(self)
+        scale_action = menu.addAction("Scale Instances...")
+        scale_action.setEnabled(not self.attached) # The daemon's instance counts come from its config
+        job = self.is_job_group(name)
+        run_action = menu.addAction("Run Now")
+        run_action.setEnabled(job)
+        rolling_action = menu.addAction("Rolling Restart")
+        rolling_action.setEnabled(not job and name not in self.rolls and any(self.is_instance_running(i['name']) for i in self.instances.get(name, [])))
+        live_action = menu.addAction("Show Live Output...")
+        live_action.setEnabled(self.has_tail_buffer(name))
+        history_action = menu.addAction("Show History...")
+        history_action.setEnabled(self.journal is not None)
+        orphans = [o['app'] for o in self.orphans if self.group_of.get(o['app'], o['app']) == name]
+        orphans_action = menu.addAction(f"Kill Orphaned Processes ({len(orphans)})")
+        orphans_action.setEnabled(bool(orphans))
+        chosen = menu.exec(self.process_table.viewport().mapToGlobal(pos))
+        if chosen == history_action:
+            self.show_history(name)
+        elif chosen == run_action:
+            self.run_job_now(name)
+        elif chosen == live_action:
+            self.show_live_output(name)
+        elif chosen == orphans_action:
+            killed = self.orphan_bridge.reaper.kill_orphans(orphans)
+            self.append_log_message(f"[{name}] Killed {killed} orphaned process(es).")
+        elif chosen == rolling_action:
+            self.rolling_restart(name)
+        elif chosen == scale_action:
+            count, ok = QInputDialog.getInt(self, "Scale Instances", f"Number of instances for '{name}':",
+                                            len(self.instances.get(name, [])), 1, 1000)
+            if ok: self.scale_group(name, count)
+
+    def is_job_group(self, name):
+        return any(is_job(instance) for instance in self.instances.get(name, []))
+
+    def run_job_now(self, name):
+        """Runs a job's instances now, outside their schedule (its overlap policy still applies)."""
+        for instance in self.instances.get(name, []):
+            if self.attached: self.engine_bridge.engine.run_now(instance['name'])
+            elif not self.job_bridge.scheduler.run_now(instance['name']):
+                self.append_log_message(f"[{instance['name']}] Not scheduled; start it first.")
+
+    def rolling_restart(self, name):
+        """Restarts a group's instances one at a time, each once the previous one is ready again."""
+        if self.attached:
+            self.engine_bridge.engine.rolling_restart(name)
+            return
+        bridge = RollingRestartBridge(name, self.instances.get(name, []))
+        bridge.restart_requested.connect(self.restart_instance)
+        bridge.log_message.connect(self.append_log_message)
+        bridge.finished.connect(lambda group, completed: self.rolls.pop(group, None))
+        self.rolls[name] = bridge
+        bridge.roll.start({i['name']: self.instance_status.get(i['name'], "STOPPED") for i in self.instances.get(name, [])})
+
+    def scale_group(self, name, count):
+        """Changes how many instances of an app run, starting or stopping only the difference."""
         app_config = next((app for app in self.config['apps'] if app['name'] == name), None)
         if not app_config: return
+        old_count = len(self.instances.get(name, []))
+        self.replace_group(dict(app_config, instances=count))
+        self.append_log_message(f"[{name}] Scaled from {old_count} to {count} instance(s).")
+
+    def replace_group(self, app_config, restart=False):
+        """
+        Moves an app onto a new config. If it is running, surplus instances
+        stop and new ones start; the rest are restarted when `restart` is set
+        and otherwise keep running with the new live settings.
+        """
+        name = app_config['name']
+        old, new = self.instances.get(name, []), expand_app(app_config)
+        old_names, new_names = {i['name'] for i in old}, {i['name'] for i in new}
+        if is_job(app_config) or any(is_job(i) for i in old):
+            self.replace_job_group(name, old, new, restart)
+            return
+        group_running = any(self.is_instance_running(i['name']) for i in old)
+        for instance in old:
+            if instance['name'] not in new_names:
+                self.stop_instance(instance['name'])
+                self.instance_status.pop(instance['name'], None)
+        self.set_instances(name, new)
+        if group_running:
+            for instance in new:
+                if instance['name'] not in old_names: self.start_instance(instance)
+                elif restart: self.restart_instance(instance)
+                else: self.update_instance(instance)
+        self.refresh_group_status(name)
+
+    def replace_job_group(self, name, old, new, restart=False):
+        """
+        replace_group() for an app that is or becomes a job: instances that
+        went away (all of them with `restart`) are unscheduled and stopped,
+        and if any was active the new ones are (re)scheduled.
+        """
+        new_names = {i['name'] for i in new}
+        active = any(self.is_instance_running(i['name']) or self.job_bridge.scheduler.is_scheduled(i['name']) for i in old)
+        gone = [i['name'] for i in old if restart or i['name'] not in new_names]
+        self.stop_instances(gone)
+        for instance_name in gone:
+            if instance_name not in new_names: self.instance_status.pop(instance_name, None)
+        self.set_instances(name, new)
+        if active:
+            for instance in new: self.start_instance(instance)
+        self.refresh_group_status(name)
+
+    @Slot(str, str)
+    def on_row_action(self, name, action):
+        if action == "Start": self.start_process(name)
+        elif action == "Stop": self.stop_process(name)
+        elif action == "Logs": self.show_output(name)
+
+    def show_output(self, name):
+        """Opens the output files of an app's instances in an OutputViewer."""
+        paths = {instance['name']: self.effective_config(instance)['output']
+                 for instance in self.instances.get(name, []) if instance.get('output')}
+        if not paths and self.has_tail_buffer(name):
+            self.show_live_output(name)
+            return
+        if not paths:
+            QMessageBox.information(self, "No Output File", f"'{name}' has no output file configured.")
+            return
+        self.open_viewer(OutputViewer(paths, self))
+
+    def has_tail_buffer(self, name):
+        """True if an app keeps its latest output in tail buffers ("tail_buffer", per app or top-level)."""
+        return any(instance.get('tail_buffer', self.config.get('tail_buffer')) for instance in self.instances.get(name, []))
+
+    def show_live_output(self, name):
+        """Shows what an app's instances are printing, read from their tail buffers in shared memory."""
+        names = [instance['name'] for instance in self.instances.get(name, [])]
+        paths = (self.engine_bridge.engine.live(names) if self.attached else tail_buffers.paths(set(names))) or {}
+        if not paths:
+            QMessageBox.information(self, "No Live Output", f"'{name}' has not been started with a tail buffer yet.")
+            return
+        self.open_viewer(TailViewer(paths, self))
+
+    def open_viewer(self, viewer):
+        viewer.finished.connect(lambda result, viewer=viewer: self.output_viewers.remove(viewer))
+        self.output_viewers.append(viewer)
+        viewer.show()
+
+    def uses_engine(self):
+        """True when attached to a daemon or config.json selects the single-loop asyncio engine ("engine": "asyncio")."""
+        return self.attached or self.config.get('engine') == 'asyncio'
+
+    def get_engine(self):
+        if self.engine_bridge is None:
+            self.engine_bridge = EngineBridge()
+            self.engine_bridge.log_message.connect(self.append_log_message)
+            self.engine_bridge.status_update.connect(self.update_process_status)
+        return self.engine_bridge.engine
+
+    def is_instance_running(self, name):
+        if self.engine_bridge and self.engine_bridge.engine.is_app_running(name): return True
+        return name in self.threads and self.threads[name].isRunning()
+
+    def start_process(self, name):
+        """Starts every instance of an app; they are supervised in parallel."""
+        for instance in self.instances.get(name, []): self.start_instance(instance)
+
+    def stop_process(self, name):
+        if self.attached:
+            for instance in self.instances.get(name, []): self.stop_instance(instance['name'])
+        else:
+            self.stop_instances([instance['name'] for instance in self.instances.get(name, [])])
+
+    def effective_config(self, app_config):
+        """The instance config with its output path resolved against the user data directory."""
         effective_config = app_config.copy()
         if effective_config.get('output'):
             log_path = self.user_data_dir / effective_config['output']
             effective_config['output'] = str(log_path)
+        return effective_config
+
+    def start_instance(self, app_config):
+        """Supervises an instance, or for a job, schedules it."""
+        if is_job(app_config) and not self.attached:
+            self.job_bridge.scheduler.schedule(app_config)
+        else:
+            self.launch_instance(app_config)
+
+    @Slot(str)
+    def run_job(self, name):
+        """Starts one run of a job (requested by the job scheduler)."""
+        instance = next((i for i in self.instances.get(self.group_of.get(name), []) if i['name'] == name), None)
+        if instance is None: return
+        # The previous run's thread was told to quit when it reported STOPPED.
+        if name in self.threads: self.threads[name].wait(1000)
+        self.launch_instance(run_config(instance))
+
+    def launch_instance(self, app_config):
+        name = app_config['name']
+        if name in self.threads and self.threads[name].isRunning(): return
+        effective_config = self.effective_config(app_config)
+        if self.uses_engine():
+            self.get_engine().start_app(effective_config)
+            return
         worker = SupervisorWorker(effective_config)
         thread = QThread()
         worker.moveToThread(thread)
@@ -188,22 +533,147 @@ class MainWindow(QMainWindow):
         self.threads[name], self.workers[name] = thread, worker
         thread.start()
 
-    def stop_process(self, name):
-        if name in self.workers and name in self.threads and self.threads[name].isRunning(): self.workers[name].stop()
+    def restart_instance(self, app_config):
+        """Restarts one instance with a new config; a job runs now instead."""
+        name = app_config['name']
+        if is_job(app_config) and not self.attached:
+            self.job_bridge.scheduler.run_now(name)
+        elif self.uses_engine():
+            self.get_engine().restart_app(self.effective_config(app_config))
+        elif name in self.threads and self.threads[name].isRunning():
+            # The worker's thread finishes asynchronously; start again once it reports STOPPED.
+            self.pending_restarts[name] = app_config
+            self.workers[name].stop()
+        else:
+            self.launch_instance(app_config)
+
+    def update_instance(self, app_config):
+        """Hands a running instance the settings it reads live (restart policy and the like)."""
+        values = {key: app_config.get(key) for key in LIVE_FIELDS}
+        if self.job_bridge and self.job_bridge.scheduler.is_scheduled(app_config['name']):
+            self.job_bridge.scheduler.schedule(app_config) # A changed schedule applies from now
+        if self.engine_bridge: self.engine_bridge.engine.update_app_config(app_config['name'], values)
+        if app_config['name'] in self.workers: self.workers[app_config['name']].proc_config.update(values)
+
+    def stop_instance(self, name):
+        if self.attached:
+            if self.engine_bridge.engine.is_app_running(name): self.engine_bridge.engine.stop_app(name)
+        else:
+            self.stop_instances([name])
+
+    def shutdown_targets(self, names=None):
+        """{instance name: supervisor} for the running instances (all, or those in `names`), for a ShutdownCoordinator."""
+        targets = {name: worker.supervisor for name, worker in self.workers.items()
+                   if (names is None or name in names) and self.threads[name].isRunning()}
+        if self.engine_bridge: targets.update(self.engine_bridge.engine.stop_targets(names))
+        return targets
+
+    def shutdown_bridge(self, targets):
+        """A ShutdownBridge for `targets`, with the stop order and deadline from config.json."""
+        bridge = ShutdownBridge(self.config.get('shutdown_timeout', DEFAULT_TIMEOUT))
+        bridge.log_message.connect(self.append_log_message)
+        layers = stop_layers(self.config.get('apps', []), self.group_of, targets,
+                             ordered=self.config.get('stop_order') == 'dependencies')
+        return bridge, layers
+
+    def stop_instances(self, names=None):
+        """Stops instances (all when `names` is None) in parallel against one deadline, off the GUI thread; jobs are unscheduled."""
+        if self.job_bridge: self.job_bridge.scheduler.unschedule(names)
+        self.stop_runs(names)
+
+    def stop_runs(self, names=None):
+        """stop_instances() that leaves jobs scheduled, e.g. to replace a job's run with a new one."""
+        targets = self.shutdown_targets(names)
+        if not targets: return
+        bridge, layers = self.shutdown_bridge(targets)
+        bridge.finished.connect(self.on_shutdown_finished)
+        self.shutdown_bridges.append(bridge)
+        bridge.start(targets, layers)
+
+    @Slot(object)
+    def on_shutdown_finished(self, result):
+        if self.sender() in self.shutdown_bridges: self.shutdown_bridges.remove(self.sender())
 
     def start_all_processes(self):
-        for app in self.config.get('apps', []): self.start_process(app['name'])
+        """Starts every app, each one as soon as the apps it depends_on are ready."""
+        if self.attached:
+            self.engine_bridge.engine.start_all()
+            return
+        try:
+            bridge = StartupBridge(self.config.get('apps', []))
+        except ValueError as e:
+            self.append_log_message(f"ERROR: Cannot start apps: {e}")
+            QMessageBox.critical(self, "Startup Order", f"Cannot start apps: {e}")
+            return
+        if self.startup_bridge: self.startup_bridge.coordinator.cancel()
+        bridge.start_requested.connect(self.start_planned_process)
+        bridge.log_message.connect(self.append_log_message)
+        self.startup_bridge = bridge
+        bridge.coordinator.start()
+
+    @Slot(str)
+    def start_planned_process(self, name):
+        self.start_process(name)
+        # A job is ready for its dependents once it is scheduled.
+        if self.startup_bridge and self.is_job_group(name): self.startup_bridge.coordinator.mark_ready(name)
+        # Apps that were already running send no new status, so report the current one.
+        if self.startup_bridge: self.startup_bridge.coordinator.notify_status(name, self.group_status_of(name))
 
     def stop_all_processes(self):
-        for app in self.config.get('apps', []): self.stop_process(app['name'])
+        if self.attached:
+            self.engine_bridge.engine.stop_all()
+            return
+        if self.startup_bridge: self.startup_bridge.coordinator.cancel()
+        self.stop_instances()
 
     def open_config_editor(self):
+        old_config = copy.deepcopy(self.config)
         dialog = ConfigEditor(self, self.config, self.config_path)
         if dialog.exec():
-            self.stop_all_processes()
-            self.load_config()
-            self.append_log_message("Configuration reloaded.")
+            self.apply_config(old_config, self.config)
+        else:
+            self.config = old_config # The editor works on the config in place
+
+    def apply_config(self, old_config, new_config):
+        """
+        Applies a new config by diffing it against the old one: added apps
+        start, removed apps stop, changed apps restart only if a field other
+        than the live ones (restart policy, dependencies, instance count)
+        changed, and everything else keeps running untouched.
+        """
+        diff = ConfigDiff(old_config, new_config)
+        self.config = new_config
+        configure_global_budget(new_config)
+        if self.job_bridge: self.job_bridge.scheduler.configure(new_config)
+        if not self.attached: self.configure_combined_log(new_config)
+        self.log_viewer.set_max_lines(new_config.get('log_max_lines', 5000))
+        self.log_viewer.set_apps(app['name'] for app in new_config.get('apps', []))
+        # When attached, the daemon applies the same diff to the processes on reload.
+        for app in diff.removed:
+            if not self.attached: self.stop_process(app['name'])
+            self.process_model.remove_app(app['name'])
+            self.remove_instances(app['name'])
+        for change in diff.changed:
+            self.process_model.update_app(change.new)
+            if self.attached: self.set_instances(change.name, expand_app(change.new))
+            else: self.replace_group(change.new, restart=change.needs_restart)
+        for app in diff.added:
+            self.process_model.add_app(app)
+            self.set_instances(app['name'], expand_app(app))
+            if not self.attached: self.start_process(app['name'])
+        if self.attached: self.engine_bridge.engine.reload()
+        else:
+            configure_listeners(expand_apps(new_config.get('apps', []))) # Sockets no app lists any more
+            configure_tail_buffers(new_config, expand_apps(new_config.get('apps', [])))
+        self.append_log_message(f"Configuration reloaded: {diff.summary()}.")
     
+    def configure_combined_log(self, config):
+        """Opens, reopens or closes the combined JSON-lines log set by "combined_log" in config.json."""
+        try:
+            configure_combined_log(config, self.config_path.parent)
+        except OSError as e:
+            self.append_log_message(f"ERROR: Could not open the combined log {config.get('combined_log')}: {e}")
+
     def closeEvent(self, event):
         if self.tray_icon.isVisible():
             event.ignore()
@@ -211,18 +681,66 @@ class MainWindow(QMainWindow):
             self.tray_icon.showMessage("PySupervisor", "Application was minimized to tray.", QSystemTrayIcon.Information, 2000)
 
     def force_quit(self):
-        self.stop_all_processes()
+        for roll in self.rolls.values(): roll.roll.cancel()
+        if self.attached:
+            self.engine_bridge.stop() # Detach; the daemon keeps its apps running
+        else:
+            if self.startup_bridge: self.startup_bridge.coordinator.cancel()
+            self.job_bridge.scheduler.stop()
+            self.job_bridge.scheduler.unschedule()
+            targets = self.shutdown_targets()
+            bridge, layers = self.shutdown_bridge(targets)
+            bridge.run(targets, layers)
+        # The workers have returned; end their threads here rather than waiting on queued STOPPED statuses.
         for thread in self.threads.values():
-            if thread.isRunning(): thread.wait(5000)
+            thread.quit()
+            thread.wait(1000)
+        if self.engine_bridge and not self.attached: self.engine_bridge.engine.shutdown(timeout=10)
+        listen_registry.close_all()
+        tail_buffers.close_all()
+        if self.orphan_bridge: self.orphan_bridge.reaper.stop()
+        if self.metrics_bridge: self.metrics_bridge.sampler.stop()
+        if self.journal: self.journal.close()
+        close_combined_log()
+        if self.exporter: self.exporter.stop()
         QApplication.instance().quit()
     
     @Slot(str)
-    def append_log_message(self, message): self.log_viewer.append(message)
+    def append_log_message(self, message):
+        self.log_viewer.append_message(message)
+        if self.exporter: self.exporter.record_log(message)
+        record_combined_log(message)
+
+    def group_status_of(self, group):
+        statuses = [self.instance_status.get(i['name'], "STOPPED") for i in self.instances.get(group, [])]
+        return group_status(statuses) if statuses else "STOPPED"
+
+    def refresh_group_status(self, group):
+        if not self.instances.get(group): return
+        status = self.group_status_of(group)
+        self.process_model.update_status(group, status)
+        if self.startup_bridge: self.startup_bridge.coordinator.notify_status(group, status)
+
+    @Slot(object)
+    def update_metrics(self, snapshot):
+        self.process_model.update_metrics(aggregate_metrics(snapshot, self.group_of))
+        if self.exporter: self.exporter.update_resources(snapshot)
 
     @Slot(str, str)
     def update_process_status(self, name, status):
-        for row in range(self.process_table.rowCount()):
-            if self.process_table.item(row, 0).text() == name:
-                self.process_table.setItem(row, 1, QTableWidgetItem(status))
-                if (status.startswith("STOPPED") or status.startswith("ERROR")) and name in self.threads: self.threads[name].quit()
-                break
+        if stats.enabled: stats.end_mark(SIGNAL_DISPATCH, name)
+        self.instance_status[name] = status
+        roll = self.rolls.get(self.group_of.get(name, name))
+        if roll: roll.roll.notify_status(name, status)
+        if self.journal: self.journal.record_status(self.group_of.get(name, name), name, status)
+        if self.exporter: self.exporter.record_status(self.group_of.get(name, name), name, status)
+        self.refresh_group_status(self.group_of.get(name, name))
+        if self.metrics_bridge:
+            pid = pid_from_status(status)
+            if pid: self.metrics_bridge.sampler.track(name, pid)
+            else: self.metrics_bridge.sampler.untrack(name)
+        if (status.startswith("STOPPED") or status.startswith("ERROR")) and name in self.threads: self.threads[name].quit()
+        if status == "STOPPED" and name in self.pending_restarts:
+            if name in self.threads: self.threads[name].wait()
+            self.start_instance(self.pending_restarts.pop(name))
+        if self.job_bridge: self.job_bridge.scheduler.notify_status(name, status)
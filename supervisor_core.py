@@ -0,0 +1,120 @@
+import subprocess
+import threading
+import time
+from exit_watcher import ExitWatcher
+from shutdown import stop_signal
+from supervision import Supervision
+from instrumentation import stats, EXIT_DETECTION
+
+STOP_TIMEOUT = 5
+
+
+class ProcessSupervisor:
+    """
+    Supervises one app on the calling thread: starts it, waits for it to
+    exit and applies the restart policy. Qt-free; on_log(message) and
+    on_status(name, status) are called from the supervising thread.
+    SupervisorWorker wraps this for the GUI.
+    """
+    def __init__(self, proc_config, on_log=print, on_status=None):
+        self.proc_config = proc_config
+        self.on_log = on_log
+        self.on_status = on_status or (lambda name, status: None)
+        self.is_running = True
+        self.process = None
+        self.tree = None          # ProcessTree of the current run
+        self.exit_watcher = None
+        self.finished = threading.Event() # Set once run() has returned
+        self._stop_event = threading.Event()
+
+    def run(self):
+        """Main supervision loop for a single process."""
+        try:
+            self._run()
+        finally:
+            self.finished.set()
+
+    def _run(self):
+        run = Supervision(self.proc_config, self.on_log, self.on_status)
+        capture = run.capture
+        while self.is_running:
+            try:
+                argv, kwargs = run.spawn_args()
+                self.process = subprocess.Popen(argv, **kwargs)
+                self.tree = run.started(self.process, self.kill_run)
+                if capture:
+                    capture.attach(self.process)
+                self.exit_watcher = ExitWatcher(self.process)
+
+                # Blocks until the child exits or stop() wakes us up.
+                return_code = self.exit_watcher.wait() if self.is_running else None
+                detected = None
+                if return_code is not None and stats.enabled and self.exit_watcher.exit_seen:
+                    detected = time.perf_counter()
+                    stats.record(EXIT_DETECTION, detected - self.exit_watcher.exit_seen)
+                    stats.count('exits')
+                run.exited(return_code, self.is_running, detected)
+
+            except Exception as e:
+                run.failed(e)
+                self.is_running = False # Stop on critical errors
+            finally:
+                run.end_run()
+                tree, self.tree = self.tree, None
+                if tree:
+                    if self.process.poll() is None:
+                        tree.kill() # Ensure it's dead before the loop continues
+                        self.process.wait()
+                    # Whatever the app left running goes too; on a stop it already had its signal.
+                    tree.stop_leftovers(stop_signal(self.proc_config) if self.is_running else None, self.on_log)
+                run.close_run(tree)
+                if self.exit_watcher:
+                    self.exit_watcher.close()
+                    self.exit_watcher = None
+                if capture:
+                    capture.drain()
+
+            if not self.is_running:
+                break
+            delay = run.next_delay()
+            if delay is None:
+                break # Exit the loop if no restart is configured
+            if delay:
+                paused = time.perf_counter()
+                self._stop_event.wait(delay)
+                run.waited(time.perf_counter() - paused)
+
+        run.close()
+        run.finished()
+
+    def request_stop(self):
+        """Ends the supervision loop and sends the child its stop signal, without waiting."""
+        self.on_log(f"[{self.proc_config['name']}] Received stop signal.")
+        self.is_running = False
+        self._stop_event.set()
+        tree = self.tree
+        if tree and self.process.poll() is None:
+            tree.signal(stop_signal(self.proc_config))
+
+    def kill_run(self):
+        """Kills the current run's process tree, unless its child has been reaped already; safe from any thread."""
+        tree, process = self.tree, self.process
+        if tree and process and process.returncode is None:
+            tree.kill()
+
+    def kill(self):
+        """Kills the child and its descendants outright; for apps that ignore their stop signal."""
+        self.kill_run()
+        watcher = self.exit_watcher
+        if watcher:
+            watcher.wake()
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """Stops the supervision loop and the child, killing it after `timeout` seconds."""
+        self.request_stop()
+        if self.process and self.process.poll() is None:
+            try:
+                self.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                pass
+        self.kill()
@@ -0,0 +1,352 @@
+import asyncio
+import functools
+import os
+import subprocess
+import sys
+import threading
+import time
+from exit_watcher import POLL_INTERVAL
+from shutdown import stop_signal
+from supervision import Supervision
+from instrumentation import stats, EXIT_DETECTION
+
+STOP_TIMEOUT = 5
+
+
+class _Child:
+    """
+    A subprocess.Popen spawned on the executor, with the face of an asyncio
+    Process for the loop: `stdout`/`stderr` StreamReaders and wait(). Its
+    exit is seen through a pidfd on the loop and reaped there, so no
+    thread waits on it; where pidfds are unavailable after all, the loop
+    polls it every POLL_INTERVAL.
+    """
+    def __init__(self, popen):
+        self.popen = popen
+        self.pid = popen.pid
+        self.stdout = self.stderr = None
+        self._loop = asyncio.get_running_loop()
+        self._exited = self._loop.create_future()
+        self._transports = []
+        self._fd = None
+        try:
+            self._fd = os.pidfd_open(self.pid)
+            self._loop.add_reader(self._fd, self._on_exit)
+        except OSError:
+            self._close_fd()
+            self._poller = asyncio.ensure_future(self._poll())
+
+    @classmethod
+    async def wrap(cls, popen):
+        child = cls(popen)
+        for name in ('stdout', 'stderr'):
+            pipe = getattr(popen, name)
+            if pipe:
+                reader = asyncio.StreamReader()
+                transport, _ = await child._loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+                child._transports.append(transport)
+                setattr(child, name, reader)
+        return child
+
+    @property
+    def returncode(self):
+        return self.popen.returncode
+
+    async def wait(self):
+        return await asyncio.shield(self._exited)
+
+    def _on_exit(self):
+        if self.popen.poll() is None:
+            return
+        self._close_fd()
+        if not self._exited.done():
+            self._exited.set_result(self.popen.returncode)
+
+    async def _poll(self):
+        while self.popen.poll() is None:
+            await asyncio.sleep(POLL_INTERVAL)
+        if not self._exited.done():
+            self._exited.set_result(self.popen.returncode)
+
+    def _close_fd(self):
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+
+    def close(self):
+        """Closes whatever of its pipes is still open, once its pumps are done with them."""
+        for transport in self._transports:
+            transport.close()
+
+
+class _ExitClock:
+    """
+    With instrumentation on: watches a child's pidfd on the event loop to
+    note when the kernel reported its exit, and stop() records how long
+    after that `await process.wait()` returned.
+    """
+    def __init__(self, pid):
+        self.exited = None
+        self._fd = os.pidfd_open(pid)
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self._fd, self._on_exit)
+
+    def _on_exit(self):
+        self.exited = time.perf_counter()
+        self._loop.remove_reader(self._fd)
+
+    def stop(self):
+        """Records the exit detection latency; returns when the exit was detected (None if it wasn't seen)."""
+        detected = time.perf_counter()
+        self._loop.remove_reader(self._fd)
+        os.close(self._fd)
+        if self.exited is None:
+            return None
+        stats.record(EXIT_DETECTION, detected - self.exited)
+        stats.count('exits')
+        return detected
+
+
+class _AppRunner:
+    """Supervises one app as a task on the engine's loop; the steps are shared with ProcessSupervisor (see Supervision)."""
+    def __init__(self, engine, proc_config):
+        self.engine = engine
+        self.proc_config = proc_config
+        self.name = proc_config['name']
+        self.is_running = True
+        self.process = None
+        self.tree = None          # ProcessTree of the current run
+        self.task = None
+        self.finished = threading.Event() # Set once run() has returned; waitable from any thread
+        self._stop_event = asyncio.Event()
+
+    async def run(self):
+        try:
+            await self._run()
+        finally:
+            self.finished.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        # Opening output files and creating the cgroup block, so they happen on the executor.
+        run = await loop.run_in_executor(None, Supervision, self.proc_config, self._log, self.engine.on_status)
+        capture = run.capture
+        while self.is_running:
+            pumps = []
+            try:
+                self.process = await self._spawn(run)
+                self.tree = run.started(self.process, self.kill)
+                if not self.is_running: # Stopped while it was spawning
+                    self._signal(stop_signal(self.proc_config))
+                if capture:
+                    pumps = [asyncio.ensure_future(capture.pump_async(s, n, self.process.pid))
+                             for s, n in ((self.process.stdout, 'stdout'), (self.process.stderr, 'stderr'))]
+
+                exit_clock = self._exit_clock() if stats.enabled else None
+                detected = None
+                try:
+                    return_code = await self.process.wait()
+                finally:
+                    if exit_clock:
+                        detected = exit_clock.stop()
+                run.exited(return_code, self.is_running, detected)
+
+            except Exception as e:
+                run.failed(e)
+                self.is_running = False # Stop on critical errors
+            finally:
+                run.end_run()
+                tree, self.tree = self.tree, None
+                if tree:
+                    # Killing and looking for leftovers walk /proc, so they happen on the executor.
+                    if self.process.returncode is None:
+                        await loop.run_in_executor(None, tree.kill)
+                        await self.process.wait()
+                    # Whatever the app left running goes too; on a stop it already had its signal.
+                    sig = stop_signal(self.proc_config) if self.is_running else None
+                    await loop.run_in_executor(None, tree.stop_leftovers, sig, self._log)
+                run.close_run(tree)
+                if pumps:
+                    await asyncio.wait(pumps, timeout=2.0)
+                    for pump in pumps: pump.cancel()
+                if isinstance(self.process, _Child):
+                    self.process.close()
+
+            if not self.is_running:
+                break
+            delay = run.next_delay()
+            if delay is None:
+                break
+            if delay:
+                paused = time.perf_counter()
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                run.waited(time.perf_counter() - paused)
+
+        await loop.run_in_executor(None, run.close)
+        run.finished()
+
+    async def _spawn(self, run):
+        """
+        Starts the run's child without blocking the loop: fork/exec, opening
+        its output and joining its cgroup happen on the executor. Without
+        pidfds to watch it from the loop, asyncio spawns it instead.
+        """
+        loop = asyncio.get_running_loop()
+        argv, kwargs = await loop.run_in_executor(None, run.spawn_args)
+        if sys.platform == "win32" or not hasattr(os, 'pidfd_open'):
+            return await asyncio.create_subprocess_exec(*argv, **kwargs)
+        popen = await loop.run_in_executor(None, functools.partial(subprocess.Popen, argv, **kwargs))
+        return await _Child.wrap(popen)
+
+    def _log(self, message):
+        """on_log for the run's steps, some of which run on the executor or other threads; calls it on the engine thread."""
+        if threading.current_thread() is self.engine.thread:
+            self.engine.on_log(message)
+        else:
+            self.engine.loop.call_soon_threadsafe(self.engine.on_log, message)
+
+    def _signal(self, sig=None):
+        """Signals the current child's tree (SIGKILLs it if `sig` is None) on the executor, as that walks /proc."""
+        if self.tree and self.process.returncode is None:
+            work = self.tree.kill if sig is None else functools.partial(self.tree.signal, sig)
+            self.engine.loop.run_in_executor(None, work)
+
+    def _exit_clock(self):
+        """An _ExitClock for the current child, or None where pidfds are unavailable."""
+        try:
+            return _ExitClock(self.process.pid)
+        except (AttributeError, OSError):
+            return None
+
+    def _request_stop(self):
+        self.engine.on_log(f"[{self.name}] Received stop signal.")
+        self.is_running = False
+        self._stop_event.set()
+        self._signal(stop_signal(self.proc_config))
+
+    def _kill(self):
+        self._signal()
+
+    # Thread-safe entry points for ShutdownCoordinator.
+    def request_stop(self):
+        self.engine.loop.call_soon_threadsafe(self._request_stop)
+
+    def kill(self):
+        self.engine.loop.call_soon_threadsafe(self._kill)
+
+    async def stop(self):
+        self._request_stop()
+        process = self.process
+        if process and process.returncode is None:
+            try:
+                await asyncio.wait_for(process.wait(), float(self.proc_config.get('stop_timeout') or STOP_TIMEOUT))
+            except asyncio.TimeoutError:
+                self._kill()
+        if self.task:
+            await self.task
+
+
+class SupervisorEngine:
+    """
+    Supervises every app from a single asyncio event loop running in one
+    background thread, instead of one thread per app. What blocks (fork/exec,
+    cgroup setup, walking /proc to signal or clean up a process tree) runs
+    on the loop's default executor, a small pool. Callbacks are invoked
+    on the engine thread; Qt users should pass signal .emit methods so the
+    calls are queued to the GUI thread.
+    """
+    def __init__(self, on_log=print, on_status=None):
+        self.on_log = on_log
+        self.on_status = on_status or (lambda name, status: None)
+        self.loop = None
+        self.thread = None
+        self.runners = {}
+        self._ready = threading.Event()
+
+    def start(self):
+        """Starts the event loop thread. Safe to call more than once."""
+        if self.thread and self.thread.is_alive():
+            return
+        self._ready.clear()
+        self.thread = threading.Thread(target=self._run_loop, name="SupervisorEngine", daemon=True)
+        self.thread.start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        if sys.platform == "win32":
+            self.loop = asyncio.ProactorEventLoop()
+        else:
+            self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def _call(self, coro, wait=False, timeout=None):
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return future.result(timeout) if wait else future
+
+    def is_app_running(self, name):
+        runner = self.runners.get(name)
+        return runner is not None and runner.task is not None and not runner.task.done()
+
+    def start_app(self, proc_config):
+        """Begins supervising an app. Ignored if it is already supervised."""
+        return self._call(self._start_app(proc_config))
+
+    async def _start_app(self, proc_config):
+        if self.is_app_running(proc_config['name']):
+            return
+        runner = _AppRunner(self, proc_config)
+        runner.task = asyncio.ensure_future(runner.run())
+        self.runners[runner.name] = runner
+
+    def restart_app(self, proc_config, wait=False):
+        """Stops the app if it is supervised, then supervises it again with proc_config."""
+        return self._call(self._restart_app(proc_config), wait)
+
+    async def _restart_app(self, proc_config):
+        await self._stop_apps([proc_config['name']])
+        await self._start_app(proc_config)
+
+    def update_app_config(self, name, values):
+        """Updates settings a running app reads live, such as its restart policy."""
+        runner = self.runners.get(name)
+        if runner:
+            runner.proc_config.update(values)
+
+    def stop_app(self, name, wait=False):
+        """Stops one app's supervision and terminates its process."""
+        return self._call(self._stop_apps([name]), wait)
+
+    def stop_apps(self, names, wait=False):
+        """Stops several apps concurrently."""
+        return self._call(self._stop_apps(list(names)), wait)
+
+    def stop_targets(self, names=None):
+        """{name: runner} for the supervised apps (all, or those in `names`), for a ShutdownCoordinator."""
+        names = list(self.runners) if names is None else names
+        return {name: self.runners[name] for name in names if self.is_app_running(name)}
+
+    def stop_all(self, wait=False):
+        """Stops every app concurrently."""
+        return self._call(self._stop_apps(list(self.runners)), wait)
+
+    async def _stop_apps(self, names):
+        runners = [self.runners[n] for n in names if self.is_app_running(n)]
+        await asyncio.gather(*(runner.stop() for runner in runners), return_exceptions=True)
+
+    def shutdown(self, timeout=None):
+        """Stops every app, then the event loop thread itself."""
+        if not (self.thread and self.thread.is_alive()):
+            return
+        self.stop_all(wait=True)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
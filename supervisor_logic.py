@@ -1,91 +1,202 @@
-import time
-import subprocess
-import logging
-import sys
-import os
+import threading
 from PySide6.QtCore import QObject, Signal, Slot
+from supervisor_core import ProcessSupervisor
+from supervisor_engine import SupervisorEngine
+from metrics import MetricsSampler
+from startup_planner import StartupCoordinator
+from shutdown import ShutdownCoordinator
+from rolling_restart import RollingRestart
+from job_scheduler import JobScheduler
+from process_tree import reaper
+from control import ControlClient, ControlError, RemoteEngine
+from instrumentation import stats, SIGNAL_DISPATCH
+
+
+def timed_status(signal):
+    """
+    An on_status callback emitting `signal`; with instrumentation on it
+    marks when each update left, and the GUI thread's handler ends the
+    span, timing the queued hop between threads.
+    """
+    def on_status(name, status):
+        if stats.enabled:
+            stats.mark(SIGNAL_DISPATCH, name)
+            stats.count('status_updates')
+        signal.emit(name, status)
+    return on_status
+
 
 class SupervisorWorker(QObject):
     """
     This worker runs in a separate thread and handles the actual
     process supervision. It communicates with the main GUI thread via signals.
+    The supervision loop itself is the Qt-free ProcessSupervisor.
     """
     log_message = Signal(str)
     status_update = Signal(str, str) # name, status
 
     def __init__(self, proc_config):
         super().__init__()
-        self.proc_config = proc_config
-        self.is_running = True
-        self.process = None
+        self.supervisor = ProcessSupervisor(proc_config, on_log=self.log_message.emit, on_status=timed_status(self.status_update))
+
+    @property
+    def proc_config(self):
+        return self.supervisor.proc_config
 
     @Slot()
     def run(self):
         """Main supervision loop for a single process."""
-        name = self.proc_config['name']
-        command = self.proc_config['command']
-        
-        restart_delay = 1
-        MAX_RESTART_DELAY = 60
-        
-        output_handle = None
-
-        while self.is_running:
-            process_start_time = time.time()
-            try:
-                self.log_message.emit(f"[{name}] Starting command: {' '.join(command)}")
-                creation_flags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
-                output_handle = open(self.proc_config.get('output', os.devnull), 'ab', buffering=0)
-
-                self.process = subprocess.Popen(
-                    command, stdout=output_handle, stderr=subprocess.STDOUT, creationflags=creation_flags
-                )
-                self.status_update.emit(name, f"RUNNING (PID: {self.process.pid})")
-
-                while self.is_running:
-                    return_code = self.process.poll()
-                    if return_code is not None:
-                        self.log_message.emit(f"[{name}] Process exited with code {return_code}.")
-                        self.status_update.emit(name, f"STOPPED (Code: {return_code})")
-                        break
-                    time.sleep(0.5)
-
-            except Exception as e:
-                self.log_message.emit(f"[{name}] Error: {e}")
-                self.status_update.emit(name, "ERROR")
-                self.is_running = False # Stop on critical errors
-            finally:
-                if self.process:
-                    self.process.kill() # Ensure it's dead before loop continues
-                if output_handle:
-                    output_handle.close()
-            
-            if not self.is_running:
-                break
-
-            # Restart logic
-            if self.proc_config.get('restart', False) or (self.proc_config.get('restart_on_failure', False) and return_code != 0):
-                uptime = time.time() - process_start_time
-                if uptime < 5: # Fast fail
-                    self.log_message.emit(f"[{name}] Process failed quickly. Waiting {restart_delay}s.")
-                    time.sleep(restart_delay)
-                    restart_delay = min(restart_delay * 2, MAX_RESTART_DELAY)
-                else:
-                    restart_delay = 1
-            else:
-                self.log_message.emit(f"[{name}] Process finished and will not be restarted.")
-                break # Exit the loop if no restart is configured
-
-        self.status_update.emit(name, "STOPPED")
-        self.log_message.emit(f"[{name}] Supervision finished.")
+        threading.current_thread().name = f"Supervisor-{self.proc_config['name']}" # Names its counters in diagnostics
+        self.supervisor.run()
 
     def stop(self):
         """Stops the supervision loop and terminates the child process."""
-        self.log_message.emit(f"[{self.proc_config['name']}] Received stop signal.")
-        self.is_running = False
-        if self.process and self.process.poll() is None:
-            self.process.terminate()
+        self.supervisor.stop()
+
+
+class EngineBridge(QObject):
+    """
+    Owns a SupervisorEngine and re-emits its callbacks as Qt signals, so the
+    GUI can drive every app from the engine's single event loop thread
+    using the same signals a SupervisorWorker would send.
+    """
+    log_message = Signal(str)
+    status_update = Signal(str, str) # name, status
+
+    def __init__(self):
+        super().__init__()
+        self.engine = SupervisorEngine(on_log=self.log_message.emit, on_status=timed_status(self.status_update))
+
+
+class MetricsBridge(QObject):
+    """Runs a MetricsSampler and delivers each snapshot to the GUI thread as a signal."""
+    sampled = Signal(object) # {name: {'cpu', 'rss', 'fds', 'threads'}}
+
+    def __init__(self, interval=2.0):
+        super().__init__()
+        self.sampler = MetricsSampler(interval, on_sample=self.sampled.emit)
+
+
+class StartupBridge(QObject):
+    """
+    Runs a StartupCoordinator for one "Start All" and hands its start
+    requests to the GUI thread, since readiness probes finish on their own
+    threads. Raises ValueError if the apps' depends_on entries can't be ordered.
+    """
+    start_requested = Signal(str) # app name
+    log_message = Signal(str)
+
+    def __init__(self, app_configs):
+        super().__init__()
+        self.coordinator = StartupCoordinator(app_configs, self.start_requested.emit, on_log=self.log_message.emit)
+
+
+class JobBridge(QObject):
+    """
+    Owns the JobScheduler and re-emits its requests as Qt signals, so runs
+    are started and stopped on the GUI thread like any other app.
+    """
+    start_requested = Signal(str) # job instance name
+    stop_requested = Signal(str)
+    log_message = Signal(str)
+    status_update = Signal(str, str) # name, status
+
+    def __init__(self):
+        super().__init__()
+        self.scheduler = JobScheduler(self.start_requested.emit, self.stop_requested.emit,
+                                      on_log=self.log_message.emit, on_status=self.status_update.emit)
+
+
+class RollingRestartBridge(QObject):
+    """
+    Runs a RollingRestart of one group and hands its restart requests to
+    the GUI thread, which owns the workers; the roll waits for readiness
+    on its own thread.
+    """
+    restart_requested = Signal(object) # instance config
+    log_message = Signal(str)
+    finished = Signal(str, bool)       # group, completed
+
+    def __init__(self, group, instances):
+        super().__init__()
+        self.roll = RollingRestart(group, instances, self.restart_requested.emit, on_log=self.log_message.emit,
+                                   on_done=lambda completed: self.finished.emit(group, completed))
+
+
+class OrphanBridge(QObject):
+    """Starts the shared orphan reaper and re-emits its reports as Qt signals."""
+    log_message = Signal(str)
+    changed = Signal(object) # [{'pid', 'app', 'command', 'since'}, ...]
+
+    def __init__(self):
+        super().__init__()
+        self.reaper = reaper
+        self.enabled = reaper.start(on_log=self.log_message.emit, on_change=self.changed.emit)
+
+
+class ShutdownBridge(QObject):
+    """
+    Runs a ShutdownCoordinator on a background thread, so stopping many
+    apps (and waiting for stragglers) never blocks the GUI thread.
+    """
+    log_message = Signal(str)
+    finished = Signal(object) # the coordinator's result
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.coordinator = ShutdownCoordinator(timeout, on_log=self.log_message.emit)
+
+    def start(self, targets, layers=None):
+        threading.Thread(target=self.run, args=(targets, layers), name="Shutdown", daemon=True).start()
+
+    def run(self, targets, layers=None):
+        self.finished.emit(self.coordinator.shutdown(targets, layers))
+
+
+class DaemonBridge(QObject):
+    """
+    Attaches the GUI to a running daemon. Exposes a RemoteEngine as .engine
+    and polls the daemon from a background thread, emitting the same
+    signals as EngineBridge for status changes and supervisor events.
+    """
+    log_message = Signal(str)
+    status_update = Signal(str, str) # name, status
+
+    def __init__(self, socket_path=None, interval=0.5):
+        super().__init__()
+        self.interval = interval
+        self.engine = RemoteEngine(ControlClient(socket_path), on_log=self.log_message.emit)
+        self.info = self.engine.client.call('ping') # Raises ControlError if no daemon answers
+        self._poll_client = ControlClient(socket_path)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._poll, name="DaemonBridge", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _poll(self):
+        remote = RemoteEngine(self._poll_client)
+        seq, known, connected = 0, {}, True
+        while not self._stop_event.is_set():
             try:
-                self.process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                self.process.kill()
+                statuses, events, seq = remote.poll(seq)
+            except ControlError as e:
+                if connected:
+                    self.log_message.emit(f"Lost connection to the daemon: {e}")
+                connected = False
+                self._stop_event.wait(self.interval * 4)
+                continue
+            connected = True
+            self.engine.status = statuses
+            for event in events:
+                self.log_message.emit(event[3])
+            for name, status in statuses.items():
+                if known.get(name) != status:
+                    known[name] = status
+                    self.status_update.emit(name, status)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.engine.shutdown()
+        self._poll_client.close()
@@ -0,0 +1,282 @@
+import codecs
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+MAGIC = b'PSTB'
+# Ring capacity, total bytes ever written, PID of the last writer, time of the last write.
+HEADER = struct.Struct('<4sIQId')
+HEADER_SIZE = 64 # Data starts on its own cache line
+MAX_TAIL_BUFFER = 64 * 1024 * 1024
+LINE_GUESS = 128 # Bytes per line assumed when reading the last lines
+STREAMS = ('stdout', 'stderr')
+CRASH_REPORT_LINES = 10 # "crash_report_lines": output lines quoted when an app fails; 0 disables
+
+
+class TailRing:
+    """
+    The most recent `capacity` bytes of one output stream, in a ring kept
+    in a memory-mapped file (on Linux in /dev/shm, so only in memory). The
+    supervisor appends to it; anyone, including other processes such as
+    ctl.py, maps the same file read-only and copies the tail straight out
+    of shared memory. The header's write position only grows, so a reader
+    can ask for everything written since it last looked.
+    """
+    def __init__(self, path, capacity=None):
+        """`capacity`: create (or reset) the ring for writing; None maps an existing ring read-only."""
+        self.path = str(path)
+        self._lock = threading.Lock()
+        if capacity is None:
+            with open(self.path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self.capacity, _, _, _ = HEADER.unpack_from(self._map)
+            if magic != MAGIC or len(self._map) < HEADER_SIZE + self.capacity:
+                self._map.close()
+                raise ValueError(f"{self.path} is not a tail buffer")
+            self._position = None
+            return
+        self.capacity = max(1, min(int(capacity), MAX_TAIL_BUFFER))
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, HEADER_SIZE + self.capacity)
+            self._map = mmap.mmap(fd, HEADER_SIZE + self.capacity)
+        finally:
+            os.close(fd)
+        self._position = 0
+        HEADER.pack_into(self._map, 0, MAGIC, self.capacity, 0, 0, 0.0)
+
+    @property
+    def position(self):
+        """Total bytes written so far."""
+        return HEADER.unpack_from(self._map)[2]
+
+    def info(self):
+        """(position, pid of the last writer, time of the last write)."""
+        _, _, position, pid, updated = HEADER.unpack_from(self._map)
+        return position, pid, updated
+
+    def write(self, data, pid=0):
+        """Appends bytes, overwriting the oldest; only the last `capacity` bytes of a large write are kept."""
+        size = len(data)
+        if not size:
+            return
+        capacity = self.capacity
+        with self._lock:
+            position = self._position + size
+            if size > capacity:
+                data = memoryview(data)[size - capacity:]
+            start = (position - len(data)) % capacity
+            first = min(len(data), capacity - start)
+            self._map[HEADER_SIZE + start:HEADER_SIZE + start + first] = data[:first]
+            if first < len(data):
+                self._map[HEADER_SIZE:HEADER_SIZE + len(data) - first] = data[first:]
+            self._position = position
+            # The position is published last, so readers never see it ahead of the data.
+            HEADER.pack_into(self._map, 0, MAGIC, capacity, position, pid, time.time())
+
+    def read(self, since=None, limit=None):
+        """
+        (data, position): what was written after position `since` (None:
+        everything) that is still in the ring, at most its last `limit`
+        bytes; pass `position` as `since` next time to follow the stream.
+        """
+        end = self.position
+        if since is None or since > end: # None, or a ring that was reset since
+            since = 0
+        start = max(since, end - self.capacity)
+        if limit is not None:
+            start = max(start, end - limit)
+        data = self._copy(start, end)
+        # The writer may have lapped the oldest bytes while they were copied.
+        overwritten = self.position - self.capacity
+        if overwritten > start:
+            data = data[overwritten - start:]
+        return data, end
+
+    def lines(self, count, since=None):
+        """The last `count` complete or trailing lines written after `since`, decoded."""
+        if not count:
+            return []
+        # Copy out only the end that holds them, growing it until it does.
+        limit = LINE_GUESS * count
+        while True:
+            data, end = self.read(since, limit)
+            enough = data.count(b'\n', 0, len(data) - 1) >= count
+            if enough or len(data) < limit:
+                break
+            limit *= 4
+        if enough or end - len(data) > (since or 0):
+            data = data[data.find(b'\n') + 1:] # The oldest line was cut by the ring
+        return last_lines(data, count)
+
+    def _copy(self, start, end):
+        size = end - start
+        if size <= 0:
+            return b''
+        offset = start % self.capacity
+        first = min(size, self.capacity - offset)
+        data = self._map[HEADER_SIZE + offset:HEADER_SIZE + offset + first]
+        if first < size:
+            data += self._map[HEADER_SIZE:HEADER_SIZE + size - first]
+        return data
+
+    def close(self):
+        self._map.close()
+
+
+def last_lines(data, count):
+    if not count:
+        return []
+    return data.decode('utf-8', 'replace').replace('\r\n', '\n').splitlines()[-count:]
+
+
+class RingFollower:
+    """Decodes what a TailRing gets from a starting position on, for viewers that poll it."""
+    def __init__(self, ring, since=None):
+        self.ring = ring
+        self.position = since
+        self._decoder = codecs.getincrementaldecoder('utf-8')('replace')
+
+    def poll(self):
+        """New text since the last poll ('' if none)."""
+        data, self.position = self.ring.read(self.position)
+        return self._decoder.decode(data) if data else ''
+
+
+def _runtime_dir():
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    user = os.getuid() if hasattr(os, 'getuid') else os.environ.get('USERNAME', 'user')
+    return os.path.join(base, f"pysupervisor-{user}")
+
+
+def _remove_stale(parent):
+    """Drops the buffers of supervisors that are gone (named after their PIDs)."""
+    if sys.platform == "win32":
+        return
+    for entry in os.listdir(parent):
+        if not entry.isdigit():
+            continue
+        try:
+            os.kill(int(entry), 0)
+        except ProcessLookupError:
+            shutil.rmtree(os.path.join(parent, entry), ignore_errors=True)
+        except OSError:
+            pass
+
+
+class TailBuffers:
+    """
+    The tail rings of every app supervised in this process, two per
+    instance (stdout and stderr), in a directory of their own under
+    /dev/shm/pysupervisor-<uid>/<supervisor PID>. Rings live across
+    restarts of an app, so the output of a run that crashed can still be
+    read after it; they are removed once the app leaves the config
+    (retain()) or the supervisor exits (close_all()).
+    """
+    def __init__(self):
+        self.default_size = 0  # Top-level "tail_buffer": bytes per stream for apps that don't set one
+        self._rings = {}       # instance name -> {stream: TailRing}
+        self._dir = None
+        self._lock = threading.Lock()
+
+    def size_for(self, proc_config):
+        size = proc_config.get('tail_buffer')
+        return int(self.default_size if size is None else size or 0)
+
+    def rings(self, name, size):
+        """The rings of one instance, created (or recreated at a new size) as needed."""
+        with self._lock:
+            rings = self._rings.get(name)
+            if rings and rings['stdout'].capacity == min(size, MAX_TAIL_BUFFER):
+                return rings
+            if rings:
+                self._close(name)
+            directory = self._directory()
+            rings = self._rings[name] = {stream: TailRing(os.path.join(directory, f"{quote(name, safe='')}.{stream}"), size)
+                                         for stream in STREAMS}
+            return rings
+
+    def get(self, name):
+        """The rings of an instance ({} if it has none)."""
+        with self._lock:
+            return dict(self._rings.get(name, {}))
+
+    def paths(self, names=None):
+        """{instance: {stream: path}} for the named instances (all if None) that have rings."""
+        with self._lock:
+            return {name: {stream: ring.path for stream, ring in rings.items()}
+                    for name, rings in self._rings.items() if names is None or name in names}
+
+    def retain(self, names):
+        """Removes the rings of every instance not in `names`."""
+        with self._lock:
+            for name in [name for name in self._rings if name not in names]:
+                self._close(name)
+
+    def close_all(self):
+        self.retain(())
+        with self._lock:
+            if self._dir:
+                shutil.rmtree(self._dir, ignore_errors=True)
+                self._dir = None
+
+    def _directory(self):
+        if self._dir is None:
+            parent = _runtime_dir()
+            os.makedirs(parent, mode=0o700, exist_ok=True)
+            _remove_stale(parent)
+            self._dir = os.path.join(parent, str(os.getpid()))
+            os.makedirs(self._dir, mode=0o700, exist_ok=True)
+        return self._dir
+
+    def _close(self, name):
+        for ring in self._rings.pop(name).values():
+            ring.close() # Readers that still map the file keep their view of it
+            try:
+                os.remove(ring.path)
+            except OSError:
+                pass
+
+
+# Shared by every app supervised in this process; hosts set the default
+# size from the top-level "tail_buffer" and drop the rings of apps that
+# left the config with configure_tail_buffers().
+buffers = TailBuffers()
+
+
+def configure_tail_buffers(config, apps):
+    """Applies a config's top-level "tail_buffer" and removes the rings of instances not in `apps` (expanded)."""
+    buffers.default_size = int(config.get('tail_buffer') or 0)
+    buffers.retain({app['name'] for app in apps})
+
+
+def open_rings(paths):
+    """Maps {stream: path} read-only as {stream: TailRing}, skipping rings that are gone."""
+    rings = {}
+    for stream, path in paths.items():
+        try:
+            rings[stream] = TailRing(path)
+        except (OSError, ValueError):
+            pass
+    return rings
+
+
+def crash_report(name, rings, since, lines=CRASH_REPORT_LINES):
+    """
+    Log messages quoting the last lines a failed run wrote: from stderr,
+    or from stdout if it wrote nothing to stderr. `since` maps each stream
+    to its ring position when the run started.
+    """
+    for stream in ('stderr', 'stdout'):
+        ring = rings.get(stream)
+        tail = ring.lines(lines, since.get(stream, 0)) if ring and lines else []
+        if tail:
+            return [f"[{name}] Last {len(tail)} line(s) of {stream} before it exited:"] + \
+                   [f"[{name}] | {line}" for line in tail]
+    return []